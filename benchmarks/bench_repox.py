@@ -0,0 +1,186 @@
+"""
+Benchmarks of repox on synthetic repositories.
+
+Each case runs in a fresh process, so that its peak RSS is its own, and its time is the best
+of several runs. Results are written as JSON, with files and bytes processed per second:
+
+    python -m benchmarks.bench_repox --sizes 1k 10k 100k --output results/benchmarks/repox.json
+
+The same cases run with pytest-benchmark, see `benchmarks/bench_repox_pytest.py`.
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pipelex.pipelex import Pipelex
+from pipelex.system.runtime import IntegrationMode
+
+from benchmarks.synthetic_repo import ensure_synthetic_repo, parse_nb_files
+from cocode.repox.models import EnumerationMode, OutputStyle
+from cocode.repox.process_python import PythonProcessingRule, make_python_batch_processing_funcs, make_python_text_processing_funcs
+from cocode.repox.repox_container import RepoxContainerWriter
+from cocode.repox.repox_processor import RepoxProcessor
+
+# Timed operations: walking and rendering the tree, processing the files under each rule, and formatting them in each style
+BENCHMARK_CASES: List[str] = [
+    "tree",
+    *(f"process:{python_processing_rule}" for python_processing_rule in PythonProcessingRule),
+    *(f"build:{output_style}" for output_style in OutputStyle),
+]
+
+
+def make_processor(
+    repo_path: Path,
+    python_processing_rule: PythonProcessingRule = PythonProcessingRule.INTEGRAL,
+    output_style: OutputStyle = OutputStyle.REPO_MAP,
+    jobs: int = 1,
+) -> RepoxProcessor:
+    """Make a processor as the repox command does, without the persistent cache."""
+    return RepoxProcessor(
+        repo_path=str(repo_path),
+        text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=python_processing_rule),
+        text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=python_processing_rule),
+        output_style=output_style,
+        jobs=jobs,
+        enumeration_mode=EnumerationMode.FILESYSTEM,
+    )
+
+
+def prepare_case(repo_path: Path, case: str, jobs: int = 1) -> Tuple[Callable[[], object], int, Optional[int]]:
+    """Prepare the timed function of a case, doing the work it doesn't measure, such as walking before processing.
+
+    Returns:
+        The function to time, the number of files it handles, and the number of bytes it reads, None if it reads none
+    """
+    kind, _, name = case.partition(":")
+    match kind:
+        case "tree":
+            walked_files = make_processor(repo_path=repo_path).walk_files()
+            return lambda: make_processor(repo_path=repo_path).get_tree_structure(), len(walked_files), None
+        case "process":
+            processor = make_processor(repo_path=repo_path, python_processing_rule=PythonProcessingRule(name), jobs=jobs)
+            content_files = processor.select_content_files()
+            return processor.process_file_contents, len(content_files), sum(walked_file.size for walked_file in content_files)
+        case "build":
+            output_style = OutputStyle(name)
+            python_processing_rule = PythonProcessingRule.IMPORTS if output_style == OutputStyle.IMPORT_LIST else PythonProcessingRule.INTEGRAL
+            processor = make_processor(repo_path=repo_path, python_processing_rule=python_processing_rule, output_style=output_style, jobs=jobs)
+            tree_structure = processor.get_tree_structure()
+            file_contents = processor.process_file_contents()
+            nb_bytes = sum(len(file_content.encode()) for file_content in file_contents.values())
+            if output_style == OutputStyle.TREE:
+                return lambda: processor.build_output_content(tree_structure=tree_structure, file_contents=file_contents), len(file_contents), None
+            if output_style == OutputStyle.CONTAINER:
+                return lambda: _build_container(tree_structure=tree_structure, file_contents=file_contents), len(file_contents), nb_bytes
+            return lambda: processor.build_output_content(tree_structure=tree_structure, file_contents=file_contents), len(file_contents), nb_bytes
+        case _:
+            raise ValueError(f"Unknown benchmark case '{case}', expected one of: {', '.join(BENCHMARK_CASES)}")
+
+
+def _build_container(tree_structure: str, file_contents: Dict[str, str]) -> bytes:
+    """The container style is binary and has no build_output_content: format the same contents with its writer."""
+    output = io.BytesIO()
+    container_writer = RepoxContainerWriter(output=output)
+    container_writer.write_tree(tree_structure=tree_structure)
+    for relative_path, file_content in file_contents.items():
+        container_writer.write_file(relative_path=relative_path, file_content=file_content)
+    container_writer.close()
+    return output.getvalue()
+
+
+def get_peak_rss_bytes() -> int:
+    """Peak resident set size of the current process."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def run_case(repo_path: Path, case: str, nb_repeats: int, jobs: int) -> Dict[str, Any]:
+    """Run a case and measure it, in the current process."""
+    timed_func, nb_files, nb_bytes = prepare_case(repo_path=repo_path, case=case, jobs=jobs)
+    best_seconds = float("inf")
+    for _ in range(nb_repeats):
+        start_time = time.perf_counter()
+        timed_func()
+        best_seconds = min(best_seconds, time.perf_counter() - start_time)
+    return {
+        "case": case,
+        "nb_files": nb_files,
+        "nb_bytes": nb_bytes,
+        "seconds": best_seconds,
+        "files_per_second": nb_files / best_seconds,
+        "bytes_per_second": nb_bytes / best_seconds if nb_bytes is not None else None,
+        "peak_rss_bytes": get_peak_rss_bytes(),
+    }
+
+
+def boot_pipelex() -> None:
+    """Repox logs through pipelex, which must be set up in each benchmark process."""
+    Pipelex.make(integration_mode=IntegrationMode.CI, needs_inference=False)
+
+
+def run_case_in_fresh_process(repo_path: Path, case: str, nb_repeats: int, jobs: int) -> Dict[str, Any]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=boot_pipelex) as executor:
+        return executor.submit(run_case, repo_path, case, nb_repeats, jobs).result()
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark repox on deterministic synthetic repositories")
+    parser.add_argument("--sizes", nargs="+", default=["1k", "10k"], help="Numbers of files of the repositories, e.g. 1k 10k 100k")
+    parser.add_argument("--cases", nargs="+", default=BENCHMARK_CASES, choices=BENCHMARK_CASES, help="Cases to run, all by default")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each case, the best time is kept")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of parallel workers processing files")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic repositories")
+    parser.add_argument(
+        "--repos-dir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "cocode-benchmarks",
+        help="Where repositories are generated, and reused by later runs",
+    )
+    parser.add_argument("--output", type=Path, default=Path("results/benchmarks/repox.json"), help="JSON file of the results")
+    args = parser.parse_args(arguments)
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        nb_files = parse_nb_files(size)
+        print(f"Generating a repository of {nb_files} files in '{args.repos_dir}'")
+        repo_path = ensure_synthetic_repo(repos_dir=args.repos_dir, nb_files=nb_files, seed=args.seed)
+        for case in args.cases:
+            result = {"repo_nb_files": nb_files, **run_case_in_fresh_process(repo_path=repo_path, case=case, nb_repeats=args.repeat, jobs=args.jobs)}
+            results.append(result)
+            bytes_per_second = result["bytes_per_second"]
+            throughput = f"{bytes_per_second / 1e6:8.1f} MB/s" if bytes_per_second is not None else f"{'-':>8} MB/s"
+            print(
+                f"{nb_files:>7} files  {case:<20} {result['seconds']:8.3f} s  {result['files_per_second']:10.0f} files/s  "
+                f"{throughput}  {result['peak_rss_bytes'] / 1e6:8.1f} MB peak RSS"
+            )
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "cocode_version": version("cocode"),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "jobs": args.jobs,
+        "nb_repeats": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Repox benchmarks for pytest-benchmark, on a synthetic repository of REPOX_BENCHMARK_SIZE files (1k by default).
+
+This module is not collected with the unit tests, run it explicitly:
+
+    python -m pytest benchmarks/bench_repox_pytest.py --benchmark-only
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Generator
+
+import pytest
+from pipelex.pipelex import Pipelex
+
+from benchmarks.bench_repox import BENCHMARK_CASES, boot_pipelex, prepare_case
+from benchmarks.synthetic_repo import ensure_synthetic_repo, parse_nb_files
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def synthetic_repo_path() -> Generator[Path, None, None]:
+    # This directory is outside of the unit tests, whose conftest sets up pipelex
+    boot_pipelex()
+    nb_files = parse_nb_files(os.environ.get("REPOX_BENCHMARK_SIZE", "1k"))
+    yield ensure_synthetic_repo(repos_dir=Path(tempfile.gettempdir()) / "cocode-benchmarks", nb_files=nb_files)
+    Pipelex.teardown_if_needed()
+
+
+@pytest.mark.parametrize("case", BENCHMARK_CASES)
+def test_repox(benchmark: Any, synthetic_repo_path: Path, case: str) -> None:
+    timed_func, nb_files, nb_bytes = prepare_case(repo_path=synthetic_repo_path, case=case)
+    benchmark.extra_info.update({"nb_files": nb_files, "nb_bytes": nb_bytes})
+    benchmark(timed_func)
@@ -0,0 +1,140 @@
+"""
+Deterministic synthetic repositories for the repox benchmarks.
+
+A repository is generated from its number of files and a seed only, so that the same
+command benchmarks the same bytes on every machine. It has deep package trees of Python
+modules, docs and config files, gitignored vendor directories and a few large binaries.
+"""
+
+import json
+import random
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Bump when the generated contents change, so that repositories generated before are regenerated
+GENERATOR_VERSION = 1
+# File describing a generated repository, ignored by its .gitignore
+MARKER_FILENAME = ".synthetic-repo.json"
+# Share of the files that are Python modules, text files, vendored files and large binaries
+PYTHON_SHARE = 0.6
+TEXT_SHARE = 0.25
+VENDOR_SHARE = 0.14
+# One large binary per this many files, at least one
+FILES_PER_LARGE_BINARY = 2000
+LARGE_BINARY_BYTES = 1024 * 1024
+# Maximum number of nested directories under a top-level package
+MAX_DEPTH = 8
+# Number of modules in a directory before a sub-directory is opened
+FILES_PER_DIR = 12
+
+_WORDS = (
+    "alpha beta cache client config context data error event field file handler index item job key layer model node "
+    "output parser path pipe queue record request result runner schema service session source state stream task token value"
+).split()
+_TEXT_SUFFIXES = (".md", ".json", ".yaml", ".toml", ".txt")
+# Large binaries start like PNG images, so that their type is detected as for real assets
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def parse_nb_files(size: str) -> int:
+    """Parse a repository size such as '1k', '10k', '100k' or '2500'."""
+    size = size.strip().lower()
+    if size.endswith("k"):
+        return int(float(size[:-1]) * 1000)
+    return int(size)
+
+
+def ensure_synthetic_repo(repos_dir: Path, nb_files: int, seed: int = 0) -> Path:
+    """Get the path of a generated repository, generating it unless it was already, with the same parameters."""
+    repo_path = repos_dir / f"synthetic-{nb_files}-{seed}"
+    marker = {"generator_version": GENERATOR_VERSION, "nb_files": nb_files, "seed": seed}
+    marker_path = repo_path / MARKER_FILENAME
+    if marker_path.is_file() and json.loads(marker_path.read_text()) == marker:
+        return repo_path
+    if repo_path.exists():
+        shutil.rmtree(repo_path)
+    generate_synthetic_repo(repo_path=repo_path, nb_files=nb_files, seed=seed)
+    marker_path.write_text(json.dumps(marker))
+    return repo_path
+
+
+def generate_synthetic_repo(repo_path: Path, nb_files: int, seed: int = 0) -> None:
+    """Write a repository of about nb_files files, the same for the same parameters.
+
+    Args:
+        repo_path: Directory to generate the repository in, created if needed
+        nb_files: Number of files, including the ignored ones
+        seed: Seed of the contents and layout
+    """
+    rng = random.Random(seed)
+    repo_path.mkdir(parents=True, exist_ok=True)
+    (repo_path / ".gitignore").write_text(f"vendor/\n*.log\n{MARKER_FILENAME}\n")
+    nb_large_binaries = max(1, nb_files // FILES_PER_LARGE_BINARY)
+    nb_vendor_files = int(nb_files * VENDOR_SHARE)
+    nb_text_files = int(nb_files * TEXT_SHARE)
+    nb_python_files = max(nb_files - nb_large_binaries - nb_vendor_files - nb_text_files - 1, 0)
+
+    python_paths = _make_tree_paths(rng=rng, top_dir="src", nb_files=nb_python_files, suffixes=(".py",))
+    module_names = [path.replace("/", ".").removesuffix(".py") for path in python_paths]
+    for index, relative_path in enumerate(python_paths):
+        _write(repo_path, relative_path, _make_python_module(rng=rng, index=index, module_names=module_names))
+    for relative_path in _make_tree_paths(rng=rng, top_dir="docs", nb_files=nb_text_files, suffixes=_TEXT_SUFFIXES):
+        _write(repo_path, relative_path, _make_text_file(rng=rng, relative_path=relative_path))
+    for relative_path in _make_tree_paths(rng=rng, top_dir="vendor", nb_files=nb_vendor_files, suffixes=(".py", ".js")):
+        _write(repo_path, relative_path, _make_text_file(rng=rng, relative_path=relative_path))
+    for index in range(nb_large_binaries):
+        binary_path = repo_path / "assets" / f"image_{index}.png"
+        binary_path.parent.mkdir(parents=True, exist_ok=True)
+        binary_path.write_bytes(_PNG_SIGNATURE + rng.randbytes(LARGE_BINARY_BYTES - len(_PNG_SIGNATURE)))
+
+
+def _make_tree_paths(rng: random.Random, top_dir: str, nb_files: int, suffixes: Tuple[str, ...]) -> List[str]:
+    """Spread files over a tree whose depth grows with the number of files, up to MAX_DEPTH."""
+    relative_paths: List[str] = []
+    dir_parts: List[str] = [top_dir]
+    nb_files_in_dir = 0
+    for index in range(nb_files):
+        if nb_files_in_dir == FILES_PER_DIR:
+            nb_files_in_dir = 0
+            # Go deeper, or back up to a random ancestor to open a sibling directory
+            if len(dir_parts) <= MAX_DEPTH and rng.random() < 0.6:
+                dir_parts.append(f"{rng.choice(_WORDS)}_{index}")
+            else:
+                dir_parts = dir_parts[: rng.randint(1, len(dir_parts))] + [f"{rng.choice(_WORDS)}_{index}"]
+        relative_paths.append("/".join([*dir_parts, f"{rng.choice(_WORDS)}_{index}{rng.choice(suffixes)}"]))
+        nb_files_in_dir += 1
+    return relative_paths
+
+
+def _make_python_module(rng: random.Random, index: int, module_names: List[str]) -> str:
+    lines: List[str] = [f'"""Module {index}: {" ".join(rng.choices(_WORDS, k=8))}."""', "", "import os", "from typing import Dict, List", ""]
+    for module_name in rng.sample(module_names[:index], k=min(index, 3)):
+        lines.append(f"from {module_name} import {rng.choice(_WORDS).capitalize()}")
+    for class_index in range(rng.randint(1, 4)):
+        class_name = f"{rng.choice(_WORDS).capitalize()}{class_index}"
+        lines.extend(["", "", f"class {class_name}:", f'    """{" ".join(rng.choices(_WORDS, k=10)).capitalize()}."""', ""])
+        lines.append(f"    def __init__(self, {rng.choice(_WORDS)}: int) -> None:")
+        lines.append("        self.values: Dict[str, int] = {}")
+        for method_index in range(rng.randint(1, 6)):
+            arguments = ", ".join(f"{word}: str" for word in rng.sample(_WORDS, k=rng.randint(0, 3)))
+            lines.extend(["", f"    def {rng.choice(_WORDS)}_{method_index}(self{', ' if arguments else ''}{arguments}) -> List[str]:"])
+            lines.append(f'        """{" ".join(rng.choices(_WORDS, k=6)).capitalize()}."""')
+            for _ in range(rng.randint(2, 12)):
+                lines.append(f"        self.values[{rng.choice(_WORDS)!r}] = len(os.sep) + {rng.randint(0, 999)}")
+            lines.append("        return list(self.values)")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _make_text_file(rng: random.Random, relative_path: str) -> str:
+    if relative_path.endswith(".json"):
+        content: Dict[str, object] = {word: rng.randint(0, 10_000) for word in rng.sample(_WORDS, k=10)}
+        return json.dumps(content, indent=2)
+    return "\n".join(" ".join(rng.choices(_WORDS, k=rng.randint(4, 16))) for _ in range(rng.randint(5, 80))) + "\n"
+
+
+def _write(repo_path: Path, relative_path: str, content: str) -> None:
+    file_path = repo_path / relative_path
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_text(content)
@@ -6,9 +6,12 @@ import asyncio
 from typing import Annotated, List, Optional
 
 import typer
+from pipelex import log
 from pipelex.system.pipe_run_mode import PipeRunMode
 
 from cocode.common import get_output_dir, validate_repo_path
+from cocode.diff.diff_stream import DEFAULT_MAX_DIFF_BYTES
+from cocode.exceptions import DiffTooLarge
 from cocode.swe.swe_cmd import swe_from_repo_diff
 
 changelog_app = typer.Typer(
@@ -56,6 +59,30 @@ def changelog_update_cmd(
             "--exclude-pattern", "-i", help="Patterns to exclude from git diff (e.g., '*.log', 'temp/', 'build/'). Can be specified multiple times."
         ),
     ] = None,
+    target_version: Annotated[
+        Optional[str],
+        typer.Option(
+            "--to", help="Git version/tag/commit to compare against VERSION instead of the current version, without reading the working tree"
+        ),
+    ] = None,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read nor write the persistent cache of git diffs (~/.cocode/cache/diff)"),
+    ] = False,
+    max_diff_bytes: Annotated[
+        int,
+        typer.Option(
+            "--max-diff-bytes",
+            help="Maximum size of the git diff in bytes, beyond which the command stops before running the pipeline. 0 for no limit.",
+        ),
+    ] = DEFAULT_MAX_DIFF_BYTES,
+    keep_noise: Annotated[
+        bool,
+        typer.Option(
+            "--keep-noise",
+            help="Send renamed files, moved blocks, whitespace-only and generated files as full diffs, instead of collapsing them to one-line notes",
+        ),
+    ] = False,
 ) -> None:
     """Generate changelog from git diff comparing current version to specified version. Supports both local repositories and GitHub repositories."""
     repo_path = validate_repo_path(repo_path)
@@ -63,16 +90,24 @@ def changelog_update_cmd(
     to_stdout = output_dir == "stdout"
     pipe_run_mode = PipeRunMode.DRY if dry_run else PipeRunMode.LIVE
 
-    asyncio.run(
-        swe_from_repo_diff(
-            pipe_code="write_changelog_enhanced",
-            repo_path=repo_path,
-            version=version,
-            output_filename=output_filename,
-            output_dir=output_dir,
-            to_stdout=to_stdout,
-            pipe_run_mode=pipe_run_mode,
-            include_patterns=include_patterns,
-            exclude_patterns=exclude_patterns,
+    try:
+        asyncio.run(
+            swe_from_repo_diff(
+                pipe_code="write_changelog_enhanced",
+                repo_path=repo_path,
+                version=version,
+                output_filename=output_filename,
+                output_dir=output_dir,
+                to_stdout=to_stdout,
+                pipe_run_mode=pipe_run_mode,
+                include_patterns=include_patterns,
+                exclude_patterns=exclude_patterns,
+                target_version=target_version,
+                use_cache=not no_cache,
+                max_diff_bytes=max_diff_bytes or None,
+                reduce_noise=not keep_noise,
+            )
         )
-    )
+    except DiffTooLarge as exc:
+        log.error(f"[ERROR] {exc}: narrow it with --include-pattern, --exclude-pattern or --to, or raise --max-diff-bytes")
+        raise typer.Exit(code=1) from exc
@@ -6,8 +6,11 @@ import asyncio
 from typing import Annotated, List, Optional
 
 import typer
+from pipelex import log
 
 from cocode.common import validate_repo_path
+from cocode.diff.diff_stream import DEFAULT_MAX_DIFF_BYTES
+from cocode.exceptions import DiffTooLarge
 from cocode.swe.swe_cmd import swe_doc_proofread, swe_doc_update_from_diff
 
 doc_app = typer.Typer(
@@ -43,6 +46,23 @@ def doc_update_cmd(
             "--exclude-pattern", "-i", help="Patterns to exclude from git diff (e.g., '*.log', 'temp/', 'build/'). Can be specified multiple times."
         ),
     ] = None,
+    target_version: Annotated[
+        Optional[str],
+        typer.Option(
+            "--to", help="Git version/tag/commit to compare against VERSION instead of the current version, without reading the working tree"
+        ),
+    ] = None,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read nor write the persistent cache of git diffs (~/.cocode/cache/diff)"),
+    ] = False,
+    max_diff_bytes: Annotated[
+        int,
+        typer.Option(
+            "--max-diff-bytes",
+            help="Maximum size of the git diff in bytes, beyond which the command stops before running the pipeline. 0 for no limit.",
+        ),
+    ] = DEFAULT_MAX_DIFF_BYTES,
     doc_dir: Annotated[
         Optional[str],
         typer.Option("--doc-dir", "-d", help="Directory containing documentation files (e.g., 'docs', 'documentation')"),
@@ -54,15 +74,22 @@ def doc_update_cmd(
     """
     repo_path = validate_repo_path(repo_path)
 
-    asyncio.run(
-        swe_doc_update_from_diff(
-            repo_path=repo_path,
-            version=version,
-            output_filename=output_filename,
-            output_dir=output_dir,
-            exclude_patterns=exclude_patterns,
+    try:
+        asyncio.run(
+            swe_doc_update_from_diff(
+                repo_path=repo_path,
+                version=version,
+                output_filename=output_filename,
+                output_dir=output_dir,
+                exclude_patterns=exclude_patterns,
+                target_version=target_version,
+                use_cache=not no_cache,
+                max_diff_bytes=max_diff_bytes or None,
+            )
         )
-    )
+    except DiffTooLarge as exc:
+        log.error(f"[ERROR] {exc}: narrow it with --include-pattern, --exclude-pattern or --to, or raise --max-diff-bytes")
+        raise typer.Exit(code=1) from exc
 
 
 @doc_app.command("proofread")
@@ -10,6 +10,7 @@ from pipelex.system.pipe_run_mode import PipeRunMode
 
 from cocode.common import PipeCode, get_output_dir, validate_repo_path
 from cocode.repox.models import OutputStyle
+from cocode.repox.process_code import CodeProcessingRule
 from cocode.repox.process_python import PythonProcessingRule
 from cocode.swe.swe_cmd import swe_from_repo
 
@@ -44,10 +45,22 @@ def repo_extract_fundamentals_cmd(
         PythonProcessingRule,
         typer.Option("--python-rule", "-p", help="Python processing rule to apply", case_sensitive=False),
     ] = PythonProcessingRule.INTERFACE,
+    code_processing_rule: Annotated[
+        CodeProcessingRule,
+        typer.Option(
+            "--code-rule",
+            "-c",
+            help="Processing rule for JavaScript, TypeScript, Go and Rust files: interface (exported signatures, types and doc comments) or integral",
+            case_sensitive=False,
+        ),
+    ] = CodeProcessingRule.INTEGRAL,
     output_style: Annotated[
         OutputStyle,
         typer.Option(
-            "--output-style", "-s", help="One of: repo_map, flat (contents only), or import_list (for --python-rule imports)", case_sensitive=False
+            "--output-style",
+            "-s",
+            help="One of: repo_map, compact (repo map with fewer tokens), flat (contents only), or import_list (for --python-rule imports)",
+            case_sensitive=False,
         ),
     ] = OutputStyle.REPO_MAP,
     include_patterns: Annotated[
@@ -62,6 +75,18 @@ def repo_extract_fundamentals_cmd(
         bool,
         typer.Option("--dry", help="Run pipeline in dry mode (no actual execution)"),
     ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read nor write the persistent cache of processed files (~/.cocode/cache/repox)"),
+    ] = False,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option(
+            "--token-budget",
+            help="Estimated maximum number of tokens of the output: lower ranked files are degraded (integral, interface, imports) then left out",
+            min=1,
+        ),
+    ] = None,
 ) -> None:
     """Extract project fundamentals and architecture insights from repository. Supports both local repositories and GitHub repositories."""
     repo_path = validate_repo_path(repo_path)
@@ -77,10 +102,13 @@ def repo_extract_fundamentals_cmd(
             include_patterns=include_patterns,
             path_pattern=path_pattern,
             python_processing_rule=python_processing_rule,
+            code_processing_rule=code_processing_rule,
             output_style=output_style,
             output_filename=output_filename,
             output_dir=output_dir,
             to_stdout=to_stdout,
             pipe_run_mode=pipe_run_mode,
+            use_cache=not no_cache,
+            token_budget=token_budget,
         )
     )
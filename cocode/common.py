@@ -39,7 +39,7 @@ class PipeCode(StrEnum):
     WRITE_CHANGELOG_ENHANCED = "write_changelog_enhanced"
 
     # Text utilities
-    GENERATE_SPLIT_IDENTIFIERS = "generate_split_identifiers"
+    SPLIT_DIFF_INTO_CHUNKS = "split_diff_into_chunks"
 
     # SWE docs consistency check
     CHECK_DOCS_INCONSISTENCIES = "check_doc_inconsistencies"
@@ -61,7 +61,7 @@ def get_pipe_descriptions() -> str:
         "ai_instruction_update": "Generate AI instruction update suggestions for AGENTS.md, CLAUDE.md, cursor rules",
         "write_changelog": "Write a comprehensive changelog for a software project from git diff",
         "write_changelog_enhanced": "Write a comprehensive changelog with draft and polish steps from git diff",
-        "generate_split_identifiers": "Analyze large text and generate optimal split identifiers",
+        "split_diff_into_chunks": "Split a git diff into chunks of whole files grouped by directory, fitting a target token size",
         "check_doc_inconsistencies": "Identify inconsistencies in a set of software engineering documents",
     }
 
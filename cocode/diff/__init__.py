@@ -0,0 +1 @@
+"""Streaming git diff parsing for cocode."""
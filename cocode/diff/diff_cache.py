@@ -0,0 +1,144 @@
+"""
+Persistent cache of git diffs, shared by the diff-based commands.
+
+A diff is keyed on the commit it is made against, resolved from its version, and on what it
+is compared to: the tree of a target commit, or the working tree, fingerprinted from the HEAD
+tree and the contents of the files that differ from it. The git diff command, with its include
+and exclude patterns and options, is part of the key. Entries are compressed with zlib.
+"""
+
+import hashlib
+import os
+import stat
+import subprocess
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+from pipelex import log
+from typing_extensions import override
+
+from cocode.diff.diff_stream import make_diff_pathspecs, make_git_diff_command
+from cocode.repox.repox_cache import RepoxCache
+
+# Default upper bound of the diff cache size on disk
+DEFAULT_MAX_DIFF_CACHE_BYTES = 256 * 1024 * 1024
+
+# zlib compression level of the entries, diffs being written once and read by several commands
+DIFF_COMPRESSION_LEVEL = 6
+
+
+class DiffCache(RepoxCache):
+    """Maps (base commit, target tree or working tree fingerprint, git diff command, cocode version) to the diff text.
+
+    Entries are stored and evicted like the repox cache entries, compressed with zlib.
+    """
+
+    cache_name = "diff"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_DIFF_CACHE_BYTES):
+        """
+        Initialize the diff cache.
+
+        Args:
+            cache_dir: Directory holding the cache entries. If None, uses ~/.cocode/cache/diff.
+            max_bytes: Size above which the least recently used entries are evicted.
+        """
+        if cache_dir is None:
+            cache_dir = str(Path.home() / ".cocode" / "cache" / "diff")
+        super().__init__(cache_dir=cache_dir, max_bytes=max_bytes)
+
+    def make_diff_key(
+        self,
+        repo_path: str,
+        version: str,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        target_version: Optional[str] = None,
+    ) -> Optional[str]:
+        """Build the cache key of a git diff, with the arguments of `iter_git_diff`.
+
+        Returns:
+            The key, or None if a version can't be resolved, in which case the diff is not cached
+        """
+        try:
+            base_commit = resolve_git_object(repo_path=repo_path, revision=f"{version}^{{commit}}")
+            if target_version is not None:
+                target_fingerprint = f"tree {resolve_git_object(repo_path=repo_path, revision=f'{target_version}^{{tree}}')}"
+            else:
+                target_fingerprint = make_working_tree_fingerprint(
+                    repo_path=repo_path,
+                    pathspecs=make_diff_pathspecs(include_patterns=include_patterns, exclude_patterns=exclude_patterns),
+                )
+        except RuntimeError as exc:
+            log.debug(f"Git diff not cached: {exc}")
+            return None
+        # The target is in the key by its tree, whatever its name
+        git_cmd = make_git_diff_command(
+            version=base_commit,
+            include_patterns=include_patterns,
+            exclude_patterns=exclude_patterns,
+            target_version=None if target_version is None else "target",
+        )
+        hasher = hashlib.sha256()
+        hasher.update(f"{self.cocode_version}\0{base_commit}\0{target_fingerprint}\0".encode())
+        hasher.update("\0".join(git_cmd).encode("utf-8", errors="surrogateescape"))
+        return hasher.hexdigest()
+
+    @override
+    def _encode_entry(self, text: str) -> bytes:
+        return zlib.compress(text.encode("utf-8"), DIFF_COMPRESSION_LEVEL)
+
+    @override
+    def _decode_entry(self, entry_bytes: bytes) -> str:
+        try:
+            return zlib.decompress(entry_bytes).decode("utf-8")
+        except zlib.error as exc:
+            raise ValueError(f"Corrupt diff cache entry: {exc}") from exc
+
+
+def resolve_git_object(repo_path: str, revision: str) -> str:
+    """Resolve a git revision, such as 'v1.0^{commit}' or 'main^{tree}', to its object id."""
+    return _run_git(repo_path=repo_path, args=["rev-parse", "--verify", "--quiet", revision]).strip()
+
+
+def make_working_tree_fingerprint(repo_path: str, pathspecs: List[str]) -> str:
+    """Fingerprint the tracked files of the working tree matching pathspecs, which is what a diff against it depends on.
+
+    The working tree is the HEAD tree with the files that differ from it, so it is fingerprinted
+    from the HEAD tree id and the path, mode and content hash of each of these files. Untracked
+    files are not part of a git diff and are left out.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(resolve_git_object(repo_path=repo_path, revision="HEAD^{tree}").encode())
+    changed_paths = _run_git(repo_path=repo_path, args=["diff", "--no-renames", "--name-only", "-z", "HEAD", "--", *pathspecs]).split("\0")
+    for relative_path in sorted(filter(None, changed_paths)):
+        hasher.update(f"\0{relative_path}\0".encode("utf-8", errors="surrogateescape"))
+        hasher.update(_hash_working_tree_file(path=os.path.join(repo_path, relative_path)).encode())
+    return f"worktree {hasher.hexdigest()}"
+
+
+def _hash_working_tree_file(path: str) -> str:
+    try:
+        file_stat = os.lstat(path)
+    except FileNotFoundError:
+        return "deleted"
+    if stat.S_ISLNK(file_stat.st_mode):
+        return f"link {os.readlink(path)}"
+    hasher = hashlib.sha256()
+    try:
+        with open(path, "rb") as file:
+            while chunk := file.read(1024 * 1024):
+                hasher.update(chunk)
+    except OSError as exc:
+        # Such as a submodule directory: its own state is not fingerprinted
+        return f"unreadable {exc.errno}"
+    is_executable = bool(file_stat.st_mode & stat.S_IXUSR)
+    return f"{'executable' if is_executable else 'file'} {hasher.hexdigest()}"
+
+
+def _run_git(repo_path: str, args: List[str]) -> str:
+    result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {result.stderr.decode(errors='replace').strip() or f'exit status {result.returncode}'}")
+    return result.stdout.decode("utf-8", errors="surrogateescape")
@@ -0,0 +1,101 @@
+"""
+Token-aware chunking of git diffs.
+
+A diff is cut into chunks of about a target number of tokens, between files, preferably
+where the directory changes, so that each chunk can be analyzed on its own. A file larger
+than the target is cut between its hunks, and a hunk is never cut. The chunks are made
+locally and deterministically, as spans of the diff text that follow each other.
+"""
+
+import posixpath
+from typing import List, Optional, Tuple
+
+from cocode.diff.diff_stream import iter_text_lines, parse_diff_lines
+from cocode.repox.repox_budget import estimate_tokens
+
+# Number of tokens a chunk of diff is filled up to
+DIFF_CHUNK_TARGET_TOKENS = 8000
+
+# Share of the target from which a chunk is closed when the next file is in another directory
+DIRECTORY_BREAK_RATIO = 0.5
+
+
+def chunk_diff(diff_text: str, target_tokens: int = DIFF_CHUNK_TARGET_TOKENS) -> List[Tuple[int, int]]:
+    """Cut a diff in git's format into chunks of whole files and hunks, of at most about a number of tokens each.
+
+    Files are added to a chunk in diff order until the next one would exceed the target, or until
+    the chunk is at least half full and the next file is in another directory. A file that alone
+    exceeds the target is cut between its hunks, its header lines staying with its first hunk, and a
+    hunk that alone exceeds the target makes a chunk of its own. Anything before the first file
+    goes to the first chunk. A text that holds no file diff is a single chunk.
+
+    Args:
+        diff_text: The diff
+        target_tokens: Number of estimated tokens a chunk is filled up to
+
+    Returns:
+        The (start, end) character positions of the chunks, which cover the whole text in order
+    """
+    diff_files = parse_diff_lines(iter_text_lines(text=diff_text))
+    chunker = _DiffChunker(target_tokens=target_tokens)
+    files_length = 0
+    file_pieces: List[Tuple[str, List[str]]] = []
+    for diff_file in diff_files:
+        # The header lines go with the first hunk, so that no chunk starts with a hunk of an unknown file
+        pieces = [hunk.to_text() for hunk in diff_file.hunks] or [""]
+        pieces[0] = "".join(diff_file.header_lines) + pieces[0]
+        files_length += sum(len(piece) for piece in pieces)
+        file_pieces.append((posixpath.dirname(diff_file.path), pieces))
+    if not file_pieces:
+        return [(0, len(diff_text))]
+
+    # Lines before the first file diff, such as the message of a patch, are not part of any file
+    preamble_length = len(diff_text) - files_length
+    chunker.add(length=preamble_length, nb_tokens=estimate_tokens(diff_text[:preamble_length]))
+    for directory, pieces in file_pieces:
+        chunker.add_file(directory=directory, pieces=pieces)
+    return chunker.close()
+
+
+class _DiffChunker:
+    """Groups consecutive spans of a diff into chunks of about a target number of tokens."""
+
+    def __init__(self, target_tokens: int) -> None:
+        self.target_tokens = target_tokens
+        self.spans: List[Tuple[int, int]] = []
+        self.chunk_start = 0
+        self.position = 0
+        self.chunk_tokens = 0
+        self.directory: Optional[str] = None
+
+    def add_file(self, directory: str, pieces: List[str]) -> None:
+        """Add the header lines and hunks of a file, cutting it between hunks only if it alone exceeds the target."""
+        piece_tokens = [estimate_tokens(piece) for piece in pieces]
+        file_tokens = sum(piece_tokens)
+        if self.chunk_tokens and (
+            self.chunk_tokens + file_tokens > self.target_tokens
+            or (directory != self.directory and self.chunk_tokens >= self.target_tokens * DIRECTORY_BREAK_RATIO)
+        ):
+            self._close_chunk()
+        self.directory = directory
+        if file_tokens <= self.target_tokens:
+            self.add(length=sum(len(piece) for piece in pieces), nb_tokens=file_tokens)
+            return
+        for piece, nb_tokens in zip(pieces, piece_tokens):
+            if self.chunk_tokens and self.chunk_tokens + nb_tokens > self.target_tokens:
+                self._close_chunk()
+            self.add(length=len(piece), nb_tokens=nb_tokens)
+
+    def add(self, length: int, nb_tokens: int) -> None:
+        self.position += length
+        self.chunk_tokens += nb_tokens
+
+    def close(self) -> List[Tuple[int, int]]:
+        if self.position > self.chunk_start or not self.spans:
+            self._close_chunk()
+        return self.spans
+
+    def _close_chunk(self) -> None:
+        self.spans.append((self.chunk_start, self.position))
+        self.chunk_start = self.position
+        self.chunk_tokens = 0
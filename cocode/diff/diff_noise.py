@@ -0,0 +1,333 @@
+"""
+Noise reduction of git diffs.
+
+Parts of a diff that say little about a change but take many tokens are replaced by one-line
+notes: pure renames and copies, blocks of lines moved within or across files, files whose
+changes only touch trailing whitespace, line endings or the indentation of files where it has no
+meaning, and files made by tools, found from the `linguist-generated` attribute of `.gitattributes`,
+from their names and from the markers in their leading comment block.
+Each collapse is reported with the estimated tokens it saves.
+"""
+
+import os
+import re
+import subprocess
+from typing import Dict, List, Optional, Set, Tuple
+
+from pipelex import log
+
+from cocode.diff.models import DiffChange, DiffCollapse, DiffCollapseKind, DiffFile, DiffHunk, DiffNoiseReport
+from cocode.repox.repox_budget import estimate_tokens
+from cocode.repox.repox_walker import compile_path_spec
+
+# Prefix of the notes replacing the collapsed parts of a diff
+NOTE_PREFIX = "# cocode: "
+
+# Minimum number of non-blank lines of a removed block for its addition elsewhere to be collapsed as a move
+MIN_MOVED_BLOCK_LINES = 3
+
+# Number of first lines of a file whose leading comment block is searched for the markers of generated files
+GENERATED_MARKER_NB_LINES = 10
+
+# Number of bytes read from the head of a file of the working tree to search for the markers of generated files
+GENERATED_MARKER_HEAD_BYTES = 4096
+
+# Prefixes of the comment lines whose block, at the top of a file, is searched for the markers of generated files
+COMMENT_PREFIXES = ("#", "//", "/*", "*", "--", ";", "<!--", "%")
+
+# Markers that code generators write in the leading comment block of the files they make
+GENERATED_MARKER_REGEX = re.compile(
+    r"@generated\b|\bdo not edit\b|\bcode generated\b|\bauto-?generated\b|\bthis file (?:is|was) (?:automatically )?generated\b",
+    re.IGNORECASE,
+)
+
+# Names of generated files, as gitignore patterns
+GENERATED_FILE_PATTERNS = [
+    "*_pb2.py",
+    "*_pb2.pyi",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*.pb.cc",
+    "*.pb.h",
+    "*.pb.swift",
+    "*.pb.ts",
+    "*.min.js",
+    "*.min.css",
+    "*.generated.*",
+    "*_generated.*",
+    "*.g.dart",
+    "*.designer.cs",
+]
+
+# Files whose leading indentation has a meaning, as gitignore patterns: their reindented lines are never noise
+INDENTATION_SENSITIVE_FILE_PATTERNS = [
+    "*.py",
+    "*.pyi",
+    "*.pyx",
+    "*.yaml",
+    "*.yml",
+    "Makefile",
+    "GNUmakefile",
+    "*.mk",
+    "*.md",
+    "*.rst",
+    "*.coffee",
+    "*.haml",
+    "*.pug",
+    "*.sass",
+    "*.styl",
+    "*.nim",
+    "*.fs",
+]
+
+# A block of moved lines of a hunk: index of its first line and past its last line in the hunk, and its note
+MovedBlock = Tuple[int, int, str]
+
+
+def reduce_diff_noise(diff_files: List[DiffFile], repo_path: Optional[str] = None, is_working_tree: bool = True) -> Tuple[str, DiffNoiseReport]:
+    """Replace the noisy parts of a diff by one-line notes.
+
+    A renamed or copied file without changes, a file whose lines only change by their trailing
+    whitespace, line endings or, outside of indentation-sensitive files, indentation, and a
+    generated file are each replaced by a note. Then, among the other files, each hunk that only
+    removes a block of lines, and the same lines, indentation aside, where they are added
+    elsewhere in the diff, are replaced by notes telling where the block moved.
+
+    Args:
+        diff_files: The diff of each file, in diff order
+        repo_path: Path of the git repository, to read the `linguist-generated` attributes of the files
+        is_working_tree: Whether the diff compares the working tree, whose files' first lines are then read to search for markers
+
+    Returns:
+        The diff, with notes in place of the collapsed parts, and the report of the collapses
+    """
+    report = DiffNoiseReport()
+    generated_paths: Set[str] = set()
+    if repo_path is not None:
+        generated_paths = find_linguist_generated_paths(repo_path=repo_path, paths=[diff_file.path for diff_file in diff_files])
+    generated_path_spec = compile_path_spec(GENERATED_FILE_PATTERNS)
+    indentation_sensitive_path_spec = compile_path_spec(INDENTATION_SENSITIVE_FILE_PATTERNS)
+
+    file_notes: Dict[int, Tuple[DiffCollapseKind, str]] = {}
+    for file_index, diff_file in enumerate(diff_files):
+        if (file_note := _describe_pure_rename(diff_file=diff_file)) is not None:
+            file_notes[file_index] = (DiffCollapseKind.RENAME, file_note)
+        elif diff_file.path in generated_paths or generated_path_spec.match_file(diff_file.path):
+            file_notes[file_index] = (DiffCollapseKind.GENERATED, _describe_generated(diff_file=diff_file))
+        elif _has_generated_marker(diff_file=diff_file, repo_path=repo_path if is_working_tree else None):
+            file_notes[file_index] = (DiffCollapseKind.GENERATED, _describe_generated(diff_file=diff_file))
+        elif (
+            file_note := _describe_whitespace_only(
+                diff_file=diff_file, ignores_indentation=not indentation_sensitive_path_spec.match_file(diff_file.path)
+            )
+        ) is not None:
+            file_notes[file_index] = (DiffCollapseKind.WHITESPACE, file_note)
+    moved_blocks = _find_moved_blocks(
+        diff_files=[(file_index, diff_file) for file_index, diff_file in enumerate(diff_files) if file_index not in file_notes]
+    )
+
+    file_texts: List[str] = []
+    for file_index, diff_file in enumerate(diff_files):
+        file_text = diff_file.to_text()
+        nb_tokens_before = estimate_tokens(file_text)
+        nb_tokens_after = nb_tokens_before
+        if file_index in file_notes:
+            kind, note = file_notes[file_index]
+            file_text = f"{NOTE_PREFIX}{note}\n"
+            nb_tokens_after = estimate_tokens(file_text)
+            report.collapses.append(
+                DiffCollapse(path=diff_file.path, kind=kind, note=note, nb_tokens_before=nb_tokens_before, nb_tokens_after=nb_tokens_after)
+            )
+        elif any((file_index, hunk_index) in moved_blocks for hunk_index in range(len(diff_file.hunks))):
+            hunk_texts: List[str] = []
+            for hunk_index, hunk in enumerate(diff_file.hunks):
+                hunk_texts.append(hunk.header)
+                line_index = 0
+                for start_index, end_index, note in moved_blocks.get((file_index, hunk_index), []):
+                    note_line = f"{NOTE_PREFIX}{note}\n"
+                    hunk_texts.extend(hunk.lines[line_index:start_index])
+                    hunk_texts.append(note_line)
+                    line_index = end_index
+                    report.collapses.append(
+                        DiffCollapse(
+                            path=diff_file.path,
+                            kind=DiffCollapseKind.MOVE,
+                            note=note,
+                            nb_tokens_before=estimate_tokens("".join(hunk.lines[start_index:end_index])),
+                            nb_tokens_after=estimate_tokens(note_line),
+                        )
+                    )
+                hunk_texts.extend(hunk.lines[line_index:])
+            file_text = "".join(diff_file.header_lines) + "".join(hunk_texts)
+            nb_tokens_after = estimate_tokens(file_text)
+        report.nb_tokens_before += nb_tokens_before
+        report.nb_tokens_after += nb_tokens_after
+        file_texts.append(file_text)
+    return "".join(file_texts), report
+
+
+def find_linguist_generated_paths(repo_path: str, paths: List[str]) -> Set[str]:
+    """Paths whose `linguist-generated` git attribute is set, by the `.gitattributes` files of the working tree."""
+    if not paths:
+        return set()
+    result = subprocess.run(
+        ["git", "check-attr", "-z", "--stdin", "linguist-generated"],
+        cwd=repo_path,
+        input="\0".join(paths).encode("utf-8", errors="surrogateescape"),
+        capture_output=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        log.debug(f"Could not read the linguist-generated attributes: {result.stderr.decode(errors='replace').strip()}")
+        return set()
+    # The output is made of (path, attribute, value) triples
+    fields = result.stdout.decode("utf-8", errors="surrogateescape").split("\0")
+    return {fields[index] for index in range(0, len(fields) - 2, 3) if fields[index + 2] in ("set", "true")}
+
+
+def describe_diff_noise_report(report: DiffNoiseReport) -> str:
+    """Report of the collapsed parts of a diff and the tokens each saves."""
+    nb_saved_tokens = report.nb_tokens_before - report.nb_tokens_after
+    lines = [
+        f"Diff noise reduction: {len(report.collapses)} parts collapsed, ~{report.nb_tokens_before} -> ~{report.nb_tokens_after} tokens "
+        f"({nb_saved_tokens / max(report.nb_tokens_before, 1):.1%} saved)"
+    ]
+    lines.extend(f"  {collapse.nb_saved_tokens:>7} tokens saved  {collapse.kind:<10}  {collapse.note}" for collapse in report.collapses)
+    return "\n".join(lines)
+
+
+def _describe_pure_rename(diff_file: DiffFile) -> Optional[str]:
+    if diff_file.change not in (DiffChange.RENAMED, DiffChange.COPIED) or diff_file.hunks or diff_file.similarity != 100:
+        return None
+    note = f"{diff_file.change} {diff_file.old_path} -> {diff_file.new_path}, content unchanged"
+    if diff_file.old_mode is not None and diff_file.new_mode is not None and diff_file.old_mode != diff_file.new_mode:
+        note += f", mode {diff_file.old_mode} -> {diff_file.new_mode}"
+    return note
+
+
+def _describe_generated(diff_file: DiffFile) -> str:
+    nb_added_lines, nb_removed_lines = _count_changed_lines(diff_file=diff_file)
+    return f"{diff_file.path}: generated file {diff_file.change} (+{nb_added_lines} -{nb_removed_lines} lines), diff left out"
+
+
+def _describe_whitespace_only(diff_file: DiffFile, ignores_indentation: bool) -> Optional[str]:
+    """Note of a file whose changed lines only differ from the lines they replace by trailing whitespace and line endings.
+
+    Lines are compared one by one, so that joined or split lines and spaces changed within a line are
+    kept. Changes of leading indentation are also ignored, except for the files where it has a meaning.
+    """
+    if diff_file.change != DiffChange.MODIFIED or diff_file.is_binary or not diff_file.hunks:
+        return None
+    for hunk in diff_file.hunks:
+        removed_lines = hunk.removed_lines
+        added_lines = hunk.added_lines
+        if len(removed_lines) != len(added_lines):
+            return None
+        for removed_line, added_line in zip(removed_lines, added_lines):
+            if ignores_indentation:
+                removed_line, added_line = removed_line.lstrip(), added_line.lstrip()
+            if removed_line.rstrip() != added_line.rstrip():
+                return None
+    nb_added_lines, nb_removed_lines = _count_changed_lines(diff_file=diff_file)
+    return f"{diff_file.path}: whitespace-only changes (+{nb_added_lines} -{nb_removed_lines} lines), diff left out"
+
+
+def _has_generated_marker(diff_file: DiffFile, repo_path: Optional[str]) -> bool:
+    """Whether the leading comment block of the new file holds a marker of code generators, as linguist checks it.
+
+    The first lines of the file are read from the working tree, or otherwise taken from a hunk
+    starting at its first line, such as the hunk of an added file.
+    """
+    if diff_file.new_path is None or diff_file.is_binary:
+        return False
+    head_lines: List[str] = []
+    if repo_path is not None:
+        try:
+            with open(os.path.join(repo_path, diff_file.new_path), "rb") as file:
+                head_lines = file.read(GENERATED_MARKER_HEAD_BYTES).decode("utf-8", errors="replace").split("\n")
+        except OSError:
+            pass
+    elif diff_file.hunks and diff_file.hunks[0].new_start == 1:
+        head_lines = diff_file.hunks[0].added_lines
+    return any(GENERATED_MARKER_REGEX.search(line) for line in _get_leading_comment_lines(lines=head_lines[:GENERATED_MARKER_NB_LINES]))
+
+
+def _get_leading_comment_lines(lines: List[str]) -> List[str]:
+    """The comment lines at the top of a file, up to its first line of code, blank lines aside."""
+    comment_lines: List[str] = []
+    for line in lines:
+        stripped_line = line.strip()
+        if not stripped_line:
+            continue
+        if not stripped_line.startswith(COMMENT_PREFIXES):
+            break
+        comment_lines.append(stripped_line)
+    return comment_lines
+
+
+def _find_moved_blocks(diff_files: List[Tuple[int, DiffFile]]) -> Dict[Tuple[int, int], List[MovedBlock]]:
+    """Pair the hunks that only remove a block of lines with the same block, indentation aside, among the lines added elsewhere.
+
+    Returns:
+        The moved blocks of each hunk, in order, by index of its file and index in its file
+    """
+    removals: Dict[Tuple[str, ...], List[Tuple[DiffFile, DiffHunk, int, Tuple[int, int]]]] = {}
+    for file_index, diff_file in diff_files:
+        for hunk_index, hunk in enumerate(diff_file.hunks):
+            if hunk.new_count != 0:
+                continue
+            removed_lines = hunk.removed_lines
+            if (block_key := _make_block_key(lines=removed_lines)) is not None:
+                nb_leading_blank_lines = next(line_index for line_index, line in enumerate(removed_lines) if line.strip())
+                removals.setdefault(block_key, []).append((diff_file, hunk, hunk.old_start + nb_leading_blank_lines, (file_index, hunk_index)))
+    block_keys_by_first_line: Dict[str, List[Tuple[str, ...]]] = {}
+    for block_key in sorted(removals, key=len, reverse=True):
+        block_keys_by_first_line.setdefault(block_key[0], []).append(block_key)
+
+    moved_blocks: Dict[Tuple[int, int], List[MovedBlock]] = {}
+    for file_index, diff_file in diff_files:
+        for hunk_index, hunk in enumerate(diff_file.hunks):
+            # With no context lines, the added lines of a hunk are its new lines from new_start on
+            added_lines = [(line_index, line[1:].strip()) for line_index, line in enumerate(hunk.lines) if line.startswith("+")]
+            position = 0
+            while position < len(added_lines):
+                block_key = next(
+                    (
+                        block_key
+                        for block_key in block_keys_by_first_line.get(added_lines[position][1], [])
+                        if removals[block_key] and tuple(line for _, line in added_lines[position : position + len(block_key)]) == block_key
+                    ),
+                    None,
+                )
+                if block_key is None:
+                    position += 1
+                    continue
+                removal_file, removal_hunk, removal_line_number, removal_hunk_key = removals[block_key].pop(0)
+                moved_blocks[removal_hunk_key] = [
+                    (0, len(removal_hunk.lines), f"{len(block_key)} lines moved to {diff_file.path}:{hunk.new_start + position}")
+                ]
+                moved_blocks.setdefault((file_index, hunk_index), []).append(
+                    (
+                        added_lines[position][0],
+                        added_lines[position + len(block_key) - 1][0] + 1,
+                        f"{len(block_key)} lines moved from {removal_file.path}:{removal_line_number}",
+                    )
+                )
+                position += len(block_key)
+    return moved_blocks
+
+
+def _make_block_key(lines: List[str]) -> Optional[Tuple[str, ...]]:
+    """Key of a block of lines, indentation and surrounding blank lines aside, None if it has too few non-blank lines to be told apart as moved."""
+    block_key = tuple(line.strip() for line in lines)
+    if sum(1 for line in block_key if line) < MIN_MOVED_BLOCK_LINES:
+        return None
+    first_index = next(line_index for line_index, line in enumerate(block_key) if line)
+    last_index = max(line_index for line_index, line in enumerate(block_key) if line)
+    return block_key[first_index : last_index + 1]
+
+
+def _count_changed_lines(diff_file: DiffFile) -> Tuple[int, int]:
+    nb_added_lines = sum(len(hunk.added_lines) for hunk in diff_file.hunks)
+    nb_removed_lines = sum(len(hunk.removed_lines) for hunk in diff_file.hunks)
+    return nb_added_lines, nb_removed_lines
@@ -0,0 +1,286 @@
+"""
+Streaming git diff.
+
+`iter_git_diff` reads the output of `git diff` line by line as git writes it and yields a
+`DiffFile` record per file, so that no more than one file's diff is held in memory. The
+output can be capped in bytes, in which case git is stopped as soon as the cap is exceeded.
+`parse_diff_lines` parses any unified diff in git's format, such as a saved patch.
+"""
+
+import io
+import re
+import shutil
+import subprocess
+import tempfile
+from typing import Iterable, Iterator, List, Optional
+
+from cocode.diff.models import DiffChange, DiffFile, DiffHunk
+from cocode.exceptions import DiffTooLarge
+
+# Default maximum size of a diff sent to a pipeline, far more than a model's context, to fail fast on runaway diffs
+DEFAULT_MAX_DIFF_BYTES = 8 * 1024 * 1024
+
+# Patterns always left out of the diffs
+DEFAULT_DIFF_EXCLUDE_PATTERNS = [
+    "uv.lock",
+    "poetry.lock",
+    "node_modules",
+    "node_modules/**",
+    "*.lock",
+    "*.pyc",
+    "__pycache__",
+    ".git",
+    ".venv",
+    "build/",
+    "dist/",
+    "*.log",
+    "temp/",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".ruff_cache",
+]
+
+_HUNK_HEADER_REGEX = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+_C_ESCAPES = {"a": 7, "b": 8, "t": 9, "n": 10, "v": 11, "f": 12, "r": 13, '"': 34, "\\": 92}
+
+
+def make_git_diff_command(
+    version: str,
+    include_patterns: Optional[List[str]] = None,
+    exclude_patterns: Optional[List[str]] = None,
+    target_version: Optional[str] = None,
+) -> List[str]:
+    """Make the git diff command comparing the working tree, or a target version, to a version, without context lines.
+
+    Args:
+        version: Git version/commit to compare against
+        include_patterns: Patterns to include in diff (if not provided, includes all files)
+        exclude_patterns: Patterns to exclude from diff, on top of the default ones
+        target_version: Optional git version/commit compared instead of the working tree
+    """
+    git_cmd = ["git", "diff", "--no-color", "--no-ext-diff", "--find-renames", "--src-prefix=a/", "--dst-prefix=b/", version]
+    if target_version is not None:
+        git_cmd.append(target_version)
+    git_cmd.extend(["--unified=0", "--"])
+    git_cmd.extend(make_diff_pathspecs(include_patterns=include_patterns, exclude_patterns=exclude_patterns))
+    return git_cmd
+
+
+def make_diff_pathspecs(include_patterns: Optional[List[str]] = None, exclude_patterns: Optional[List[str]] = None) -> List[str]:
+    """Make the git pathspecs of the files to diff, the default excluded patterns included."""
+    pathspecs = list(include_patterns or ["."])
+    pathspecs.extend(f":(exclude){pattern}" for pattern in DEFAULT_DIFF_EXCLUDE_PATTERNS + (exclude_patterns or []))
+    return pathspecs
+
+
+def iter_git_diff(
+    repo_path: str,
+    version: str,
+    include_patterns: Optional[List[str]] = None,
+    exclude_patterns: Optional[List[str]] = None,
+    max_bytes: Optional[int] = None,
+    target_version: Optional[str] = None,
+) -> Iterator[DiffFile]:
+    """Run git diff comparing the working tree, or a target version, to a version, and yield the diff of each file as git writes it.
+
+    Args:
+        repo_path: Path to the git repository
+        version: Git version/commit to compare against
+        include_patterns: Patterns to include in diff (if not provided, includes all files)
+        exclude_patterns: Patterns to exclude from diff, on top of the default ones
+        max_bytes: Optional maximum number of bytes of the diff: beyond it, git is stopped and DiffTooLarge raised
+        target_version: Optional git version/commit compared instead of the working tree, which is then left untouched
+
+    Yields:
+        The diff of each file, in git's order
+    """
+    if shutil.which("git") is None:
+        raise RuntimeError(
+            """The 'git' command is not available.
+                Please install git to use this functionality.
+            """
+        )
+    git_cmd = make_git_diff_command(
+        version=version,
+        include_patterns=include_patterns,
+        exclude_patterns=exclude_patterns,
+        target_version=target_version,
+    )
+    # Errors go to a file, so that git can't block on a full stderr pipe while stdout is being read
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(git_cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            assert process.stdout is not None
+            yield from parse_diff_lines(_iter_decoded_lines(lines=process.stdout, max_bytes=max_bytes))
+            if process.wait() != 0:
+                stderr_file.seek(0)
+                raise RuntimeError(f"Git diff command failed: {stderr_file.read().decode(errors='replace')}")
+        finally:
+            # Stops git when the diff is too large or the caller stopped early
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            if process.stdout is not None:
+                process.stdout.close()
+
+
+def _iter_decoded_lines(lines: Iterable[bytes], max_bytes: Optional[int]) -> Iterator[str]:
+    nb_bytes = 0
+    for line in lines:
+        nb_bytes += len(line)
+        if max_bytes is not None and nb_bytes > max_bytes:
+            raise DiffTooLarge(f"The diff is larger than the limit of {max_bytes} bytes")
+        yield line.decode("utf-8", errors="replace")
+
+
+def iter_text_lines(text: str) -> Iterator[str]:
+    """Lines of a text cut on newlines only, unlike `str.splitlines` which also cuts on form feeds and other separators found in files."""
+    return iter(io.StringIO(text, newline="\n"))
+
+
+def parse_diff_lines(lines: Iterable[str]) -> Iterator[DiffFile]:
+    """Parse the lines of a diff in git's format into the diff of each file, one file at a time.
+
+    Hunk lines are told apart from headers by the line counts of their hunk, so a removed line
+    looking like a header, such as '--- a/x', is kept in its hunk.
+
+    Args:
+        lines: Lines of the diff, with their newlines
+
+    Yields:
+        The diff of each file, in diff order
+    """
+    diff_file: Optional[DiffFile] = None
+    hunk: Optional[DiffHunk] = None
+    nb_old_lines_left = 0
+    nb_new_lines_left = 0
+    for line in lines:
+        if hunk is not None:
+            if line.startswith("\\"):
+                # A '\ No newline at end of file' line follows the last old or new line and is not counted
+                hunk.lines.append(line)
+                continue
+            if nb_old_lines_left > 0 or nb_new_lines_left > 0:
+                prefix = line[:1]
+                if prefix != "+":
+                    nb_old_lines_left -= 1
+                if prefix != "-":
+                    nb_new_lines_left -= 1
+                hunk.lines.append(line)
+                continue
+            hunk = None
+        if line.startswith("diff --git "):
+            if diff_file is not None:
+                yield diff_file
+            diff_file = _make_diff_file(diff_git_line=line)
+            continue
+        if diff_file is None:
+            # Nothing comes before the first file in git's output, but a patch may have a preamble
+            continue
+        if line.startswith("@@ ") and (hunk_match := _HUNK_HEADER_REGEX.match(line.rstrip("\n"))):
+            old_start, old_count, new_start, new_count, section = hunk_match.groups()
+            hunk = DiffHunk(
+                header=line,
+                old_start=int(old_start),
+                old_count=1 if old_count is None else int(old_count),
+                new_start=int(new_start),
+                new_count=1 if new_count is None else int(new_count),
+                section=section,
+            )
+            nb_old_lines_left = hunk.old_count
+            nb_new_lines_left = hunk.new_count
+            diff_file.hunks.append(hunk)
+            continue
+        diff_file.header_lines.append(line)
+        _apply_header_line(diff_file=diff_file, line=line.rstrip("\n"))
+    if diff_file is not None:
+        yield diff_file
+
+
+def _make_diff_file(diff_git_line: str) -> DiffFile:
+    """Start the diff of a file from its 'diff --git a/x b/y' line, whose paths are only certain when they are the same."""
+    paths = diff_git_line[len("diff --git ") :].rstrip("\n")
+    path: Optional[str] = None
+    if paths.startswith('"'):
+        old_path, _, new_path = paths.partition('" ')
+        if new_path and (old_path := _strip_prefix(unquote_git_path(f'{old_path}"'))) == _strip_prefix(unquote_git_path(new_path)):
+            path = old_path
+    elif len(paths) % 2 == 1 and paths[: len(paths) // 2][2:] == paths[len(paths) // 2 + 1 :][2:]:
+        path = paths[2 : len(paths) // 2]
+    return DiffFile(old_path=path, new_path=path, header_lines=[diff_git_line])
+
+
+def _apply_header_line(diff_file: DiffFile, line: str) -> None:
+    if line.startswith("--- "):
+        if (old_path := _parse_header_path(line[4:])) is not None:
+            diff_file.old_path = old_path
+        else:
+            diff_file.old_path = None
+            diff_file.change = DiffChange.ADDED
+    elif line.startswith("+++ "):
+        if (new_path := _parse_header_path(line[4:])) is not None:
+            diff_file.new_path = new_path
+        else:
+            diff_file.new_path = None
+            diff_file.change = DiffChange.DELETED
+    elif line.startswith("new file mode "):
+        diff_file.change = DiffChange.ADDED
+        diff_file.old_path = None
+        diff_file.new_mode = line[len("new file mode ") :]
+    elif line.startswith("deleted file mode "):
+        diff_file.change = DiffChange.DELETED
+        diff_file.new_path = None
+        diff_file.old_mode = line[len("deleted file mode ") :]
+    elif line.startswith("old mode "):
+        diff_file.old_mode = line[len("old mode ") :]
+    elif line.startswith("new mode "):
+        diff_file.new_mode = line[len("new mode ") :]
+    elif line.startswith("rename from "):
+        diff_file.change = DiffChange.RENAMED
+        diff_file.old_path = unquote_git_path(line[len("rename from ") :])
+    elif line.startswith("rename to "):
+        diff_file.new_path = unquote_git_path(line[len("rename to ") :])
+    elif line.startswith("copy from "):
+        diff_file.change = DiffChange.COPIED
+        diff_file.old_path = unquote_git_path(line[len("copy from ") :])
+    elif line.startswith("copy to "):
+        diff_file.new_path = unquote_git_path(line[len("copy to ") :])
+    elif line.startswith("similarity index "):
+        diff_file.similarity = int(line[len("similarity index ") :].rstrip("%"))
+    elif line.startswith("Binary files ") or line == "GIT binary patch":
+        diff_file.is_binary = True
+
+
+def _parse_header_path(header_path: str) -> Optional[str]:
+    """Path of a '---' or '+++' line, None for /dev/null."""
+    # Paths with spaces may be followed by a tab
+    header_path = header_path.split("\t", 1)[0]
+    if header_path == "/dev/null":
+        return None
+    return _strip_prefix(unquote_git_path(header_path))
+
+
+def _strip_prefix(path: str) -> str:
+    return path[2:] if path[:2] in ("a/", "b/") else path
+
+
+def unquote_git_path(path: str) -> str:
+    """Decode a path that git quoted because it holds special characters, with C-style and octal escapes for its UTF-8 bytes."""
+    if not (len(path) >= 2 and path.startswith('"') and path.endswith('"')):
+        return path
+    path_bytes = bytearray()
+    index = 1
+    while index < len(path) - 1:
+        char = path[index]
+        if char != "\\":
+            path_bytes.extend(char.encode())
+            index += 1
+            continue
+        escaped = path[index + 1]
+        if escaped in _C_ESCAPES:
+            path_bytes.append(_C_ESCAPES[escaped])
+            index += 2
+        else:
+            path_bytes.append(int(path[index + 1 : index + 4], 8))
+            index += 4
+    return path_bytes.decode("utf-8", errors="replace")
@@ -0,0 +1,155 @@
+from enum import StrEnum
+from typing import List, Optional
+
+from pydantic import BaseModel
+from typing_extensions import override
+
+
+class DiffChange(StrEnum):
+    ADDED = "added"
+    DELETED = "deleted"
+    MODIFIED = "modified"
+    RENAMED = "renamed"
+    COPIED = "copied"
+
+
+class DiffCollapseKind(StrEnum):
+    RENAME = "rename"
+    MOVE = "move"
+    WHITESPACE = "whitespace"
+    GENERATED = "generated"
+
+
+class DiffHunk:
+    """A hunk of a file diff: its line ranges and its lines, each with its '+', '-', ' ' or '\\' prefix and its newline."""
+
+    __slots__ = ("header", "old_start", "old_count", "new_start", "new_count", "section", "lines")
+
+    def __init__(
+        self,
+        header: str,
+        old_start: int,
+        old_count: int,
+        new_start: int,
+        new_count: int,
+        section: str = "",
+        lines: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Args:
+            header: The '@@ -old_start,old_count +new_start,new_count @@ section' line, with its newline
+            old_start: First line of the range in the old file
+            old_count: Number of lines of the range in the old file
+            new_start: First line of the range in the new file
+            new_count: Number of lines of the range in the new file
+            section: Heading of the code the hunk is in, as found by git, such as a function signature
+            lines: Lines of the hunk
+        """
+        self.header = header
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.section = section
+        self.lines = lines if lines is not None else []
+
+    @property
+    def added_lines(self) -> List[str]:
+        """The added lines, without their prefix and newline."""
+        return [line[1:].rstrip("\n") for line in self.lines if line.startswith("+")]
+
+    @property
+    def removed_lines(self) -> List[str]:
+        """The removed lines, without their prefix and newline."""
+        return [line[1:].rstrip("\n") for line in self.lines if line.startswith("-")]
+
+    def to_text(self) -> str:
+        return self.header + "".join(self.lines)
+
+    @override
+    def __repr__(self) -> str:
+        return f"DiffHunk(-{self.old_start},{self.old_count} +{self.new_start},{self.new_count}, nb_lines={len(self.lines)})"
+
+
+class DiffFile:
+    """The diff of a file: its paths, change, modes and hunks, with the header lines git wrote for it."""
+
+    __slots__ = ("old_path", "new_path", "change", "old_mode", "new_mode", "similarity", "is_binary", "header_lines", "hunks")
+
+    def __init__(
+        self,
+        old_path: Optional[str],
+        new_path: Optional[str],
+        change: DiffChange = DiffChange.MODIFIED,
+        old_mode: Optional[str] = None,
+        new_mode: Optional[str] = None,
+        similarity: Optional[int] = None,
+        is_binary: bool = False,
+        header_lines: Optional[List[str]] = None,
+        hunks: Optional[List[DiffHunk]] = None,
+    ) -> None:
+        """
+        Args:
+            old_path: Path of the file before the change, None if it was added
+            new_path: Path of the file after the change, None if it was deleted
+            change: Kind of change
+            old_mode: Mode of the file before the change, if it was added, deleted or its mode changed
+            new_mode: Mode of the file after the change, if it was added, deleted or its mode changed
+            similarity: Similarity index of a renamed or copied file, in percent
+            is_binary: Whether git only reported that the binary contents differ
+            header_lines: Lines from 'diff --git' to the first hunk, with their newlines
+            hunks: Hunks of the diff, in file order
+        """
+        self.old_path = old_path
+        self.new_path = new_path
+        self.change = change
+        self.old_mode = old_mode
+        self.new_mode = new_mode
+        self.similarity = similarity
+        self.is_binary = is_binary
+        self.header_lines = header_lines if header_lines is not None else []
+        self.hunks = hunks if hunks is not None else []
+
+    @property
+    def path(self) -> str:
+        """Path of the file after the change, or before it if it was deleted."""
+        path = self.new_path if self.new_path is not None else self.old_path
+        return path or ""
+
+    @property
+    def is_mode_changed(self) -> bool:
+        return self.change == DiffChange.MODIFIED and self.old_mode is not None and self.old_mode != self.new_mode
+
+    @property
+    def nb_lines(self) -> int:
+        return len(self.header_lines) + sum(1 + len(hunk.lines) for hunk in self.hunks)
+
+    def to_text(self) -> str:
+        """The diff of the file as git wrote it."""
+        return "".join(self.header_lines) + "".join(hunk.to_text() for hunk in self.hunks)
+
+    @override
+    def __repr__(self) -> str:
+        return f"DiffFile(path={self.path!r}, change={self.change}, nb_hunks={len(self.hunks)}, is_binary={self.is_binary})"
+
+
+class DiffCollapse(BaseModel):
+    """A part of a diff replaced by a note, with the estimated tokens it took and takes."""
+
+    path: str
+    kind: DiffCollapseKind
+    note: str
+    nb_tokens_before: int
+    nb_tokens_after: int
+
+    @property
+    def nb_saved_tokens(self) -> int:
+        return self.nb_tokens_before - self.nb_tokens_after
+
+
+class DiffNoiseReport(BaseModel):
+    """Parts of a diff collapsed by noise reduction, and the estimated tokens of the diff before and after."""
+
+    collapses: List[DiffCollapse] = []
+    nb_tokens_before: int = 0
+    nb_tokens_after: int = 0
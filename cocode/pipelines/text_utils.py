@@ -1,5 +1,5 @@
 import re
-from typing import Dict, List, Set
+from typing import Dict, List, Set, Tuple
 
 from pipelex.core.memory.working_memory import WorkingMemory
 from pipelex.core.stuffs.list_content import ListContent
@@ -8,6 +8,11 @@ from pipelex.core.stuffs.text_content import TextContent
 from pipelex.system.registries.func_registry import pipe_func
 from pydantic import Field
 
+from cocode.diff.diff_chunker import chunk_diff
+
+# Identifiers as a tree of their characters, the empty key marking the end of an identifier
+PrefixTree = Dict[str, "PrefixTree"]
+
 
 class TextChunk(StructuredContent):
     """A chunk of text that is part of a larger text."""
@@ -33,47 +38,93 @@ def split_text_by_identifiers(working_memory: WorkingMemory) -> ListContent[Text
     id_stuff = working_memory.get_stuff_as_list("split_identifiers", item_type=TextContent)
     identifiers: List[str] = [d.text.strip() for d in id_stuff.items if d.text.strip()]
 
-    # Safety: no ids → one big chunk
-    if not identifiers:
-        return ListContent(items=[TextChunk(chunk_text=large_text, chunk_index=0, start_position=0, end_position=len(large_text))])
+    return make_text_chunks(text=large_text, spans=split_text_spans(text=large_text, identifiers=identifiers))
 
-    # --------------------------------------------------------------------- #
-    # 1️⃣  Find *first* position of each identifier as a full-line prefix
-    # --------------------------------------------------------------------- #
-    split_positions: Dict[int, str] = {}  # pos → delimiter
-    seen: Set[str] = set()  # dedupe
 
-    for ident in identifiers:
-        if ident in seen:
-            continue
-        seen.add(ident)
-
-        # Regex: delimiters may be indented (git diff lines often start with "+", "-" etc.)
-        pattern = re.compile(rf"(?m)^[^\S\r\n]*{re.escape(ident)}")
-        match = pattern.search(large_text)
-        if match:
-            split_positions[match.start()] = ident
-
-    # Nothing matched → one big chunk
-    if not split_positions:
-        return ListContent(items=[TextChunk(chunk_text=large_text, chunk_index=0, start_position=0, end_position=len(large_text))])
-
-    # --------------------------------------------------------------------- #
-    # 2️⃣  Build chunks from the ordered split positions
-    # --------------------------------------------------------------------- #
-    chunks: List[TextChunk] = []
+def split_text_spans(text: str, identifiers: List[str]) -> List[Tuple[int, int]]:
+    """Cut a text before the first line starting with each identifier, and return the (start, end) positions of the pieces.
+
+    No identifier, or none found, gives a single piece, and pieces are never empty unless the text is.
+    """
+    spans: List[Tuple[int, int]] = []
     current_start = 0
-    for idx, pos in enumerate(sorted(split_positions)):
-        # Skip empty regions (e.g. two delimiters right after each other)
-        if pos <= current_start:
+    for position in find_first_line_starts(text=text, identifiers=identifiers):
+        # Skip empty regions (e.g. a delimiter on the first line)
+        if position <= current_start:
             continue
-        chunks.append(TextChunk(chunk_text=large_text[current_start:pos], chunk_index=idx, start_position=current_start, end_position=pos))
-        current_start = pos
+        spans.append((current_start, position))
+        current_start = position
+    if current_start < len(text) or not spans:
+        spans.append((current_start, len(text)))
+    return spans
+
 
-    # Trailing chunk
-    if current_start < len(large_text):
-        chunks.append(
-            TextChunk(chunk_text=large_text[current_start:], chunk_index=len(chunks), start_position=current_start, end_position=len(large_text))
-        )
+def find_first_line_starts(text: str, identifiers: List[str]) -> List[int]:
+    """Find where each identifier first starts a line, possibly indented, in a single scan of the text.
 
-    return ListContent(items=chunks)
+    The identifiers are matched together by one regex shaped as their prefix tree, which gives the
+    longest identifier starting a line; the identifiers it starts with are found there as well. The
+    scan ends once every identifier is found.
+
+    Returns:
+        The positions of the starts of the lines, sorted and without duplicates
+    """
+    remaining_identifiers = set(identifiers)
+    if not remaining_identifiers:
+        return []
+    # Delimiters may be indented (git diff lines often start with "+", "-" etc.)
+    pattern = re.compile(rf"(?m)^[^\S\r\n]*({_make_prefix_tree_pattern(remaining_identifiers)})")
+    positions: Set[int] = set()
+    for match in pattern.finditer(text):
+        matched = match.group(1)
+        found_identifiers = {matched[:length] for length in range(1, len(matched) + 1)} & remaining_identifiers
+        if not found_identifiers:
+            continue
+        positions.add(match.start())
+        remaining_identifiers -= found_identifiers
+        if not remaining_identifiers:
+            break
+    return sorted(positions)
+
+
+def _make_prefix_tree_pattern(words: Set[str]) -> str:
+    """Regex matching the longest of a set of words at a position, with the alternations nested as their prefix tree."""
+    prefix_tree: PrefixTree = {}
+    for word in sorted(words):
+        node = prefix_tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _make_node_pattern(prefix_tree)
+
+
+def _make_node_pattern(node: PrefixTree) -> str:
+    branches = [re.escape(char) + _make_node_pattern(child) for char, child in node.items() if char]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    # Optional and greedy, the rest of the longer words is tried before stopping at the end of a word
+    return f"(?:{pattern})?" if "" in node else pattern
+
+
+def make_text_chunks(text: str, spans: List[Tuple[int, int]]) -> ListContent[TextChunk]:
+    """Make the chunks of a text from the (start, end) positions of its pieces, which are only copied out of it here."""
+    return ListContent(
+        items=[
+            TextChunk(chunk_text=text[start:end], chunk_index=index, start_position=start, end_position=end)
+            for index, (start, end) in enumerate(spans)
+        ]
+    )
+
+
+@pipe_func()
+def split_diff_into_chunks(working_memory: WorkingMemory) -> ListContent[TextChunk]:
+    """
+    Split the git diff `text` into chunks of whole files, grouped by directory,
+    of about `DIFF_CHUNK_TARGET_TOKENS` estimated tokens each.
+
+    * Files larger than the target are cut between hunks, never inside a hunk.
+    * The chunks are made locally, so the same diff always gives the same chunks.
+    """
+    diff_text: str = working_memory.get_stuff_as_str("text")
+    return make_text_chunks(text=diff_text, spans=chunk_diff(diff_text=diff_text))
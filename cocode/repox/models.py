@@ -1,4 +1,11 @@
+import hashlib
 from enum import StrEnum
+from typing import Callable, Dict, Optional
+
+from pydantic import BaseModel
+from typing_extensions import override
+
+from cocode.exceptions import RepoxException
 
 
 class NotableFileType(StrEnum):
@@ -7,6 +14,138 @@ class NotableFileType(StrEnum):
 
 class OutputStyle(StrEnum):
     REPO_MAP = "repo_map"
+    COMPACT = "compact"
     FLAT = "flat"
     IMPORT_LIST = "import_list"
     TREE = "tree"
+    CONTAINER = "container"
+
+
+class EnumerationMode(StrEnum):
+    AUTO = "auto"
+    GIT = "git"
+    FILESYSTEM = "filesystem"
+
+
+class DedupMode(StrEnum):
+    NONE = "none"
+    EXACT = "exact"
+    NEAR = "near"
+
+
+class ProfilePhase(StrEnum):
+    WALK = "walk"
+    IGNORE = "ignore"
+    READ = "read"
+    CLASSIFY = "classify"
+    TRANSFORM = "transform"
+    FORMAT = "format"
+    WRITE = "write"
+
+
+class RepoxWalkStats(BaseModel):
+    """Counters gathered while enumerating a repository."""
+
+    nb_dirs_walked: int = 0
+    nb_dirs_pruned: int = 0
+    nb_files_pruned: int = 0
+    nb_files_kept: int = 0
+
+
+class RepoxBatchResult(BaseModel):
+    """Outcome of one repository of a batch: its output file, or the error that stopped it."""
+
+    repo_path: str
+    output_file_path: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def is_success(self) -> bool:
+        return self.error is None
+
+
+class RepoxSizeEstimate(BaseModel):
+    """Pre-flight estimate of an output, from the sizes of the walk and a few sampled reads."""
+
+    nb_files: int = 0
+    nb_content_files: int = 0
+    # Bytes read from the files whose contents are output, each capped at max_file_bytes
+    nb_bytes: int = 0
+    nb_estimated_tokens: int = 0
+    nb_sampled_files: int = 0
+    seconds: float = 0.0
+
+
+class RepoxTokenAttribution(BaseModel):
+    """Estimated tokens of a processed output, attributed to the files, directories and MIME types they come from."""
+
+    nb_tokens: int = 0
+    # Tokens of the tree structure and headers, which belong to no file
+    nb_header_tokens: int = 0
+    file_tokens: Dict[str, int] = {}
+    # Tokens of the files of each directory, sub-directories included
+    directory_tokens: Dict[str, int] = {}
+    mime_tokens: Dict[str, int] = {}
+    seconds: float = 0.0
+
+
+class RepoxStats(BaseModel):
+    """Statistics of a repox output: the estimate, and the attribution of its tokens if the output was processed."""
+
+    repo_path: str
+    output_style: OutputStyle
+    estimate: RepoxSizeEstimate
+    attribution: Optional[RepoxTokenAttribution] = None
+
+
+class FileRecord:
+    """A file of the repository with its processed text, given up front or loaded on first access.
+
+    The MIME type is judged from the extension and the size is the size on disk, so that
+    records can be filtered and paginated before any file is read.
+    """
+
+    __slots__ = ("relative_path", "mime", "size", "_text", "_text_loader", "_content_hash")
+
+    def __init__(
+        self,
+        relative_path: str,
+        mime: str,
+        size: int,
+        text: Optional[str] = None,
+        text_loader: Optional[Callable[[], str]] = None,
+    ) -> None:
+        if text is None and text_loader is None:
+            raise RepoxException(f"The record of '{relative_path}' needs a text or a text loader")
+        self.relative_path = relative_path
+        self.mime = mime
+        self.size = size
+        self._text = text
+        self._text_loader = text_loader
+        self._content_hash: Optional[str] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._text is not None
+
+    @property
+    def text(self) -> str:
+        """The processed text, loaded on first access for lazy records, which then drop their loader."""
+        if self._text is None:
+            if self._text_loader is None:
+                raise RepoxException(f"The record of '{self.relative_path}' has no text loader")
+            self._text = self._text_loader()
+            self._text_loader = None
+        return self._text
+
+    @property
+    def content_hash(self) -> str:
+        """Hash of the processed text, loading it if needed."""
+        if self._content_hash is None:
+            self._content_hash = hashlib.blake2b(self.text.encode(), digest_size=16).hexdigest()
+        return self._content_hash
+
+    @override
+    def __repr__(self) -> str:
+        return f"FileRecord(relative_path={self.relative_path!r}, mime={self.mime!r}, size={self.size}, is_loaded={self.is_loaded})"
@@ -0,0 +1,696 @@
+"""
+Interface extraction for JavaScript, TypeScript, Go and Rust.
+
+Without a parser for these languages, the code is split into top-level items by matching
+brackets, skipping strings and comments, and ending items at semicolons, at the end of their
+braces, or at line ends where the language inserts semicolons. The exported items are kept
+with their doc comments, and the bodies of functions and methods are left out.
+"""
+
+import re
+from enum import StrEnum
+from typing import Callable, Dict, List, Optional, Tuple
+
+JAVASCRIPT_MIME = "text/javascript"
+TYPESCRIPT_MIME = "text/typescript"
+GO_MIME = "text/x-go"
+RUST_MIME = "text/x-rust"
+
+# Typical size of the interface of a file, relative to its source
+CODE_INTERFACE_SIZE_RATIO = 0.35
+
+# Values on a single line up to this length are kept, longer ones are reduced to their declaration
+MAX_KEPT_VALUE_LENGTH = 160
+
+
+class CodeProcessingRule(StrEnum):
+    INTERFACE = "interface"
+    INTEGRAL = "integral"
+
+
+class _Syntax(StrEnum):
+    JAVASCRIPT = "javascript"
+    GO = "go"
+    RUST = "rust"
+
+
+class _CodeItem:
+    """A top-level item of code, or a member of a class, trait or impl block."""
+
+    __slots__ = ("start", "end", "doc_start", "doc_end", "body_start", "body_end")
+
+    def __init__(self, start: int, end: int, doc_span: Optional[Tuple[int, int]], body_span: Optional[Tuple[int, int]]) -> None:
+        self.start = start
+        self.end = end
+        self.doc_start, self.doc_end = doc_span or (start, start)
+        # Opening and closing braces of the block the item ends with, if any
+        self.body_start, self.body_end = body_span or (-1, -1)
+
+    @property
+    def has_body(self) -> bool:
+        return self.body_start >= 0
+
+
+_REGEX_PRECEDING_CHARS = set("(,=:[!&|?{};+-*%<>~^")
+_CONTINUATION_END_CHARS = set(",=+-*/%&|^!?:.([{<")
+_CONTINUATION_START_CHARS = set(".?:{|&")
+_RUST_CHAR_REGEX = re.compile(r"b?'(?:\\(?:x[0-9a-fA-F]{2}|u\{[0-9a-fA-F]+\}|.)|[^\\'\n])'")
+_RUST_RAW_STRING_REGEX = re.compile(r'b?r(#*)"')
+# Runs of code that can't start a literal, a comment, a bracket nor the end of an item, skipped at once
+_PLAIN_CODE_REGEXES = {
+    _Syntax.JAVASCRIPT: re.compile(r"[^\s\"'`/()\[\]{};]+"),
+    _Syntax.GO: re.compile(r"[^\s\"'`/()\[\]{};]+"),
+    _Syntax.RUST: re.compile(r"(?:[^\s\"'/()\[\]{};rb]|r(?![#\"])|b(?![r\"']))+"),
+}
+_HORIZONTAL_SPACE_REGEX = re.compile(r"[^\S\n]+")
+_DECORATORS_REGEX = re.compile(r"(?:\s*@[\w.]+(?:\(.*\))?)+\s*", re.DOTALL)
+
+
+def make_code_text_processing_funcs(code_processing_rule: CodeProcessingRule) -> Dict[str, Callable[[str], str]]:
+    """
+    Per-file text processing functions, by MIME type, implementing a code processing rule for JavaScript, TypeScript, Go and Rust.
+    """
+    match code_processing_rule:
+        case CodeProcessingRule.INTEGRAL:
+            return {}
+        case CodeProcessingRule.INTERFACE:
+            return {
+                JAVASCRIPT_MIME: javascript_interface,
+                TYPESCRIPT_MIME: typescript_interface,
+                GO_MIME: go_interface,
+                RUST_MIME: rust_interface,
+            }
+
+
+def make_code_size_ratios(code_processing_rule: CodeProcessingRule) -> Dict[str, float]:
+    """
+    Typical size of the output of a code processing rule relative to the source, by MIME type, for token budgets.
+    """
+    match code_processing_rule:
+        case CodeProcessingRule.INTEGRAL:
+            return {}
+        case CodeProcessingRule.INTERFACE:
+            return {mime: CODE_INTERFACE_SIZE_RATIO for mime in (JAVASCRIPT_MIME, TYPESCRIPT_MIME, GO_MIME, RUST_MIME)}
+
+
+def javascript_interface(code: str) -> str:
+    """
+    Keep the exported declarations of a JavaScript module, with their JSDoc comments, without function bodies.
+    Modules without exports keep all their top-level declarations.
+    """
+    return _js_interface(code=code)
+
+
+def typescript_interface(code: str) -> str:
+    """
+    Keep the exported declarations, interfaces and types of a TypeScript module, with their JSDoc comments, without function bodies.
+    Modules without exports keep all their top-level declarations.
+    """
+    return _js_interface(code=code)
+
+
+def go_interface(code: str) -> str:
+    """
+    Keep the package clause and the exported declarations of a Go file, with their doc comments, without function bodies.
+    """
+    items = _split_items(text=code, start=0, end=len(code), syntax=_Syntax.GO)
+    rendered_items = [_render_item(text=code, item=item, code=rendered) for item in items if (rendered := _go_item(text=code, item=item))]
+    return "\n\n".join(rendered_items)
+
+
+def rust_interface(code: str) -> str:
+    """
+    Keep the module docs and the public items of a Rust file, with their doc comments and attributes, without function bodies.
+    Inherent impl blocks keep their public methods, trait impl blocks are reduced to their header, and test modules are left out.
+    """
+    return "\n\n".join(_rust_items(text=code, start=0, end=len(code)))
+
+
+##########################################################################################
+# Splitting code into items
+##########################################################################################
+
+
+def _skip_literal(text: str, index: int, syntax: _Syntax, previous_char: str) -> Optional[Tuple[int, bool]]:
+    """Find the end of the string, character literal or comment starting at index, if any.
+
+    Returns:
+        The index after the literal and whether it is a comment, or None if no literal starts at index
+    """
+    char = text[index]
+    next_char = text[index + 1 : index + 2]
+    if char == "/" and next_char == "/":
+        line_end = text.find("\n", index)
+        return (len(text) if line_end < 0 else line_end), True
+    if char == "/" and next_char == "*":
+        return _skip_block_comment(text=text, index=index, is_nested=syntax == _Syntax.RUST), True
+    match syntax:
+        case _Syntax.JAVASCRIPT:
+            if char in "\"'":
+                return _skip_quoted(text=text, index=index, quote=char, is_multiline=False), False
+            if char == "`":
+                return _skip_template(text=text, index=index), False
+            if char == "/" and (not previous_char or previous_char in _REGEX_PRECEDING_CHARS):
+                regex_end = _skip_regex(text=text, index=index)
+                return None if regex_end is None else (regex_end, False)
+        case _Syntax.GO:
+            if char == '"':
+                return _skip_quoted(text=text, index=index, quote=char, is_multiline=False), False
+            if char == "'":
+                return _skip_quoted(text=text, index=index, quote=char, is_multiline=False), False
+            if char == "`":
+                raw_end = text.find("`", index + 1)
+                return (len(text) if raw_end < 0 else raw_end + 1), False
+        case _Syntax.RUST:
+            is_identifier_continuation = index > 0 and (text[index - 1].isalnum() or text[index - 1] == "_")
+            if char in "br" and not is_identifier_continuation and (raw_match := _RUST_RAW_STRING_REGEX.match(text, index)):
+                raw_end = text.find('"' + raw_match.group(1), raw_match.end())
+                return (len(text) if raw_end < 0 else raw_end + 1 + len(raw_match.group(1))), False
+            if char == '"' or (char == "b" and next_char == '"' and not is_identifier_continuation):
+                return _skip_quoted(text=text, index=text.index('"', index), quote='"', is_multiline=True), False
+            if char in "'b" and not is_identifier_continuation and (char_match := _RUST_CHAR_REGEX.match(text, index)):
+                return char_match.end(), False
+    return None
+
+
+def _skip_block_comment(text: str, index: int, is_nested: bool) -> int:
+    depth = 0
+    while index < len(text):
+        if text.startswith("/*", index):
+            depth += 1 if is_nested or depth == 0 else 0
+            index += 2
+        elif text.startswith("*/", index):
+            depth -= 1
+            index += 2
+            if depth == 0:
+                return index
+        else:
+            index += 1
+    return len(text)
+
+
+def _skip_quoted(text: str, index: int, quote: str, is_multiline: bool) -> int:
+    index += 1
+    while index < len(text):
+        char = text[index]
+        if char == "\\":
+            index += 2
+        elif char == quote:
+            return index + 1
+        elif char == "\n" and not is_multiline:
+            # Unterminated literal, ended at the line end
+            return index
+        else:
+            index += 1
+    return len(text)
+
+
+def _skip_template(text: str, index: int) -> int:
+    index += 1
+    while index < len(text):
+        char = text[index]
+        if char == "\\":
+            index += 2
+        elif char == "`":
+            return index + 1
+        elif text.startswith("${", index):
+            index = _skip_until_closing_brace(text=text, index=index + 2, syntax=_Syntax.JAVASCRIPT)
+        else:
+            index += 1
+    return len(text)
+
+
+def _skip_regex(text: str, index: int) -> Optional[int]:
+    """Find the end of the regex literal starting at index, or None if the slash is not the start of one."""
+    index += 1
+    is_in_class = False
+    while index < len(text) and text[index] != "\n":
+        char = text[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == "[":
+            is_in_class = True
+        elif char == "]":
+            is_in_class = False
+        elif char == "/" and not is_in_class:
+            index += 1
+            while index < len(text) and text[index].isalpha():
+                index += 1
+            return index
+        index += 1
+    return None
+
+
+def _skip_until_closing_brace(text: str, index: int, syntax: _Syntax) -> int:
+    """Find the index after the brace closing an already opened one."""
+    return _find_group_end(text=text, index=index, syntax=syntax, depth=1)
+
+
+def _find_group_end(text: str, index: int, syntax: _Syntax, depth: int = 0) -> int:
+    """Find the index after the bracket closing the one at index, or the ones already opened if depth > 0."""
+    previous_char = ""
+    plain_code_regex = _PLAIN_CODE_REGEXES[syntax]
+    while index < len(text):
+        if plain_match := plain_code_regex.match(text, index):
+            index = plain_match.end()
+            previous_char = text[index - 1]
+            continue
+        if (literal := _skip_literal(text=text, index=index, syntax=syntax, previous_char=previous_char)) is not None:
+            index = literal[0]
+            continue
+        char = text[index]
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        if not char.isspace():
+            previous_char = char
+        index += 1
+    return len(text)
+
+
+def _is_doc_comment(comment: str, syntax: _Syntax) -> bool:
+    match syntax:
+        case _Syntax.JAVASCRIPT:
+            return comment.startswith("/**")
+        case _Syntax.GO:
+            return True
+        case _Syntax.RUST:
+            return (comment.startswith("///") and not comment.startswith("////")) or comment.startswith("/**")
+
+
+def _split_items(text: str, start: int, end: int, syntax: _Syntax) -> List[_CodeItem]:
+    """Split a region of code into items, each with its doc comment and the block it ends with, if any.
+
+    Items end at a semicolon outside brackets, at the line end after a closing brace in Rust,
+    and, in JavaScript and Go, at a line end where the statement is complete.
+    """
+    items: List[_CodeItem] = []
+    is_asi = syntax != _Syntax.RUST
+    index = start
+    item_start: Optional[int] = None
+    last_code_index = -1
+    open_brackets: List[int] = []
+    last_group: Optional[Tuple[int, int]] = None
+    doc_span: Optional[Tuple[int, int]] = None
+    is_blank_line = True
+    previous_char = ""
+
+    def finish_item(item_end: int) -> None:
+        nonlocal item_start, last_group, doc_span
+        if item_start is None:
+            return
+        body_span = last_group if last_group and text[last_group[1] + 1 : item_end].strip() in ("", ";") else None
+        items.append(_CodeItem(start=item_start, end=item_end, doc_span=doc_span, body_span=body_span))
+        item_start = None
+        last_group = None
+        doc_span = None
+
+    plain_code_regex = _PLAIN_CODE_REGEXES[syntax]
+    while index < end:
+        if space_match := _HORIZONTAL_SPACE_REGEX.match(text, index, end):
+            index = space_match.end()
+            continue
+        if plain_match := plain_code_regex.match(text, index, end):
+            # A run of code without brackets, literals nor comments
+            if item_start is None:
+                item_start = index
+            index = plain_match.end()
+            last_code_index = index - 1
+            previous_char = text[last_code_index]
+            is_blank_line = False
+            continue
+        char = text[index]
+        if char == "\n":
+            if item_start is None:
+                if is_blank_line:
+                    doc_span = None
+            elif (
+                is_asi
+                and not open_brackets
+                and not _is_continued(text=text, item_start=item_start, last_code_index=last_code_index, index=index, end=end)
+            ):
+                finish_item(item_end=last_code_index + 1)
+            is_blank_line = True
+            index += 1
+            continue
+        is_blank_line = False
+        if (literal := _skip_literal(text=text, index=index, syntax=syntax, previous_char=previous_char)) is not None:
+            literal_end, is_comment = literal
+            if is_comment:
+                if item_start is None and not open_brackets and syntax == _Syntax.RUST and text.startswith(("//!", "/*!"), index):
+                    # Inner doc comments document the enclosing module, they are items of their own
+                    if items and text.startswith(("//!", "/*!"), items[-1].start) and text.count("\n", items[-1].end, index) <= 1:
+                        items[-1].end = literal_end
+                    else:
+                        items.append(_CodeItem(start=index, end=literal_end, doc_span=None, body_span=None))
+                    doc_span = None
+                elif item_start is None and not open_brackets:
+                    if _is_doc_comment(comment=text[index:literal_end], syntax=syntax):
+                        doc_span = (doc_span[0] if doc_span else index, literal_end)
+                    else:
+                        doc_span = None
+            else:
+                if item_start is None:
+                    item_start = index
+                last_code_index = literal_end - 1
+                previous_char = '"'
+            index = literal_end
+            continue
+        if item_start is None:
+            item_start = index
+        last_code_index = index
+        previous_char = char
+        if char in "([{":
+            open_brackets.append(index)
+        elif char in ")]}" and open_brackets:
+            open_index = open_brackets.pop()
+            if char == "}" and not open_brackets:
+                last_group = (open_index, index)
+                if not is_asi and not _is_rust_expression_continued(text=text, index=index + 1, end=end):
+                    finish_item(item_end=index + 1)
+        elif char == ";" and not open_brackets:
+            finish_item(item_end=index + 1)
+        index += 1
+    finish_item(item_end=last_code_index + 1)
+    return items
+
+
+def _is_continued(text: str, item_start: int, last_code_index: int, index: int, end: int) -> bool:
+    """Check if a statement goes on after a line end, where JavaScript and Go would not insert a semicolon."""
+    last_char = text[last_code_index]
+    if last_char in _CONTINUATION_END_CHARS or text[last_code_index - 1 : last_code_index + 1] == "=>":
+        return True
+    if text[item_start] == "@" and _DECORATORS_REGEX.fullmatch(text, item_start, last_code_index + 1):
+        # Only decorators so far, they belong to the next declaration
+        return True
+    next_index = index
+    while next_index < end and text[next_index].isspace():
+        next_index += 1
+    return next_index < end and text[next_index] in _CONTINUATION_START_CHARS and not text.startswith(("//", "/*"), next_index)
+
+
+def _is_rust_expression_continued(text: str, index: int, end: int) -> bool:
+    """Check if a closing brace at the top level is followed by the rest of an expression, as in `const X: T = T { .. };`."""
+    while index < end and text[index].isspace():
+        index += 1
+    return index < end and text[index] in ";,.)?"
+
+
+##########################################################################################
+# Rendering items
+##########################################################################################
+
+
+def _render_item(text: str, item: _CodeItem, code: str) -> str:
+    """Render the code of an item after its doc comment, indented as in the source."""
+    line_start = text.rfind("\n", 0, item.doc_start) + 1
+    indent = text[line_start : item.doc_start]
+    if not indent.isspace():
+        indent = ""
+    if item.doc_end > item.doc_start:
+        return f"{indent}{text[item.doc_start : item.doc_end]}\n{indent}{code}"
+    return f"{indent}{code}"
+
+
+def _signature(text: str, item: _CodeItem, start: int, terminator: str) -> str:
+    """The code of a function or method item up to its body."""
+    head = text[start : item.body_start].rstrip()
+    if terminator and head.endswith(","):
+        # Trailing comma of a Rust where clause
+        head = head[:-1]
+    if head.endswith("=>"):
+        return f"{head} ...{terminator}"
+    return f"{head}{terminator}"
+
+
+def _value_outline(text: str, item: _CodeItem, start: int, syntax: _Syntax, terminator: str) -> str:
+    """The code of a value declaration, reduced to the part before its value if it is long."""
+    code = text[start : item.end].strip()
+    if "\n" not in code and len(code) <= MAX_KEPT_VALUE_LENGTH:
+        return code
+    if (equal_index := _find_top_level_equal(text=text, start=start, end=item.end, syntax=syntax)) is not None:
+        return f"{text[start:equal_index].rstrip()} = ...{terminator}"
+    return f"{code.splitlines()[0].rstrip()} ..."
+
+
+def _find_top_level_equal(text: str, start: int, end: int, syntax: _Syntax) -> Optional[int]:
+    index = start
+    depth = 0
+    previous_char = ""
+    while index < end:
+        if (literal := _skip_literal(text=text, index=index, syntax=syntax, previous_char=previous_char)) is not None:
+            index = literal[0]
+            continue
+        char = text[index]
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "=" and depth == 0 and text[index + 1 : index + 2] not in ("=", ">") and previous_char not in "=<>!":
+            return index
+        if not char.isspace():
+            previous_char = char
+        index += 1
+    return None
+
+
+def _outline_block(text: str, item: _CodeItem, start: int, member_codes: List[str]) -> str:
+    """The header of a block item, such as a class or an impl, followed by the rendered members and its closing brace."""
+    header = text[start : item.body_start].rstrip()
+    line_start = text.rfind("\n", 0, item.body_end) + 1
+    closing_indent = text[line_start : item.body_end]
+    if not closing_indent.isspace():
+        closing_indent = ""
+    if not member_codes:
+        return f"{header} {{}}"
+    return "\n".join([f"{header} {{", *member_codes, f"{closing_indent}}}"])
+
+
+##########################################################################################
+# JavaScript and TypeScript
+##########################################################################################
+
+_JS_DECLARATION_REGEX = re.compile(
+    r"(?P<decorators>(?:@[\w.]+(?:\([^()]*\))?\s*)*)(?P<export>export\s+)?(?P<default>default\s+)?"
+    r"(?:(?:declare|abstract|async)\s+)*(?P<keyword>[\w$]+)?"
+)
+_JS_EXPORT_REGEX = re.compile(r"(?:@[\w.]+(?:\([^()]*\))?\s*)*export\b")
+_JS_TYPE_KEYWORDS = {"interface", "type", "enum", "namespace", "module", "global"}
+_JS_PRIVATE_MEMBER_REGEX = re.compile(
+    r"(?:@[\w.]+(?:\([^()]*\))?\s*)*(?:(?:public|protected|static|readonly|override|abstract|declare|async|get|set|accessor)\s+)*(?:private\b|#)"
+)
+_JS_FUNCTION_VALUE_REGEX = re.compile(r"=\s*(?:async\s+)?function\b")
+
+
+def _js_interface(code: str) -> str:
+    items = _split_items(text=code, start=0, end=len(code), syntax=_Syntax.JAVASCRIPT)
+    has_exports = any(_JS_EXPORT_REGEX.match(code, item.start) for item in items)
+    rendered_items = [
+        _render_item(text=code, item=item, code=rendered) for item in items if (rendered := _js_item(text=code, item=item, has_exports=has_exports))
+    ]
+    return "\n\n".join(rendered_items)
+
+
+def _js_item(text: str, item: _CodeItem, has_exports: bool) -> Optional[str]:
+    item_code = text[item.start : item.end]
+    declaration_match = _JS_DECLARATION_REGEX.match(item_code)
+    if declaration_match is None:
+        return None
+    is_exported = bool(declaration_match.group("export")) or not has_exports
+    keyword = declaration_match.group("keyword")
+    if item_code.startswith("module.exports") or item_code.startswith("exports."):
+        return _value_outline(text=text, item=item, start=item.start, syntax=_Syntax.JAVASCRIPT, terminator=";")
+    if not is_exported or keyword == "import":
+        return None
+    if keyword is None:
+        # Re-exports, such as `export { a, b } from "./module"` or `export * from "./module"`
+        return item_code.strip() if declaration_match.group("export") else None
+    head = text[item.start : item.body_start] if item.has_body else item_code
+    if keyword in _JS_TYPE_KEYWORDS or re.match(r"const\s+enum\b", item_code[declaration_match.start("keyword") :]):
+        return item_code.strip()
+    if keyword == "function":
+        return _signature(text=text, item=item, start=item.start, terminator=";") if item.has_body else item_code.strip()
+    if keyword == "class":
+        return _js_class_outline(text=text, item=item) if item.has_body else item_code.strip()
+    if keyword in ("const", "let", "var") and re.search(r"=\s*require\(", item_code):
+        return None
+    if item.has_body and ("=>" in head or _JS_FUNCTION_VALUE_REGEX.search(head)):
+        return _signature(text=text, item=item, start=item.start, terminator=";")
+    if keyword in ("const", "let", "var") or declaration_match.group("default"):
+        return _value_outline(text=text, item=item, start=item.start, syntax=_Syntax.JAVASCRIPT, terminator=";")
+    return None
+
+
+def _js_class_outline(text: str, item: _CodeItem) -> str:
+    member_codes: List[str] = []
+    for member in _split_items(text=text, start=item.body_start + 1, end=item.body_end, syntax=_Syntax.JAVASCRIPT):
+        member_code = text[member.start : member.end]
+        if _JS_PRIVATE_MEMBER_REGEX.match(member_code) or re.match(r"static\s*\{", member_code):
+            continue
+        if member.has_body and ("(" in text[member.start : member.body_start]):
+            rendered = _signature(text=text, item=member, start=member.start, terminator=";")
+        else:
+            rendered = _value_outline(text=text, item=member, start=member.start, syntax=_Syntax.JAVASCRIPT, terminator=";")
+        member_codes.append(_render_item(text=text, item=member, code=rendered))
+    return _outline_block(text=text, item=item, start=item.start, member_codes=member_codes)
+
+
+##########################################################################################
+# Go
+##########################################################################################
+
+_GO_FUNC_NAME_REGEX = re.compile(r"func\s*(?:\([^)]*\)\s*)?(\w+)")
+_GO_GROUP_REGEX = re.compile(r"(type|const|var)\s*\(")
+
+
+def _is_go_exported(name: str) -> bool:
+    return bool(name) and name[0].isupper()
+
+
+def _go_item(text: str, item: _CodeItem) -> Optional[str]:
+    item_code = text[item.start : item.end]
+    keyword_match = re.match(r"\w+", item_code)
+    if keyword_match is None:
+        return None
+    match keyword_match.group():
+        case "package":
+            return item_code.strip()
+        case "func":
+            name_match = _GO_FUNC_NAME_REGEX.match(item_code)
+            if name_match is None or not _is_go_exported(name_match.group(1)):
+                return None
+            return _signature(text=text, item=item, start=item.start, terminator="") if item.has_body else item_code.strip()
+        case "type" | "const" | "var":
+            if group_match := _GO_GROUP_REGEX.match(item_code):
+                return _go_group(text=text, item=item, keyword=group_match.group(1), open_index=item.start + group_match.end() - 1)
+            name_match = re.match(r"\w+\s+(\w+)", item_code)
+            if name_match is None or not _is_go_exported(name_match.group(1)):
+                return None
+            if keyword_match.group() == "type":
+                return item_code.strip()
+            return _value_outline(text=text, item=item, start=item.start, syntax=_Syntax.GO, terminator="")
+        case _:
+            return None
+
+
+def _go_group(text: str, item: _CodeItem, keyword: str, open_index: int) -> Optional[str]:
+    """A `type (...)`, `const (...)` or `var (...)` group, with its exported entries only."""
+    close_index = _find_group_end(text=text, index=open_index, syntax=_Syntax.GO) - 1
+    entry_codes: List[str] = []
+    for entry in _split_items(text=text, start=open_index + 1, end=close_index, syntax=_Syntax.GO):
+        name_match = re.match(r"\w+", text[entry.start : entry.end])
+        if name_match is None or not _is_go_exported(name_match.group()):
+            continue
+        entry_code = (
+            text[entry.start : entry.end].strip()
+            if keyword == "type"
+            else _value_outline(text=text, item=entry, start=entry.start, syntax=_Syntax.GO, terminator="")
+        )
+        entry_codes.append(_render_item(text=text, item=entry, code=entry_code))
+    if not entry_codes:
+        return None
+    return "\n".join([f"{keyword} (", *entry_codes, ")"])
+
+
+##########################################################################################
+# Rust
+##########################################################################################
+
+_RUST_INNER_DOC_PREFIXES = ("//!", "/*!")
+_RUST_VISIBILITY_REGEX = re.compile(r"pub(?:\s*\([^)]*\))?\s+")
+_RUST_FN_REGEX = re.compile(r'(?:(?:const|async|unsafe|default)\s+|extern\s+(?:"[^"]*"\s+)?)*fn\b')
+_RUST_KEYWORD_REGEX = re.compile(r"(?:(?:unsafe|default)\s+)*(\w+!?)")
+
+
+def _rust_items(text: str, start: int, end: int) -> List[str]:
+    rendered_items: List[str] = []
+    for item in _split_items(text=text, start=start, end=end, syntax=_Syntax.RUST):
+        if text.startswith(_RUST_INNER_DOC_PREFIXES, item.start):
+            rendered_items.append(_render_item(text=text, item=item, code=text[item.start : item.end]))
+        elif rendered := _rust_item(text=text, item=item):
+            rendered_items.append(_render_item(text=text, item=item, code=rendered))
+    return rendered_items
+
+
+def _rust_attributes_end(text: str, item: _CodeItem) -> Tuple[int, int, str]:
+    """Find where the attributes of an item end.
+
+    Returns:
+        The index after the inner attributes (`#![...]`), which are left out, the index after all the
+        attributes, and the text of the outer ones
+    """
+    index = item.start
+    code_start = item.start
+    outer_attributes: List[str] = []
+    while text.startswith("#", index):
+        is_inner = text.startswith("#!", index)
+        bracket_index = text.find("[", index)
+        attribute_end = _find_group_end(text=text, index=bracket_index, syntax=_Syntax.RUST)
+        if is_inner:
+            code_start = attribute_end
+        else:
+            outer_attributes.append(text[index:attribute_end])
+        index = attribute_end
+        while index < item.end and text[index].isspace():
+            index += 1
+    if code_start > item.start:
+        while code_start < item.end and text[code_start].isspace():
+            code_start += 1
+    return code_start, index, " ".join(outer_attributes)
+
+
+def _rust_item(text: str, item: _CodeItem, context: str = "") -> Optional[str]:
+    """Render a Rust item, in a module (no context), a trait ("trait"), an inherent impl ("impl") or a trait impl ("trait_impl")."""
+    code_start, index, outer_attributes = _rust_attributes_end(text=text, item=item)
+    if "cfg(test)" in outer_attributes or index >= item.end:
+        return None
+    visibility_match = _RUST_VISIBILITY_REGEX.match(text, index)
+    is_public = visibility_match is not None or context in ("trait", "trait_impl")
+    if visibility_match:
+        index = visibility_match.end()
+    if _RUST_FN_REGEX.match(text, index):
+        if not is_public:
+            return None
+        return _signature(text=text, item=item, start=code_start, terminator=";") if item.has_body else text[code_start : item.end].strip()
+    keyword_match = _RUST_KEYWORD_REGEX.match(text, index)
+    if keyword_match is None:
+        return None
+    match keyword_match.group(1):
+        case "struct" | "enum" | "union" | "type" if is_public:
+            return text[code_start : item.end].strip()
+        case "const" | "static" if is_public:
+            return _value_outline(text=text, item=item, start=code_start, syntax=_Syntax.RUST, terminator=";")
+        case "use" if is_public and not context:
+            return text[code_start : item.end].strip()
+        case "trait" if is_public and item.has_body:
+            return _rust_block_outline(text=text, item=item, start=code_start, context="trait")
+        case "impl" if item.has_body and not context:
+            header = text[keyword_match.end() : item.body_start]
+            if re.search(r"\bfor\b", re.sub(r"for\s*<[^>]*>", "", header)):
+                return f"{text[code_start : item.body_start].rstrip()} {{ ... }}"
+            return _rust_block_outline(text=text, item=item, start=code_start, context="impl", is_skipped_if_empty=True)
+        case "mod" if is_public and not context:
+            if not item.has_body:
+                return text[code_start : item.end].strip()
+            member_codes = _rust_items(text=text, start=item.body_start + 1, end=item.body_end)
+            return _outline_block(text=text, item=item, start=code_start, member_codes=member_codes)
+        case "macro_rules!" if "macro_export" in outer_attributes and not context:
+            name_match = re.match(r"macro_rules!\s*(\w+)", text[keyword_match.start(1) : item.end])
+            return f"{text[code_start:index]}macro_rules! {name_match.group(1) if name_match else ''} {{ ... }}"
+        case _:
+            return None
+
+
+def _rust_block_outline(text: str, item: _CodeItem, start: int, context: str, is_skipped_if_empty: bool = False) -> Optional[str]:
+    member_codes = [
+        _render_item(text=text, item=member, code=rendered)
+        for member in _split_items(text=text, start=item.body_start + 1, end=item.body_end, syntax=_Syntax.RUST)
+        if (rendered := _rust_item(text=text, item=member, context=context))
+    ]
+    if not member_codes and is_skipped_if_empty:
+        return None
+    return _outline_block(text=text, item=item, start=start, member_codes=member_codes)
@@ -1,10 +1,22 @@
 import ast
+import logging
 from enum import StrEnum
-from typing import List
+from typing import Callable, Dict, List, Optional
 
 from pipelex import log
 
-from cocode.utils import format_with_ruff
+from cocode.repox.process_code import CodeProcessingRule, make_code_size_ratios, make_code_text_processing_funcs
+from cocode.repox.repox_budget import TextProcessingLevel, TokenBudget
+from cocode.utils import format_many_with_ruff, format_with_ruff, get_python_formatter_name, is_log_enabled
+
+PYTHON_MIME = "text/x-python"
+
+# Typical size of the interface and of the imports list of a module, relative to its source
+PYTHON_INTERFACE_SIZE_RATIO = 0.25
+PYTHON_IMPORTS_SIZE_RATIO = 0.01
+
+# Output of the processing functions for python code that doesn't parse
+INVALID_PYTHON_CODE = "# Invalid Python code"
 
 
 class PythonProcessingRule(StrEnum):
@@ -13,6 +25,14 @@ class PythonProcessingRule(StrEnum):
     IMPORTS = "imports"
 
 
+# Typical size of the output of each rule, relative to the source of a module
+PYTHON_SIZE_RATIOS: Dict[PythonProcessingRule, float] = {
+    PythonProcessingRule.INTEGRAL: 1.0,
+    PythonProcessingRule.INTERFACE: PYTHON_INTERFACE_SIZE_RATIO,
+    PythonProcessingRule.IMPORTS: PYTHON_IMPORTS_SIZE_RATIO,
+}
+
+
 def python_integral(python_code: str) -> str:
     """
     Return it all
@@ -25,15 +45,88 @@ def python_interface(python_code: str) -> str:
     Format the python code only retaining interface code and docstrings.
     Also keeps Enum/StrEnum values and ignores private methods.
     """
-    try:
-        tree = ast.parse(python_code)
-        output_lines: List[str] = []
-        _format_interface(node=tree, lines=output_lines)
-        interface_code = "\n".join(output_lines)
-        reformatted_code = format_with_ruff(interface_code)
-        return reformatted_code
-    except SyntaxError:
-        return "# Invalid Python code"
+    return _process_python_module(tree_processing_func=_python_interface_from_tree, python_code=python_code)
+
+
+def python_interface_unformatted(python_code: str) -> str:
+    """
+    Same as `python_interface` but without the ruff formatting, which is meant to be applied
+    to many files at once with `python_format_batch`.
+    """
+    return _process_python_module(tree_processing_func=_interface_code, python_code=python_code)
+
+
+def python_format_batch(python_codes: List[str]) -> List[str]:
+    """
+    Format a batch of python codes with a single ruff run.
+    """
+    return format_many_with_ruff(python_codes)
+
+
+def make_python_text_processing_funcs(python_processing_rule: PythonProcessingRule) -> Dict[str, Callable[[str], str]]:
+    """
+    Per-file text processing functions, by MIME type, implementing a python processing rule.
+    """
+    match python_processing_rule:
+        case PythonProcessingRule.INTEGRAL:
+            return {PYTHON_MIME: python_integral}
+        case PythonProcessingRule.INTERFACE:
+            return {PYTHON_MIME: python_interface_unformatted}
+        case PythonProcessingRule.IMPORTS:
+            return {PYTHON_MIME: python_imports_list}
+
+
+def make_python_batch_processing_funcs(python_processing_rule: PythonProcessingRule) -> Dict[str, Callable[[List[str]], List[str]]]:
+    """
+    Batch text processing functions, by MIME type, applied after the per-file ones of the same rule.
+    """
+    match python_processing_rule:
+        case PythonProcessingRule.INTERFACE:
+            return {PYTHON_MIME: python_format_batch}
+        case PythonProcessingRule.INTEGRAL | PythonProcessingRule.IMPORTS:
+            return {}
+
+
+def make_python_token_budget(
+    python_processing_rule: PythonProcessingRule,
+    max_tokens: int,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
+) -> TokenBudget:
+    """
+    Token budget in which python files are degraded from the given rule to the less detailed ones, down to imports.
+    Files of the other languages with an interface extractor are degraded to their interface along with python files, unless
+    they are already processed with the interface code rule.
+    """
+    rules_by_detail = [PythonProcessingRule.INTEGRAL, PythonProcessingRule.INTERFACE, PythonProcessingRule.IMPORTS]
+    degraded_rules = rules_by_detail[rules_by_detail.index(python_processing_rule) + 1 :]
+    degraded_levels: List[TextProcessingLevel] = []
+    for degraded_rule in degraded_rules:
+        text_processing_funcs = make_python_text_processing_funcs(python_processing_rule=degraded_rule)
+        if degraded_rule == PythonProcessingRule.INTERFACE and code_processing_rule == CodeProcessingRule.INTEGRAL:
+            text_processing_funcs.update(make_code_text_processing_funcs(code_processing_rule=CodeProcessingRule.INTERFACE))
+        degraded_levels.append(
+            TextProcessingLevel(
+                name=degraded_rule,
+                text_processing_funcs=text_processing_funcs,
+                text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=degraded_rule),
+                size_ratio=PYTHON_SIZE_RATIOS[degraded_rule],
+            )
+        )
+    return TokenBudget(
+        max_tokens=max_tokens,
+        degraded_levels=degraded_levels,
+        size_ratios=make_python_size_ratios(python_processing_rule=python_processing_rule, code_processing_rule=code_processing_rule),
+    )
+
+
+def make_python_size_ratios(
+    python_processing_rule: PythonProcessingRule,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
+) -> Dict[str, float]:
+    """
+    Typical size of the output of the python and code processing rules relative to the source, by MIME type, 1 if missing.
+    """
+    return {PYTHON_MIME: PYTHON_SIZE_RATIOS[python_processing_rule], **make_code_size_ratios(code_processing_rule=code_processing_rule)}
 
 
 def python_imports_list(python_code: str) -> str:
@@ -41,24 +134,78 @@ def python_imports_list(python_code: str) -> str:
     Extract all non-private entities defined at the root level of the Python module.
     Returns a comma-separated list of public entity names that can be imported.
     """
+    return _process_python_module(tree_processing_func=_imports_list, python_code=python_code)
+
+
+def apply_python_processing_funcs(text_processing_funcs: List[Callable[[str], str]], python_code: str) -> List[str]:
+    """
+    Apply several processing functions to the same python code, parsing it once for all the ones working on its syntax tree.
+    The other functions are applied to the code as is.
+    """
+    tree_processing_funcs = [_PYTHON_TREE_PROCESSING_FUNCS.get(text_processing_func) for text_processing_func in text_processing_funcs]
+    tree = _parse_python_module(python_code) if any(tree_processing_funcs) else None
+    processed_codes: List[str] = []
+    for text_processing_func, tree_processing_func in zip(text_processing_funcs, tree_processing_funcs):
+        if tree_processing_func is None:
+            processed_codes.append(text_processing_func(python_code))
+        elif tree is None:
+            processed_codes.append(INVALID_PYTHON_CODE)
+        else:
+            processed_codes.append(tree_processing_func(tree))
+    return processed_codes
+
+
+def get_python_formatting_name(processing_func: Callable[..., object]) -> Optional[str]:
+    """
+    Name and version of the formatter applied by a processing function, which its outputs depend on, or None if it formats nothing.
+    """
+    if processing_func in _PYTHON_FORMATTING_FUNCS:
+        return get_python_formatter_name()
+    return None
+
+
+def _process_python_module(tree_processing_func: Callable[[ast.Module], str], python_code: str) -> str:
+    tree = _parse_python_module(python_code)
+    if tree is None:
+        return INVALID_PYTHON_CODE
+    return tree_processing_func(tree)
+
+
+def _parse_python_module(python_code: str) -> Optional[ast.Module]:
+    """
+    Parse python code, or return None if it is invalid.
+    """
     try:
-        tree = ast.parse(python_code)
-        entities: List[str] = []
-
-        # Only look at direct children of the Module node
-        for node in tree.body:
-            if isinstance(node, ast.ClassDef) and not node.name.startswith("_"):
-                entities.append(node.name)
-            elif isinstance(node, ast.FunctionDef) and not node.name.startswith("_"):
-                entities.append(node.name)
-            elif isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name) and not target.id.startswith("_") and len(target.id) > 1:
-                        entities.append(target.id)
-
-        return ", ".join(sorted(set(entities)))
+        return ast.parse(python_code)
     except SyntaxError:
-        return "# Invalid Python code"
+        return None
+
+
+def _python_interface_from_tree(tree: ast.Module) -> str:
+    return format_with_ruff(_interface_code(tree=tree))
+
+
+def _imports_list(tree: ast.Module) -> str:
+    entities: List[str] = []
+
+    # Only look at direct children of the Module node
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and not node.name.startswith("_"):
+            entities.append(node.name)
+        elif isinstance(node, ast.FunctionDef) and not node.name.startswith("_"):
+            entities.append(node.name)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and not target.id.startswith("_") and len(target.id) > 1:
+                    entities.append(target.id)
+
+    return ", ".join(sorted(set(entities)))
+
+
+def _interface_code(tree: ast.Module) -> str:
+    output_lines: List[str] = []
+    _format_interface(node=tree, lines=output_lines)
+    return "\n".join(output_lines)
 
 
 def _get_docstring(node: ast.AST) -> str | None:
@@ -136,5 +283,16 @@ def _format_interface(node: ast.AST, lines: List[str]) -> None:
         lines.append("        ...")
         lines.append("")
 
-    else:
+    elif is_log_enabled(logging.DEBUG):
         log.debug(f"This node is not processed: {node}")
+
+
+# Functions processing the syntax tree of a module, by the processing function that applies them to its code
+_PYTHON_TREE_PROCESSING_FUNCS: Dict[Callable[[str], str], Callable[[ast.Module], str]] = {
+    python_interface: _python_interface_from_tree,
+    python_interface_unformatted: _interface_code,
+    python_imports_list: _imports_list,
+}
+
+# Processing functions whose outputs depend on the formatter applied to python code
+_PYTHON_FORMATTING_FUNCS: List[Callable[..., object]] = [python_interface, python_format_batch]
@@ -0,0 +1,154 @@
+"""
+Batch repox over many repositories in a single process.
+
+The repositories are listed from a root directory, each of its sub-directories being one,
+or from a manifest file. They are processed one after the other, sharing the worker pools,
+the persistent cache and the compiled ignore patterns, so that neither Python nor the
+workers are started again for each repository. Each repository gets its own output file,
+and a repository that fails is reported without stopping the batch.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Set
+
+from pipelex import log
+from pipelex.tools.misc.file_utils import ensure_path
+
+from cocode.exceptions import RepoxException
+from cocode.repox.models import DedupMode, EnumerationMode, OutputStyle, RepoxBatchResult
+from cocode.repox.process_code import CodeProcessingRule
+from cocode.repox.process_python import PythonProcessingRule
+from cocode.repox.repox_cache import RepoxCache
+from cocode.repox.repox_cmd import make_repox_processor, write_repox_output_file
+from cocode.repox.repox_processor import RepoxWorkerPools
+
+# Lines of a manifest starting with this are comments
+MANIFEST_COMMENT_PREFIX = "#"
+
+
+def list_batch_repo_paths(root_or_manifest: str) -> List[str]:
+    """List the repositories of a batch.
+
+    Args:
+        root_or_manifest: Either a directory, whose sub-directories are the repositories, hidden ones excepted,
+            or a manifest file listing a repository path per line, relative to the manifest's directory,
+            with blank lines and lines starting with '#' ignored
+
+    Returns:
+        The absolute paths of the repositories, sorted by name for a root, in manifest order otherwise
+    """
+    root_or_manifest_path = Path(root_or_manifest).resolve()
+    if root_or_manifest_path.is_dir():
+        return sorted(
+            str(entry_path) for entry_path in root_or_manifest_path.iterdir() if entry_path.is_dir() and not entry_path.name.startswith(".")
+        )
+    if not root_or_manifest_path.is_file():
+        raise RepoxException(f"'{root_or_manifest}' is neither a directory of repositories nor a manifest file")
+    repo_paths: List[str] = []
+    for line in root_or_manifest_path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith(MANIFEST_COMMENT_PREFIX):
+            continue
+        repo_paths.append(str((root_or_manifest_path.parent / os.path.expanduser(line)).resolve()))
+    return repo_paths
+
+
+def make_batch_output_filename(output_filename: str, repo_path: str) -> str:
+    """Name the output file of a repository after the output filename, e.g. 'repo-to-text-myrepo.txt'."""
+    stem, suffix = os.path.splitext(output_filename)
+    return f"{stem}-{os.path.basename(repo_path)}{suffix}"
+
+
+def repox_batch_command(
+    root_or_manifest: str,
+    output_dir: str,
+    output_filename: str,
+    exclude_patterns: Optional[List[str]],
+    include_patterns: Optional[List[str]],
+    path_pattern: Optional[str],
+    python_processing_rule: PythonProcessingRule,
+    output_style: OutputStyle,
+    jobs: int = 1,
+    file_timeout: Optional[float] = None,
+    use_cache: bool = True,
+    enumeration_mode: EnumerationMode = EnumerationMode.AUTO,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
+    dedup_mode: DedupMode = DedupMode.NONE,
+    strip_license_headers: bool = False,
+) -> List[RepoxBatchResult]:
+    """Write the output of each repository of a batch to its own file in output_dir, with the options of `repox_command`.
+
+    With several jobs, the worker pools are made once and shared by all the repositories. A stuck
+    transform is skipped after file_timeout seconds but keeps its worker busy until the end of the batch.
+
+    Returns:
+        The result of each repository, in batch order
+    """
+    # The output directory may be under the root, it is not one of the repositories
+    repo_paths = [
+        repo_path for repo_path in list_batch_repo_paths(root_or_manifest=root_or_manifest) if Path(repo_path) != Path(output_dir).resolve()
+    ]
+    log.info(f"Batch processing {len(repo_paths)} repositories from '{root_or_manifest}' with output style: '{output_style}'")
+    ensure_path(Path(output_dir))
+    cache = RepoxCache() if use_cache else None
+    worker_pools = RepoxWorkerPools(jobs=jobs) if jobs > 1 else None
+    results: List[RepoxBatchResult] = []
+    output_file_paths: Set[Path] = set()
+    try:
+        for repo_path in repo_paths:
+            start_time = time.perf_counter()
+            output_file_path = Path(output_dir) / make_batch_output_filename(output_filename=output_filename, repo_path=repo_path)
+            is_output_file_owned = False
+            try:
+                if not os.path.isdir(repo_path):
+                    raise RepoxException(f"'{repo_path}' is not a directory")
+                if output_file_path in output_file_paths:
+                    raise RepoxException(
+                        f"Another repository of the batch is named '{os.path.basename(repo_path)}' and was output to '{output_file_path}'"
+                    )
+                output_file_paths.add(output_file_path)
+                is_output_file_owned = True
+                processor = make_repox_processor(
+                    repo_path=repo_path,
+                    exclude_patterns=exclude_patterns,
+                    include_patterns=include_patterns,
+                    path_pattern=path_pattern,
+                    python_processing_rule=python_processing_rule,
+                    output_style=output_style,
+                    jobs=jobs,
+                    file_timeout=file_timeout,
+                    cache=cache,
+                    enumeration_mode=enumeration_mode,
+                    max_file_bytes=max_file_bytes,
+                    max_total_bytes=max_total_bytes,
+                    token_budget=token_budget,
+                    code_processing_rule=code_processing_rule,
+                    dedup_mode=dedup_mode,
+                    strip_license_headers=strip_license_headers,
+                    worker_pools=worker_pools,
+                )
+                write_repox_output_file(repox_processor=processor, output_file_path=output_file_path)
+            except Exception as exc:
+                # A failing repository must not stop the others, nor leave a partial output behind
+                if is_output_file_owned:
+                    output_file_path.unlink(missing_ok=True)
+                log.error(f"Failed to process '{repo_path}': {exc}")
+                results.append(RepoxBatchResult(repo_path=repo_path, error=str(exc) or type(exc).__name__, seconds=time.perf_counter() - start_time))
+                continue
+            results.append(RepoxBatchResult(repo_path=repo_path, output_file_path=str(output_file_path), seconds=time.perf_counter() - start_time))
+            log.info(f"Output of '{repo_path}' saved to file: '{output_file_path}'")
+    finally:
+        if worker_pools is not None:
+            worker_pools.close()
+
+    nb_failures = sum(1 for result in results if not result.is_success)
+    log.info(f"Done, {len(results) - nb_failures} of {len(results)} repositories processed, outputs saved in '{output_dir}'")
+    for result in results:
+        if not result.is_success:
+            log.error(f"Failed: '{result.repo_path}': {result.error}")
+    return results
@@ -0,0 +1,273 @@
+"""
+Token budget planning for repox outputs.
+
+Files are ranked by how much they tell about a repository, then given, in rank order,
+the most detailed processing level that still fits in the budget. The plan is made from
+the file sizes gathered by the walk and from the first bytes of the files, which tell
+binary files, output as a placeholder, from text files, so files left out of the budget
+are never read in full.
+"""
+
+import itertools
+import math
+import re
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from cocode.repox.repox_walker import WalkedFile
+
+# Average number of bytes per token of source code and docs, used to estimate the tokens of a file from its size
+BYTES_PER_TOKEN = 3.2
+
+# Tokens taken by the header of each file section of a repo map, besides its path
+FILE_SECTION_OVERHEAD_TOKENS = 6
+
+# Tokens taken by the line listing a degraded or omitted file in the output header, besides its path
+LISTING_OVERHEAD_TOKENS = 4
+
+# Tokens of the placeholder standing for the content of a binary file, such as "Binary content: 'image/png'"
+BINARY_FILE_TOKENS = 12
+
+_TOKEN_PIECE_REGEX = re.compile(r"(\w+)|[^\w\s]+")
+
+ENTRY_POINT_NAMES = {"__main__.py", "main.py", "cli.py", "app.py", "manage.py", "setup.py", "wsgi.py", "asgi.py"}
+DOC_AND_CONFIG_EXTENSIONS = {".md", ".rst", ".txt", ".toml", ".cfg", ".ini", ".yaml", ".yml", ".json"}
+TEST_DIR_NAMES = {"test", "tests", "testing", "fixtures", "testdata", "test_data", "__snapshots__"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text, without a model tokenizer.
+
+    Whitespace is merged into the neighbouring tokens, words count as one token per 4 characters
+    and runs of punctuation as one token per 2 characters, which is close to what byte pair
+    encoding tokenizers give on code.
+    """
+    nb_tokens = 0
+    for piece_match in _TOKEN_PIECE_REGEX.finditer(text):
+        piece_length = piece_match.end() - piece_match.start()
+        nb_tokens += (piece_length + 3) // 4 if piece_match.group(1) else (piece_length + 1) // 2
+    return nb_tokens
+
+
+def estimate_tokens_from_size(size: int) -> int:
+    """Estimate the number of tokens of a text file from its size in bytes."""
+    return math.ceil(size / BYTES_PER_TOKEN)
+
+
+class FileRank(IntEnum):
+    """How early a file gets its share of the budget, lowest first."""
+
+    ENTRY_POINT = 0
+    PUBLIC_MODULE = 1
+    DOC_OR_CONFIG = 2
+    PRIVATE_MODULE = 3
+    TEST = 4
+
+
+def rank_file(relative_path: str) -> FileRank:
+    """Rank a file from its path: entry points, public modules, docs and config, private modules, and tests and fixtures last."""
+    parts = relative_path.split("/")
+    name = parts[-1]
+    stem, _, extension = name.rpartition(".")
+    if any(part in TEST_DIR_NAMES for part in parts[:-1]) or name == "conftest.py" or stem.startswith("test_") or stem.endswith("_test"):
+        return FileRank.TEST
+    if name in ENTRY_POINT_NAMES:
+        return FileRank.ENTRY_POINT
+    if f".{extension}" in DOC_AND_CONFIG_EXTENSIONS or any(part.startswith(".") for part in parts):
+        return FileRank.DOC_OR_CONFIG
+    if any(part.startswith("_") for part in parts):
+        return FileRank.PRIVATE_MODULE
+    return FileRank.PUBLIC_MODULE
+
+
+class TextProcessingLevel:
+    """A less detailed way to process the files of some MIME types, used to fit them in a token budget."""
+
+    __slots__ = ("name", "text_processing_funcs", "text_batch_processing_funcs", "size_ratio")
+
+    def __init__(
+        self,
+        name: str,
+        text_processing_funcs: Dict[str, Callable[[str], str]],
+        text_batch_processing_funcs: Dict[str, Callable[[List[str]], List[str]]],
+        size_ratio: float,
+    ) -> None:
+        """
+        Args:
+            name: Name of the level, listed in the output header for the files degraded to it
+            text_processing_funcs: Text processing functions of the level, by MIME type; the level only applies to these types
+            text_batch_processing_funcs: Batch processing functions of the level, by MIME type
+            size_ratio: Typical size of the processed text relative to the source file, used to estimate its tokens
+        """
+        self.name = name
+        self.text_processing_funcs = text_processing_funcs
+        self.text_batch_processing_funcs = text_batch_processing_funcs
+        self.size_ratio = size_ratio
+
+
+class TokenBudget:
+    """Maximum number of tokens of an output, with the ways to shrink files to fit in it."""
+
+    __slots__ = ("max_tokens", "degraded_levels", "size_ratios")
+
+    def __init__(
+        self,
+        max_tokens: int,
+        degraded_levels: Optional[List[TextProcessingLevel]] = None,
+        size_ratios: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Args:
+            max_tokens: Maximum number of tokens of the output
+            degraded_levels: Processing levels files can be degraded to, from the most to the least detailed
+            size_ratios: Typical size of the output of the default processing relative to the source file, by MIME type, 1 if missing
+        """
+        self.max_tokens = max_tokens
+        self.degraded_levels = degraded_levels or []
+        self.size_ratios = size_ratios or {}
+
+
+class TokenBudgetPlan:
+    """Processing level chosen for each file to fit a token budget."""
+
+    __slots__ = ("token_budget", "estimated_tokens", "degraded_levels", "omitted_paths")
+
+    def __init__(self, token_budget: TokenBudget) -> None:
+        self.token_budget = token_budget
+        self.estimated_tokens = 0
+        # Index of the level of each degraded file, in the degraded levels of the budget
+        self.degraded_levels: Dict[str, int] = {}
+        self.omitted_paths: List[str] = []
+
+    def get_degraded_level(self, relative_path: str) -> Optional[TextProcessingLevel]:
+        level_index = self.degraded_levels.get(relative_path)
+        if level_index is None:
+            return None
+        return self.token_budget.degraded_levels[level_index]
+
+    def describe(self) -> str:
+        """List the degraded and omitted files, for the output header."""
+        lines = [f"Token budget: {self.token_budget.max_tokens} tokens, {self.estimated_tokens} estimated"]
+        if self.estimated_tokens > self.token_budget.max_tokens:
+            lines[0] += ", over the budget by the listing of the omitted files"
+        if self.degraded_levels:
+            lines.append("Degraded files:")
+            lines.extend(
+                f"- {relative_path}: {self.token_budget.degraded_levels[level_index].name}"
+                for relative_path, level_index in self.degraded_levels.items()
+            )
+        if self.omitted_paths:
+            lines.append("Omitted files:")
+            lines.extend(f"- {relative_path}" for relative_path in self.omitted_paths)
+        return "\n".join(lines) + "\n"
+
+
+def plan_token_budget(
+    walked_files: Sequence[WalkedFile],
+    mimes: Dict[str, str],
+    token_budget: TokenBudget,
+    reserved_tokens: int,
+    binary_paths: Optional[Set[str]] = None,
+) -> TokenBudgetPlan:
+    """Choose the processing level of each file so that the estimated output fits in the token budget.
+
+    Ranks are visited in order, and the files of a rank, in walk order, twice, before the next
+    rank gets any share of the budget. The first pass gives the files that some degraded levels
+    apply to the least detailed of them, so that they are kept if at all possible. The second
+    pass gives every file the most detailed level that still fits: its default processing, then
+    each degraded level in order. Files that fit in none are omitted. Binary files are charged
+    their placeholder, whatever their size.
+
+    Omitted files are still listed in the output header, so once the budget is spent, their
+    listing takes it over: the estimated tokens of the plan then exceed the budget, which its
+    description tells.
+
+    Args:
+        walked_files: Files whose contents are to be output, in walk order
+        mimes: MIME type of each file, by relative path, as guessed from its extension
+        token_budget: Maximum number of tokens of the output and the levels files can be degraded to
+        reserved_tokens: Tokens already taken by the parts of the output that are not file contents
+        binary_paths: Relative paths of the files whose content is binary, output as a placeholder
+
+    Returns:
+        The plan, listing the degraded and omitted files
+    """
+    plan = TokenBudgetPlan(token_budget=token_budget)
+    remaining_tokens = token_budget.max_tokens - reserved_tokens
+    ranked_files = sorted(walked_files, key=lambda walked_file: rank_file(walked_file.relative_path))
+
+    # The estimated tokens of each level a file can be processed at, from the most to the least detailed
+    level_tokens: Dict[str, List[Tuple[Optional[int], int]]] = {}
+    for walked_file in ranked_files:
+        relative_path = walked_file.relative_path
+        mime = mimes[relative_path]
+        section_tokens = FILE_SECTION_OVERHEAD_TOKENS + estimate_tokens(relative_path)
+        if binary_paths is not None and relative_path in binary_paths:
+            level_tokens[relative_path] = [(None, section_tokens + BINARY_FILE_TOKENS)]
+            continue
+        listing_tokens = LISTING_OVERHEAD_TOKENS + estimate_tokens(relative_path)
+        level_tokens[relative_path] = [
+            (None, section_tokens + estimate_tokens_from_size(int(walked_file.size * token_budget.size_ratios.get(mime, 1.0))))
+        ]
+        level_tokens[relative_path].extend(
+            (level_index, section_tokens + listing_tokens + estimate_tokens_from_size(int(walked_file.size * level.size_ratio)))
+            for level_index, level in enumerate(token_budget.degraded_levels)
+            if mime in level.text_processing_funcs
+        )
+
+    # Each rank is placed before the next one gets any share of the budget
+    for _, rank_files in itertools.groupby(ranked_files, key=lambda walked_file: rank_file(walked_file.relative_path)):
+        remaining_tokens = _plan_rank(
+            relative_paths=[walked_file.relative_path for walked_file in rank_files],
+            level_tokens=level_tokens,
+            remaining_tokens=remaining_tokens,
+            plan=plan,
+        )
+
+    # Listed in walk order, like the output
+    walk_order = {walked_file.relative_path: index for index, walked_file in enumerate(walked_files)}
+    plan.degraded_levels = dict(sorted(plan.degraded_levels.items(), key=lambda item: walk_order[item[0]]))
+    plan.omitted_paths.sort(key=walk_order.__getitem__)
+    plan.estimated_tokens = token_budget.max_tokens - remaining_tokens
+    return plan
+
+
+def _plan_rank(
+    relative_paths: List[str], level_tokens: Dict[str, List[Tuple[Optional[int], int]]], remaining_tokens: int, plan: TokenBudgetPlan
+) -> int:
+    """Choose the levels of the files of a rank, in walk order, and return the tokens left.
+
+    The files that can be degraded first get their least detailed level, so that as many of them
+    as possible are kept, then every file gets the most detailed level that still fits.
+    """
+    chosen_levels: Dict[str, int] = {}
+    omitted_paths: Set[str] = set()
+    for relative_path in relative_paths:
+        file_levels = level_tokens[relative_path]
+        if len(file_levels) == 1:
+            continue
+        if file_levels[-1][1] <= remaining_tokens:
+            remaining_tokens -= file_levels[-1][1]
+            chosen_levels[relative_path] = len(file_levels) - 1
+        else:
+            remaining_tokens -= LISTING_OVERHEAD_TOKENS + estimate_tokens(relative_path)
+            omitted_paths.add(relative_path)
+
+    for relative_path in relative_paths:
+        if relative_path in omitted_paths:
+            plan.omitted_paths.append(relative_path)
+            continue
+        file_levels = level_tokens[relative_path]
+        chosen_level = chosen_levels.get(relative_path)
+        current_tokens = 0 if chosen_level is None else file_levels[chosen_level][1]
+        for candidate_index, (_, candidate_tokens) in enumerate(file_levels[:chosen_level]):
+            if candidate_tokens - current_tokens <= remaining_tokens:
+                remaining_tokens -= candidate_tokens - current_tokens
+                chosen_level = candidate_index
+                break
+        if chosen_level is None:
+            remaining_tokens -= LISTING_OVERHEAD_TOKENS + estimate_tokens(relative_path)
+            plan.omitted_paths.append(relative_path)
+        elif (level_index := file_levels[chosen_level][0]) is not None:
+            plan.degraded_levels[relative_path] = level_index
+    return remaining_tokens
@@ -0,0 +1,144 @@
+"""
+Persistent, content-addressed cache of processed repox file outputs.
+"""
+
+import hashlib
+import os
+import tempfile
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from pipelex import log
+
+# Default upper bound of the cache size on disk
+DEFAULT_MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def get_cocode_version() -> str:
+    try:
+        return version("cocode")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class RepoxCache:
+    """Maps (content hash, MIME type, processing functions and the formatter they apply, cocode version) to processed text.
+
+    Entries are stored as one file per key, sharded by the first two characters of the key.
+    Reading an entry refreshes its modification time, which is what the size-bounded LRU
+    eviction relies on.
+    """
+
+    # Name of the cache in logs
+    cache_name = "repox"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        """
+        Initialize the repox cache.
+
+        Args:
+            cache_dir: Directory holding the cache entries. If None, uses ~/.cocode/cache/repox.
+            max_bytes: Size above which the least recently used entries are evicted.
+        """
+        if cache_dir is None:
+            cache_dir = str(Path.home() / ".cocode" / "cache" / "repox")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.cocode_version = get_cocode_version()
+        self.nb_hits = 0
+        self.nb_misses = 0
+        self.nb_writes = 0
+
+    def make_key(self, text: str, mime: str, processing_name: str) -> str:
+        """Build the cache key of a text file's processed output."""
+        hasher = hashlib.sha256()
+        hasher.update(f"{self.cocode_version}\0{mime}\0{processing_name}\0".encode())
+        hasher.update(text.encode("utf-8", errors="surrogatepass"))
+        return hasher.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key[2:]
+
+    def get(self, key: str) -> Optional[str]:
+        entry_path = self._entry_path(key)
+        try:
+            processed_text = self._decode_entry(entry_path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            self.nb_misses += 1
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        self.nb_hits += 1
+        return processed_text
+
+    def put(self, key: str, processed_text: str) -> None:
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(exist_ok=True)
+        # Written to a temporary file then renamed, so that concurrent runs never read a partial entry
+        file_descriptor, temp_path = tempfile.mkstemp(dir=entry_path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(file_descriptor, "wb") as temp_file:
+                temp_file.write(self._encode_entry(processed_text))
+            os.replace(temp_path, entry_path)
+        except OSError as exc:
+            log.warning(f"Could not write {self.cache_name} cache entry '{entry_path}': {exc}")
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+        self.nb_writes += 1
+
+    def _encode_entry(self, text: str) -> bytes:
+        return text.encode("utf-8")
+
+    def _decode_entry(self, entry_bytes: bytes) -> str:
+        """Decode the bytes of an entry, raising ValueError if they are corrupt."""
+        return entry_bytes.decode("utf-8")
+
+    def evict(self) -> int:
+        """Delete the least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+            The number of evicted entries
+        """
+        entries: List[Tuple[float, int, str]] = []
+        total_bytes = 0
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    entry_stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+                total_bytes += entry_stat.st_size
+        if total_bytes <= self.max_bytes:
+            return 0
+
+        nb_evicted = 0
+        for _, size, path in sorted(entries):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            nb_evicted += 1
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
+        log.debug(f"Evicted {nb_evicted} entries from the {self.cache_name} cache '{self.cache_dir}'")
+        return nb_evicted
+
+    def end_run(self) -> None:
+        """Log the cache statistics, evict old entries if this run added any, and reset the counters."""
+        log.debug(f"{self.cache_name.capitalize()} cache: {self.nb_hits} hits, {self.nb_misses} misses, {self.nb_writes} writes")
+        if self.nb_writes:
+            self.evict()
+        self.nb_hits = 0
+        self.nb_misses = 0
+        self.nb_writes = 0
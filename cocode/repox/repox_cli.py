@@ -8,9 +8,13 @@ import typer
 
 from cocode.common import get_output_dir, validate_repo_path
 
-from .models import OutputStyle
+from .models import DedupMode, EnumerationMode, OutputStyle
+from .process_code import CodeProcessingRule
 from .process_python import PythonProcessingRule
-from .repox_cmd import repox_command
+from .repox_batch import repox_batch_command
+from .repox_cmd import repox_command, repox_get_command
+from .repox_profile import NB_SLOWEST_FILES
+from .repox_stats import NB_TOP_ENTRIES, describe_repox_stats, repox_stats_command
 
 repox_app = typer.Typer(
     name="repox",
@@ -42,10 +46,23 @@ def repox_convert(
         PythonProcessingRule,
         typer.Option("--python-rule", "-p", help="Python processing rule to apply", case_sensitive=False),
     ] = PythonProcessingRule.INTERFACE,
+    code_processing_rule: Annotated[
+        CodeProcessingRule,
+        typer.Option(
+            "--code-rule",
+            "-c",
+            help="Processing rule for JavaScript, TypeScript, Go and Rust files: interface (exported signatures, types and doc comments) or integral",
+            case_sensitive=False,
+        ),
+    ] = CodeProcessingRule.INTEGRAL,
     output_style: Annotated[
         OutputStyle,
         typer.Option(
-            "--output-style", "-s", help="One of: repo_map, flat (contents only), or import_list (for --python-rule imports)", case_sensitive=False
+            "--output-style",
+            "-s",
+            help="One of: repo_map, compact (repo map with fewer tokens), flat (contents only), import_list (for --python-rule imports), "
+            "or container (compressed, indexed by path, read with 'cocode repox get')",
+            case_sensitive=False,
         ),
     ] = OutputStyle.REPO_MAP,
     include_patterns: Annotated[
@@ -56,6 +73,91 @@ def repox_convert(
         Optional[str],
         typer.Option("--path-pattern", "-pp", help="Optional pattern to filter paths in the tree structure (regex pattern)"),
     ] = None,
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", help="Number of parallel workers reading and transforming files", min=1),
+    ] = 1,
+    file_timeout: Annotated[
+        float,
+        typer.Option("--file-timeout", help="Maximum seconds spent on one file before it is skipped, when --jobs is greater than 1"),
+    ] = 60.0,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read nor write the persistent cache of processed files (~/.cocode/cache/repox)"),
+    ] = False,
+    enumeration_mode: Annotated[
+        EnumerationMode,
+        typer.Option(
+            "--enumeration",
+            help="How files are listed: git (from the git index, honoring every .gitignore), filesystem, or auto (git when in a git checkout)",
+            case_sensitive=False,
+        ),
+    ] = EnumerationMode.AUTO,
+    max_file_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-file-bytes",
+            help="Maximum number of bytes kept from a text file: larger files are reduced to their first and last lines around a truncation marker",
+            min=1,
+        ),
+    ] = None,
+    max_total_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-total-bytes",
+            help="Maximum number of bytes read from all the files: the contents of the files that don't fit are left out",
+            min=1,
+        ),
+    ] = None,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option(
+            "--token-budget",
+            help="Estimated maximum number of tokens of the output: lower ranked files are degraded (integral, interface, imports) then left out",
+            min=1,
+        ),
+    ] = None,
+    watch: Annotated[
+        bool,
+        typer.Option("--watch", help="Keep running and rewrite the output file whenever files change, processing only the changed files"),
+    ] = False,
+    poll_interval: Annotated[
+        float,
+        typer.Option("--poll-interval", help="Seconds between checks for changes with --watch, when inotify is not available", min=0.05),
+    ] = 1.0,
+    outputs: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--output",
+            "-O",
+            help="Output to write as RULE:STYLE (e.g. interface:repo_map, imports:import_list) or 'tree', instead of --python-rule and "
+            "--output-style - can be repeated to write several outputs in a single pass, each file named after --output-filename",
+        ),
+    ] = None,
+    dedup_mode: Annotated[
+        DedupMode,
+        typer.Option(
+            "--dedup",
+            help="Duplicate files in repo maps: none, exact (identical files refer to their first occurrence) "
+            "or near (similar files are also shown as a diff from a representative)",
+            case_sensitive=False,
+        ),
+    ] = DedupMode.NONE,
+    strip_license_headers: Annotated[
+        bool,
+        typer.Option("--strip-license", help="Remove the license header (copyright notice, SPDX identifier) of each file, compact style only"),
+    ] = False,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            "--profile",
+            help="Report the wall time and count of each phase (walk, ignore, read, classify, transform, format, write) and the slowest files",
+        ),
+    ] = False,
+    nb_profiled_files: Annotated[
+        int,
+        typer.Option("--profile-files", help="Number of slowest files reported with --profile", min=0),
+    ] = NB_SLOWEST_FILES,
 ) -> None:
     """Convert repository structure and contents to a text file."""
     repo_path = validate_repo_path(repo_path)
@@ -68,10 +170,25 @@ def repox_convert(
         include_patterns=include_patterns,
         path_pattern=path_pattern,
         python_processing_rule=python_processing_rule,
+        code_processing_rule=code_processing_rule,
         output_style=output_style,
         output_filename=output_filename,
         output_dir=output_dir,
         to_stdout=to_stdout,
+        jobs=jobs,
+        file_timeout=file_timeout,
+        use_cache=not no_cache,
+        enumeration_mode=enumeration_mode,
+        max_file_bytes=max_file_bytes,
+        max_total_bytes=max_total_bytes,
+        token_budget=token_budget,
+        watch=watch,
+        poll_interval=poll_interval,
+        outputs=outputs,
+        dedup_mode=dedup_mode,
+        strip_license_headers=strip_license_headers,
+        profile=profile,
+        nb_profiled_files=nb_profiled_files,
     )
 
 
@@ -98,10 +215,23 @@ def repox_repo(
         PythonProcessingRule,
         typer.Option("--python-rule", "-p", help="Python processing rule to apply", case_sensitive=False),
     ] = PythonProcessingRule.INTERFACE,
+    code_processing_rule: Annotated[
+        CodeProcessingRule,
+        typer.Option(
+            "--code-rule",
+            "-c",
+            help="Processing rule for JavaScript, TypeScript, Go and Rust files: interface (exported signatures, types and doc comments) or integral",
+            case_sensitive=False,
+        ),
+    ] = CodeProcessingRule.INTEGRAL,
     output_style: Annotated[
         OutputStyle,
         typer.Option(
-            "--output-style", "-s", help="One of: repo_map, flat (contents only), or import_list (for --python-rule imports)", case_sensitive=False
+            "--output-style",
+            "-s",
+            help="One of: repo_map, compact (repo map with fewer tokens), flat (contents only), import_list (for --python-rule imports), "
+            "or container (compressed, indexed by path, read with 'cocode repox get')",
+            case_sensitive=False,
         ),
     ] = OutputStyle.REPO_MAP,
     include_patterns: Annotated[
@@ -112,6 +242,91 @@ def repox_repo(
         Optional[str],
         typer.Option("--path-pattern", "-pp", help="Optional pattern to filter paths in the tree structure (regex pattern)"),
     ] = None,
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", help="Number of parallel workers reading and transforming files", min=1),
+    ] = 1,
+    file_timeout: Annotated[
+        float,
+        typer.Option("--file-timeout", help="Maximum seconds spent on one file before it is skipped, when --jobs is greater than 1"),
+    ] = 60.0,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read nor write the persistent cache of processed files (~/.cocode/cache/repox)"),
+    ] = False,
+    enumeration_mode: Annotated[
+        EnumerationMode,
+        typer.Option(
+            "--enumeration",
+            help="How files are listed: git (from the git index, honoring every .gitignore), filesystem, or auto (git when in a git checkout)",
+            case_sensitive=False,
+        ),
+    ] = EnumerationMode.AUTO,
+    max_file_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-file-bytes",
+            help="Maximum number of bytes kept from a text file: larger files are reduced to their first and last lines around a truncation marker",
+            min=1,
+        ),
+    ] = None,
+    max_total_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-total-bytes",
+            help="Maximum number of bytes read from all the files: the contents of the files that don't fit are left out",
+            min=1,
+        ),
+    ] = None,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option(
+            "--token-budget",
+            help="Estimated maximum number of tokens of the output: lower ranked files are degraded (integral, interface, imports) then left out",
+            min=1,
+        ),
+    ] = None,
+    watch: Annotated[
+        bool,
+        typer.Option("--watch", help="Keep running and rewrite the output file whenever files change, processing only the changed files"),
+    ] = False,
+    poll_interval: Annotated[
+        float,
+        typer.Option("--poll-interval", help="Seconds between checks for changes with --watch, when inotify is not available", min=0.05),
+    ] = 1.0,
+    outputs: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--output",
+            "-O",
+            help="Output to write as RULE:STYLE (e.g. interface:repo_map, imports:import_list) or 'tree', instead of --python-rule and "
+            "--output-style - can be repeated to write several outputs in a single pass, each file named after --output-filename",
+        ),
+    ] = None,
+    dedup_mode: Annotated[
+        DedupMode,
+        typer.Option(
+            "--dedup",
+            help="Duplicate files in repo maps: none, exact (identical files refer to their first occurrence) "
+            "or near (similar files are also shown as a diff from a representative)",
+            case_sensitive=False,
+        ),
+    ] = DedupMode.NONE,
+    strip_license_headers: Annotated[
+        bool,
+        typer.Option("--strip-license", help="Remove the license header (copyright notice, SPDX identifier) of each file, compact style only"),
+    ] = False,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            "--profile",
+            help="Report the wall time and count of each phase (walk, ignore, read, classify, transform, format, write) and the slowest files",
+        ),
+    ] = False,
+    nb_profiled_files: Annotated[
+        int,
+        typer.Option("--profile-files", help="Number of slowest files reported with --profile", min=0),
+    ] = NB_SLOWEST_FILES,
 ) -> None:
     """Convert repository structure and contents to a text file."""
     repox_convert(
@@ -120,7 +335,316 @@ def repox_repo(
         output_filename=output_filename,
         exclude_patterns=exclude_patterns,
         python_processing_rule=python_processing_rule,
+        code_processing_rule=code_processing_rule,
         output_style=output_style,
         include_patterns=include_patterns,
         path_pattern=path_pattern,
+        jobs=jobs,
+        file_timeout=file_timeout,
+        no_cache=no_cache,
+        enumeration_mode=enumeration_mode,
+        max_file_bytes=max_file_bytes,
+        max_total_bytes=max_total_bytes,
+        token_budget=token_budget,
+        watch=watch,
+        poll_interval=poll_interval,
+        outputs=outputs,
+        dedup_mode=dedup_mode,
+        strip_license_headers=strip_license_headers,
+        profile=profile,
+        nb_profiled_files=nb_profiled_files,
+    )
+
+
+@repox_app.command("get")
+def repox_get(
+    container_path: Annotated[
+        str,
+        typer.Argument(help="Repox container written with --output-style container", exists=True, file_okay=True, dir_okay=False),
+    ],
+    relative_path: Annotated[
+        Optional[str],
+        typer.Argument(help="Relative path of the file to print, the tree structure is printed if it is omitted"),
+    ] = None,
+    list_paths: Annotated[
+        bool,
+        typer.Option("--list", "-l", help="Print the relative paths of the files in the container"),
+    ] = False,
+) -> None:
+    """Print the processed content of one file from a repox container, reading only that file's record."""
+    repox_get_command(container_path=container_path, relative_path=relative_path, list_paths=list_paths)
+
+
+@repox_app.command("batch")
+def repox_batch(
+    root_or_manifest: Annotated[
+        str,
+        typer.Argument(
+            help="Directory whose sub-directories are the repositories, or manifest file listing a repository path per line",
+            exists=True,
+            resolve_path=True,
+        ),
+    ],
+    output_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            "--output-dir", "-o", help="Output directory path, holding an output file per repository. Defaults to config value if not provided"
+        ),
+    ] = None,
+    output_filename: Annotated[
+        str,
+        typer.Option("--output-filename", "-n", help="Output filename, each repository's output is named after it and the repository"),
+    ] = "repo-to-text.txt",
+    exclude_patterns: Annotated[
+        Optional[List[str]],
+        typer.Option("--exclude-pattern", "-i", help="List of patterns to ignore (in gitignore format)"),
+    ] = None,
+    python_processing_rule: Annotated[
+        PythonProcessingRule,
+        typer.Option("--python-rule", "-p", help="Python processing rule to apply", case_sensitive=False),
+    ] = PythonProcessingRule.INTERFACE,
+    code_processing_rule: Annotated[
+        CodeProcessingRule,
+        typer.Option(
+            "--code-rule",
+            "-c",
+            help="Processing rule for JavaScript, TypeScript, Go and Rust files: interface (exported signatures, types and doc comments) or integral",
+            case_sensitive=False,
+        ),
+    ] = CodeProcessingRule.INTEGRAL,
+    output_style: Annotated[
+        OutputStyle,
+        typer.Option(
+            "--output-style",
+            "-s",
+            help="One of: repo_map, compact (repo map with fewer tokens), flat (contents only), import_list (for --python-rule imports), tree, "
+            "or container (compressed, indexed by path, read with 'cocode repox get')",
+            case_sensitive=False,
+        ),
+    ] = OutputStyle.REPO_MAP,
+    include_patterns: Annotated[
+        Optional[List[str]],
+        typer.Option("--include-pattern", "-r", help="Optional pattern to filter files in the tree structure (glob pattern) - can be repeated"),
+    ] = None,
+    path_pattern: Annotated[
+        Optional[str],
+        typer.Option("--path-pattern", "-pp", help="Optional pattern to filter paths in the tree structure (regex pattern)"),
+    ] = None,
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", help="Number of parallel workers reading and transforming files, shared by all the repositories", min=1),
+    ] = 1,
+    file_timeout: Annotated[
+        float,
+        typer.Option("--file-timeout", help="Maximum seconds spent on one file before it is skipped, when --jobs is greater than 1"),
+    ] = 60.0,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read nor write the persistent cache of processed files (~/.cocode/cache/repox)"),
+    ] = False,
+    enumeration_mode: Annotated[
+        EnumerationMode,
+        typer.Option(
+            "--enumeration",
+            help="How files are listed: git (from the git index, honoring every .gitignore), filesystem, or auto (git when in a git checkout)",
+            case_sensitive=False,
+        ),
+    ] = EnumerationMode.AUTO,
+    max_file_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-file-bytes",
+            help="Maximum number of bytes kept from a text file: larger files are reduced to their first and last lines around a truncation marker",
+            min=1,
+        ),
+    ] = None,
+    max_total_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-total-bytes",
+            help="Maximum number of bytes read from all the files of a repository: the contents of the files that don't fit are left out",
+            min=1,
+        ),
+    ] = None,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option(
+            "--token-budget",
+            help="Estimated maximum number of tokens of each output: lower ranked files are degraded (integral, interface, imports) then left out",
+            min=1,
+        ),
+    ] = None,
+    dedup_mode: Annotated[
+        DedupMode,
+        typer.Option(
+            "--dedup",
+            help="Duplicate files in repo maps: none, exact (identical files refer to their first occurrence) "
+            "or near (similar files are also shown as a diff from a representative)",
+            case_sensitive=False,
+        ),
+    ] = DedupMode.NONE,
+    strip_license_headers: Annotated[
+        bool,
+        typer.Option("--strip-license", help="Remove the license header (copyright notice, SPDX identifier) of each file, compact style only"),
+    ] = False,
+) -> None:
+    """Convert many repositories in a single process, each to its own output file, reporting the ones that fail without stopping."""
+    results = repox_batch_command(
+        root_or_manifest=root_or_manifest,
+        output_dir=get_output_dir(output_dir),
+        output_filename=output_filename,
+        exclude_patterns=exclude_patterns,
+        include_patterns=include_patterns,
+        path_pattern=path_pattern,
+        python_processing_rule=python_processing_rule,
+        code_processing_rule=code_processing_rule,
+        output_style=output_style,
+        jobs=jobs,
+        file_timeout=file_timeout,
+        use_cache=not no_cache,
+        enumeration_mode=enumeration_mode,
+        max_file_bytes=max_file_bytes,
+        max_total_bytes=max_total_bytes,
+        token_budget=token_budget,
+        dedup_mode=dedup_mode,
+        strip_license_headers=strip_license_headers,
+    )
+    if not all(result.is_success for result in results):
+        raise typer.Exit(code=1)
+
+
+@repox_app.command("stats")
+def repox_stats(
+    repo_path: Annotated[
+        str,
+        typer.Argument(help="Input directory path", exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    ] = ".",
+    is_processed: Annotated[
+        bool,
+        typer.Option("--full", help="Also process the files and format the output, to attribute its tokens to each file, directory and MIME type"),
+    ] = False,
+    nb_top_entries: Annotated[
+        int,
+        typer.Option("--top", help="Number of files, directories and MIME types listed with --full", min=1),
+    ] = NB_TOP_ENTRIES,
+    to_json: Annotated[
+        bool,
+        typer.Option("--json", help="Print the statistics as JSON, with the tokens of every file, directory and MIME type"),
+    ] = False,
+    exclude_patterns: Annotated[
+        Optional[List[str]],
+        typer.Option("--exclude-pattern", "-i", help="List of patterns to ignore (in gitignore format)"),
+    ] = None,
+    python_processing_rule: Annotated[
+        PythonProcessingRule,
+        typer.Option("--python-rule", "-p", help="Python processing rule to apply", case_sensitive=False),
+    ] = PythonProcessingRule.INTERFACE,
+    code_processing_rule: Annotated[
+        CodeProcessingRule,
+        typer.Option(
+            "--code-rule",
+            "-c",
+            help="Processing rule for JavaScript, TypeScript, Go and Rust files: interface (exported signatures, types and doc comments) or integral",
+            case_sensitive=False,
+        ),
+    ] = CodeProcessingRule.INTEGRAL,
+    output_style: Annotated[
+        OutputStyle,
+        typer.Option(
+            "--output-style",
+            "-s",
+            help="One of: repo_map, compact (repo map with fewer tokens), flat (contents only), import_list (for --python-rule imports), or tree",
+            case_sensitive=False,
+        ),
+    ] = OutputStyle.REPO_MAP,
+    include_patterns: Annotated[
+        Optional[List[str]],
+        typer.Option("--include-pattern", "-r", help="Optional pattern to filter files in the tree structure (glob pattern) - can be repeated"),
+    ] = None,
+    path_pattern: Annotated[
+        Optional[str],
+        typer.Option("--path-pattern", "-pp", help="Optional pattern to filter paths in the tree structure (regex pattern)"),
+    ] = None,
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", help="Number of parallel workers reading and transforming files with --full", min=1),
+    ] = 1,
+    file_timeout: Annotated[
+        float,
+        typer.Option("--file-timeout", help="Maximum seconds spent on one file before it is skipped, when --jobs is greater than 1"),
+    ] = 60.0,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read nor write the persistent cache of processed files (~/.cocode/cache/repox)"),
+    ] = False,
+    enumeration_mode: Annotated[
+        EnumerationMode,
+        typer.Option(
+            "--enumeration",
+            help="How files are listed: git (from the git index, honoring every .gitignore), filesystem, or auto (git when in a git checkout)",
+            case_sensitive=False,
+        ),
+    ] = EnumerationMode.AUTO,
+    max_file_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-file-bytes",
+            help="Maximum number of bytes kept from a text file: larger files are reduced to their first and last lines around a truncation marker",
+            min=1,
+        ),
+    ] = None,
+    max_total_bytes: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-total-bytes",
+            help="Maximum number of bytes read from all the files: the contents of the files that don't fit are left out",
+            min=1,
+        ),
+    ] = None,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option(
+            "--token-budget",
+            help="Estimated maximum number of tokens of the output: lower ranked files are degraded (integral, interface, imports) then left out",
+            min=1,
+        ),
+    ] = None,
+    dedup_mode: Annotated[
+        DedupMode,
+        typer.Option(
+            "--dedup",
+            help="Duplicate files in repo maps: none, exact (identical files refer to their first occurrence) "
+            "or near (similar files are also shown as a diff from a representative)",
+            case_sensitive=False,
+        ),
+    ] = DedupMode.NONE,
+    strip_license_headers: Annotated[
+        bool,
+        typer.Option("--strip-license", help="Remove the license header (copyright notice, SPDX identifier) of each file, compact style only"),
+    ] = False,
+) -> None:
+    """Estimate the files, bytes and tokens of a repox output before making it, and with --full, which files the tokens come from."""
+    repo_path = validate_repo_path(repo_path)
+    stats = repox_stats_command(
+        repo_path=repo_path,
+        exclude_patterns=exclude_patterns,
+        include_patterns=include_patterns,
+        path_pattern=path_pattern,
+        python_processing_rule=python_processing_rule,
+        code_processing_rule=code_processing_rule,
+        output_style=output_style,
+        is_processed=is_processed,
+        jobs=jobs,
+        file_timeout=file_timeout,
+        use_cache=not no_cache,
+        enumeration_mode=enumeration_mode,
+        max_file_bytes=max_file_bytes,
+        max_total_bytes=max_total_bytes,
+        token_budget=token_budget,
+        dedup_mode=dedup_mode,
+        strip_license_headers=strip_license_headers,
     )
+    if to_json:
+        print(stats.model_dump_json(indent=2))
+    else:
+        print(describe_repox_stats(stats=stats, nb_top_entries=nb_top_entries))
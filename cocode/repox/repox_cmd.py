@@ -1,12 +1,27 @@
+import os
+import sys
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Callable, Dict, List, Optional
+from typing import BinaryIO, Generator, List, Optional, Tuple
 
 from pipelex import log
+from pipelex.tools.log.log_levels import LOGGING_LEVEL_VERBOSE
 from pipelex.tools.misc.file_utils import ensure_path, save_text_to_path
 
-from cocode.repox.models import OutputStyle
-from cocode.repox.process_python import PythonProcessingRule, python_imports_list, python_integral, python_interface
-from cocode.repox.repox_processor import RepoxException, RepoxProcessor
+from cocode.repox.models import DedupMode, EnumerationMode, OutputStyle
+from cocode.repox.process_code import CodeProcessingRule, make_code_text_processing_funcs
+from cocode.repox.process_python import (
+    PythonProcessingRule,
+    make_python_batch_processing_funcs,
+    make_python_text_processing_funcs,
+    make_python_token_budget,
+)
+from cocode.repox.repox_cache import RepoxCache
+from cocode.repox.repox_container import RepoxContainerReader
+from cocode.repox.repox_processor import STREAMING_WINDOW_SIZE, RepoxException, RepoxOutputWriter, RepoxProcessor, RepoxWorkerPools
+from cocode.repox.repox_profile import NB_SLOWEST_FILES, RepoxProfiler
+from cocode.repox.repox_watch import RepoxWatchSession, make_file_change_watcher
+from cocode.utils import is_log_enabled
 
 
 def repox_command(
@@ -19,54 +34,358 @@ def repox_command(
     output_filename: str,
     output_dir: str,
     to_stdout: bool,
+    jobs: int = 1,
+    file_timeout: Optional[float] = None,
+    use_cache: bool = True,
+    enumeration_mode: EnumerationMode = EnumerationMode.AUTO,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    watch: bool = False,
+    poll_interval: float = 1.0,
+    outputs: Optional[List[str]] = None,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
+    dedup_mode: DedupMode = DedupMode.NONE,
+    strip_license_headers: bool = False,
+    profile: bool = False,
+    nb_profiled_files: int = NB_SLOWEST_FILES,
 ) -> None:
-    text_processing_funcs: Dict[str, Callable[[str], str]] = {}
-    match python_processing_rule:
-        case PythonProcessingRule.INTEGRAL:
-            text_processing_funcs["text/x-python"] = python_integral
-        case PythonProcessingRule.INTERFACE:
-            text_processing_funcs["text/x-python"] = python_interface
-        case PythonProcessingRule.IMPORTS:
-            text_processing_funcs["text/x-python"] = python_imports_list
-
     log.info(f"generate_repox processing: '{repo_path}' with output style: '{output_style}'")
-    processor = RepoxProcessor(
+    if outputs and (to_stdout or watch):
+        raise RepoxException("Several outputs are written to files in a single pass: they can't go to stdout nor be watched")
+    if watch:
+        if to_stdout:
+            raise RepoxException("Watch mode rewrites an output file, it can't output to stdout")
+        if output_style == OutputStyle.CONTAINER:
+            raise RepoxException("Watch mode rewrites a text output file, it can't write a container")
+        exclude_patterns = [
+            *(exclude_patterns or []),
+            *get_output_exclude_patterns(repo_path=repo_path, output_dir=output_dir, output_filename=output_filename),
+        ]
+    profiler = RepoxProfiler(nb_slowest_files=nb_profiled_files) if profile else None
+    processor = make_repox_processor(
         repo_path=repo_path,
         exclude_patterns=exclude_patterns,
         include_patterns=include_patterns,
         path_pattern=path_pattern,
-        text_processing_funcs=text_processing_funcs,
+        python_processing_rule=python_processing_rule,
         output_style=output_style,
+        jobs=jobs,
+        file_timeout=file_timeout,
+        cache=RepoxCache() if use_cache else None,
+        enumeration_mode=enumeration_mode,
+        max_file_bytes=max_file_bytes,
+        max_total_bytes=max_total_bytes,
+        token_budget=token_budget,
+        code_processing_rule=code_processing_rule,
+        dedup_mode=dedup_mode,
+        strip_license_headers=strip_license_headers,
+        profiler=profiler,
     )
 
-    # Handle TREE output style separately - only output tree structure
-    if output_style == OutputStyle.TREE:
-        tree_structure = processor.get_tree_structure()
-        repo_text = tree_structure
-    else:
-        repo_text = process_repox(repox_processor=processor)
+    with log_profile_report(profiler=profiler):
+        if outputs:
+            ensure_path(Path(output_dir))
+            output_file_paths = write_repox_outputs(
+                repox_processor=processor,
+                outputs=[parse_repox_output(output) for output in outputs],
+                output_dir=Path(output_dir),
+                output_filename=output_filename,
+                token_budget=token_budget,
+                code_processing_rule=code_processing_rule,
+            )
+            for output_file_path in output_file_paths:
+                log.info(f"Done, output saved as text to file: '{output_file_path}'")
+            return
 
-    if to_stdout:
-        print(repo_text)
-    else:
-        ensure_path(Path(output_dir))
-        output_file_path = Path(output_dir) / output_filename
-        save_text_to_path(text=repo_text, path=output_file_path)
-        log.info(f"Done, output saved as text to file: '{output_file_path}'")
+        if watch:
+            ensure_path(Path(output_dir))
+            output_file_path = Path(output_dir) / output_filename
+            session = RepoxWatchSession(
+                processor=processor,
+                output_file_path=output_file_path,
+                nb_padding_lines=0 if output_style == OutputStyle.TREE else 2,
+            )
+            session.start()
+            log.info(f"Output saved as text to file: '{output_file_path}'")
+            session.run(watcher=make_file_change_watcher(processor=processor, poll_interval=poll_interval))
+            return
 
+        if not to_stdout:
+            ensure_path(Path(output_dir))
+            output_file_path = Path(output_dir) / output_filename
+            write_repox_output_file(repox_processor=processor, output_file_path=output_file_path)
+            log.info(f"Done, output saved to file: '{output_file_path}'")
+            return
 
-def process_repox(
+        # Handle TREE output style separately - only output tree structure
+        if output_style == OutputStyle.TREE:
+            print(processor.get_tree_structure())
+            return
+
+        sys.stdout.flush()
+        stream_repox(
+            repox_processor=processor,
+            output=sys.stdout.buffer,
+            nb_padding_lines=get_nb_padding_lines(output_style=output_style, nb_padding_lines=2),
+        )
+        if output_style != OutputStyle.CONTAINER:
+            # Same trailing newline as print()
+            sys.stdout.buffer.write(b"\n")
+        sys.stdout.buffer.flush()
+
+
+def make_repox_processor(
+    repo_path: str,
+    exclude_patterns: Optional[List[str]],
+    include_patterns: Optional[List[str]],
+    path_pattern: Optional[str],
+    python_processing_rule: PythonProcessingRule,
+    output_style: OutputStyle,
+    jobs: int = 1,
+    file_timeout: Optional[float] = None,
+    cache: Optional[RepoxCache] = None,
+    enumeration_mode: EnumerationMode = EnumerationMode.AUTO,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
+    dedup_mode: DedupMode = DedupMode.NONE,
+    strip_license_headers: bool = False,
+    profiler: Optional[RepoxProfiler] = None,
+    worker_pools: Optional[RepoxWorkerPools] = None,
+) -> RepoxProcessor:
+    """Make the processor of a repository from the options of the repox commands."""
+    return RepoxProcessor(
+        repo_path=repo_path,
+        exclude_patterns=exclude_patterns,
+        include_patterns=include_patterns,
+        path_pattern=path_pattern,
+        text_processing_funcs={
+            **make_python_text_processing_funcs(python_processing_rule=python_processing_rule),
+            **make_code_text_processing_funcs(code_processing_rule=code_processing_rule),
+        },
+        text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=python_processing_rule),
+        output_style=output_style,
+        jobs=jobs,
+        file_timeout=file_timeout,
+        cache=cache,
+        enumeration_mode=enumeration_mode,
+        max_file_bytes=max_file_bytes,
+        max_total_bytes=max_total_bytes,
+        token_budget=make_python_token_budget(
+            python_processing_rule=python_processing_rule,
+            max_tokens=token_budget,
+            code_processing_rule=code_processing_rule,
+        )
+        if token_budget
+        else None,
+        dedup_mode=dedup_mode,
+        strip_license_headers=strip_license_headers,
+        profiler=profiler,
+        worker_pools=worker_pools,
+    )
+
+
+def write_repox_output_file(repox_processor: RepoxProcessor, output_file_path: Path) -> None:
+    """Write the output of a repository to a file: the tree structure alone as is, the other styles padded and as files are processed."""
+    if repox_processor.output_style == OutputStyle.TREE:
+        save_text_to_path(text=repox_processor.get_tree_structure(), path=output_file_path)
+        return
+    tree_structure = get_repox_tree_structure(repox_processor=repox_processor)
+    with open(output_file_path, "wb") as output_file:
+        stream_repox(
+            repox_processor=repox_processor,
+            output=output_file,
+            # The container is binary, with offsets counted from its first byte
+            nb_padding_lines=get_nb_padding_lines(output_style=repox_processor.output_style, nb_padding_lines=2),
+            tree_structure=tree_structure,
+        )
+
+
+@contextmanager
+def log_profile_report(profiler: Optional[RepoxProfiler]) -> Generator[None, None, None]:
+    """Log the report of the profiler, if there is one, once the run ends, even if it fails or is interrupted."""
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            log.info(profiler.describe())
+
+
+def repox_get_command(container_path: str, relative_path: Optional[str], list_paths: bool = False) -> None:
+    """Print the processed content of a file from a repox container, its tree structure, or the paths of its files."""
+    with RepoxContainerReader(container_path=container_path) as container_reader:
+        if list_paths:
+            output_text = "\n".join(container_reader.list_paths())
+        elif relative_path is None:
+            output_text = container_reader.get_tree_structure()
+        else:
+            output_text = container_reader.read_file(relative_path=relative_path)
+    sys.stdout.write(output_text)
+    sys.stdout.write("\n")
+
+
+def parse_repox_output(output: str) -> Tuple[PythonProcessingRule, OutputStyle]:
+    """Parse an output given as 'RULE:STYLE', or 'tree' for the tree structure alone."""
+    if output.lower() == OutputStyle.TREE:
+        return PythonProcessingRule.INTEGRAL, OutputStyle.TREE
+    rule_name, _, style_name = output.lower().partition(":")
+    try:
+        return PythonProcessingRule(rule_name), OutputStyle(style_name or OutputStyle.REPO_MAP)
+    except ValueError as exc:
+        raise RepoxException(
+            f"Invalid output '{output}': expected 'RULE:STYLE' with a rule among {', '.join(PythonProcessingRule)} "
+            f"and a style among {', '.join(OutputStyle)}, or 'tree'"
+        ) from exc
+
+
+def make_output_filename(output_filename: str, python_processing_rule: PythonProcessingRule, output_style: OutputStyle) -> str:
+    """Name the file of one of several outputs after the output filename, e.g. 'repo-to-text-interface-repo_map.txt'."""
+    stem, suffix = os.path.splitext(output_filename)
+    if output_style == OutputStyle.TREE:
+        return f"{stem}-{output_style}{suffix}"
+    return f"{stem}-{python_processing_rule}-{output_style}{suffix}"
+
+
+def write_repox_outputs(
     repox_processor: RepoxProcessor,
+    outputs: List[Tuple[PythonProcessingRule, OutputStyle]],
+    output_dir: Path,
+    output_filename: str,
+    token_budget: Optional[int] = None,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
     nb_padding_lines: int = 2,
-) -> str:
-    """Save repository structure and contents to a text file."""
+) -> List[Path]:
+    """Write several outputs of a repository in a single pass over its files.
+
+    Each file is read once and all its processing rules run in a row on the same text,
+    sharing the parsing of Python files. Each output file gets the same bytes as a separate
+    run with its rule and style.
+
+    Args:
+        repox_processor: Processor whose walk and options are shared by all the outputs
+        outputs: Python processing rule and output style of each output
+        output_dir: Directory of the output files
+        output_filename: Name the output files are named after, with `make_output_filename`
+        token_budget: Optional token budget of each output
+        code_processing_rule: Processing rule of the JavaScript, TypeScript, Go and Rust files, shared by all the outputs
+        nb_padding_lines: Number of empty lines around each output, except tree ones
+
+    Returns:
+        The paths of the output files, in the order of the outputs
+    """
+    output_file_paths: List[Path] = []
+    for python_processing_rule, output_style in outputs:
+        output_file_path = output_dir / make_output_filename(
+            output_filename=output_filename,
+            python_processing_rule=python_processing_rule,
+            output_style=output_style,
+        )
+        if output_file_path in output_file_paths:
+            raise RepoxException(f"Output '{python_processing_rule}:{output_style}' is requested more than once")
+        output_file_paths.append(output_file_path)
+    # Raises if the repository is empty, the compact style renders its own tree
+    get_repox_tree_structure(repox_processor=repox_processor)
+    variants = [
+        repox_processor.make_variant(
+            text_processing_funcs={
+                **make_python_text_processing_funcs(python_processing_rule=python_processing_rule),
+                **make_code_text_processing_funcs(code_processing_rule=code_processing_rule),
+            },
+            text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=python_processing_rule),
+            output_style=output_style,
+            token_budget=make_python_token_budget(
+                python_processing_rule=python_processing_rule,
+                max_tokens=token_budget,
+                code_processing_rule=code_processing_rule,
+            )
+            if token_budget
+            else None,
+        )
+        for python_processing_rule, output_style in outputs
+    ]
+
+    with ExitStack() as exit_stack:
+        output_writers: List[RepoxOutputWriter] = []
+        for variant, output_file_path in zip(variants, output_file_paths):
+            output_file = exit_stack.enter_context(open(output_file_path, "wb"))
+            output_file.write(b"\n" * get_nb_padding_lines(output_style=variant.output_style, nb_padding_lines=nb_padding_lines))
+            output_writer = RepoxOutputWriter(processor=variant, output=output_file)
+            output_writer.start(tree_structure=variant.get_tree_structure())
+            output_writers.append(output_writer)
+
+        content_writers = [output_writer for output_writer in output_writers if output_writer.processor.output_style != OutputStyle.TREE]
+        if content_writers:
+            for walked_file, file_contents in repox_processor.iter_variant_file_contents(
+                variants=[output_writer.processor for output_writer in content_writers],
+                window_size=STREAMING_WINDOW_SIZE,
+            ):
+                for output_writer, file_content in zip(content_writers, file_contents):
+                    if file_content is not None:
+                        output_writer.write_file(walked_file=walked_file, file_content=file_content)
+
+        for output_writer in output_writers:
+            output_writer.end()
+            output_writer.output.write(
+                b"\n" * get_nb_padding_lines(output_style=output_writer.processor.output_style, nb_padding_lines=nb_padding_lines)
+            )
+    return output_file_paths
+
+
+def get_nb_padding_lines(output_style: OutputStyle, nb_padding_lines: int) -> int:
+    """Outputs are padded with blank lines, except the tree structure alone and the binary container."""
+    if output_style in (OutputStyle.TREE, OutputStyle.CONTAINER):
+        return 0
+    return nb_padding_lines
+
+
+def get_output_exclude_patterns(repo_path: str, output_dir: str, output_filename: str) -> List[str]:
+    """Patterns excluding the output file, and its temporary files, if it is written inside the repository."""
+    relative_output_path = os.path.relpath(os.path.abspath(os.path.join(output_dir, output_filename)), os.path.abspath(repo_path))
+    if relative_output_path.startswith(".."):
+        return []
+    relative_output_dir, _, name = relative_output_path.replace(os.sep, "/").rpartition("/")
+    prefix = f"/{relative_output_dir}/" if relative_output_dir else "/"
+    return [f"{prefix}{name}", f"{prefix}.{name}.*"]
 
+
+def get_repox_tree_structure(repox_processor: RepoxProcessor) -> str:
+    """Get the tree structure of the repository, raising if it is empty."""
     tree_structure: str = repox_processor.get_tree_structure()
     if not tree_structure.strip():
         log.error(f"No tree structure found for path: {repox_processor.repo_path}")
         raise RepoxException(f"No tree structure found for path: {repox_processor.repo_path}")
-    log.verbose(f"Final tree structure to be written: {tree_structure}")
+    if is_log_enabled(LOGGING_LEVEL_VERBOSE):
+        log.verbose(f"Final tree structure to be written: {tree_structure}")
+    return tree_structure
+
+
+def stream_repox(
+    repox_processor: RepoxProcessor,
+    output: BinaryIO,
+    nb_padding_lines: int = 2,
+    tree_structure: Optional[str] = None,
+) -> None:
+    """Write repository structure and contents to a binary stream as files are processed.
+
+    Writes the same bytes as encoding the result of `process_repox`, holding a bounded number
+    of processed files in memory whatever the size of the repository.
+    """
+    if tree_structure is None:
+        tree_structure = get_repox_tree_structure(repox_processor=repox_processor)
+    output.write(b"\n" * nb_padding_lines)
+    repox_processor.write_output_content(tree_structure=tree_structure, output=output)
+    output.write(b"\n" * nb_padding_lines)
+
+
+def process_repox(
+    repox_processor: RepoxProcessor,
+    nb_padding_lines: int = 2,
+) -> str:
+    """Save repository structure and contents to a text file."""
 
+    tree_structure = get_repox_tree_structure(repox_processor=repox_processor)
     file_contents = repox_processor.process_file_contents()
 
     output_content = repox_processor.build_output_content(
@@ -0,0 +1,190 @@
+"""
+Compressed repox container, giving random access to the processed content of each file.
+
+A container holds the tree structure once and one compressed record per file, followed by
+an index of the records by relative path and a fixed size footer locating that index:
+
+    magic | codec | tree record | file records... | index record | index offset | index size | magic
+
+Records are compressed one by one with zstd when the `zstandard` package is installed, and
+with zlib otherwise, so that reading a file only decompresses its own record. The reader maps
+the container in memory and loads the index on first use.
+"""
+
+import importlib
+import json
+import mmap
+import struct
+import zlib
+from enum import StrEnum
+from pathlib import Path
+from types import ModuleType, TracebackType
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Type
+
+from cocode.exceptions import RepoxException
+
+# Marks the start and the end of a container
+CONTAINER_MAGIC = b"REPOXC\x00\x01"
+# Index offset and index size, followed by the magic
+_FOOTER_STRUCT = struct.Struct(f"<QQ{len(CONTAINER_MAGIC)}s")
+# Compression level of zstd, favoring speed as containers are written on every run
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+class ContainerCodec(StrEnum):
+    ZLIB = "zlib"
+    ZSTD = "zstd"
+
+
+# Codec of a container, stored as one byte after the leading magic
+_CODEC_IDS: Dict[ContainerCodec, int] = {ContainerCodec.ZLIB: 1, ContainerCodec.ZSTD: 2}
+
+
+def _import_zstandard() -> Optional[ModuleType]:
+    """Import the optional zstandard package, if it is installed."""
+    try:
+        return importlib.import_module("zstandard")
+    except ImportError:
+        return None
+
+
+def get_default_codec() -> ContainerCodec:
+    return ContainerCodec.ZLIB if _import_zstandard() is None else ContainerCodec.ZSTD
+
+
+def _get_zstandard() -> ModuleType:
+    if (zstandard := _import_zstandard()) is None:
+        raise RepoxException("zstd compression needs the 'zstandard' package: install it with `pip install cocode[zstd]`")
+    return zstandard
+
+
+class RepoxContainerWriter:
+    """Write a container to a binary stream, one file at a time, counting the bytes written rather than seeking."""
+
+    def __init__(self, output: BinaryIO, codec: Optional[ContainerCodec] = None) -> None:
+        self.output = output
+        self.codec = codec or get_default_codec()
+        self._zstd_compressor: Optional[Any] = None
+        if self.codec == ContainerCodec.ZSTD:
+            self._zstd_compressor = _get_zstandard().ZstdCompressor(level=ZSTD_LEVEL)
+        self._position = 0
+        self._tree_record: Optional[Tuple[int, int]] = None
+        self._file_records: Dict[str, Tuple[int, int]] = {}
+        self._write(CONTAINER_MAGIC + bytes([_CODEC_IDS[self.codec]]))
+
+    def _write(self, data: bytes) -> None:
+        self.output.write(data)
+        self._position += len(data)
+
+    def _write_record(self, data: bytes) -> Tuple[int, int]:
+        """Compress and write a record, returning its offset and compressed size."""
+        compressed_data: bytes
+        if self._zstd_compressor is not None:
+            compressed_data = self._zstd_compressor.compress(data)
+        else:
+            compressed_data = zlib.compress(data, ZLIB_LEVEL)
+        offset = self._position
+        self._write(compressed_data)
+        return offset, len(compressed_data)
+
+    def write_tree(self, tree_structure: str) -> None:
+        self._tree_record = self._write_record(tree_structure.encode())
+
+    def write_file(self, relative_path: str, file_content: str) -> None:
+        if relative_path in self._file_records:
+            raise RepoxException(f"'{relative_path}' is already in the repox container")
+        self._file_records[relative_path] = self._write_record(file_content.encode())
+
+    def close(self) -> None:
+        """Write the index and the footer, the container can't be written to afterwards."""
+        index = {"tree": self._tree_record, "files": self._file_records}
+        index_offset, index_size = self._write_record(json.dumps(index, separators=(",", ":")).encode())
+        self._write(_FOOTER_STRUCT.pack(index_offset, index_size, CONTAINER_MAGIC))
+
+
+class RepoxContainerReader:
+    """Read the files of a container by relative path, decompressing only the records that are read.
+
+    Use as a context manager, or call `close`, to release the memory map.
+    """
+
+    def __init__(self, container_path: str | Path) -> None:
+        self.container_path = Path(container_path)
+        with open(self.container_path, "rb") as container_file:
+            try:
+                self._mmap = mmap.mmap(container_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:
+                raise RepoxException(f"'{self.container_path}' is not a repox container: it is empty") from exc
+        header_size = len(CONTAINER_MAGIC) + 1
+        if len(self._mmap) < header_size + _FOOTER_STRUCT.size or self._mmap[: len(CONTAINER_MAGIC)] != CONTAINER_MAGIC:
+            self.close()
+            raise RepoxException(f"'{self.container_path}' is not a repox container")
+        codecs_by_id = {codec_id: codec for codec, codec_id in _CODEC_IDS.items()}
+        codec_id = self._mmap[len(CONTAINER_MAGIC)]
+        if codec_id not in codecs_by_id:
+            self.close()
+            raise RepoxException(f"'{self.container_path}' is compressed with an unknown codec")
+        self.codec = codecs_by_id[codec_id]
+        index_offset, index_size, end_magic = _FOOTER_STRUCT.unpack_from(self._mmap, len(self._mmap) - _FOOTER_STRUCT.size)
+        if end_magic != CONTAINER_MAGIC:
+            self.close()
+            raise RepoxException(f"'{self.container_path}' is a truncated repox container")
+        self._zstd_decompressor: Optional[Any] = _get_zstandard().ZstdDecompressor() if self.codec == ContainerCodec.ZSTD else None
+        self._index_record = (index_offset, index_size)
+        self._tree_record: Optional[Tuple[int, int]] = None
+        self._file_records: Optional[Dict[str, Tuple[int, int]]] = None
+
+    def __enter__(self) -> "RepoxContainerReader":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def _read_record(self, record: Tuple[int, int]) -> bytes:
+        offset, size = record
+        compressed_data = self._mmap[offset : offset + size]
+        if self._zstd_decompressor is not None:
+            return bytes(self._zstd_decompressor.decompress(compressed_data))
+        return zlib.decompress(compressed_data)
+
+    def _get_file_records(self) -> Dict[str, Tuple[int, int]]:
+        """Load the index on first use."""
+        if self._file_records is None:
+            index = json.loads(self._read_record(self._index_record))
+            tree_record = index["tree"]
+            self._tree_record = (tree_record[0], tree_record[1]) if tree_record else None
+            self._file_records = {relative_path: (offset, size) for relative_path, (offset, size) in index["files"].items()}
+        return self._file_records
+
+    def list_paths(self) -> List[str]:
+        """The relative paths of the files in the container, in the order they were written."""
+        return list(self._get_file_records())
+
+    def __contains__(self, relative_path: str) -> bool:
+        return relative_path in self._get_file_records()
+
+    def get_tree_structure(self) -> str:
+        self._get_file_records()
+        if self._tree_record is None:
+            return ""
+        return self._read_record(self._tree_record).decode()
+
+    def read_file(self, relative_path: str) -> str:
+        """Get the processed content of a file.
+
+        Raises:
+            RepoxException: If the file is not in the container
+        """
+        file_record = self._get_file_records().get(relative_path.strip("/"))
+        if file_record is None:
+            raise RepoxException(f"'{relative_path}' is not in the repox container '{self.container_path}'")
+        return self._read_record(file_record).decode()
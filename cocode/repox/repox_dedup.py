@@ -0,0 +1,134 @@
+"""
+Collapse duplicate files in repo maps.
+
+Files are visited in output order and the first of each group of duplicates is output in full.
+Exact duplicates are found by hashing their processed contents and are replaced by a reference
+to the first occurrence. Near duplicates are found with MinHash sketches of their line shingles,
+and are replaced by a reference and a compact diff when the diff is much smaller than the file.
+"""
+
+import difflib
+import hashlib
+import heapq
+import logging
+import zlib
+from typing import Dict, List, Optional, Set
+
+from pipelex import log
+
+from cocode.repox.models import DedupMode
+from cocode.utils import is_log_enabled
+
+# Number of smallest shingle hashes kept in the sketch of a file (bottom-k MinHash)
+SKETCH_SIZE = 64
+# Number of consecutive non-blank lines in a shingle
+SHINGLE_NB_LINES = 3
+# Estimated Jaccard similarity of the shingles above which files are near duplicates
+NEAR_DUPLICATE_MIN_SIMILARITY = 0.7
+# Near duplicates are only collapsed when their diff is at most this fraction of their size
+NEAR_DUPLICATE_MAX_DIFF_RATIO = 0.5
+# Files outside these bounds are only checked for exact duplicates: small ones gain little, and diffs of large ones are slow
+NEAR_DUPLICATE_MIN_LINES = 8
+NEAR_DUPLICATE_MAX_BYTES = 512 * 1024
+# Maximum size of the contents kept in memory to diff near duplicates against
+NEAR_DUPLICATE_MEMORY_BYTES = 64 * 1024 * 1024
+
+
+class RepoxDeduplicator:
+    """Replace the processed contents of duplicate files by references to their first occurrence."""
+
+    def __init__(self, dedup_mode: DedupMode) -> None:
+        self.dedup_mode = dedup_mode
+        self.nb_identical_files = 0
+        self.nb_similar_files = 0
+        self.nb_saved_bytes = 0
+        self._first_paths: Dict[bytes, str] = {}
+        # Contents and sketches of the files near duplicates are diffed against
+        self._representative_contents: Dict[str, str] = {}
+        self._representative_indexes: Dict[str, int] = {}
+        self._representative_sketches: Dict[str, Set[int]] = {}
+        self._representative_paths_by_hash: Dict[int, List[str]] = {}
+        self._nb_representative_bytes = 0
+
+    def deduplicate(self, relative_path: str, file_content: str) -> str:
+        """Get the content to output for a file, given its processed content.
+
+        Returns:
+            The processed content for the first occurrence of a content, or else a reference to it, with a diff for near duplicates
+        """
+        if self.dedup_mode == DedupMode.NONE or not file_content:
+            return file_content
+        content_hash = hashlib.blake2b(file_content.encode(), digest_size=16).digest()
+        if (first_path := self._first_paths.get(content_hash)) is not None:
+            reference = f"[identical to {first_path}]"
+            self.nb_identical_files += 1
+            self.nb_saved_bytes += len(file_content) - len(reference)
+            return reference
+        self._first_paths[content_hash] = relative_path
+        if self.dedup_mode != DedupMode.NEAR or len(file_content) > NEAR_DUPLICATE_MAX_BYTES:
+            return file_content
+        lines = file_content.splitlines()
+        if len(lines) < NEAR_DUPLICATE_MIN_LINES:
+            return file_content
+        sketch = _make_sketch(lines=lines)
+        if (
+            similar_content := self._get_similar_content(relative_path=relative_path, file_content=file_content, lines=lines, sketch=sketch)
+        ) is not None:
+            self.nb_similar_files += 1
+            self.nb_saved_bytes += len(file_content) - len(similar_content)
+            return similar_content
+        self._add_representative(relative_path=relative_path, file_content=file_content, sketch=sketch)
+        return file_content
+
+    def _get_similar_content(self, relative_path: str, file_content: str, lines: List[str], sketch: Set[int]) -> Optional[str]:
+        """Find the most similar representative, and the reference and diff replacing the content if they are small enough."""
+        nb_shared_hashes: Dict[str, int] = {}
+        for sketch_hash in sketch:
+            for representative_path in self._representative_paths_by_hash.get(sketch_hash, ()):
+                nb_shared_hashes[representative_path] = nb_shared_hashes.get(representative_path, 0) + 1
+        if not nb_shared_hashes:
+            return None
+        # The earliest representative wins ties, so that the output doesn't depend on the iteration order of the sketches
+        representative_path = max(nb_shared_hashes, key=lambda path: (nb_shared_hashes[path], -self._representative_indexes[path]))
+        if _estimate_similarity(sketch, self._representative_sketches[representative_path]) < NEAR_DUPLICATE_MIN_SIMILARITY:
+            return None
+        # Skip the --- and +++ lines of the unified diff, the hunks are enough
+        diff_lines = list(difflib.unified_diff(self._representative_contents[representative_path].splitlines(), lines, lineterm="", n=1))[2:]
+        similar_content = "\n".join([f"[similar to {representative_path}, differences:]", *diff_lines])
+        if len(similar_content) > len(file_content) * NEAR_DUPLICATE_MAX_DIFF_RATIO:
+            return None
+        if is_log_enabled(logging.DEBUG):
+            log.debug(f"'{relative_path}' is similar to '{representative_path}'")
+        return similar_content
+
+    def _add_representative(self, relative_path: str, file_content: str, sketch: Set[int]) -> None:
+        if self._nb_representative_bytes + len(file_content) > NEAR_DUPLICATE_MEMORY_BYTES:
+            return
+        self._nb_representative_bytes += len(file_content)
+        self._representative_indexes[relative_path] = len(self._representative_contents)
+        self._representative_contents[relative_path] = file_content
+        self._representative_sketches[relative_path] = sketch
+        for sketch_hash in sketch:
+            self._representative_paths_by_hash.setdefault(sketch_hash, []).append(relative_path)
+
+    def log_summary(self) -> None:
+        if self.nb_identical_files or self.nb_similar_files:
+            log.info(f"Collapsed {self.nb_identical_files} identical and {self.nb_similar_files} similar files, saving {self.nb_saved_bytes} bytes")
+
+
+def _make_sketch(lines: List[str]) -> Set[int]:
+    """The smallest hashes of the shingles of consecutive non-blank lines, ignoring indentation."""
+    stripped_lines = [line.strip() for line in lines if line.strip()]
+    shingle_hashes = {
+        zlib.crc32("\n".join(stripped_lines[index : index + SHINGLE_NB_LINES]).encode())
+        for index in range(max(len(stripped_lines) - SHINGLE_NB_LINES + 1, 1))
+    }
+    return set(heapq.nsmallest(SKETCH_SIZE, shingle_hashes))
+
+
+def _estimate_similarity(sketch: Set[int], other_sketch: Set[int]) -> float:
+    """Estimate the Jaccard similarity of two sets of shingles from their bottom-k sketches."""
+    union_sketch = heapq.nsmallest(SKETCH_SIZE, sketch | other_sketch)
+    if not union_sketch:
+        return 0.0
+    return sum(1 for sketch_hash in union_sketch if sketch_hash in sketch and sketch_hash in other_sketch) / len(union_sketch)
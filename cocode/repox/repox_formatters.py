@@ -2,8 +2,40 @@
 Static utility functions for formatting repository output data.
 """
 
-import os
-from typing import Dict, List, Optional, Set
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cocode.repox.models import FileRecord
+
+# A directory maps each entry name to its own sub-directory, or to None for a file
+TreeNode = Dict[str, Optional["TreeNode"]]
+
+# Indentation of each level of the compact tree
+COMPACT_TREE_INDENT = "  "
+
+# Markers of a license header, looked for in lowercase in the leading comment block of a file
+LICENSE_HEADER_MARKERS = (
+    "copyright",
+    "spdx-license-identifier",
+    "licensed under",
+    "all rights reserved",
+    "permission is hereby granted",
+    "general public license",
+)
+
+_TRAILING_WHITESPACE_REGEX = re.compile(r"[ \t\r\f\v]+$", re.MULTILINE)
+_BLANK_LINES_REGEX = re.compile(r"\n{3,}")
+# Optional shebang and blank lines, then a run of line comments, a block comment or a docstring, alone on their lines
+_LEADING_COMMENT_BLOCK_REGEX = re.compile(
+    r"\A(?P<prelude>(?:#![^\n]*\n)?(?:[ \t]*\n)*)"
+    r"(?P<block>"
+    r"(?:[ \t]*(?:#|//|--|;)[^\n]*(?:\n|\Z))+"
+    r"|[ \t]*/\*.*?\*/[ \t]*(?:\n|\Z)"
+    r"|[ \t]*<!--.*?-->[ \t]*(?:\n|\Z)"
+    r"|[ \t]*(?P<quote>\"\"\"|\'\'\').*?(?P=quote)[ \t]*(?:\n|\Z)"
+    r")",
+    re.DOTALL,
+)
 
 
 def build_flat_output(file_contents: Dict[str, str]) -> str:
@@ -15,28 +47,26 @@ def build_flat_output(file_contents: Dict[str, str]) -> str:
     Returns:
         String with all file contents joined by double newlines
     """
-    return "\n\n".join(file_contents.values())
+    return "".join(_iter_flat_chunks(file_texts=file_contents.items()))
 
 
-def extract_full_path(line: str, repo_path: str) -> Optional[str]:
-    """Extract the full path from a line of tree output.
+def iter_flat_output(file_records: Iterable[FileRecord]) -> Iterator[str]:
+    """Generate the flat output chunk by chunk, holding one file record at a time.
 
     Args:
-        line: Line from tree command output
-        repo_path: Base repository path
+        file_records: Records of the files, in output order
 
-    Returns:
-        Extracted full path or None if not found
+    Yields:
+        Chunks whose concatenation is the output of `build_flat_output`
     """
-    # Check for relative path patterns
-    for prefix in ["./", "../"]:
-        idx = line.find(prefix)
-        if idx != -1:
-            return line[idx:].strip()
+    return _iter_flat_chunks(file_texts=((file_record.relative_path, file_record.text) for file_record in file_records))
+
 
-    # Fallback to exact path match
-    idx = line.find(repo_path)
-    return line[idx:].strip() if idx != -1 else None
+def _iter_flat_chunks(file_texts: Iterable[Tuple[str, str]]) -> Iterator[str]:
+    for index, (_, file_content) in enumerate(file_texts):
+        if index:
+            yield "\n\n"
+        yield file_content
 
 
 def build_import_list(file_contents: Dict[str, str]) -> str:
@@ -48,25 +78,137 @@ def build_import_list(file_contents: Dict[str, str]) -> str:
     Returns:
         String with import statements joined by double newlines
     """
-    import_statements: List[str] = []
-    for relative_path, file_content in file_contents.items():
-        if not file_content.strip():
+    return "".join(_iter_import_list_chunks(file_texts=file_contents.items()))
+
+
+def iter_import_list(file_records: Iterable[FileRecord]) -> Iterator[str]:
+    """Generate the import list chunk by chunk, only loading the text of the Python files.
+
+    Args:
+        file_records: Records of the files, in output order
+
+    Yields:
+        Chunks whose concatenation is the output of `build_import_list`
+    """
+    return _iter_import_list_chunks(
+        file_texts=((file_record.relative_path, file_record.text) for file_record in file_records if file_record.relative_path.endswith(".py"))
+    )
+
+
+def _iter_import_list_chunks(file_texts: Iterable[Tuple[str, str]]) -> Iterator[str]:
+    is_first_statement = True
+    for relative_path, file_content in file_texts:
+        if (import_statement := make_import_statement(relative_path=relative_path, file_content=file_content)) is None:
             continue
-        if relative_path.endswith(".py"):
-            module_path = relative_path.replace(".py", "").replace("/", ".")
-            import_statement = f"from {module_path} import {file_content}"
-            import_statements.append(import_statement)
-    return "\n\n".join(import_statements)
+        if not is_first_statement:
+            yield "\n\n"
+        yield import_statement
+        is_first_statement = False
+
+
+def make_import_statement(relative_path: str, file_content: str) -> Optional[str]:
+    """Make the import list statement of a Python file from its processed content, None for other and empty files."""
+    if not relative_path.endswith(".py") or not file_content.strip():
+        return None
+    module_path = relative_path.replace(".py", "").replace("/", ".")
+    return f"from {module_path} import {file_content}"
 
 
-def mark_non_empty_dirs(relative_path: str, non_empty_dirs: Set[str]) -> None:
-    """Mark all parent directories of a file as non-empty.
+def build_tree_structure(relative_paths: Iterable[str], root_label: str = ".") -> str:
+    """Render file paths with the layout of `tree -a -f --noreport`.
+
+    Entries are sorted by name within each directory, directories and files mixed, and
+    each entry shows its full path relative to the repository root. Directories only
+    appear when they contain at least one of the given files.
+
+    Args:
+        relative_paths: Paths of the files to display, relative to the repository root, using "/" separators
+        root_label: Label of the first line, standing for the repository root
+
+    Returns:
+        The rendered tree, one entry per line
+    """
+    lines: List[str] = [root_label]
+    _append_tree_lines(node=_make_tree_node(relative_paths=relative_paths), prefix="", parent_path="", lines=lines)
+    return "\n".join(lines)
+
+
+def build_compact_tree(relative_paths: Iterable[str]) -> str:
+    """Render file paths as an indented list of names, the fewest characters that keep the hierarchy.
+
+    Entries are sorted by name within each directory, as in `build_tree_structure`, each
+    directory is suffixed with "/" and its entries are indented below it.
 
     Args:
-        relative_path: Path to the file relative to repository root
-        non_empty_dirs: Set to store non-empty directory paths
+        relative_paths: Paths of the files to display, relative to the repository root, using "/" separators
+
+    Returns:
+        The rendered tree, one entry per line
+    """
+    lines: List[str] = []
+    _append_compact_tree_lines(node=_make_tree_node(relative_paths=relative_paths), indent="", lines=lines)
+    return "\n".join(lines)
+
+
+def _make_tree_node(relative_paths: Iterable[str]) -> TreeNode:
+    root: TreeNode = {}
+    for relative_path in relative_paths:
+        node = root
+        parts = relative_path.split("/")
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is None:
+                child = {}
+                node[part] = child
+            node = child
+        node.setdefault(parts[-1], None)
+    return root
+
+
+def _append_tree_lines(node: TreeNode, prefix: str, parent_path: str, lines: List[str]) -> None:
+    names = sorted(node)
+    last_index = len(names) - 1
+    for index, name in enumerate(names):
+        is_last = index == last_index
+        path = f"{parent_path}{name}"
+        lines.append(f"{prefix}{'└── ' if is_last else '├── '}{path}")
+        child = node[name]
+        if child is not None:
+            _append_tree_lines(node=child, prefix=prefix + ("    " if is_last else "│   "), parent_path=f"{path}/", lines=lines)
+
+
+def _append_compact_tree_lines(node: TreeNode, indent: str, lines: List[str]) -> None:
+    for name in sorted(node):
+        child = node[name]
+        if child is None:
+            lines.append(f"{indent}{name}")
+        else:
+            lines.append(f"{indent}{name}/")
+            _append_compact_tree_lines(node=child, indent=indent + COMPACT_TREE_INDENT, lines=lines)
+
+
+def normalize_whitespace(text: str) -> str:
+    """Strip the trailing whitespace of each line, collapse runs of blank lines into one, and trim the blank lines around the text."""
+    text = _TRAILING_WHITESPACE_REGEX.sub("", text)
+    return _BLANK_LINES_REGEX.sub("\n\n", text).strip("\n")
+
+
+def strip_license_header(text: str) -> str:
+    """Remove the leading comment block or docstring of a file if it is a license header, keeping a shebang line.
+
+    The block is a license header when it holds a marker such as a copyright notice or an SPDX
+    identifier, merely mentioning the word license is not enough.
     """
-    dir_path: str = os.path.dirname(relative_path)
-    while dir_path:
-        non_empty_dirs.add(dir_path)
-        dir_path = os.path.dirname(dir_path)
+    if (block_match := _LEADING_COMMENT_BLOCK_REGEX.match(text)) is None:
+        return text
+    block = block_match.group("block").lower()
+    if not any(marker in block for marker in LICENSE_HEADER_MARKERS):
+        return text
+    return block_match.group("prelude") + text[block_match.end() :].lstrip("\n")
+
+
+def make_compact_file_content(file_content: str, strip_license_headers: bool = False) -> str:
+    """Make the content of a file in the compact style: whitespace normalized and, optionally, without its license header."""
+    if strip_license_headers:
+        file_content = strip_license_header(file_content)
+    return normalize_whitespace(file_content)
@@ -8,21 +8,44 @@ i.e. all of the following code as it's been entirely rewritten,
 are © 2025 Evotis S.A.S., All rights reserved.
 """
 
-import fnmatch
+import functools
+import logging
+import multiprocessing
+import multiprocessing.pool
 import os
-import re
-from typing import Callable, Dict, List, Optional, Set, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from multiprocessing.pool import AsyncResult
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Set, Tuple, Type
 
-import pathspec
-from pathspec import PathSpec, Pattern
 from pipelex import log
 from pipelex.tools.misc.exceptions import FileTypeError
-from pipelex.tools.misc.filetype_utils import FileType
+from pipelex.tools.misc.filetype_utils import FileType, detect_file_type_from_path
 
 from cocode.exceptions import RepoxException
-from cocode.repox.models import OutputStyle
-from cocode.repox.repox_formatters import build_flat_output, build_import_list, extract_full_path, mark_non_empty_dirs
-from cocode.utils import check_type_and_load_if_text, run_tree_command
+from cocode.repox.models import DedupMode, EnumerationMode, FileRecord, OutputStyle, ProfilePhase, RepoxWalkStats
+from cocode.repox.process_python import apply_python_processing_funcs, get_python_formatting_name
+from cocode.repox.repox_budget import TokenBudget, TokenBudgetPlan, estimate_tokens, plan_token_budget
+from cocode.repox.repox_cache import RepoxCache
+from cocode.repox.repox_container import RepoxContainerWriter
+from cocode.repox.repox_dedup import RepoxDeduplicator
+from cocode.repox.repox_formatters import (
+    build_compact_tree,
+    build_flat_output,
+    build_import_list,
+    build_tree_structure,
+    iter_flat_output,
+    iter_import_list,
+    make_compact_file_content,
+    make_import_statement,
+)
+from cocode.repox.repox_profile import ProfiledRepoxMatcher, RepoxProfiler, profile_phase
+from cocode.repox.repox_walker import GitIndexWalker, RepoxMatcher, RepoxWalker, WalkedFile, is_git_work_tree, merge_walked_files
+from cocode.utils import copy_text_file_bytes, determine_text_file_type, is_binary_file, is_log_enabled, load_if_text
 
 REPOX_IGNORED_PATHS = [
     ".git",
@@ -60,10 +83,68 @@ IGNORE_TREE_AND_CONTENT = [
 
 IGNORE_CONTENT = ["README.md", "LICENSE", "pyproject.toml"]
 
+# Files that were always skipped, whatever the configuration
+IGNORE_ALWAYS = ["*.png", "repo-to-text_*"]
+
+# Number of files whose processed contents are held in memory at once when streaming the output
+STREAMING_WINDOW_SIZE = 256
+
 # Results directory constant
 RESULTS_DIR = "results"
 
 
+def apply_text_processing_funcs(text_processing_funcs: List[Callable[[str], str]], text: str) -> List[str]:
+    """Apply several text processing functions to the same text, python code being parsed once for all the functions processing its syntax tree."""
+    return apply_python_processing_funcs(text_processing_funcs=text_processing_funcs, python_code=text)
+
+
+def apply_text_processing_funcs_timed(text_processing_funcs: List[Callable[[str], str]], text: str) -> Tuple[List[str], float]:
+    """Apply text processing functions like `apply_text_processing_funcs`, also giving the seconds they took in the worker running them."""
+    start_time = time.perf_counter()
+    processed_texts = apply_text_processing_funcs(text_processing_funcs=text_processing_funcs, text=text)
+    return processed_texts, time.perf_counter() - start_time
+
+
+def _get_processing_func_name(processing_func: Callable[..., object]) -> str:
+    """Name of a processing function in cache keys, along with the formatter it applies, so that outputs of another formatter are not served."""
+    processing_func_name = f"{processing_func.__module__}.{processing_func.__qualname__}"
+    if formatting_name := get_python_formatting_name(processing_func):
+        processing_func_name += f"[{formatting_name}]"
+    return processing_func_name
+
+
+class RepoxWorkerPools:
+    """Worker pools reading files on threads and transforming them in processes, for one run or shared by several.
+
+    A processor makes its own pools for each run when it has several jobs. Pools given to processors
+    are shared by all their runs, such as the repositories of a batch, so that workers are started
+    once. They are only terminated when closed, so a transform that outlives the file timeout of a
+    run keeps its worker busy until then.
+    """
+
+    def __init__(self, jobs: int) -> None:
+        self.jobs = jobs
+        # The process pool is created first, so that its workers are not forked from a multi-threaded process
+        self.process_pool = multiprocessing.Pool(processes=jobs)
+        self.thread_pool = ThreadPoolExecutor(max_workers=jobs)
+
+    def __enter__(self) -> "RepoxWorkerPools":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        self.process_pool.terminate()
+        self.process_pool.join()
+
+
 class RepoxProcessor:
     def __init__(
         self,
@@ -73,6 +154,18 @@ class RepoxProcessor:
         path_pattern: Optional[str] = None,
         text_processing_funcs: Optional[Dict[str, Callable[[str], str]]] = None,
         output_style: OutputStyle = OutputStyle.REPO_MAP,
+        text_batch_processing_funcs: Optional[Dict[str, Callable[[List[str]], List[str]]]] = None,
+        jobs: int = 1,
+        file_timeout: Optional[float] = None,
+        cache: Optional[RepoxCache] = None,
+        enumeration_mode: EnumerationMode = EnumerationMode.AUTO,
+        max_file_bytes: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+        token_budget: Optional[TokenBudget] = None,
+        dedup_mode: DedupMode = DedupMode.NONE,
+        profiler: Optional[RepoxProfiler] = None,
+        worker_pools: Optional[RepoxWorkerPools] = None,
+        strip_license_headers: bool = False,
     ) -> None:
         """Initialize RepoxProcessor with repository path and ignore specifications.
 
@@ -83,136 +176,171 @@ class RepoxProcessor:
             path_pattern: Optional regex pattern to match against file paths
             text_processing_funcs: Optional dict of text processing functions by MIME type
             output_style: Style for output format
+            text_batch_processing_funcs: Optional dict of functions by MIME type, processing the outputs of all the text files
+                of that type at once, after the text processing functions
+            jobs: Number of parallel workers used to read and transform files, 1 processes them sequentially
+            file_timeout: Optional maximum number of seconds spent reading or transforming one file, only enforced when jobs > 1
+            cache: Optional persistent cache of the processed outputs of text files
+            enumeration_mode: How files are listed: from the git index, from the filesystem,
+                or from the git index when repo_path is in a git checkout (auto)
+            max_file_bytes: Optional maximum number of bytes loaded from a text file, larger files are reduced to their head and tail
+            max_total_bytes: Optional maximum number of bytes loaded from all the files, the files that don't fit are left out
+            token_budget: Optional maximum number of tokens of the output: lower ranked files are degraded, then left out, to fit in it
+            dedup_mode: Whether the repo map and compact styles replace the duplicates of a file, identical or similar, by references to it
+            profiler: Optional profiler measuring the time spent in each phase of the run and on each file
+            worker_pools: Optional worker pools shared with other processors, used instead of making pools for each run, whatever jobs is
+            strip_license_headers: Whether the compact style removes the license header at the top of each file
         """
         self.repo_path = repo_path
         self.text_processing_funcs = text_processing_funcs
+        self.text_batch_processing_funcs = text_batch_processing_funcs
+        self.cache = cache
         self.output_style = output_style
         self.include_patterns = include_patterns
         self.path_pattern = path_pattern
         self.cli_exclude_patterns = exclude_patterns or []
-        self.gitignore_spec: Optional[PathSpec[Pattern]]
-        self.content_ignore_spec: PathSpec[Pattern]
-        self.tree_and_content_ignore_spec: PathSpec[Pattern]
-        self.gitignore_spec, self.content_ignore_spec, self.tree_and_content_ignore_spec = self._ignore_specs(
-            repo_path=repo_path,
-            cli_exclude_patterns=exclude_patterns,
-        )
-
-    def _ignore_specs(
-        self,
-        repo_path: str,
-        cli_exclude_patterns: Optional[List[str]] = None,
-    ) -> Tuple[Optional[PathSpec[Pattern]], PathSpec[Pattern], PathSpec[Pattern]]:
-        """Load ignore specifications from various sources.
+        self.jobs = jobs
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.token_budget = token_budget
+        self.dedup_mode = dedup_mode
+        self.profiler = profiler
+        self.worker_pools = worker_pools
+        self.strip_license_headers = strip_license_headers
+        self.budget_plan: Optional[TokenBudgetPlan] = None
+        self.file_timeout = file_timeout
+        self.is_git_index_used = self._resolve_enumeration_mode(enumeration_mode=enumeration_mode)
+        self.matcher = self._make_matcher()
+        self.walk_stats = RepoxWalkStats()
+        self._walked_files: Optional[List[WalkedFile]] = None
+
+    def _resolve_enumeration_mode(self, enumeration_mode: EnumerationMode) -> bool:
+        """Decide whether files are listed from the git index (True) or from the filesystem (False)."""
+        match enumeration_mode:
+            case EnumerationMode.FILESYSTEM:
+                return False
+            case EnumerationMode.GIT:
+                if not is_git_work_tree(self.repo_path):
+                    raise RepoxException(f"Can't enumerate files from the git index: '{self.repo_path}' is not in a git working tree")
+                return True
+            case EnumerationMode.AUTO:
+                return IS_GITIGNORE_APPLIED and is_git_work_tree(self.repo_path)
 
-        Args:
-            repo_path: Base directory path
-            cli_exclude_patterns: List of patterns from command line
+    def _make_matcher(self) -> RepoxMatcher:
+        """Merge every ignore and include rule into a single compiled matcher.
 
-        Returns:
-            Tuple[Optional[PathSpec], PathSpec, PathSpec]: Tuple of gitignore_spec,
-            content_ignore_spec, and tree_and_content_ignore_spec
+        The .gitignore patterns come first so that a negation in the repository's own
+        .gitignore cannot re-include a path that repox always ignores. They are left out
+        when listing files from the git index, since git already applied all of them.
         """
-        content_ignore_spec = pathspec.PathSpec.from_lines("gitwildmatch", IGNORE_CONTENT)
-
-        tree_and_content_ignore_list = IGNORE_TREE_AND_CONTENT.copy()
-        if cli_exclude_patterns:
-            log.debug(f"Adding CLI ignore patterns: {cli_exclude_patterns}")
-            tree_and_content_ignore_list.extend(cli_exclude_patterns)
-        tree_and_content_ignore_spec = pathspec.PathSpec.from_lines("gitwildmatch", tree_and_content_ignore_list)
-
-        gitignore_spec: Optional[PathSpec[Pattern]] = None
-        if IS_GITIGNORE_APPLIED:
-            gitignore_path = os.path.join(repo_path, ".gitignore")
+        prune_patterns: List[str] = []
+        if IS_GITIGNORE_APPLIED and not self.is_git_index_used:
+            gitignore_path = os.path.join(self.repo_path, ".gitignore")
             if os.path.exists(gitignore_path):
-                log.debug(f"Loading .gitignore from path: {gitignore_path}")
                 with open(gitignore_path, "r", encoding="utf-8") as f:
-                    gitignore_spec = pathspec.PathSpec.from_lines("gitwildmatch", f)
+                    prune_patterns.extend(f.read().splitlines())
+        prune_patterns.extend(REPOX_IGNORED_PATHS)
+        prune_patterns.extend(IGNORE_TREE_AND_CONTENT)
+        prune_patterns.extend(IGNORE_ALWAYS)
+        prune_patterns.extend(self.cli_exclude_patterns)
+        return RepoxMatcher(
+            prune_patterns=prune_patterns,
+            content_ignore_patterns=IGNORE_CONTENT,
+            include_patterns=self.include_patterns,
+            path_pattern=self.path_pattern,
+        )
 
-        return gitignore_spec, content_ignore_spec, tree_and_content_ignore_spec
+    def walk_files(self) -> List[WalkedFile]:
+        """Enumerate the repository once; the tree and the file contents both reuse this walk."""
+        if self._walked_files is None:
+            walker = self._make_walker()
+            # Counted in files once they are all walked
+            with profile_phase(self.profiler, ProfilePhase.WALK, count=0):
+                self._walked_files = list(walker.walk())
+            if self.profiler is not None:
+                self.profiler.add(phase=ProfilePhase.WALK, seconds=0.0, count=len(self._walked_files))
+            self.walk_stats = walker.stats
+            log.debug(
+                f"Walked {walker.stats.nb_dirs_walked} directories, kept {walker.stats.nb_files_kept} files, "
+                f"pruned {walker.stats.nb_dirs_pruned} directories and {walker.stats.nb_files_pruned} files"
+            )
+        return self._walked_files
+
+    def refresh_walk(self) -> List[WalkedFile]:
+        """Enumerate the repository again, after files changed, with the ignore rules and the token budget plan made anew."""
+        self.matcher = self._make_matcher()
+        self._walked_files = None
+        self.budget_plan = None
+        return self.walk_files()
+
+    def update_walk(self, changed_paths: Set[str]) -> List[WalkedFile]:
+        """Enumerate again only the changed files and directories, with the same ignore rules, and make the token budget plan anew.
+
+        The ignore rules are not made anew, so a change of a .gitignore calls for `refresh_walk` instead.
+        """
+        walked_files = self.walk_files()
+        with profile_phase(self.profiler, ProfilePhase.WALK):
+            self._walked_files = merge_walked_files(
+                walked_files=walked_files,
+                changed_paths=changed_paths,
+                changed_files=self._make_walker().walk_paths(sorted(changed_paths)),
+            )
+        self.budget_plan = None
+        return self._walked_files
+
+    def _make_walker(self) -> RepoxWalker | GitIndexWalker:
+        matcher = self.matcher if self.profiler is None else ProfiledRepoxMatcher(matcher=self.matcher, profiler=self.profiler)
+        if self.is_git_index_used:
+            return GitIndexWalker(repo_path=self.repo_path, matcher=matcher)
+        return RepoxWalker(repo_path=self.repo_path, matcher=matcher)
+
+    def make_variant(
+        self,
+        text_processing_funcs: Optional[Dict[str, Callable[[str], str]]],
+        text_batch_processing_funcs: Optional[Dict[str, Callable[[List[str]], List[str]]]],
+        output_style: OutputStyle,
+        token_budget: Optional[TokenBudget] = None,
+    ) -> "RepoxProcessor":
+        """Make a processor of the same files with other processing functions and output style, sharing this processor's walk."""
+        variant = RepoxProcessor(
+            repo_path=self.repo_path,
+            exclude_patterns=self.cli_exclude_patterns,
+            include_patterns=self.include_patterns,
+            path_pattern=self.path_pattern,
+            text_processing_funcs=text_processing_funcs,
+            output_style=output_style,
+            text_batch_processing_funcs=text_batch_processing_funcs,
+            jobs=self.jobs,
+            file_timeout=self.file_timeout,
+            cache=self.cache,
+            enumeration_mode=EnumerationMode.GIT if self.is_git_index_used else EnumerationMode.FILESYSTEM,
+            max_file_bytes=self.max_file_bytes,
+            max_total_bytes=self.max_total_bytes,
+            token_budget=token_budget,
+            dedup_mode=self.dedup_mode,
+            profiler=self.profiler,
+            worker_pools=self.worker_pools,
+            strip_license_headers=self.strip_license_headers,
+        )
+        variant._walked_files = self.walk_files()
+        variant.walk_stats = self.walk_stats
+        return variant
 
     ##########################################################################################
     # Tree structure
     ##########################################################################################
 
     def get_tree_structure(self) -> str:
-        """Generate tree structure of the directory."""
+        """Generate tree structure of the directory, as an indented list of names in the compact style."""
         log.debug(f"Generating tree structure for path: {self.repo_path}")
-
-        # Collect all ignore patterns for the tree command
-        tree_exclude_patterns = REPOX_IGNORED_PATHS.copy()
-
-        # Add CLI ignore patterns if available and we're doing tree-based output
-        if self.output_style in (OutputStyle.TREE, OutputStyle.REPO_MAP) and self.cli_exclude_patterns:
-            log.debug(f"Adding CLI ignore patterns to tree command: {self.cli_exclude_patterns}")
-            tree_exclude_patterns.extend(self.cli_exclude_patterns)
-        tree_output = run_tree_command(
-            path=self.repo_path,
-            ignored_patterns=tree_exclude_patterns,
-            required_pattern=self.include_patterns[0] if self.include_patterns else None,
-            gitignore=True,
-            path_pattern=self.path_pattern,
-        )
-        log.verbose(f"Tree output generated:\n{tree_output}")
-
-        # For tree-based output styles, minimize post-processing to preserve structure
-        if self.output_style in (OutputStyle.TREE, OutputStyle.REPO_MAP):
-            log.debug("Using minimal post-processing for tree-based output to preserve structure")
-            tree_structure = tree_output
-        elif not self.gitignore_spec and not self.tree_and_content_ignore_spec:
-            log.debug("No .gitignore or ignore-tree-and-content specification found")
-            tree_structure = tree_output
-        else:
-            log.debug("Filtering tree output based on ignore specifications")
-            tree_structure = self._filter_tree_output(tree_output=tree_output)
-
-        # Normalize paths by removing absolute path prefix for cleaner tree display
-        if self.repo_path.startswith("/"):
-            # Replace the absolute path with nothing for relative display
-            tree_structure = tree_structure.replace(self.repo_path + "/", "")
-            tree_structure = tree_structure.replace(self.repo_path, "")
-
-        return tree_structure
-
-    def _filter_tree_output(self, tree_output: str) -> str:
-        """Filter the tree output based on ignore specifications."""
-        lines: List[str] = tree_output.splitlines()
-        non_empty_dirs: Set[str] = set()
-        log.verbose(f"Lines: {lines}")
-
-        filtered_lines = [self._process_line(line=line, non_empty_dirs=non_empty_dirs) for line in lines]
-
-        filtered_tree_output = "\n".join(filter(None, filtered_lines))
-        log.verbose(f"Filtered tree structure:\n{filtered_tree_output}")
-        if not filtered_tree_output.strip():
-            log.error(f"No tree structure found for path: {self.repo_path}")
-            raise RepoxException(f"No tree structure found for path: {self.repo_path}")
-        return filtered_tree_output
-
-    def _process_line(self, line: str, non_empty_dirs: Set[str]) -> Optional[str]:
-        """Process a single line of the tree output."""
-        full_path = extract_full_path(line=line, repo_path=self.repo_path)
-        log.verbose(f"Processing line: {line}")
-        log.verbose(f"Extracted full_path: {full_path}")
-
-        if not full_path or full_path == ".":
-            return None
-
-        relative_path = os.path.relpath(full_path, self.repo_path).replace(os.sep, "/")
-        log.verbose(f"Normalized relative_path: {relative_path}")
-
-        if self._should_ignore_file(
-            file_path=full_path,
-            relative_path=relative_path,
-            should_content_ignore_spec=False,
-        ):
-            log.verbose(f"Ignored: {relative_path}")
-            return None
-
-        if not os.path.isdir(full_path):
-            mark_non_empty_dirs(relative_path=relative_path, non_empty_dirs=non_empty_dirs)
-
-        return line.replace("./", "", 1)
+        walked_files = self.walk_files()
+        if not walked_files:
+            return ""
+        relative_paths = [walked_file.relative_path for walked_file in walked_files]
+        with profile_phase(self.profiler, ProfilePhase.FORMAT):
+            if self.output_style == OutputStyle.COMPACT:
+                return build_compact_tree(relative_paths=relative_paths)
+            return build_tree_structure(relative_paths=relative_paths)
 
     ##########################################################################################
     # File contents
@@ -221,112 +349,411 @@ class RepoxProcessor:
     def process_file_contents(self) -> Dict[str, str]:
         """Generate contents of files in the repository."""
         file_contents: Dict[str, str] = {}
+        for walked_file, file_content in self.iter_file_contents():
+            if file_content is not None:
+                file_contents[walked_file.relative_path] = file_content
+        log.debug("File contents stored in dictionary")
+        return file_contents
 
-        for root, _, files in os.walk(self.repo_path):
-            # Skip ignored paths
-            if any(ignored in root for ignored in REPOX_IGNORED_PATHS):
-                continue
+    def iter_file_records(self, window_size: Optional[int] = STREAMING_WINDOW_SIZE, is_lazy: bool = False) -> Iterator[FileRecord]:
+        """Generate the records of the files whose contents are output, in walk order, without holding them all in memory.
 
-            # If path_pattern is specified, check if this directory matches
-            if self.path_pattern:
-                relative_root = os.path.relpath(root, self.repo_path).replace(os.sep, "/")
-                # Use regex to check if the path matches the pattern
-                if not re.search(self.path_pattern, relative_root):
-                    continue
+        Args:
+            window_size: Number of files processed together when not lazy, None processes all the files in a single window
+            is_lazy: If True, files are only read and processed when the text of their record is accessed, one at a time,
+                so that records can be filtered or paginated first
 
-            for filename in files:
-                file_path = os.path.join(root, filename)
-                relative_path = os.path.relpath(file_path, self.repo_path)
+        Yields:
+            The record of each file, with its processed text or a loader of it
+        """
+        if is_lazy:
+            for walked_file in self.select_content_files():
+                yield FileRecord(
+                    relative_path=walked_file.relative_path,
+                    mime=determine_text_file_type(walked_file.path).mime,
+                    size=walked_file.size,
+                    text_loader=functools.partial(self._load_record_text, walked_file),
+                )
+            return
+        for walked_file, file_content in self.iter_file_contents(window_size=window_size):
+            if file_content is not None:
+                yield FileRecord(
+                    relative_path=walked_file.relative_path,
+                    mime=determine_text_file_type(walked_file.path).mime,
+                    size=walked_file.size,
+                    text=file_content,
+                )
+
+    def _load_record_text(self, walked_file: WalkedFile) -> str:
+        """Process a single file for a lazy record, giving an empty text if it was skipped."""
+        return self._process_files(walked_files=[walked_file]).get(walked_file.relative_path, "")
+
+    def iter_file_contents(
+        self,
+        window_size: Optional[int] = None,
+        is_verbatim_copy_allowed: bool = False,
+    ) -> Iterator[Tuple[WalkedFile, Optional[str]]]:
+        """Generate the processed contents of files, in walk order, one window of files at a time.
 
-                if self._should_ignore_file(
-                    file_path=file_path,
-                    relative_path=relative_path,
-                    should_content_ignore_spec=True,
-                ):
-                    continue
+        Only the files of the current window are held in memory, and the batch processing
+        functions run once per window. The worker pools, if any, are shared by all the windows.
 
-                log.debug(f"File not ignored: {file_path}")
-                relative_path = relative_path.replace("./", "", 1)
-                file_content: str
-                file_type: FileType
-                try:
-                    file_check = check_type_and_load_if_text(file_path=file_path)
-                    if isinstance(file_check, FileType):
-                        # not a text file
-                        file_content = self._specific_binary_file_processing(file_path=file_path, file_type=file_check)
-                    else:
-                        # text file
-                        file_type, text_if_applicable = file_check
-                        file_content = self._specific_text_file_processing(file_type=file_type, text=text_if_applicable)
-                except FileTypeError as exc:
-                    log.warning(f"Skipping '{file_path}' - could not determine file type: {exc}")
-                    continue
-                file_contents[relative_path] = file_content
+        Args:
+            window_size: Number of files processed together, None processes all the files in a single window
+            is_verbatim_copy_allowed: If True, files that no processing function applies to are not read:
+                they are yielded with a None content, to be copied as is by the caller
 
-        log.debug("File contents stored in dictionary")
-        return file_contents
+        Yields:
+            The walked file and its processed content, or None if it is to be copied verbatim
+        """
+        content_files = self.select_content_files()
+        if not window_size:
+            window_size = max(len(content_files), 1)
+        with self._worker_pools(nb_files=len(content_files)) as (process_pool, thread_pool):
+            for window_start in range(0, len(content_files), window_size):
+                window = content_files[window_start : window_start + window_size]
+                verbatim_paths: Set[str] = set()
+                if is_verbatim_copy_allowed:
+                    verbatim_paths = {walked_file.relative_path for walked_file in window if self._is_verbatim_copy_candidate(walked_file)}
+                files_to_process = [walked_file for walked_file in window if walked_file.relative_path not in verbatim_paths]
+                file_contents = self._process_files(walked_files=files_to_process, process_pool=process_pool, thread_pool=thread_pool)
+                for walked_file in window:
+                    if walked_file.relative_path in verbatim_paths:
+                        yield walked_file, None
+                    elif (file_content := file_contents.get(walked_file.relative_path)) is not None:
+                        yield walked_file, file_content
+
+    def iter_variant_file_contents(
+        self,
+        variants: List["RepoxProcessor"],
+        window_size: Optional[int] = None,
+    ) -> Iterator[Tuple[WalkedFile, List[Optional[str]]]]:
+        """Generate the processed contents of files for several processors at once, reading each file once.
 
-    def _specific_text_file_processing(self, file_type: FileType, text: str) -> str:
-        """Process a specific text file based on its type."""
-        log.debug(f"_specific_text_file_processing for type '{file_type}', text={text[:50]}")
-        if self.text_processing_funcs and (text_processing_func := self.text_processing_funcs.get(file_type.mime)):
-            return text_processing_func(text)
-        return text
+        The variants are made with `make_variant` and share this processor's walk. Each file
+        is loaded once, and all the text processing functions that apply to it run in a row,
+        in the same worker when there are several jobs, so that they can share their parsing.
 
-    def _specific_binary_file_processing(self, file_path: str, file_type: FileType) -> str:
-        """Process a specific binary file based on its type."""
-        # TODO: handle pdf files and other formats
-        return f"Binary content: '{file_type.mime}'"
+        Args:
+            variants: Processors of the same files, with their own processing functions, token budgets and output styles
+            window_size: Number of files processed together, None processes all the files in a single window
 
-    def _should_ignore_file(
+        Yields:
+            The walked file and its processed content for each variant, None for the variants it is not output by
+        """
+        variant_paths = [{walked_file.relative_path for walked_file in variant.select_content_files()} for variant in variants]
+        content_files = [walked_file for walked_file in self.walk_files() if any(walked_file.relative_path in paths for paths in variant_paths)]
+        if not window_size:
+            window_size = max(len(content_files), 1)
+        with self._worker_pools(nb_files=len(content_files)) as (process_pool, thread_pool):
+            for window_start in range(0, len(content_files), window_size):
+                window = content_files[window_start : window_start + window_size]
+                variant_contents = self._process_files_for_variants(
+                    variants=variants,
+                    variant_paths=variant_paths,
+                    walked_files=window,
+                    process_pool=process_pool,
+                    thread_pool=thread_pool,
+                )
+                for walked_file in window:
+                    yield walked_file, [file_contents.get(walked_file.relative_path) for file_contents in variant_contents]
+
+    @contextmanager
+    def _worker_pools(self, nb_files: int) -> Generator[Tuple[Optional[multiprocessing.pool.Pool], Optional[ThreadPoolExecutor]], None, None]:
+        """Create the worker pools of a run if there are several jobs, or use the shared ones, and end the cache run with them."""
+        if self.worker_pools is not None:
+            log.debug(f"Processing {nb_files} files with the shared pools of {self.worker_pools.jobs} jobs")
+            try:
+                yield self.worker_pools.process_pool, self.worker_pools.thread_pool
+            finally:
+                if self.cache is not None:
+                    self.cache.end_run()
+            return
+        run_pools: Optional[RepoxWorkerPools] = None
+        if self.jobs > 1:
+            log.debug(f"Processing {nb_files} files with {self.jobs} jobs")
+            run_pools = RepoxWorkerPools(jobs=self.jobs)
+        try:
+            if run_pools is None:
+                yield None, None
+            else:
+                yield run_pools.process_pool, run_pools.thread_pool
+        finally:
+            if run_pools is not None:
+                run_pools.close()
+            if self.cache is not None:
+                self.cache.end_run()
+
+    def select_content_files(self) -> List[WalkedFile]:
+        """List the files whose contents are output, within the total byte budget if there is one.
+
+        Each file costs its size, capped at max_file_bytes. Files are taken in walk order,
+        and a file that doesn't fit in what remains of the budget is left out.
+        """
+        content_files = [walked_file for walked_file in self.walk_files() if not walked_file.is_content_ignored and walked_file.size > 0]
+        if budget_plan := self.get_budget_plan():
+            omitted_paths = set(budget_plan.omitted_paths)
+            content_files = [walked_file for walked_file in content_files if walked_file.relative_path not in omitted_paths]
+        if self.max_total_bytes is None:
+            return content_files
+        selected_files: List[WalkedFile] = []
+        remaining_bytes = self.max_total_bytes
+        for walked_file in content_files:
+            file_cost = walked_file.size if self.max_file_bytes is None else min(walked_file.size, self.max_file_bytes)
+            if file_cost > remaining_bytes:
+                continue
+            remaining_bytes -= file_cost
+            selected_files.append(walked_file)
+        if nb_left_out := len(content_files) - len(selected_files):
+            log.warning(f"Left out the contents of {nb_left_out} files to stay within the limit of {self.max_total_bytes} bytes")
+        return selected_files
+
+    def get_budget_plan(self) -> Optional[TokenBudgetPlan]:
+        """Plan the processing level of each file to fit in the token budget, if there is one, from the walk data and the first bytes of the files."""
+        if self.token_budget is None or self.budget_plan is not None:
+            return self.budget_plan
+        content_files = [walked_file for walked_file in self.walk_files() if not walked_file.is_content_ignored and walked_file.size > 0]
+        self.budget_plan = plan_token_budget(
+            walked_files=content_files,
+            mimes={walked_file.relative_path: determine_text_file_type(walked_file.path).mime for walked_file in content_files},
+            token_budget=self.token_budget,
+            reserved_tokens=self.estimate_header_tokens(),
+            binary_paths={walked_file.relative_path for walked_file in content_files if is_binary_file(walked_file.path)},
+        )
+        if self.budget_plan.degraded_levels or self.budget_plan.omitted_paths:
+            log.warning(
+                f"To fit in the budget of {self.token_budget.max_tokens} tokens, degraded {len(self.budget_plan.degraded_levels)} files "
+                f"and omitted the contents of {len(self.budget_plan.omitted_paths)} files"
+            )
+        return self.budget_plan
+
+    def estimate_header_tokens(self) -> int:
+        """Estimate the tokens of the output header, the tree structure of the repo map and compact styles, without the budget plan."""
+        match self.output_style:
+            case OutputStyle.REPO_MAP:
+                return estimate_tokens(self._repo_map_base_header(tree_structure=self.get_tree_structure()))
+            case OutputStyle.COMPACT:
+                return estimate_tokens(self._compact_base_header(tree_structure=self.get_tree_structure()))
+            case OutputStyle.TREE:
+                return estimate_tokens(self.get_tree_structure())
+            case OutputStyle.FLAT | OutputStyle.IMPORT_LIST | OutputStyle.CONTAINER:
+                return 0
+
+    def _is_verbatim_copy_candidate(self, walked_file: WalkedFile) -> bool:
+        """Check if no processing function applies to a file, judging its type from its extension, and it needs no truncation."""
+        if self.max_file_bytes is not None and walked_file.size > self.max_file_bytes:
+            return False
+        file_type = determine_text_file_type(walked_file.path)
+        if self._get_text_processing_func(file_type=file_type, relative_path=walked_file.relative_path) is not None:
+            return False
+        return self._get_text_batch_processing_func(mime=file_type.mime, relative_path=walked_file.relative_path) is None
+
+    def process_files(self, walked_files: List[WalkedFile]) -> Dict[str, str]:
+        """Generate contents of some of the files only, such as the ones that changed since the last run."""
+        try:
+            return self._process_files(walked_files=walked_files)
+        finally:
+            if self.cache is not None:
+                self.cache.end_run()
+
+    def _process_files(
+        self,
+        walked_files: List[WalkedFile],
+        process_pool: Optional[multiprocessing.pool.Pool] = None,
+        thread_pool: Optional[ThreadPoolExecutor] = None,
+    ) -> Dict[str, str]:
+        """Generate contents of files, with this processor as the single variant of `_process_files_for_variants`."""
+        [file_contents] = self._process_files_for_variants(
+            variants=[self],
+            variant_paths=[{walked_file.relative_path for walked_file in walked_files}],
+            walked_files=walked_files,
+            process_pool=process_pool,
+            thread_pool=thread_pool,
+        )
+        return file_contents
+
+    def _process_files_for_variants(
         self,
-        file_path: str,
-        relative_path: str,
-        should_content_ignore_spec: bool,
-        should_ignore_empty_files: bool = True,
-    ) -> bool:
-        """Check if a file should be ignored based on various ignore specifications.
+        variants: List["RepoxProcessor"],
+        variant_paths: List[Set[str]],
+        walked_files: List[WalkedFile],
+        process_pool: Optional[multiprocessing.pool.Pool],
+        thread_pool: Optional[ThreadPoolExecutor],
+    ) -> List[Dict[str, str]]:
+        """Generate contents of files for several variants, loading each file once and running its text processing functions together.
+
+        This is the processing of every run, a single processor being its own single variant. Files
+        are read on the thread pool and transformed on the process pool if there are pools, or in
+        this process otherwise. Results are gathered in walk order, so the output does not depend on
+        scheduling, and a file whose read or transform exceeds `file_timeout` seconds is skipped with
+        a warning. Cached outputs are looked up and stored for each variant, and the batch processing
+        functions of each variant run once over its files.
 
         Args:
-            file_path: Full path to the file
-            relative_path: Path relative to the repository root
-            should_content_ignore_spec: Whether to use the content ignore specification
-            should_ignore_empty_files: Whether to ignore empty files
+            variants: Processors of the same files, made with `make_variant`
+            variant_paths: Relative paths of the files whose contents are output, for each variant
+            walked_files: Files to process, output by at least one variant
+            process_pool: Optional process pool running the text processing functions
+            thread_pool: Optional thread pool loading the files
 
         Returns:
-            bool: True if file should be ignored, False otherwise
+            The processed contents of the files, for each variant
         """
-        relative_path = relative_path.replace(os.sep, "/")
-
-        if relative_path.startswith("./"):
-            relative_path = relative_path[2:]
-
-        if os.path.isdir(file_path):
-            relative_path += "/"
-
-        log.verbose("Checking if file should be ignored:")
-        log.verbose(f"    file_path: {file_path}")
-        log.verbose(f"    relative_path: {relative_path}")
-        if self._is_ignored_path(file_path=file_path):
-            log.debug(f"File '{relative_path} 'is ignored because of is_ignored_path")
-            return True
-        if self.gitignore_spec and self.gitignore_spec.match_file(relative_path):
-            log.debug(f"File '{relative_path}' is ignored because of gitignore_spec")
-            return True
-        if should_content_ignore_spec and self.content_ignore_spec and self.content_ignore_spec.match_file(relative_path):
-            log.debug(f"File '{relative_path}' is ignored because of content_ignore_spec")
-            return True
-        if self.tree_and_content_ignore_spec and self.tree_and_content_ignore_spec.match_file(relative_path):
-            log.debug(f"File '{relative_path}' is ignored because of tree_and_content_ignore_spec")
-            return True
-        if os.path.basename(file_path).startswith("repo-to-text_"):
-            log.debug(f"File '{relative_path}' is ignored because of repo-to-text_ prefix")
-            return True
-        if should_ignore_empty_files and os.path.getsize(file_path) == 0:
-            log.debug(f"File '{relative_path}' is ignored because it is empty")
-            return True
-
-        return False
+        variant_contents: List[Dict[str, str]] = [{} for _ in variants]
+        variant_mimes: List[Dict[str, str]] = [{} for _ in variants]
+        variant_cache_keys: List[Dict[str, str]] = [{} for _ in variants]
+        pending_contents: List[Tuple[WalkedFile, List[int], List[str] | AsyncResult[Tuple[List[str], float]]]] = []
+        for walked_file, file_check in self._load_files(walked_files=walked_files, thread_pool=thread_pool):
+            relative_path = walked_file.relative_path
+            variant_indexes = [index for index, paths in enumerate(variant_paths) if relative_path in paths]
+            if isinstance(file_check, FileType):
+                binary_content = self._specific_binary_file_processing(file_path=walked_file.path, file_type=file_check)
+                for index in variant_indexes:
+                    variant_contents[index][relative_path] = binary_content
+                continue
+            file_type, text = file_check
+            text_processing_funcs: List[Callable[[str], str]] = []
+            func_variant_indexes: List[int] = []
+            for index in variant_indexes:
+                variant = variants[index]
+                if cache_key := variant._get_cache_key(file_type=file_type, text=text, relative_path=relative_path):
+                    if (cached_content := variant._get_from_cache(cache_key=cache_key)) is not None:
+                        variant_contents[index][relative_path] = cached_content
+                        continue
+                    variant_cache_keys[index][relative_path] = cache_key
+                variant_mimes[index][relative_path] = file_type.mime
+                if text_processing_func := variant._get_text_processing_func(file_type=file_type, relative_path=relative_path):
+                    text_processing_funcs.append(text_processing_func)
+                    func_variant_indexes.append(index)
+                else:
+                    variant_contents[index][relative_path] = text
+            if not text_processing_funcs:
+                continue
+            if is_log_enabled(logging.DEBUG):
+                log.debug(f"Text processing of '{relative_path}' as '{file_type}' by {len(text_processing_funcs)} functions, text={text[:50]}")
+            if process_pool is not None:
+                pending_contents.append(
+                    (walked_file, func_variant_indexes, process_pool.apply_async(apply_text_processing_funcs_timed, (text_processing_funcs, text)))
+                )
+            else:
+                with profile_phase(self.profiler, ProfilePhase.TRANSFORM, relative_path=relative_path):
+                    pending_contents.append((walked_file, func_variant_indexes, apply_text_processing_funcs(text_processing_funcs, text)))
+
+        for walked_file, func_variant_indexes, pending_texts in pending_contents:
+            if isinstance(pending_texts, list):
+                processed_texts = pending_texts
+            else:
+                try:
+                    processed_texts, transform_seconds = pending_texts.get(timeout=self.file_timeout)
+                except multiprocessing.TimeoutError:
+                    log.warning(f"Skipping '{walked_file.path}' - processing it took more than {self.file_timeout} seconds")
+                    continue
+                if self.profiler is not None:
+                    self.profiler.add(phase=ProfilePhase.TRANSFORM, seconds=transform_seconds, relative_path=walked_file.relative_path)
+            for index, processed_text in zip(func_variant_indexes, processed_texts):
+                variant_contents[index][walked_file.relative_path] = processed_text
+
+        for variant, file_contents, text_file_mimes, cache_keys in zip(variants, variant_contents, variant_mimes, variant_cache_keys):
+            variant._apply_text_batch_processing(file_contents=file_contents, text_file_mimes=text_file_mimes)
+            variant._store_in_cache(file_contents=file_contents, cache_keys=cache_keys)
+        return variant_contents
+
+    def _load_files(
+        self,
+        walked_files: List[WalkedFile],
+        thread_pool: Optional[ThreadPoolExecutor],
+    ) -> Iterator[Tuple[WalkedFile, FileType | Tuple[FileType, str]]]:
+        """Load files in walk order, with the thread pool if there is one, leaving out the ones that can't be loaded in time."""
+        if thread_pool is None:
+            for walked_file in walked_files:
+                if (file_check := self._load_file(file_path=walked_file.path, relative_path=walked_file.relative_path)) is not None:
+                    yield walked_file, file_check
+            return
+        load_futures = [thread_pool.submit(self._load_file, walked_file.path, walked_file.relative_path) for walked_file in walked_files]
+        for walked_file, load_future in zip(walked_files, load_futures):
+            try:
+                file_check = load_future.result(timeout=self.file_timeout)
+            except FuturesTimeoutError:
+                log.warning(f"Skipping '{walked_file.path}' - reading it took more than {self.file_timeout} seconds")
+                continue
+            if file_check is not None:
+                yield walked_file, file_check
+
+    def _apply_text_batch_processing(self, file_contents: Dict[str, str], text_file_mimes: Dict[str, str]) -> None:
+        """Run each batch processing function once over all the processed text files it applies to."""
+        batches: Dict[Callable[[List[str]], List[str]], List[str]] = {}
+        for relative_path, mime in text_file_mimes.items():
+            if relative_path not in file_contents:
+                continue
+            if text_batch_processing_func := self._get_text_batch_processing_func(mime=mime, relative_path=relative_path):
+                batches.setdefault(text_batch_processing_func, []).append(relative_path)
+        for text_batch_processing_func, relative_paths in batches.items():
+            log.debug(f"Batch processing {len(relative_paths)} files with '{text_batch_processing_func.__name__}'")
+            with profile_phase(self.profiler, ProfilePhase.TRANSFORM, count=len(relative_paths)):
+                processed_texts = text_batch_processing_func([file_contents[relative_path] for relative_path in relative_paths])
+            for relative_path, processed_text in zip(relative_paths, processed_texts):
+                file_contents[relative_path] = processed_text
+
+    def _get_cache_key(self, file_type: FileType, text: str, relative_path: str) -> Optional[str]:
+        """Cache key of a text file's processed output, or None if it is not cached.
+
+        Only files that go through a processing function are cached: the others are output as is.
+        """
+        if self.cache is None:
+            return None
+        processing_funcs: List[Callable[..., object]] = []
+        if text_processing_func := self._get_text_processing_func(file_type=file_type, relative_path=relative_path):
+            processing_funcs.append(text_processing_func)
+        if text_batch_processing_func := self._get_text_batch_processing_func(mime=file_type.mime, relative_path=relative_path):
+            processing_funcs.append(text_batch_processing_func)
+        if not processing_funcs:
+            return None
+        processing_name = "+".join(_get_processing_func_name(func) for func in processing_funcs)
+        return self.cache.make_key(text=text, mime=file_type.mime, processing_name=processing_name)
+
+    def _get_from_cache(self, cache_key: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.get(cache_key)
+
+    def _store_in_cache(self, file_contents: Dict[str, str], cache_keys: Dict[str, str]) -> None:
+        if self.cache is None:
+            return
+        for relative_path, cache_key in cache_keys.items():
+            if relative_path in file_contents:
+                self.cache.put(key=cache_key, processed_text=file_contents[relative_path])
+
+    def _load_file(self, file_path: str, relative_path: Optional[str] = None) -> Optional[FileType | Tuple[FileType, str]]:
+        """Load a file as text if it is one, or return its type. Returns None if the type can't be determined."""
+        try:
+            with profile_phase(self.profiler, ProfilePhase.READ, relative_path=relative_path):
+                text = load_if_text(file_path=file_path, max_file_bytes=self.max_file_bytes)
+            with profile_phase(self.profiler, ProfilePhase.CLASSIFY, relative_path=relative_path):
+                if text is None:
+                    return detect_file_type_from_path(Path(file_path))
+                return determine_text_file_type(file_path), text
+        except FileTypeError as exc:
+            log.warning(f"Skipping '{file_path}' - could not determine file type: {exc}")
+            return None
+
+    def _get_text_processing_func(self, file_type: FileType, relative_path: str) -> Optional[Callable[[str], str]]:
+        if self.budget_plan is not None and (degraded_level := self.budget_plan.get_degraded_level(relative_path)):
+            return degraded_level.text_processing_funcs.get(file_type.mime)
+        if not self.text_processing_funcs:
+            return None
+        return self.text_processing_funcs.get(file_type.mime)
+
+    def _get_text_batch_processing_func(self, mime: str, relative_path: str) -> Optional[Callable[[List[str]], List[str]]]:
+        if self.budget_plan is not None and (degraded_level := self.budget_plan.get_degraded_level(relative_path)):
+            return degraded_level.text_batch_processing_funcs.get(mime)
+        if not self.text_batch_processing_funcs:
+            return None
+        return self.text_batch_processing_funcs.get(mime)
+
+    def _specific_binary_file_processing(self, file_path: str, file_type: FileType) -> str:
+        """Process a specific binary file based on its type."""
+        # TODO: handle pdf files and other formats
+        return f"Binary content: '{file_type.mime}'"
 
     ##########################################################################################
     # Output content
@@ -338,77 +765,234 @@ class RepoxProcessor:
         file_contents: Dict[str, str],
     ) -> str:
         """Generate the output content for the repository."""
+        with profile_phase(self.profiler, ProfilePhase.FORMAT):
+            match self.output_style:
+                case OutputStyle.REPO_MAP:
+                    return "".join(self._iter_repo_map(tree_structure=tree_structure, file_texts=file_contents.items()))
+                case OutputStyle.COMPACT:
+                    return "".join(self._iter_compact(tree_structure=tree_structure, file_texts=file_contents.items()))
+                case OutputStyle.FLAT:
+                    return build_flat_output(file_contents=file_contents)
+                case OutputStyle.IMPORT_LIST:
+                    return build_import_list(file_contents=file_contents)
+                case OutputStyle.TREE:
+                    return tree_structure
+                case OutputStyle.CONTAINER:
+                    raise RepoxException("The container output style is binary, it can only be written to a stream with write_output_content")
+
+    def iter_output_content(self, tree_structure: str, file_records: Iterable[FileRecord]) -> Iterator[str]:
+        """Generate the output content for the repository chunk by chunk, consuming the file records as they come.
+
+        Args:
+            tree_structure: Tree structure of the repository
+            file_records: Records of the files, as generated by `iter_file_records`, possibly filtered
+
+        Yields:
+            Chunks of the output content
+        """
         match self.output_style:
             case OutputStyle.REPO_MAP:
-                return self._build_repo_map(tree_structure=tree_structure, file_contents=file_contents)
+                yield from self._iter_repo_map(
+                    tree_structure=tree_structure,
+                    file_texts=((file_record.relative_path, file_record.text) for file_record in file_records),
+                )
+            case OutputStyle.COMPACT:
+                yield from self._iter_compact(
+                    tree_structure=tree_structure,
+                    file_texts=((file_record.relative_path, file_record.text) for file_record in file_records),
+                )
             case OutputStyle.FLAT:
-                return build_flat_output(file_contents=file_contents)
+                yield from iter_flat_output(file_records=file_records)
             case OutputStyle.IMPORT_LIST:
-                return build_import_list(file_contents=file_contents)
+                yield from iter_import_list(file_records=file_records)
             case OutputStyle.TREE:
-                return tree_structure
-
-    def _build_repo_map(
-        self,
-        tree_structure: str,
-        file_contents: Dict[str, str],
-    ) -> str:
-        """Generate the output content for the repository."""
-        output_content: List[str] = []
-        project_name = os.path.basename(self.repo_path)
-        output_content.append(f"Directory: {project_name}\n\n")
-        output_content.append("Directory Structure:\n")
-        output_content.append(f"{self.repo_path}: ```tree\n")
-
-        if self.repo_path.startswith("/"):
-            tree_structure = tree_structure.replace(self.repo_path, "")
+                yield tree_structure
+            case OutputStyle.CONTAINER:
+                raise RepoxException("The container output style is binary, it can only be written to a stream with write_output_content")
 
-        output_content.append(tree_structure + "\n```\n")
+    def write_output_content(self, tree_structure: str, output: BinaryIO) -> None:
+        """Write the output content for the repository to a binary stream, as files are processed.
 
-        for relative_path, file_content in file_contents.items():
-            output_content.append(f"\n{relative_path}: ```\n")
-            output_content.append(file_content)
-            output_content.append("\n```\n")
-
-        output_content.append("\n")
-        return "".join(output_content)
-
-    def _is_ignored_path(
-        self,
-        file_path: str,
-    ) -> bool:
-        """Check if a file path should be ignored based on predefined rules.
-
-        Args:
-            file_path: Path to check
+        Gives the same bytes as encoding `build_output_content` in UTF-8, but the repo map, compact and
+        flat styles only hold one window of processed files in memory, and the files that no
+        processing function applies to are copied from disk without being decoded. The container
+        style, being binary, can only be written this way.
+        """
+        output_writer = RepoxOutputWriter(processor=self, output=output)
+        output_writer.start(tree_structure=tree_structure)
+        if self.output_style != OutputStyle.TREE:
+            # Duplicates are found from the processed contents, so files can't be copied without being read
+            is_verbatim_copy_allowed = self.output_style == OutputStyle.FLAT or (
+                self.output_style == OutputStyle.REPO_MAP and self.dedup_mode == DedupMode.NONE
+            )
+            for walked_file, file_content in self.iter_file_contents(
+                window_size=STREAMING_WINDOW_SIZE,
+                is_verbatim_copy_allowed=is_verbatim_copy_allowed,
+            ):
+                output_writer.write_file(walked_file=walked_file, file_content=file_content)
+        output_writer.end()
+
+    def copy_verbatim(self, walked_file: WalkedFile, output: BinaryIO, header: bytes) -> bool:
+        """Copy a file as is after its header, or write the binary file placeholder if it is not text.
 
         Returns:
-            bool: True if path should be ignored, False otherwise
+            False if the file was skipped and nothing was written
         """
-        # Check for .png files
-        if file_path.endswith(".png"):
-            log.verbose(f"Path ignored: {file_path} (PNG file)")
-            return True
-
-        # Check against ignored paths from config
-        if any(ignored in file_path for ignored in REPOX_IGNORED_PATHS):
-            log.verbose(f"Path ignored: {file_path} (matches config ignored paths)")
-            return True
-
-        # Check include patterns if specified
-        if self.include_patterns:
-            filename = os.path.basename(file_path)
-            # If none of the patterns match, ignore the file
-            if not any(fnmatch.fnmatch(filename, pattern) for pattern in self.include_patterns):
-                log.verbose(f"Path ignored: {file_path} (doesn't match any include patterns)")
+        with profile_phase(self.profiler, ProfilePhase.WRITE):
+            if copy_text_file_bytes(file_path=walked_file.path, output=output, header=header):
                 return True
+        try:
+            file_type = detect_file_type_from_path(Path(walked_file.path))
+        except FileTypeError as exc:
+            log.warning(f"Skipping '{walked_file.path}' - could not determine file type: {exc}")
+            return False
+        output.write(header)
+        output.write(self._specific_binary_file_processing(file_path=walked_file.path, file_type=file_type).encode())
+        return True
+
+    def get_repo_map_header(self, tree_structure: str) -> str:
+        repo_map_header = self._repo_map_base_header(tree_structure=tree_structure)
+        if budget_plan := self.get_budget_plan():
+            repo_map_header += f"\n{budget_plan.describe()}"
+        return repo_map_header
+
+    def _repo_map_base_header(self, tree_structure: str) -> str:
+        project_name = os.path.basename(self.repo_path)
+        return f"Directory: {project_name}\n\nDirectory Structure:\n{self.repo_path}: ```tree\n{tree_structure}\n```\n"
+
+    def _iter_repo_map(self, tree_structure: str, file_texts: Iterable[Tuple[str, str]]) -> Iterator[str]:
+        """Generate the repo map from the relative paths and processed contents of the files."""
+        yield self.get_repo_map_header(tree_structure=tree_structure)
+        deduplicator = RepoxDeduplicator(dedup_mode=self.dedup_mode)
+        for relative_path, file_content in file_texts:
+            yield f"\n{relative_path}: ```\n"
+            yield deduplicator.deduplicate(relative_path=relative_path, file_content=file_content)
+            yield "\n```\n"
+
+        yield "\n"
+        deduplicator.log_summary()
+
+    def get_compact_header(self, tree_structure: str) -> str:
+        compact_header = self._compact_base_header(tree_structure=tree_structure)
+        if budget_plan := self.get_budget_plan():
+            compact_header += f"\n{budget_plan.describe()}"
+        return compact_header
+
+    def _compact_base_header(self, tree_structure: str) -> str:
+        return f"Repository: {os.path.basename(self.repo_path)}\n{tree_structure}\n"
+
+    def make_compact_file_chunk(self, relative_path: str, file_content: str) -> str:
+        """Make the part of the compact output of a file: a one line header, the `head` command's, then its normalized content."""
+        file_content = make_compact_file_content(file_content=file_content, strip_license_headers=self.strip_license_headers)
+        return f"\n==> {relative_path} <==\n{file_content}\n"
+
+    def _iter_compact(self, tree_structure: str, file_texts: Iterable[Tuple[str, str]]) -> Iterator[str]:
+        """Generate the compact output from the relative paths and processed contents of the files."""
+        yield self.get_compact_header(tree_structure=tree_structure)
+        deduplicator = RepoxDeduplicator(dedup_mode=self.dedup_mode)
+        for relative_path, file_content in file_texts:
+            file_content = deduplicator.deduplicate(relative_path=relative_path, file_content=file_content)
+            yield self.make_compact_file_chunk(relative_path=relative_path, file_content=file_content)
+        deduplicator.log_summary()
+
+
+class RepoxOutputWriter:
+    """Write the output of a processor to a binary stream, one file at a time.
+
+    The repo map, compact, flat and import list styles are written as files come, and the tree style is
+    written at the start. The container style writes a compressed record per file as files come,
+    and its index at the end.
+    """
+
+    def __init__(self, processor: RepoxProcessor, output: BinaryIO) -> None:
+        self.processor = processor
+        self.output = output
+        self._is_first_file = True
+        self._deduplicator = RepoxDeduplicator(dedup_mode=processor.dedup_mode)
+        self._container_writer: Optional[RepoxContainerWriter] = None
+
+    def _write(self, data: bytes) -> None:
+        with profile_phase(self.processor.profiler, ProfilePhase.WRITE):
+            self.output.write(data)
+
+    def start(self, tree_structure: str) -> None:
+        with profile_phase(self.processor.profiler, ProfilePhase.FORMAT):
+            self._start(tree_structure=tree_structure)
+
+    def _start(self, tree_structure: str) -> None:
+        match self.processor.output_style:
+            case OutputStyle.REPO_MAP:
+                self._write(self.processor.get_repo_map_header(tree_structure=tree_structure).encode())
+            case OutputStyle.COMPACT:
+                self._write(self.processor.get_compact_header(tree_structure=tree_structure).encode())
+            case OutputStyle.TREE:
+                self._write(tree_structure.encode())
+            case OutputStyle.CONTAINER:
+                self._container_writer = RepoxContainerWriter(output=self.output)
+                self._container_writer.write_tree(tree_structure=tree_structure)
+            case OutputStyle.FLAT | OutputStyle.IMPORT_LIST:
+                pass
+
+    def write_file(self, walked_file: WalkedFile, file_content: Optional[str]) -> None:
+        """Write the processed content of a file, or copy the file as is if its content is None."""
+        with profile_phase(self.processor.profiler, ProfilePhase.FORMAT):
+            self._write_file(walked_file=walked_file, file_content=file_content)
+
+    def _write_file(self, walked_file: WalkedFile, file_content: Optional[str]) -> None:
+        match self.processor.output_style:
+            case OutputStyle.REPO_MAP:
+                file_header = f"\n{walked_file.relative_path}: ```\n".encode()
+                if file_content is None:
+                    if not self.processor.copy_verbatim(walked_file=walked_file, output=self.output, header=file_header):
+                        return
+                else:
+                    self._write(file_header)
+                    file_content = self._deduplicator.deduplicate(relative_path=walked_file.relative_path, file_content=file_content)
+                    self._write(file_content.encode())
+                self._write(b"\n```\n")
+            case OutputStyle.COMPACT:
+                if file_content is None:
+                    raise RepoxException(f"The compact output needs the processed content of '{walked_file.relative_path}'")
+                file_content = self._deduplicator.deduplicate(relative_path=walked_file.relative_path, file_content=file_content)
+                self._write(self.processor.make_compact_file_chunk(relative_path=walked_file.relative_path, file_content=file_content).encode())
+            case OutputStyle.FLAT:
+                separator = b"" if self._is_first_file else b"\n\n"
+                if file_content is None:
+                    if not self.processor.copy_verbatim(walked_file=walked_file, output=self.output, header=separator):
+                        return
+                else:
+                    self._write(separator)
+                    self._write(file_content.encode())
+                self._is_first_file = False
+            case OutputStyle.IMPORT_LIST:
+                if file_content is None:
+                    raise RepoxException(f"The import list needs the processed content of '{walked_file.relative_path}'")
+                if (import_statement := make_import_statement(relative_path=walked_file.relative_path, file_content=file_content)) is None:
+                    return
+                if not self._is_first_file:
+                    self._write(b"\n\n")
+                self._write(import_statement.encode())
+                self._is_first_file = False
+            case OutputStyle.CONTAINER:
+                if self._container_writer is None or file_content is None:
+                    raise RepoxException(f"The container needs to be started and the processed content of '{walked_file.relative_path}'")
+                self._container_writer.write_file(relative_path=walked_file.relative_path, file_content=file_content)
+            case OutputStyle.TREE:
+                pass
+
+    def end(self) -> None:
+        with profile_phase(self.processor.profiler, ProfilePhase.FORMAT):
+            self._end()
 
-        # Check predefined ignore rules
-        ignored_dirs: List[str] = [".git"]
-        ignored_files_prefix: List[str] = ["repo-to-text_"]
-        is_ignored_dir = any(ignored in file_path for ignored in ignored_dirs)
-        is_ignored_file = any(file_path.startswith(prefix) for prefix in ignored_files_prefix)
-        result = is_ignored_dir or is_ignored_file
-        if result:
-            log.verbose(f"Path ignored: {file_path}")
-        return result
+    def _end(self) -> None:
+        match self.processor.output_style:
+            case OutputStyle.REPO_MAP:
+                self._write(b"\n")
+                self._deduplicator.log_summary()
+            case OutputStyle.COMPACT:
+                self._deduplicator.log_summary()
+            case OutputStyle.CONTAINER:
+                if self._container_writer is not None:
+                    self._container_writer.close()
+            case OutputStyle.FLAT | OutputStyle.IMPORT_LIST | OutputStyle.TREE:
+                pass
@@ -0,0 +1,120 @@
+"""
+Phase-level profiling of repox runs.
+
+`RepoxProfiler` sums the wall time and the number of operations of each phase of a run
+(walk, ignore evaluation, read, classify, transform, format and write), and the time spent
+on each file, to report where a scan spends its time. Phases nest: the time of a phase
+measured within another one, such as ignore evaluation within the walk, is only counted
+once, in the inner phase. Reads run on threads and transforms in worker processes when
+there are several jobs, so phase times can then add up to more than the wall time.
+"""
+
+import heapq
+import threading
+import time
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Dict, Generator, List, Optional, Tuple
+
+from typing_extensions import override
+
+from cocode.repox.models import ProfilePhase
+from cocode.repox.repox_walker import RepoxMatcher
+
+# Number of slowest files reported by default
+NB_SLOWEST_FILES = 10
+
+
+class RepoxProfiler:
+    """Accumulate the time and count of each phase of a run, and the time spent on each file. Thread-safe."""
+
+    def __init__(self, nb_slowest_files: int = NB_SLOWEST_FILES) -> None:
+        self.nb_slowest_files = nb_slowest_files
+        self.phase_seconds: Dict[ProfilePhase, float] = {phase: 0.0 for phase in ProfilePhase}
+        self.phase_counts: Dict[ProfilePhase, int] = {phase: 0 for phase in ProfilePhase}
+        self.file_seconds: Dict[str, float] = {}
+        self._start_time = time.perf_counter()
+        self._lock = threading.Lock()
+        # Per thread, the elapsed seconds of the phases nested in each of the phases being measured
+        self._local = threading.local()
+
+    def add(self, phase: ProfilePhase, seconds: float, count: int = 1, relative_path: Optional[str] = None) -> None:
+        """Account for time spent in a phase, measured elsewhere, such as in a worker process."""
+        with self._lock:
+            self.phase_seconds[phase] += seconds
+            self.phase_counts[phase] += count
+            if relative_path is not None:
+                self.file_seconds[relative_path] = self.file_seconds.get(relative_path, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, phase: ProfilePhase, count: int = 1, relative_path: Optional[str] = None) -> Generator[None, None, None]:
+        """Measure the time spent in a phase, leaving out the time of the phases measured within it."""
+        nested_seconds: List[float] = self._local.__dict__.setdefault("nested_seconds", [])
+        nested_seconds.append(0.0)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            inner_seconds = nested_seconds.pop()
+            if nested_seconds:
+                nested_seconds[-1] += elapsed
+            self.add(phase=phase, seconds=elapsed - inner_seconds, count=count, relative_path=relative_path)
+
+    def get_slowest_files(self) -> List[Tuple[str, float]]:
+        """The files that took the longest to read, classify and transform, slowest first."""
+        with self._lock:
+            return heapq.nlargest(self.nb_slowest_files, self.file_seconds.items(), key=lambda item: item[1])
+
+    def describe(self) -> str:
+        """Report of the time and count of each phase, and of the slowest files."""
+        wall_seconds = time.perf_counter() - self._start_time
+        total_seconds = sum(self.phase_seconds.values()) or 1.0
+        lines = [
+            f"Repox profile, {wall_seconds:.3f} s wall time:",
+            f"  {'phase':<10} {'seconds':>9} {'share':>6} {'count':>9}",
+        ]
+        for phase in ProfilePhase:
+            seconds = self.phase_seconds[phase]
+            lines.append(f"  {phase:<10} {seconds:>9.3f} {seconds / total_seconds:>6.1%} {self.phase_counts[phase]:>9}")
+        if slowest_files := self.get_slowest_files():
+            lines.append(f"Slowest {len(slowest_files)} files:")
+            lines.extend(f"  {seconds:>9.4f} s  {relative_path}" for relative_path, seconds in slowest_files)
+        return "\n".join(lines)
+
+
+def profile_phase(
+    profiler: Optional[RepoxProfiler],
+    phase: ProfilePhase,
+    count: int = 1,
+    relative_path: Optional[str] = None,
+) -> AbstractContextManager[None]:
+    """Measure a phase if there is a profiler, doing nothing otherwise."""
+    if profiler is None:
+        return nullcontext()
+    return profiler.measure(phase=phase, count=count, relative_path=relative_path)
+
+
+class ProfiledRepoxMatcher(RepoxMatcher):
+    """A matcher sharing the compiled rules of another one, measuring each evaluation of them as the ignore phase."""
+
+    def __init__(self, matcher: RepoxMatcher, profiler: RepoxProfiler) -> None:
+        self.prune_spec = matcher.prune_spec
+        self.content_ignore_spec = matcher.content_ignore_spec
+        self.include_regex = matcher.include_regex
+        self.path_regex = matcher.path_regex
+        self.profiler = profiler
+
+    @override
+    def is_dir_pruned(self, relative_dir: str) -> bool:
+        with self.profiler.measure(phase=ProfilePhase.IGNORE):
+            return super().is_dir_pruned(relative_dir)
+
+    @override
+    def is_file_ignored(self, relative_dir: str, relative_path: str, name: str) -> bool:
+        with self.profiler.measure(phase=ProfilePhase.IGNORE):
+            return super().is_file_ignored(relative_dir=relative_dir, relative_path=relative_path, name=name)
+
+    @override
+    def is_content_ignored(self, relative_path: str) -> bool:
+        with self.profiler.measure(phase=ProfilePhase.IGNORE):
+            return super().is_content_ignored(relative_path)
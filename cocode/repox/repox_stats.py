@@ -0,0 +1,259 @@
+"""
+Size and token statistics of repox outputs.
+
+The estimate is a pre-flight check: it lists the files with the same walk and rules as the
+real run, so that the numbers of files and bytes are exact, and estimates the tokens from
+the file sizes, the typical size ratio of the processing rules and a few sampled reads per
+MIME type, without processing anything. Binary files, told apart by their first bytes, only
+cost the placeholder standing for their content. The attribution processes the files and formats the
+output as the real run does, then attributes its estimated tokens to each file, directory
+and MIME type.
+"""
+
+import io
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cocode.exceptions import RepoxException
+from cocode.repox.models import DedupMode, EnumerationMode, OutputStyle, RepoxSizeEstimate, RepoxStats, RepoxTokenAttribution
+from cocode.repox.process_code import CodeProcessingRule
+from cocode.repox.process_python import PythonProcessingRule, make_python_size_ratios
+from cocode.repox.repox_budget import BINARY_FILE_TOKENS, BYTES_PER_TOKEN, FILE_SECTION_OVERHEAD_TOKENS, estimate_tokens
+from cocode.repox.repox_cache import RepoxCache
+from cocode.repox.repox_cmd import make_repox_processor
+from cocode.repox.repox_processor import STREAMING_WINDOW_SIZE, RepoxOutputWriter, RepoxProcessor
+from cocode.repox.repox_walker import WalkedFile
+from cocode.utils import determine_text_file_type, is_binary_file
+
+# Number of files read per MIME type to measure its tokens per byte
+NB_SAMPLED_FILES_PER_MIME = 3
+
+# Number of bytes read from the head of each sampled file
+SAMPLE_BYTES = 16 * 1024
+
+# Type under which binary files are counted, whatever their extension
+BINARY_MIME = "application/octet-stream"
+
+# Tokens of the "from" and "import" keywords of a statement of the import list, besides the module path
+IMPORT_STATEMENT_OVERHEAD_TOKENS = 2
+
+# Number of files, directories and MIME types listed in the report by default
+NB_TOP_ENTRIES = 10
+
+
+def repox_stats_command(
+    repo_path: str,
+    exclude_patterns: Optional[List[str]],
+    include_patterns: Optional[List[str]],
+    path_pattern: Optional[str],
+    python_processing_rule: PythonProcessingRule,
+    output_style: OutputStyle,
+    is_processed: bool = False,
+    jobs: int = 1,
+    file_timeout: Optional[float] = None,
+    use_cache: bool = True,
+    enumeration_mode: EnumerationMode = EnumerationMode.AUTO,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
+    dedup_mode: DedupMode = DedupMode.NONE,
+    strip_license_headers: bool = False,
+) -> RepoxStats:
+    """Estimate the size of the output of a repository, with the options of `repox_command`, and attribute its tokens if processed.
+
+    Args:
+        is_processed: If True, the files are also processed and the output formatted, to attribute its tokens
+
+    Returns:
+        The estimate, and the attribution if the output was processed
+    """
+    processor = make_repox_processor(
+        repo_path=repo_path,
+        exclude_patterns=exclude_patterns,
+        include_patterns=include_patterns,
+        path_pattern=path_pattern,
+        python_processing_rule=python_processing_rule,
+        output_style=output_style,
+        jobs=jobs,
+        file_timeout=file_timeout,
+        cache=RepoxCache() if use_cache and is_processed else None,
+        enumeration_mode=enumeration_mode,
+        max_file_bytes=max_file_bytes,
+        max_total_bytes=max_total_bytes,
+        token_budget=token_budget,
+        code_processing_rule=code_processing_rule,
+        dedup_mode=dedup_mode,
+        strip_license_headers=strip_license_headers,
+    )
+    estimate = estimate_repox_size(
+        processor=processor,
+        size_ratios=make_python_size_ratios(python_processing_rule=python_processing_rule, code_processing_rule=code_processing_rule),
+    )
+    return RepoxStats(
+        repo_path=repo_path,
+        output_style=output_style,
+        estimate=estimate,
+        attribution=attribute_repox_tokens(processor=processor) if is_processed else None,
+    )
+
+
+def estimate_repox_size(processor: RepoxProcessor, size_ratios: Optional[Dict[str, float]] = None) -> RepoxSizeEstimate:
+    """Estimate the size of the output of a processor without processing any file.
+
+    Files are listed by the processor's walk and selection, and their tokens are estimated from
+    their sizes, capped at max_file_bytes, times the size ratio of their MIME type, or of their
+    degraded level in the token budget plan. Binary files are counted apart, whatever their
+    extension, and only cost a placeholder each. The tokens per byte of each MIME type of the
+    text files are measured on the heads of a few files of that type, spread over the walk.
+
+    Args:
+        processor: Processor whose files and options the output is made with
+        size_ratios: Typical size of the processed text relative to the source file, by MIME type, 1 if missing
+
+    Returns:
+        The numbers of files and bytes, exact, and the estimated tokens of the output
+    """
+    start_time = time.perf_counter()
+    size_ratios = size_ratios or {}
+    walked_files = processor.walk_files()
+    content_files = processor.select_content_files() if processor.output_style != OutputStyle.TREE else []
+    if processor.output_style == OutputStyle.IMPORT_LIST:
+        # Only Python modules are listed
+        content_files = [walked_file for walked_file in content_files if walked_file.relative_path.endswith(".py")]
+    budget_plan = processor.get_budget_plan()
+
+    files_by_mime: Dict[str, List[WalkedFile]] = {}
+    for walked_file in content_files:
+        files_by_mime.setdefault(_get_stats_mime(walked_file=walked_file), []).append(walked_file)
+
+    estimate = RepoxSizeEstimate(nb_files=len(walked_files), nb_content_files=len(content_files))
+    nb_tokens = processor.estimate_header_tokens()
+    is_section_headed = processor.output_style in (OutputStyle.REPO_MAP, OutputStyle.COMPACT)
+    for mime, mime_files in files_by_mime.items():
+        tokens_per_byte: Optional[float] = None
+        if mime != BINARY_MIME:
+            tokens_per_byte, nb_sampled_files = _sample_tokens_per_byte(walked_files=mime_files)
+            estimate.nb_sampled_files += nb_sampled_files
+        for walked_file in mime_files:
+            nb_bytes = walked_file.size if processor.max_file_bytes is None else min(walked_file.size, processor.max_file_bytes)
+            estimate.nb_bytes += nb_bytes
+            if is_section_headed:
+                nb_tokens += FILE_SECTION_OVERHEAD_TOKENS + estimate_tokens(walked_file.relative_path)
+            elif processor.output_style == OutputStyle.IMPORT_LIST:
+                nb_tokens += IMPORT_STATEMENT_OVERHEAD_TOKENS + estimate_tokens(walked_file.relative_path)
+            if tokens_per_byte is None:
+                nb_tokens += BINARY_FILE_TOKENS
+                continue
+            size_ratio = size_ratios.get(mime, 1.0)
+            if budget_plan is not None and (degraded_level := budget_plan.get_degraded_level(walked_file.relative_path)) is not None:
+                size_ratio = degraded_level.size_ratio
+            nb_tokens += round(nb_bytes * size_ratio * tokens_per_byte)
+    estimate.nb_estimated_tokens = nb_tokens
+    estimate.seconds = time.perf_counter() - start_time
+    return estimate
+
+
+def _get_stats_mime(walked_file: WalkedFile) -> str:
+    """MIME type a file is counted under: the one of its extension, or BINARY_MIME if its first bytes are binary."""
+    if is_binary_file(walked_file.path):
+        return BINARY_MIME
+    return determine_text_file_type(walked_file.path).mime
+
+
+def _sample_tokens_per_byte(walked_files: List[WalkedFile]) -> Tuple[float, int]:
+    """Measure the tokens per byte of the heads of a few text files spread over a list.
+
+    Returns:
+        The tokens per byte and the number of files read
+    """
+    step = max(len(walked_files) // NB_SAMPLED_FILES_PER_MIME, 1)
+    sampled_files = walked_files[::step][:NB_SAMPLED_FILES_PER_MIME]
+    nb_tokens = 0
+    nb_bytes = 0
+    nb_sampled_files = 0
+    for walked_file in sampled_files:
+        try:
+            with open(walked_file.path, "rb") as file:
+                head = file.read(SAMPLE_BYTES)
+        except OSError:
+            continue
+        nb_sampled_files += 1
+        nb_tokens += estimate_tokens(head.decode("utf-8", errors="replace"))
+        nb_bytes += len(head)
+    if nb_bytes:
+        return nb_tokens / nb_bytes, nb_sampled_files
+    # Nothing could be read: the average of source code and docs
+    return 1 / BYTES_PER_TOKEN, nb_sampled_files
+
+
+def attribute_repox_tokens(processor: RepoxProcessor) -> RepoxTokenAttribution:
+    """Process the files of a processor and format its output, attributing the estimated tokens of each part of it.
+
+    The output is formatted by the same writer as the real run, so the header, deduplication and
+    budget plan are the same, and each file gets the tokens of everything written for it. Parts
+    are split on whitespace, so their tokens add up to the tokens of the whole output.
+
+    Returns:
+        The tokens of the output, of its header and of each file, directory and MIME type
+    """
+    if processor.output_style == OutputStyle.CONTAINER:
+        raise RepoxException("The container output style is binary, its tokens can't be counted: use a text output style")
+    start_time = time.perf_counter()
+    attribution = RepoxTokenAttribution()
+    output = io.BytesIO()
+    output_writer = RepoxOutputWriter(processor=processor, output=output)
+    output_writer.start(tree_structure=processor.get_tree_structure())
+    attribution.nb_header_tokens += _pop_output_tokens(output=output)
+    if processor.output_style != OutputStyle.TREE:
+        for walked_file, file_content in processor.iter_file_contents(window_size=STREAMING_WINDOW_SIZE):
+            output_writer.write_file(walked_file=walked_file, file_content=file_content)
+            if not (nb_tokens := _pop_output_tokens(output=output)):
+                continue
+            attribution.file_tokens[walked_file.relative_path] = nb_tokens
+            mime = _get_stats_mime(walked_file=walked_file)
+            attribution.mime_tokens[mime] = attribution.mime_tokens.get(mime, 0) + nb_tokens
+            directory_parts = walked_file.relative_path.split("/")[:-1]
+            for index in range(1, len(directory_parts) + 1):
+                directory = "/".join(directory_parts[:index])
+                attribution.directory_tokens[directory] = attribution.directory_tokens.get(directory, 0) + nb_tokens
+    output_writer.end()
+    attribution.nb_header_tokens += _pop_output_tokens(output=output)
+    attribution.nb_tokens = attribution.nb_header_tokens + sum(attribution.file_tokens.values())
+    attribution.seconds = time.perf_counter() - start_time
+    return attribution
+
+
+def _pop_output_tokens(output: io.BytesIO) -> int:
+    """Estimate the tokens written to an output since the last call, and empty it."""
+    nb_tokens = estimate_tokens(output.getvalue().decode("utf-8", errors="replace"))
+    output.seek(0)
+    output.truncate()
+    return nb_tokens
+
+
+def describe_repox_stats(stats: RepoxStats, nb_top_entries: int = NB_TOP_ENTRIES) -> str:
+    """Report of the estimate and, if there is one, of the files, directories and MIME types taking the most tokens."""
+    estimate = stats.estimate
+    lines = [
+        f"Repox stats of '{stats.repo_path}' with output style '{stats.output_style}':",
+        f"  Estimate, {estimate.seconds * 1000:.0f} ms: {estimate.nb_files} files, {estimate.nb_content_files} with content, "
+        f"{estimate.nb_bytes} bytes, ~{estimate.nb_estimated_tokens} tokens ({estimate.nb_sampled_files} files sampled)",
+    ]
+    if (attribution := stats.attribution) is None:
+        return "\n".join(lines)
+    lines.append(
+        f"  Processed, {attribution.seconds:.2f} s: {attribution.nb_tokens} tokens, {attribution.nb_header_tokens} in the tree structure and headers"
+    )
+    for title, column, entry_tokens in (
+        ("files", "file", attribution.file_tokens),
+        ("directories", "directory", attribution.directory_tokens),
+        ("MIME types", "MIME type", attribution.mime_tokens),
+    ):
+        top_entries = sorted(entry_tokens.items(), key=lambda item: item[1], reverse=True)[:nb_top_entries]
+        if not top_entries:
+            continue
+        lines.append(f"Top {len(top_entries)} {title}:")
+        lines.append(f"  {'tokens':>9} {'share':>6}  {column}")
+        lines.extend(f"  {nb_tokens:>9} {nb_tokens / max(attribution.nb_tokens, 1):>6.1%}  {name}" for name, nb_tokens in top_entries)
+    return "\n".join(lines)
@@ -0,0 +1,425 @@
+"""
+Single-pass repository enumeration for repox.
+
+`RepoxWalker` is built on `os.scandir`: ignored directories are pruned before they are
+descended into, and the `DirEntry` objects returned by the directory listing are reused
+for type and size checks instead of issuing separate `isdir`/`getsize` syscalls.
+
+`GitIndexWalker` takes the file list from git itself, so every .gitignore of the
+checkout is honored, and the file sizes from the index, so no file needs to be stat'ed.
+"""
+
+import fnmatch
+import functools
+import heapq
+import os
+import re
+import shutil
+import stat
+import subprocess
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+from pathspec import PathSpec
+from pathspec import Pattern as PathSpecPattern
+from pathspec import util as pathspec_util
+
+from cocode.repox.models import RepoxWalkStats
+
+# Number of compiled gitignore patterns kept for the matchers made later in the same process
+PATTERN_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def _compile_gitignore_pattern(line: str) -> PathSpecPattern:
+    pattern_factory = pathspec_util.lookup_pattern("gitignore")
+    return pattern_factory(line)
+
+
+def compile_path_spec(lines: List[str]) -> PathSpec[PathSpecPattern]:
+    """Compile gitignore-style lines like `PathSpec.from_lines`, reusing the patterns compiled before in the process.
+
+    Most of the cost of a PathSpec is in compiling its patterns, and the repositories processed in the
+    same process, such as those of a batch, share the built-in ignore patterns and many .gitignore lines.
+    """
+    return PathSpec([_compile_gitignore_pattern(line) for line in lines if line])
+
+
+class WalkedFile:
+    """A file kept by the walker, with the stat data gathered during the walk."""
+
+    __slots__ = ("path", "relative_path", "size", "is_content_ignored")
+
+    def __init__(self, path: str, relative_path: str, size: int, is_content_ignored: bool) -> None:
+        self.path = path
+        self.relative_path = relative_path
+        self.size = size
+        self.is_content_ignored = is_content_ignored
+
+
+class RepoxMatcher:
+    """Compiled ignore and include rules for a repository.
+
+    All the tree-level ignore sources (built-in ignored paths, command line excludes and
+    the repository .gitignore) are merged into a single PathSpec, the include globs are
+    merged into a single regex, and the path pattern is compiled once.
+    """
+
+    def __init__(
+        self,
+        prune_patterns: List[str],
+        content_ignore_patterns: List[str],
+        include_patterns: Optional[List[str]] = None,
+        path_pattern: Optional[str] = None,
+    ) -> None:
+        """Compile the matcher.
+
+        Args:
+            prune_patterns: Gitignore-style patterns excluding paths from both the tree and the contents
+            content_ignore_patterns: Gitignore-style patterns excluding files from the contents only
+            include_patterns: Optional glob patterns that file names must match
+            path_pattern: Optional regex that the relative directory of a file must match
+        """
+        self.prune_spec: PathSpec[PathSpecPattern] = compile_path_spec(prune_patterns)
+        self.content_ignore_spec: PathSpec[PathSpecPattern] = compile_path_spec(content_ignore_patterns)
+        self.include_regex: Optional[Pattern[str]] = None
+        if include_patterns:
+            self.include_regex = re.compile("|".join(fnmatch.translate(pattern) for pattern in include_patterns))
+        self.path_regex: Optional[Pattern[str]] = re.compile(path_pattern) if path_pattern else None
+
+    def is_dir_pruned(self, relative_dir: str) -> bool:
+        """Check if a directory, given relative to the repository root, must not be descended into."""
+        return self.prune_spec.match_file(relative_dir + "/")
+
+    def is_file_ignored(self, relative_dir: str, relative_path: str, name: str) -> bool:
+        """Check if a file is excluded from both the tree and the contents."""
+        if self.include_regex is not None and not self.include_regex.match(name):
+            return True
+        if self.path_regex is not None and not self.path_regex.search(relative_dir or "."):
+            return True
+        return self.prune_spec.match_file(relative_path)
+
+    def is_content_ignored(self, relative_path: str) -> bool:
+        """Check if a file is listed in the tree but its contents must be left out."""
+        return self.content_ignore_spec.match_file(relative_path)
+
+
+class RepoxWalker:
+    """Walk a repository with `os.scandir`, pruning ignored directories up front."""
+
+    def __init__(self, repo_path: str, matcher: RepoxMatcher) -> None:
+        self.repo_path = repo_path
+        self.matcher = matcher
+        self.stats = RepoxWalkStats()
+
+    def walk(self, relative_dir: str = "") -> Iterator[WalkedFile]:
+        """Yield the kept files in a deterministic, top-down order.
+
+        Within each directory, entries are sorted by name and files are yielded before
+        the sub-directories are descended into. Symlinked directories are not followed.
+
+        Args:
+            relative_dir: Directory to walk, relative to the repository root, which is walked by default
+        """
+        matcher = self.matcher
+        nb_dirs_walked = 0
+        nb_dirs_pruned = 0
+        nb_files_pruned = 0
+        nb_files_kept = 0
+
+        pending_dirs: List[str] = [relative_dir]
+        while pending_dirs:
+            relative_dir = pending_dirs.pop()
+            abs_dir = os.path.join(self.repo_path, relative_dir) if relative_dir else self.repo_path
+            try:
+                with os.scandir(abs_dir) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            nb_dirs_walked += 1
+
+            sub_dirs: List[str] = []
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    if entry.is_symlink():
+                        continue
+                    if matcher.is_dir_pruned(relative_path):
+                        nb_dirs_pruned += 1
+                        continue
+                    sub_dirs.append(relative_path)
+                    continue
+
+                if matcher.is_file_ignored(relative_dir=relative_dir, relative_path=relative_path, name=entry.name):
+                    nb_files_pruned += 1
+                    continue
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                nb_files_kept += 1
+                yield WalkedFile(
+                    path=entry.path,
+                    relative_path=relative_path,
+                    size=size,
+                    is_content_ignored=matcher.is_content_ignored(relative_path),
+                )
+
+            # Reversed so that popping from the end visits sub-directories in name order
+            pending_dirs.extend(reversed(sub_dirs))
+
+        self.stats = RepoxWalkStats(
+            nb_dirs_walked=nb_dirs_walked,
+            nb_dirs_pruned=nb_dirs_pruned,
+            nb_files_pruned=nb_files_pruned,
+            nb_files_kept=nb_files_kept,
+        )
+
+    def walk_paths(self, relative_paths: Iterable[str]) -> Iterator[WalkedFile]:
+        """Yield the kept files at or under some paths, such as the ones that changed, in top-down order for each path."""
+        for relative_path in relative_paths:
+            relative_dir, _, name = relative_path.rpartition("/")
+            if is_under_pruned_dir(matcher=self.matcher, relative_dir=relative_dir):
+                continue
+            path = os.path.join(self.repo_path, relative_path)
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.S_ISDIR(file_stat.st_mode):
+                if not os.path.islink(path) and not self.matcher.is_dir_pruned(relative_path):
+                    yield from self.walk(relative_dir=relative_path)
+            elif not self.matcher.is_file_ignored(relative_dir=relative_dir, relative_path=relative_path, name=name):
+                yield WalkedFile(
+                    path=path,
+                    relative_path=relative_path,
+                    size=file_stat.st_size,
+                    is_content_ignored=self.matcher.is_content_ignored(relative_path),
+                )
+
+
+def is_under_pruned_dir(matcher: RepoxMatcher, relative_dir: str) -> bool:
+    """Check if a directory or one of its parents is pruned."""
+    while relative_dir:
+        if matcher.is_dir_pruned(relative_dir):
+            return True
+        relative_dir = relative_dir.rpartition("/")[0]
+    return False
+
+
+def merge_walked_files(walked_files: List[WalkedFile], changed_paths: Set[str], changed_files: Iterable[WalkedFile]) -> List[WalkedFile]:
+    """Replace the files at or under some changed paths of a walk by the files walked again at these paths, keeping the walk order.
+
+    Args:
+        walked_files: Files of the whole walk, in walk order
+        changed_paths: Relative paths of the files and directories walked again
+        changed_files: Files kept at or under the changed paths by the walk again
+
+    Returns:
+        The files of the updated walk, in walk order
+    """
+
+    def is_changed(relative_path: str) -> bool:
+        while relative_path:
+            if relative_path in changed_paths:
+                return True
+            relative_path = relative_path.rpartition("/")[0]
+        return False
+
+    kept_files = [walked_file for walked_file in walked_files if not is_changed(walked_file.relative_path)]
+    new_files = {walked_file.relative_path: walked_file for walked_file in changed_files}
+    sorted_new_files = sorted(new_files.values(), key=lambda walked_file: _top_down_sort_key(walked_file.relative_path))
+    return list(heapq.merge(kept_files, sorted_new_files, key=lambda walked_file: _top_down_sort_key(walked_file.relative_path)))
+
+
+# Mode of the index entries that point to a submodule commit rather than to a file
+GIT_SUBMODULE_MODE = "160000"
+
+_GIT_DEBUG_SIZE_REGEX = re.compile(r"\bsize: (\d+)")
+_GIT_DEBUG_BLOCK_REGEX = re.compile(r"((?:  [^\n]*\n)*)(.*)", re.DOTALL)
+
+
+def is_git_work_tree(path: str) -> bool:
+    """Check if a directory is inside a git working tree."""
+    if shutil.which("git") is None:
+        return False
+    result = subprocess.run(
+        ["git", "rev-parse", "--is-inside-work-tree"],
+        cwd=path,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.returncode == 0 and result.stdout.strip() == "true"
+
+
+def _run_git_ls_files(repo_path: str, options: List[str]) -> str:
+    result = subprocess.run(
+        ["git", "ls-files", "-z", *options],
+        cwd=repo_path,
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout.decode("utf-8", errors="surrogateescape")
+
+
+def list_git_index_files(repo_path: str) -> Dict[str, Tuple[str, int]]:
+    """List the files tracked in the git index, relative to repo_path, with their mode and cached size."""
+    output = _run_git_ls_files(repo_path=repo_path, options=["--cached", "--stage", "--debug"])
+    # Each NUL-terminated "<mode> <object> <stage>\t<path>" header is followed by the indented
+    # debug lines of that entry, which end up at the start of the next NUL-separated token.
+    index_files: Dict[str, Tuple[str, int]] = {}
+    tokens = output.split("\0")
+    headers: List[str] = [tokens[0]]
+    debug_blocks: List[str] = []
+    for token in tokens[1:]:
+        block_match = _GIT_DEBUG_BLOCK_REGEX.match(token)
+        if block_match is None:
+            continue
+        debug_blocks.append(block_match.group(1))
+        headers.append(block_match.group(2))
+    for header, debug_block in zip(headers, debug_blocks):
+        entry_info, _, relative_path = header.partition("\t")
+        if not relative_path:
+            continue
+        mode = entry_info.split(" ", 1)[0]
+        size_match = _GIT_DEBUG_SIZE_REGEX.search(debug_block)
+        index_files[relative_path] = (mode, int(size_match.group(1)) if size_match else -1)
+    return index_files
+
+
+def list_git_other_files(repo_path: str) -> List[str]:
+    """List the untracked files that are not ignored by any .gitignore, relative to repo_path."""
+    output = _run_git_ls_files(repo_path=repo_path, options=["--others", "--exclude-standard"])
+    # Untracked nested repositories are listed as their directory, with a trailing slash
+    return [relative_path for relative_path in output.split("\0") if relative_path and not relative_path.endswith("/")]
+
+
+def list_git_modified_files(repo_path: str) -> Set[str]:
+    """List the tracked files that differ from the index in the working tree, deleted ones included, relative to repo_path."""
+    output = _run_git_ls_files(repo_path=repo_path, options=["--modified"])
+    return {relative_path for relative_path in output.split("\0") if relative_path}
+
+
+def list_git_ignored_dirs(repo_path: str) -> Set[str]:
+    """List the directories that git ignores as a whole, relative to repo_path."""
+    output = _run_git_ls_files(repo_path=repo_path, options=["--others", "--ignored", "--exclude-standard", "--directory"])
+    return {relative_path.rstrip("/") for relative_path in output.split("\0") if relative_path.endswith("/")}
+
+
+def _top_down_sort_key(relative_path: str) -> Tuple[Tuple[int, str], ...]:
+    """Sort key giving the same order as `RepoxWalker`: files of a directory first, then its sub-directories."""
+    parts = relative_path.split("/")
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+class GitIndexWalker:
+    """Enumerate a git checkout from its index: tracked files plus untracked files that are not ignored.
+
+    Git applies every .gitignore of the checkout, including nested ones, so the matcher given
+    to this walker should not include .gitignore patterns. File sizes come from the index,
+    except for untracked files, for files modified in the working tree since they were staged
+    and for entries cached as empty, which are stat'ed.
+    """
+
+    def __init__(self, repo_path: str, matcher: RepoxMatcher) -> None:
+        self.repo_path = repo_path
+        self.matcher = matcher
+        self.stats = RepoxWalkStats()
+
+    def walk(self) -> Iterator[WalkedFile]:
+        """Yield the kept files in the same order as `RepoxWalker`."""
+        matcher = self.matcher
+        index_files = list_git_index_files(repo_path=self.repo_path)
+        # The index sizes of modified files are stale, and deleted files fail to be stat'ed
+        modified_files = list_git_modified_files(repo_path=self.repo_path)
+        file_sizes: Dict[str, int] = {}
+        for relative_path, (mode, size) in index_files.items():
+            if mode == GIT_SUBMODULE_MODE:
+                continue
+            file_sizes[relative_path] = -1 if relative_path in modified_files else size
+        for relative_path in list_git_other_files(repo_path=self.repo_path):
+            file_sizes.setdefault(relative_path, -1)
+
+        dir_pruning: Dict[str, bool] = {"": False}
+        nb_dirs_pruned = 0
+        nb_files_pruned = 0
+        nb_files_kept = 0
+        for relative_path in sorted(file_sizes, key=_top_down_sort_key):
+            relative_dir, _, name = relative_path.rpartition("/")
+            if self._is_dir_pruned(relative_dir=relative_dir, dir_pruning=dir_pruning):
+                nb_files_pruned += 1
+                continue
+            if matcher.is_file_ignored(relative_dir=relative_dir, relative_path=relative_path, name=name):
+                nb_files_pruned += 1
+                continue
+            path = os.path.join(self.repo_path, relative_path)
+            size = file_sizes[relative_path]
+            if size <= 0:
+                try:
+                    file_stat = os.stat(path)
+                except OSError:
+                    # Deleted from the working tree
+                    continue
+                if stat.S_ISDIR(file_stat.st_mode):
+                    # A nested repository, or a symbolic link to a directory
+                    continue
+                size = file_stat.st_size
+            nb_files_kept += 1
+            yield WalkedFile(
+                path=path,
+                relative_path=relative_path,
+                size=size,
+                is_content_ignored=matcher.is_content_ignored(relative_path),
+            )
+
+        for relative_dir, is_pruned in dir_pruning.items():
+            if is_pruned and not dir_pruning.get(relative_dir.rpartition("/")[0], False):
+                nb_dirs_pruned += 1
+        self.stats = RepoxWalkStats(
+            nb_dirs_walked=sum(1 for is_pruned in dir_pruning.values() if not is_pruned),
+            nb_dirs_pruned=nb_dirs_pruned,
+            nb_files_pruned=nb_files_pruned,
+            nb_files_kept=nb_files_kept,
+        )
+
+    def walk_paths(self, relative_paths: Iterable[str]) -> Iterator[WalkedFile]:
+        """Yield the files git lists at or under some paths, such as the ones that changed, if kept, in top-down order."""
+        pathspecs = [f":(literal){relative_path}" for relative_path in relative_paths]
+        if not pathspecs:
+            return
+        output = _run_git_ls_files(repo_path=self.repo_path, options=["--cached", "--others", "--exclude-standard", "--", *pathspecs])
+        dir_pruning: Dict[str, bool] = {"": False}
+        for relative_path in sorted(set(filter(None, output.split("\0"))), key=_top_down_sort_key):
+            relative_dir, _, name = relative_path.rpartition("/")
+            if self._is_dir_pruned(relative_dir=relative_dir, dir_pruning=dir_pruning):
+                continue
+            if self.matcher.is_file_ignored(relative_dir=relative_dir, relative_path=relative_path, name=name):
+                continue
+            path = os.path.join(self.repo_path, relative_path)
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                # Deleted from the working tree
+                continue
+            if stat.S_ISDIR(file_stat.st_mode):
+                # A submodule
+                continue
+            yield WalkedFile(
+                path=path,
+                relative_path=relative_path,
+                size=file_stat.st_size,
+                is_content_ignored=self.matcher.is_content_ignored(relative_path),
+            )
+
+    def _is_dir_pruned(self, relative_dir: str, dir_pruning: Dict[str, bool]) -> bool:
+        """Check if a directory or one of its parents is pruned, evaluating each directory only once."""
+        is_pruned = dir_pruning.get(relative_dir)
+        if is_pruned is None:
+            parent_dir = relative_dir.rpartition("/")[0]
+            is_pruned = self._is_dir_pruned(relative_dir=parent_dir, dir_pruning=dir_pruning) or self.matcher.is_dir_pruned(relative_dir)
+            dir_pruning[relative_dir] = is_pruned
+        return is_pruned
@@ -0,0 +1,391 @@
+"""
+Watch mode for repox: regenerate the output incrementally when files change.
+
+The processed contents of every file are kept in memory. When the watcher reports changes,
+only the changed paths are walked again, and only the changed, new and re-planned files are
+processed again. The whole repository is walked again, which is cheap since ignored directories
+are pruned and no file is read, when polling or when a .gitignore changes, in which case the
+ignore rules of the walk and of the watcher are made anew. The output file is then rewritten
+atomically, with the mode of the file it replaces.
+
+Changes are received from inotify on Linux, called through ctypes, and otherwise found by
+polling the size and modification time of the files.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Set, Tuple
+
+from pipelex import log
+
+from cocode.exceptions import RepoxException
+from cocode.repox.repox_processor import RepoxProcessor
+from cocode.repox.repox_walker import RepoxMatcher, WalkedFile, list_git_ignored_dirs
+
+# Time without new events after which a burst of changes is considered over, in seconds
+DEBOUNCE_DELAY = 0.05
+# Longest time a burst of changes can delay the regeneration, in seconds
+MAX_DEBOUNCE_DELAY = 0.5
+
+# inotify constants, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileChangeWatcher(Protocol):
+    def wait_for_changes(self, timeout: Optional[float] = None) -> Optional[Set[str]]:
+        """Block until files change or the timeout expires.
+
+        Returns:
+            The relative paths reported as changed, possibly empty on timeout, or None if the
+            changes are unknown and every file must be checked
+        """
+        ...
+
+    def update_ignore_rules(self, matcher: RepoxMatcher, ignored_dirs: Optional[Set[str]]) -> None:
+        """Apply new ignore rules, after a .gitignore changed, to the directories that are watched."""
+        ...
+
+    def close(self) -> None: ...
+
+
+def is_gitignore_path(relative_path: str) -> bool:
+    return relative_path.rpartition("/")[2] == ".gitignore"
+
+
+def list_watched_dirs(
+    repo_path: str,
+    matcher: RepoxMatcher,
+    relative_dir: str = "",
+    ignored_dirs: Optional[Set[str]] = None,
+) -> List[str]:
+    """List a directory and its sub-directories that are neither pruned nor ignored, relative to repo_path.
+
+    Symlinked directories are not followed.
+    """
+    watched_dirs: List[str] = []
+    pending_dirs = [relative_dir]
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        watched_dirs.append(current_dir)
+        try:
+            with os.scandir(os.path.join(repo_path, current_dir) if current_dir else repo_path) as iterator:
+                for entry in iterator:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    sub_dir = f"{current_dir}/{entry.name}" if current_dir else entry.name
+                    if not matcher.is_dir_pruned(sub_dir) and not (ignored_dirs and sub_dir in ignored_dirs):
+                        pending_dirs.append(sub_dir)
+        except OSError:
+            continue
+    return watched_dirs
+
+
+class InotifyWatcher:
+    """Receive file changes from the Linux inotify API, with one watch per directory that is not pruned."""
+
+    def __init__(self, repo_path: str, matcher: RepoxMatcher, ignored_dirs: Optional[Set[str]] = None) -> None:
+        """Set up the watches.
+
+        Args:
+            repo_path: Root directory to watch
+            matcher: Rules of the directories that are not watched
+            ignored_dirs: Other directories that are not watched, such as the ones git ignores, relative to repo_path
+
+        Raises:
+            OSError: If inotify is not available or a watch can't be added, e.g. when the limit of watches is reached
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.repo_path = repo_path
+        self.matcher = matcher
+        self.ignored_dirs = ignored_dirs
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd: int = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error_number = ctypes.get_errno()
+            raise OSError(error_number, os.strerror(error_number))
+        self._watched_dirs: Dict[int, str] = {}
+        try:
+            for relative_dir in list_watched_dirs(repo_path=repo_path, matcher=matcher, ignored_dirs=ignored_dirs):
+                self._add_watch(relative_dir=relative_dir)
+        except OSError:
+            self.close()
+            raise
+        log.debug(f"Watching {len(self._watched_dirs)} directories with inotify")
+
+    def _add_watch(self, relative_dir: str) -> None:
+        abs_dir = os.path.join(self.repo_path, relative_dir) if relative_dir else self.repo_path
+        watch_descriptor: int = self._libc.inotify_add_watch(self._fd, os.fsencode(abs_dir), WATCH_MASK)
+        if watch_descriptor < 0:
+            error_number = ctypes.get_errno()
+            if error_number in (errno.ENOENT, errno.ENOTDIR):
+                # The directory is already gone
+                return
+            raise OSError(error_number, f"Could not watch '{abs_dir}': {os.strerror(error_number)}")
+        self._watched_dirs[watch_descriptor] = relative_dir
+
+    def wait_for_changes(self, timeout: Optional[float] = None) -> Optional[Set[str]]:
+        changed_paths: Set[str] = set()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changed_paths
+        deadline = time.monotonic() + MAX_DEBOUNCE_DELAY
+        while True:
+            if not self._read_events(changed_paths=changed_paths):
+                return None
+            remaining_delay = min(DEBOUNCE_DELAY, deadline - time.monotonic())
+            if remaining_delay <= 0:
+                return changed_paths
+            readable, _, _ = select.select([self._fd], [], [], remaining_delay)
+            if not readable:
+                return changed_paths
+
+    def _read_events(self, changed_paths: Set[str]) -> bool:
+        """Read the pending events into changed_paths. Returns False if some events were lost."""
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return True
+        offset = 0
+        while offset + _INOTIFY_EVENT_HEADER.size <= len(buffer):
+            watch_descriptor, mask, _, name_length = _INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _INOTIFY_EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset : offset + name_length].rstrip(b"\0"))
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                return False
+            relative_dir = self._watched_dirs.get(watch_descriptor)
+            if relative_dir is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._watched_dirs[watch_descriptor]
+                continue
+            if not name:
+                continue
+            relative_path = f"{relative_dir}/{name}" if relative_dir else name
+            changed_paths.add(relative_path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and not self.matcher.is_dir_pruned(relative_path):
+                try:
+                    for new_dir in list_watched_dirs(repo_path=self.repo_path, matcher=self.matcher, relative_dir=relative_path):
+                        self._add_watch(relative_dir=new_dir)
+                except OSError as exc:
+                    log.warning(f"Changes in '{relative_path}' won't be noticed: {exc}")
+        return True
+
+    def update_ignore_rules(self, matcher: RepoxMatcher, ignored_dirs: Optional[Set[str]]) -> None:
+        self.matcher = matcher
+        self.ignored_dirs = ignored_dirs
+        watched_dirs = set(list_watched_dirs(repo_path=self.repo_path, matcher=matcher, ignored_dirs=ignored_dirs))
+        for watch_descriptor, relative_dir in list(self._watched_dirs.items()):
+            if relative_dir not in watched_dirs:
+                self._libc.inotify_rm_watch(self._fd, watch_descriptor)
+                del self._watched_dirs[watch_descriptor]
+        new_dirs = watched_dirs - set(self._watched_dirs.values())
+        try:
+            for relative_dir in sorted(new_dirs):
+                self._add_watch(relative_dir=relative_dir)
+        except OSError as exc:
+            log.warning(f"Changes in some of the directories no longer ignored won't be noticed: {exc}")
+        log.debug(f"Watching {len(self._watched_dirs)} directories with inotify, after the ignore rules changed")
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Fallback watcher that waits for a fixed interval and lets every file be checked."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+
+    def wait_for_changes(self, timeout: Optional[float] = None) -> Optional[Set[str]]:
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        return None
+
+    def update_ignore_rules(self, matcher: RepoxMatcher, ignored_dirs: Optional[Set[str]]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def make_file_change_watcher(processor: RepoxProcessor, poll_interval: float) -> FileChangeWatcher:
+    """Watch the repository of a processor with inotify if possible, and poll otherwise."""
+    repo_path = processor.repo_path
+    try:
+        return InotifyWatcher(repo_path=repo_path, matcher=processor.matcher, ignored_dirs=list_ignored_dirs(processor=processor))
+    except (OSError, AttributeError) as exc:
+        # AttributeError: the C library has no inotify functions
+        log.warning(f"Could not watch '{repo_path}' with inotify, polling every {poll_interval} seconds instead: {exc}")
+        return PollingWatcher(interval=poll_interval)
+
+
+def list_ignored_dirs(processor: RepoxProcessor) -> Optional[Set[str]]:
+    """List the directories git ignores as a whole, which are not watched, when the processor lists files from the git index."""
+    return list_git_ignored_dirs(repo_path=processor.repo_path) if processor.is_git_index_used else None
+
+
+class RepoxWatchSession:
+    """Keep the processed contents of a repository up to date, and its output file with them."""
+
+    def __init__(self, processor: RepoxProcessor, output_file_path: Path, nb_padding_lines: int = 2) -> None:
+        self.processor = processor
+        self.output_file_path = output_file_path
+        self.nb_padding_lines = nb_padding_lines
+        # Processed content of each file, with the index of the degraded level it was processed at, if any
+        self._file_contents: Dict[str, Tuple[Optional[int], str]] = {}
+        self._tree_paths: List[str] = []
+        # Modification time and size of each file, to find the changed files when polling
+        self._file_stats: Dict[str, Tuple[int, int]] = {}
+
+    def start(self) -> None:
+        """Process every file and write the output file."""
+        walked_files = self.processor.refresh_walk()
+        for walked_file, file_content in self.processor.iter_file_contents():
+            if file_content is not None:
+                self._file_contents[walked_file.relative_path] = (self._get_degraded_level(walked_file), file_content)
+        self._tree_paths = [walked_file.relative_path for walked_file in walked_files]
+        self._file_stats = self._stat_files(walked_files=self.processor.select_content_files())
+        self.write_output()
+
+    def update(self, changed_paths: Optional[Set[str]]) -> int:
+        """Process again the changed files and rewrite the output file if anything changed.
+
+        Args:
+            changed_paths: Relative paths reported as changed, or None to find the changed files from their stats
+
+        Returns:
+            The number of files processed again or removed, plus one if the tree changed
+        """
+        if changed_paths is None or any(is_gitignore_path(relative_path) for relative_path in changed_paths):
+            walked_files = self.processor.refresh_walk()
+        else:
+            walked_files = self.processor.update_walk(changed_paths=changed_paths)
+        content_files = self.processor.select_content_files()
+        if changed_paths is None:
+            # The stats are only kept up to date when polling, so files changed since are just processed again
+            current_stats = self._stat_files(walked_files=content_files)
+            changed_paths = {relative_path for relative_path, file_stat in current_stats.items() if self._file_stats.get(relative_path) != file_stat}
+            self._file_stats = current_stats
+
+        files_to_process: List[WalkedFile] = []
+        for walked_file in content_files:
+            processed = self._file_contents.get(walked_file.relative_path)
+            if walked_file.relative_path in changed_paths or processed is None or processed[0] != self._get_degraded_level(walked_file):
+                files_to_process.append(walked_file)
+        content_paths = {walked_file.relative_path for walked_file in content_files}
+        removed_paths = [relative_path for relative_path in self._file_contents if relative_path not in content_paths]
+        for relative_path in removed_paths:
+            del self._file_contents[relative_path]
+        tree_paths = [walked_file.relative_path for walked_file in walked_files]
+        is_tree_changed = tree_paths != self._tree_paths
+        self._tree_paths = tree_paths
+        if not files_to_process and not removed_paths and not is_tree_changed:
+            return 0
+
+        processed_contents = self.processor.process_files(walked_files=files_to_process)
+        for walked_file in files_to_process:
+            if (file_content := processed_contents.get(walked_file.relative_path)) is not None:
+                self._file_contents[walked_file.relative_path] = (self._get_degraded_level(walked_file), file_content)
+            else:
+                self._file_contents.pop(walked_file.relative_path, None)
+        self.write_output()
+        return len(files_to_process) + len(removed_paths) + int(is_tree_changed)
+
+    def run(self, watcher: FileChangeWatcher) -> None:
+        """Regenerate the output on every change, until interrupted."""
+        log.info(f"Watching '{self.processor.repo_path}' for changes, press Ctrl+C to stop")
+        try:
+            while True:
+                changed_paths = watcher.wait_for_changes()
+                if changed_paths is not None and not changed_paths:
+                    continue
+                start_time = time.perf_counter()
+                nb_updated_files = self.update(changed_paths=changed_paths)
+                if changed_paths is not None and any(is_gitignore_path(relative_path) for relative_path in changed_paths):
+                    watcher.update_ignore_rules(matcher=self.processor.matcher, ignored_dirs=list_ignored_dirs(processor=self.processor))
+                if nb_updated_files:
+                    elapsed_ms = (time.perf_counter() - start_time) * 1000
+                    log.info(f"Updated '{self.output_file_path}' ({nb_updated_files} changes) in {elapsed_ms:.0f} ms")
+        except KeyboardInterrupt:
+            log.info("Stopped watching")
+        finally:
+            watcher.close()
+
+    def write_output(self) -> None:
+        """Write the output file from the processed contents, replacing it atomically."""
+        tree_structure = self.processor.get_tree_structure()
+        if not tree_structure.strip():
+            raise RepoxException(f"No tree structure found for path: {self.processor.repo_path}")
+        file_contents = {
+            walked_file.relative_path: self._file_contents[walked_file.relative_path][1]
+            for walked_file in self.processor.select_content_files()
+            if walked_file.relative_path in self._file_contents
+        }
+        output_content = self.processor.build_output_content(tree_structure=tree_structure, file_contents=file_contents)
+        padding = "\n" * self.nb_padding_lines
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.output_file_path.parent, prefix=f".{self.output_file_path.name}.")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as temp_file:
+                temp_file.write(padding)
+                temp_file.write(output_content)
+                temp_file.write(padding)
+            # mkstemp creates the file readable by its owner only, unlike the output files written otherwise
+            os.chmod(temp_path, self._get_output_file_mode())
+            os.replace(temp_path, self.output_file_path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _get_output_file_mode(self) -> int:
+        """Mode of the output file being replaced, or the mode of a new file for the umask."""
+        try:
+            return stat.S_IMODE(os.stat(self.output_file_path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def _get_degraded_level(self, walked_file: WalkedFile) -> Optional[int]:
+        if self.processor.budget_plan is None:
+            return None
+        return self.processor.budget_plan.degraded_levels.get(walked_file.relative_path)
+
+    def _stat_files(self, walked_files: List[WalkedFile]) -> Dict[str, Tuple[int, int]]:
+        file_stats: Dict[str, Tuple[int, int]] = {}
+        for walked_file in walked_files:
+            try:
+                file_stat = os.stat(walked_file.path)
+            except OSError:
+                continue
+            file_stats[walked_file.relative_path] = (file_stat.st_mtime_ns, file_stat.st_size)
+        return file_stats
@@ -1,7 +1,7 @@
 import json
 import os
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, cast
+from typing import Any, Dict, List, Optional, cast
 
 from pipelex import log, pretty_print
 from pipelex.core.memory.working_memory_factory import WorkingMemoryFactory
@@ -14,10 +14,19 @@ from pipelex.reporting.cost_report_renderer import render_cost_report_for_output
 from pipelex.system.pipe_run_mode import PipeRunMode
 from pipelex.tools.misc.file_utils import ensure_path, failable_load_text_from_path, load_text_from_path, save_text_to_path
 
+from cocode.diff.diff_cache import DiffCache
+from cocode.diff.diff_stream import DEFAULT_MAX_DIFF_BYTES
 from cocode.pipelines.doc_proofread.doc_proofread_models import DocumentationFile, DocumentationInconsistency, RepositoryMap
 from cocode.pipelines.doc_proofread.file_utils import create_documentation_files_from_paths
 from cocode.repox.models import OutputStyle
-from cocode.repox.process_python import PythonProcessingRule, python_imports_list, python_integral, python_interface
+from cocode.repox.process_code import CodeProcessingRule, make_code_text_processing_funcs
+from cocode.repox.process_python import (
+    PythonProcessingRule,
+    make_python_batch_processing_funcs,
+    make_python_text_processing_funcs,
+    make_python_token_budget,
+)
+from cocode.repox.repox_cache import RepoxCache
 from cocode.repox.repox_processor import RepoxProcessor
 from cocode.swe.swe_utils import get_repo_text_for_swe, process_swe_pipeline_result
 from cocode.utils import NoDifferencesFound, run_git_diff_command
@@ -49,24 +58,30 @@ async def swe_from_repo(
     output_dir: str,
     to_stdout: bool,
     pipe_run_mode: PipeRunMode,
+    use_cache: bool = True,
+    token_budget: Optional[int] = None,
+    code_processing_rule: CodeProcessingRule = CodeProcessingRule.INTEGRAL,
 ) -> None:
-    text_processing_funcs: Dict[str, Callable[[str], str]] = {}
-    match python_processing_rule:
-        case PythonProcessingRule.INTEGRAL:
-            text_processing_funcs["text/x-python"] = python_integral
-        case PythonProcessingRule.INTERFACE:
-            text_processing_funcs["text/x-python"] = python_interface
-        case PythonProcessingRule.IMPORTS:
-            text_processing_funcs["text/x-python"] = python_imports_list
-
     log.info(f"generate_repox processing: '{repo_path}' with output style: '{output_style}'")
     processor = RepoxProcessor(
         repo_path=repo_path,
         exclude_patterns=exclude_patterns,
         include_patterns=include_patterns,
         path_pattern=path_pattern,
-        text_processing_funcs=text_processing_funcs,
+        text_processing_funcs={
+            **make_python_text_processing_funcs(python_processing_rule=python_processing_rule),
+            **make_code_text_processing_funcs(code_processing_rule=code_processing_rule),
+        },
+        text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=python_processing_rule),
         output_style=output_style,
+        cache=RepoxCache() if use_cache else None,
+        token_budget=make_python_token_budget(
+            python_processing_rule=python_processing_rule,
+            max_tokens=token_budget,
+            code_processing_rule=code_processing_rule,
+        )
+        if token_budget
+        else None,
     )
     repo_text = get_repo_text_for_swe(repox_processor=processor)
 
@@ -129,13 +144,26 @@ async def swe_from_repo_diff(
     pipe_run_mode: PipeRunMode,
     include_patterns: Optional[List[str]] = None,
     exclude_patterns: Optional[List[str]] = None,
+    target_version: Optional[str] = None,
+    use_cache: bool = True,
+    max_diff_bytes: Optional[int] = DEFAULT_MAX_DIFF_BYTES,
+    reduce_noise: bool = False,
 ) -> None:
     """Process SWE analysis from a git diff comparing current version to specified version."""
-    log.info(f"Processing SWE from git diff: comparing current to '{version}' in '{repo_path}'")
+    log.info(f"Processing SWE from git diff: comparing {target_version or 'current'} to '{version}' in '{repo_path}'")
 
     # Generate git diff
     try:
-        git_diff = run_git_diff_command(repo_path=repo_path, version=version, include_patterns=include_patterns, exclude_patterns=exclude_patterns)
+        git_diff = run_git_diff_command(
+            repo_path=repo_path,
+            version=version,
+            include_patterns=include_patterns,
+            exclude_patterns=exclude_patterns,
+            target_version=target_version,
+            diff_cache=DiffCache() if use_cache else None,
+            max_bytes=max_diff_bytes,
+            reduce_noise=reduce_noise,
+        )
     except NoDifferencesFound as exc:
         log.info(f"Aborting: {exc}")
         return
@@ -174,16 +202,27 @@ async def swe_from_repo_diff_with_prompt(
     pipe_run_mode: PipeRunMode,
     include_patterns: Optional[List[str]] = None,
     exclude_patterns: Optional[List[str]] = None,
+    target_version: Optional[str] = None,
+    use_cache: bool = True,
+    max_diff_bytes: Optional[int] = DEFAULT_MAX_DIFF_BYTES,
 ) -> None:
     """Process SWE analysis from a git diff comparing current version to specified version."""
-    log.info(f"Processing SWE from git diff: comparing current to '{version}' in '{repo_path}'")
+    log.info(f"Processing SWE from git diff: comparing {target_version or 'current'} to '{version}' in '{repo_path}'")
 
     if not prompt:
         raise SweFromRepoDiffWithPromptError("Prompt is required")
 
     # Generate git diff
     try:
-        git_diff = run_git_diff_command(repo_path=repo_path, version=version, include_patterns=include_patterns, exclude_patterns=exclude_patterns)
+        git_diff = run_git_diff_command(
+            repo_path=repo_path,
+            version=version,
+            include_patterns=include_patterns,
+            exclude_patterns=exclude_patterns,
+            target_version=target_version,
+            diff_cache=DiffCache() if use_cache else None,
+            max_bytes=max_diff_bytes,
+        )
     except NoDifferencesFound as exc:
         log.info(f"Aborting: {exc}")
         return
@@ -219,12 +258,23 @@ async def swe_doc_update_from_diff(
     output_dir: str,
     include_patterns: Optional[List[str]] = None,
     exclude_patterns: Optional[List[str]] = None,
+    target_version: Optional[str] = None,
+    use_cache: bool = True,
+    max_diff_bytes: Optional[int] = DEFAULT_MAX_DIFF_BYTES,
 ) -> None:
     """Generate documentation update suggestions for docs/ directory based on git diff analysis."""
-    log.info(f"Generating documentation update suggestions from git diff: comparing current to '{version}' in '{repo_path}'")
+    log.info(f"Generating documentation update suggestions from git diff: comparing {target_version or 'current'} to '{version}' in '{repo_path}'")
 
     # Generate git diff
-    git_diff = run_git_diff_command(repo_path=repo_path, version=version, include_patterns=include_patterns, exclude_patterns=exclude_patterns)
+    git_diff = run_git_diff_command(
+        repo_path=repo_path,
+        version=version,
+        include_patterns=include_patterns,
+        exclude_patterns=exclude_patterns,
+        target_version=target_version,
+        diff_cache=DiffCache() if use_cache else None,
+        max_bytes=max_diff_bytes,
+    )
 
     pipe_output = await _execute_pipeline(
         pipe_code="doc_update",
@@ -252,11 +302,22 @@ async def swe_ai_instruction_update_from_diff(
     output_dir: str,
     include_patterns: Optional[List[str]] = None,
     exclude_patterns: Optional[List[str]] = None,
+    target_version: Optional[str] = None,
+    use_cache: bool = True,
+    max_diff_bytes: Optional[int] = DEFAULT_MAX_DIFF_BYTES,
 ) -> None:
     """Generate AI instruction update suggestions for AGENTS.md, CLAUDE.md, and cursor rules based on git diff analysis."""
-    log.info(f"Generating AI instruction update suggestions from git diff: comparing current to '{version}' in '{repo_path}'")
+    log.info(f"Generating AI instruction update suggestions from git diff: comparing {target_version or 'current'} to '{version}' in '{repo_path}'")
 
-    diff_text = run_git_diff_command(repo_path=repo_path, version=version, include_patterns=include_patterns, exclude_patterns=exclude_patterns)
+    diff_text = run_git_diff_command(
+        repo_path=repo_path,
+        version=version,
+        include_patterns=include_patterns,
+        exclude_patterns=exclude_patterns,
+        target_version=target_version,
+        diff_cache=DiffCache() if use_cache else None,
+        max_bytes=max_diff_bytes,
+    )
 
     # Read AGENTS.md content
     agents_md_path = os.path.join(repo_path, "AGENTS.md")
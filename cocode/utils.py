@@ -1,66 +1,65 @@
-import re
+import codecs
+import functools
+import logging
+import os
 import shutil
 import subprocess
 import tempfile
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import BinaryIO, List, Optional, Tuple
 
 from pipelex import log
-from pipelex.tools.misc.file_utils import load_text_from_path
 from pipelex.tools.misc.filetype_utils import FileType, detect_file_type_from_path
 
-from cocode.exceptions import NoDifferencesFound
+from cocode.diff.diff_cache import DiffCache
+from cocode.diff.diff_noise import describe_diff_noise_report, reduce_diff_noise
+from cocode.diff.diff_stream import iter_git_diff, iter_text_lines, parse_diff_lines
+from cocode.exceptions import DiffTooLarge, NoDifferencesFound
 
+# Logger that pipelex's log hands the messages of cocode's modules to, named after their top-level package
+_COCODE_LOGGER = logging.getLogger("cocode")
 
-def run_tree_command(
-    path: str,
-    nb_levels: Optional[int] = None,
-    ignored_patterns: Optional[List[str]] = None,
-    required_pattern: Optional[str] = None,
-    gitignore: bool = True,
-    path_pattern: Optional[str] = None,
-) -> str:
-    """Run the tree command and return its output."""
-    if shutil.which("tree") is None:
-        raise RuntimeError(
-            """The 'tree' command is not available.
-                Please install it using one of the following commands:
-                For MacOS: brew install tree
-                For Debian-based systems (e.g., Ubuntu): sudo apt-get install tree
-                For Red Hat-based systems (e.g., Fedora, CentOS): sudo yum install tree
-            """
-        )
 
-    tree_params = ["tree"]
-    if ignored_patterns:
-        for ignored_path in ignored_patterns:
-            tree_params.extend(["-I", ignored_path])
-    if required_pattern:
-        tree_params.extend(["-P", required_pattern])
-        log.debug(f"Required pattern: {required_pattern}")
-    tree_params.extend(["-a", "-f", "--noreport", path])
-    if nb_levels is not None:
-        tree_params.extend(["-L", str(nb_levels)])
-    if gitignore:
-        tree_params.extend(["--gitignore"])
+def is_log_enabled(level: int) -> bool:
+    """Check if messages of a level are logged, so that hot loops only build and log the ones that are.
+
+    pipelex's log inspects the call stack of every call, even when the message is then filtered out by its level.
+    """
+    return _COCODE_LOGGER.isEnabledFor(level)
+
 
-    # Run tree command
-    result = subprocess.run(tree_params, stdout=subprocess.PIPE, check=True)
+# Name of the formatter applied to python code when ruff is not installed
+PYTHON_LAYOUT_NORMALIZER_NAME = "normalize_python_layout"
 
-    # Filter output based on path_pattern if specified
-    if path_pattern:
-        lines = result.stdout.decode("utf-8").splitlines()
-        filtered_lines = [line for line in lines if re.search(path_pattern, line)]
-        return "\n".join(filtered_lines)
 
-    return result.stdout.decode("utf-8")
+def get_python_formatter_name() -> str:
+    """
+    Name and version of the formatter that `format_with_ruff` and `format_many_with_ruff` apply,
+    such as "ruff 0.14.13", or the name of the built-in normalizer if ruff is not installed.
+    """
+    ruff_path = shutil.which("ruff")
+    if ruff_path is None:
+        return PYTHON_LAYOUT_NORMALIZER_NAME
+    return _get_ruff_name(ruff_path=ruff_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_ruff_name(ruff_path: str) -> str:
+    try:
+        result = subprocess.run(args=[ruff_path, "--version"], check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "ruff"
+    return result.stdout.strip() or "ruff"
 
 
 def format_with_ruff(python_code: str) -> str:
     """
     Format the python code using ruff.
-    Returns the formatted code or the original code if formatting fails.
+    Returns the formatted code or the original code if formatting fails. If ruff is not installed,
+    the code is only normalized with `normalize_python_layout`.
     """
+    if get_python_formatter_name() == PYTHON_LAYOUT_NORMALIZER_NAME:
+        return normalize_python_layout(python_code)
     with tempfile.NamedTemporaryFile(mode="w", suffix=".py") as temp_file:
         temp_file.write(python_code)
         temp_file.flush()
@@ -76,17 +75,72 @@ def format_with_ruff(python_code: str) -> str:
             return python_code
 
 
-def check_type_and_load_if_text(file_path: str) -> FileType | Tuple[FileType, str]:
+def format_many_with_ruff(python_codes: List[str]) -> List[str]:
+    """
+    Format several python codes with a single ruff invocation.
+    Each code that ruff can't format is returned as is. If ruff is not installed,
+    the codes are only normalized with `normalize_python_layout`.
+    """
+    if not python_codes:
+        return []
+    if get_python_formatter_name() == PYTHON_LAYOUT_NORMALIZER_NAME:
+        log.debug("ruff is not available, falling back to the built-in layout normalizer")
+        return [normalize_python_layout(python_code) for python_code in python_codes]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_paths = [Path(temp_dir) / f"code_{index}.py" for index in range(len(python_codes))]
+        for file_path, python_code in zip(file_paths, python_codes):
+            file_path.write_text(python_code)
+        # ruff formats every file it can parse and exits with an error for the others, which are left untouched
+        subprocess.run(
+            args=["ruff", "format", temp_dir],
+            check=False,
+            capture_output=True,
+            text=True,
+        )
+        return [file_path.read_text() for file_path in file_paths]
+
+
+def normalize_python_layout(python_code: str) -> str:
+    """
+    Minimal formatter used when ruff is not available: strips trailing whitespace,
+    collapses runs of blank lines to at most two and ends the code with a single newline.
+    """
+    lines: List[str] = []
+    nb_blank_lines = 0
+    for line in python_code.splitlines():
+        line = line.rstrip()
+        if not line:
+            nb_blank_lines += 1
+            if nb_blank_lines > 2 or not lines:
+                continue
+        else:
+            nb_blank_lines = 0
+        lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines) + "\n"
+
+
+# Number of bytes read from the start of a file to tell text files from binary files
+SNIFF_BYTES = 8192
+
+# Line replacing the middle of a text file truncated to its head and tail
+TRUNCATION_MARKER = "[... truncated by cocode: {nb_omitted_bytes} of {nb_total_bytes} bytes omitted ...]"
+
+
+def check_type_and_load_if_text(file_path: str, max_file_bytes: Optional[int] = None) -> FileType | Tuple[FileType, str]:
     """
     Check the file type and load its content if it's a text file.
 
-    This function attempts to load a file as text and determine its type. If the file
-    can be decoded as UTF-8 text, it returns a tuple containing the determined text
-    file type along with the file content. If the file cannot be decoded as UTF-8
-    (e.g., binary files), it returns only the detected file type.
+    The first bytes of the file are sniffed to tell text from binary: a file whose prefix
+    holds a NUL byte or is not valid UTF-8 is binary, and the rest of it is never read.
+    Otherwise, the file is loaded as UTF-8 text, with newlines normalized to "\n". A text
+    file larger than max_file_bytes is reduced to its head and tail, around a truncation marker.
 
     Args:
         file_path (str): Path to the file to check and potentially load.
+        max_file_bytes (Optional[int]): Maximum number of bytes loaded from a text file, None for no limit.
 
     Returns:
         FileType | Tuple[FileType, str]: Either:
@@ -97,14 +151,142 @@ def check_type_and_load_if_text(file_path: str) -> FileType | Tuple[FileType, st
         FileNotFoundError: If the file does not exist.
         PermissionError: If the file cannot be read due to permissions.
     """
+    if (text := load_if_text(file_path=file_path, max_file_bytes=max_file_bytes)) is None:
+        return detect_file_type_from_path(Path(file_path))
+    return determine_text_file_type(file_path), text
+
+
+def load_if_text(file_path: str, max_file_bytes: Optional[int] = None) -> Optional[str]:
+    """Load a file as text, with newlines normalized, or return None if it is binary, without determining its type.
+
+    See `check_type_and_load_if_text`, which also determines the file type.
+    """
+    with open(file_path, "rb") as file:
+        prefix = file.read(SNIFF_BYTES)
+        text: Optional[str] = None
+        if not is_binary_prefix(prefix):
+            file_size = os.fstat(file.fileno()).st_size
+            try:
+                if max_file_bytes is not None and file_size > max_file_bytes:
+                    text = _load_head_and_tail(file=file, file_size=file_size, max_file_bytes=max_file_bytes)
+                else:
+                    text = (prefix + file.read()).decode("utf-8")
+            except UnicodeDecodeError:
+                # this is not an utf-8 text file after all
+                text = None
+    if text is None:
+        return None
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def is_binary_prefix(prefix: bytes) -> bool:
+    """Check if the first bytes of a file are those of a binary file: they hold a NUL byte or are not valid UTF-8."""
+    if b"\0" in prefix:
+        return True
     try:
-        text = load_text_from_path(Path(file_path))
-        text_file_type = determine_text_file_type(file_path)
-        return text_file_type, text
+        # Not final, since the prefix may end in the middle of a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
     except UnicodeDecodeError:
-        # this is not an utf-8 text file
-        file_type = detect_file_type_from_path(Path(file_path))
-        return file_type
+        return True
+    return False
+
+
+def is_binary_file(file_path: str) -> bool:
+    """Check if a file is binary from its first bytes, as `load_if_text` tells it, without reading the rest. False if it can't be read."""
+    try:
+        with open(file_path, "rb") as file:
+            return is_binary_prefix(file.read(SNIFF_BYTES))
+    except OSError:
+        return False
+
+
+def _load_head_and_tail(file: BinaryIO, file_size: int, max_file_bytes: int) -> str:
+    """Load the first and last lines of a text file, fitting in max_file_bytes, around a truncation marker.
+
+    Raises:
+        UnicodeDecodeError: If the samples are not valid UTF-8.
+    """
+    head_size = max_file_bytes // 2
+    tail_size = max_file_bytes - head_size
+    file.seek(0)
+    head = file.read(head_size)
+    file.seek(file_size - tail_size)
+    tail = file.read(tail_size)
+
+    # Cut the samples at line boundaries if there are any, and at least at character boundaries
+    if (head_end := head.rfind(b"\n")) >= 0:
+        head = head[: head_end + 1]
+    if (tail_start := tail.find(b"\n")) >= 0:
+        tail = tail[tail_start + 1 :]
+    else:
+        tail = tail.lstrip(bytes(range(0x80, 0xC0)))
+    head_text = codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    nb_head_bytes = len(head_text.encode("utf-8"))
+    tail_text = tail.decode("utf-8")
+
+    marker = TRUNCATION_MARKER.format(nb_omitted_bytes=file_size - nb_head_bytes - len(tail), nb_total_bytes=file_size)
+    separator = "" if not head_text or head_text.endswith("\n") else "\n"
+    return f"{head_text}{separator}{marker}\n{tail_text}"
+
+
+# Size of the chunks in which text files are copied verbatim into an output
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def copy_text_file_bytes(file_path: str, output: BinaryIO, header: bytes = b"") -> bool:
+    """
+    Copy a UTF-8 text file into a binary output, chunk by chunk, without loading it as a string.
+
+    The newlines are normalized to "\n", so the copied bytes are the same as loading the file
+    with `check_type_and_load_if_text` and encoding it back to UTF-8. Files larger than one chunk
+    are validated in a first pass, so nothing is written for a file that turns out not to be text.
+
+    Args:
+        file_path (str): Path to the file to copy.
+        output (BinaryIO): Binary stream the file is appended to.
+        header (bytes): Bytes written before the file contents, only if the file is text.
+
+    Returns:
+        bool: True if the file was copied, False if it is not a UTF-8 text file and nothing was written.
+    """
+    with open(file_path, "rb") as file:
+        first_chunk = file.read(COPY_CHUNK_SIZE)
+        if is_binary_prefix(first_chunk[:SNIFF_BYTES]):
+            return False
+        if len(first_chunk) < COPY_CHUNK_SIZE:
+            try:
+                first_chunk.decode("utf-8")
+            except UnicodeDecodeError:
+                return False
+            output.write(header)
+            output.write(_normalize_newlines(first_chunk))
+            return True
+
+        # Validation only: each decoded chunk is discarded right away
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            decoder.decode(first_chunk)
+            while chunk := file.read(COPY_CHUNK_SIZE):
+                decoder.decode(chunk)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return False
+
+        output.write(header)
+        file.seek(0)
+        carried_cr = b""
+        while chunk := file.read(COPY_CHUNK_SIZE):
+            chunk = carried_cr + chunk
+            # A trailing "\r" may be the first half of a "\r\n" split across two chunks
+            carried_cr = b"\r" if chunk.endswith(b"\r") else b""
+            output.write(_normalize_newlines(chunk[: len(chunk) - len(carried_cr)]))
+        if carried_cr:
+            output.write(b"\n")
+    return True
+
+
+def _normalize_newlines(data: bytes) -> bytes:
+    return data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
 
 
 def determine_text_file_type(file_path: str) -> FileType:
@@ -192,85 +374,76 @@ def determine_text_file_type(file_path: str) -> FileType:
 
 
 def run_git_diff_command(
-    repo_path: str, version: str, include_patterns: Optional[List[str]] = None, exclude_patterns: Optional[List[str]] = None
+    repo_path: str,
+    version: str,
+    include_patterns: Optional[List[str]] = None,
+    exclude_patterns: Optional[List[str]] = None,
+    max_bytes: Optional[int] = None,
+    target_version: Optional[str] = None,
+    diff_cache: Optional[DiffCache] = None,
+    reduce_noise: bool = False,
 ) -> str:
-    """Run git diff command comparing current version to specified version.
+    """Run git diff command comparing current version, or a target version, to specified version.
 
     Args:
         repo_path: Path to the git repository
         version: Git version/commit to compare against
         include_patterns: Patterns to include in diff (if not provided, includes all files)
         exclude_patterns: Patterns to exclude from diff (applied after include_patterns)
+        max_bytes: Optional maximum number of bytes of the diff, beyond which DiffTooLarge is raised
+        target_version: Optional git version/commit to compare instead of the working tree
+        diff_cache: Optional cache the diff is read from, or written to once made
+        reduce_noise: If True, renames, moved blocks, whitespace-only and generated files are collapsed to one-line notes
     """
-    if shutil.which("git") is None:
-        raise RuntimeError(
-            """The 'git' command is not available.
-                Please install git to use this functionality.
-            """
-        )
-
-    try:
-        # Default patterns to exclude from diff
-        default_exclude_patterns = [
-            "uv.lock",
-            "poetry.lock",
-            "node_modules",
-            "node_modules/**",
-            "*.lock",
-            "*.pyc",
-            "__pycache__",
-            ".git",
-            ".venv",
-            "build/",
-            "dist/",
-            "*.log",
-            "temp/",
-            ".pytest_cache",
-            ".mypy_cache",
-            ".ruff_cache",
-        ]
-
-        # Combine default patterns with user-provided patterns
-        all_exclude_patterns = default_exclude_patterns + (exclude_patterns or [])
-
-        # Build git command with inclusions and exclusions
-        git_cmd = [
-            "git",
-            "diff",
-            version,
-            "--unified=0",
-            "--",
-        ]
-
-        # Add inclusion patterns first (if provided)
-        if include_patterns:
-            for pattern in include_patterns:
-                git_cmd.append(pattern)
-        else:
-            # If no include patterns, include all files
-            git_cmd.append(".")
-
-        # Add exclusion patterns
-        for pattern in all_exclude_patterns:
-            git_cmd.append(f":(exclude){pattern}")
-
-        # Change to the repository directory and run git diff
-        result = subprocess.run(
-            git_cmd,
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True,
+    diff_text: Optional[str] = None
+    cache_key: Optional[str] = None
+    if diff_cache is not None:
+        cache_key = diff_cache.make_diff_key(
+            repo_path=repo_path,
+            version=version,
+            include_patterns=include_patterns,
+            exclude_patterns=exclude_patterns,
+            target_version=target_version,
         )
-
-        diff_text = result.stdout
-        if not diff_text.strip():
+        if cache_key is not None and (cached_diff_text := diff_cache.get(cache_key)) is not None:
+            if max_bytes is not None and len(cached_diff_text.encode()) > max_bytes:
+                raise DiffTooLarge(f"The diff is larger than the limit of {max_bytes} bytes")
+            nb_cached_lines = cached_diff_text.count("\n")
+            log.info(f"Using cached git diff with {nb_cached_lines} lines")
+            diff_text = cached_diff_text
+
+    if diff_text is None:
+        diff_texts: List[str] = []
+        nb_lines = 0
+        try:
+            for diff_file in iter_git_diff(
+                repo_path=repo_path,
+                version=version,
+                include_patterns=include_patterns,
+                exclude_patterns=exclude_patterns,
+                max_bytes=max_bytes,
+                target_version=target_version,
+            ):
+                diff_texts.append(diff_file.to_text())
+                nb_lines += diff_file.nb_lines
+        except RuntimeError as exc:
+            log.error(str(exc))
+            raise
+
+        if not diff_texts:
             raise NoDifferencesFound(f"No differences found between current version and '{version}' in '{repo_path}'")
 
-        log.info(f"Generated git diff with {len(diff_text.splitlines())} lines")
-        return diff_text
-
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Git diff command failed: {e.stderr}"
-        log.error(error_msg)
-        raise RuntimeError(error_msg)
+        log.info(f"Generated git diff with {nb_lines} lines")
+        diff_text = "".join(diff_texts)
+        if diff_cache is not None and cache_key is not None:
+            diff_cache.put(cache_key, diff_text)
+            diff_cache.end_run()
+
+    if reduce_noise:
+        diff_text, noise_report = reduce_diff_noise(
+            diff_files=list(parse_diff_lines(iter_text_lines(text=diff_text))),
+            repo_path=repo_path,
+            is_working_tree=target_version is None,
+        )
+        log.info(describe_diff_noise_report(report=noise_report))
+    return diff_text
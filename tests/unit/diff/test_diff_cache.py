@@ -0,0 +1,77 @@
+"""
+Unit tests for the persistent git diff cache.
+"""
+
+import subprocess
+import zlib
+from pathlib import Path
+from typing import List
+
+from cocode.diff.diff_cache import DiffCache
+from cocode.utils import run_git_diff_command
+
+
+def _git(repo_path: Path, args: List[str]) -> str:
+    result = subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args], cwd=repo_path, check=True, capture_output=True
+    )
+    return result.stdout.decode()
+
+
+def _make_repo(repo_path: Path) -> None:
+    """A repository with two tagged commits and a change in the working tree."""
+    (repo_path / "pkg").mkdir()
+    (repo_path / "pkg" / "module.py").write_text("".join(f"VALUE_{index} = {index}\n" for index in range(200)))
+    (repo_path / "README.md").write_text("# Example\n")
+    _git(repo_path, ["init", "-q"])
+    _git(repo_path, ["add", "."])
+    _git(repo_path, ["commit", "-q", "-m", "first"])
+    _git(repo_path, ["tag", "v1"])
+    (repo_path / "pkg" / "module.py").write_text("".join(f"VALUE_{index} = {index * 2}\n" for index in range(200)))
+    _git(repo_path, ["commit", "-q", "-am", "second"])
+    _git(repo_path, ["tag", "v2"])
+    (repo_path / "README.md").write_text("# Example\n\nChanged in the working tree.\n")
+
+
+class TestDiffCache:
+    """Test cases for caching git diffs."""
+
+    def test_cached_diff_is_reused_until_the_working_tree_changes(self, tmp_path: Path) -> None:
+        """The same diff is keyed the same, stored compressed, and a change of a tracked file or of the patterns gives another key."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        _make_repo(repo_path)
+        diff_cache = DiffCache(cache_dir=str(tmp_path / "cache"))
+
+        diff_text = run_git_diff_command(repo_path=str(repo_path), version="v1", diff_cache=diff_cache)
+        key = diff_cache.make_diff_key(repo_path=str(repo_path), version="v1")
+
+        assert key is not None
+        entry_bytes = (tmp_path / "cache" / key[:2] / key[2:]).read_bytes()
+        assert zlib.decompress(entry_bytes).decode() == diff_text
+        assert len(entry_bytes) < len(diff_text) / 2
+        assert run_git_diff_command(repo_path=str(repo_path), version="v1", diff_cache=diff_cache) == diff_text
+        assert diff_cache.nb_hits == 1
+        # Untracked files are not part of the diff
+        (repo_path / "notes.txt").write_text("untracked\n")
+        assert diff_cache.make_diff_key(repo_path=str(repo_path), version="v1") == key
+        assert diff_cache.make_diff_key(repo_path=str(repo_path), version="v1", exclude_patterns=["*.md"]) != key
+        (repo_path / "README.md").write_text("# Example\n\nChanged again.\n")
+        assert diff_cache.make_diff_key(repo_path=str(repo_path), version="v1") != key
+        assert run_git_diff_command(repo_path=str(repo_path), version="v1", diff_cache=diff_cache) != diff_text
+
+    def test_two_refs_are_diffed_without_the_working_tree(self, tmp_path: Path) -> None:
+        """Diffing two refs gives git's diff between them, keyed on the target tree rather than the working tree."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        _make_repo(repo_path)
+        diff_cache = DiffCache(cache_dir=str(tmp_path / "cache"))
+
+        diff_text = run_git_diff_command(repo_path=str(repo_path), version="v1", target_version="v2", diff_cache=diff_cache)
+        key = diff_cache.make_diff_key(repo_path=str(repo_path), version="v1", target_version="v2")
+
+        assert "README.md" not in diff_text
+        assert diff_text == run_git_diff_command(repo_path=str(repo_path), version="v1", target_version="v2")
+        (repo_path / "README.md").write_text("# Example\n\nChanged again.\n")
+        assert diff_cache.make_diff_key(repo_path=str(repo_path), version="v1", target_version="HEAD") == key
+        assert diff_cache.make_diff_key(repo_path=str(repo_path), version="missing", target_version="v2") is None
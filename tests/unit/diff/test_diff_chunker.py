@@ -0,0 +1,63 @@
+"""
+Unit tests for the token-aware diff chunker.
+"""
+
+import re
+from typing import List
+
+from cocode.diff.diff_chunker import chunk_diff
+from cocode.repox.repox_budget import estimate_tokens
+
+
+def _make_file_diff(path: str, nb_hunks: int, nb_lines_per_hunk: int) -> str:
+    lines = [f"diff --git a/{path} b/{path}\n", "index 1111111..2222222 100644\n", f"--- a/{path}\n", f"+++ b/{path}\n"]
+    for hunk_index in range(nb_hunks):
+        start = hunk_index * 100 + 1
+        lines.append(f"@@ -{start},{nb_lines_per_hunk} +{start},{nb_lines_per_hunk} @@ def function_{hunk_index}():\n")
+        lines.extend(f"-    value = compute_old_value({line_index})\n" for line_index in range(nb_lines_per_hunk))
+        lines.extend(f"+    value = compute_new_value({line_index})\x0c\n" for line_index in range(nb_lines_per_hunk))
+    return "".join(lines)
+
+
+def _make_diff(paths: List[str], nb_hunks: int = 2, nb_lines_per_hunk: int = 5) -> str:
+    return "".join(_make_file_diff(path=path, nb_hunks=nb_hunks, nb_lines_per_hunk=nb_lines_per_hunk) for path in paths)
+
+
+class TestChunkDiff:
+    """Test cases for chunking diffs between files and hunks."""
+
+    def test_chunks_cover_the_diff_and_end_between_files(self) -> None:
+        """Chunks follow each other over the whole diff, each starts a file and fits the target."""
+        diff_text = _make_diff([f"pkg/sub_{index // 4}/module_{index}.py" for index in range(12)])
+        file_tokens = estimate_tokens(_make_file_diff(path="pkg/sub_0/module_0.py", nb_hunks=2, nb_lines_per_hunk=5))
+
+        spans = chunk_diff(diff_text=diff_text, target_tokens=3 * file_tokens)
+
+        assert spans[0][0] == 0
+        assert spans[-1][1] == len(diff_text)
+        assert all(previous[1] == span[0] for previous, span in zip(spans, spans[1:]))
+        assert all(diff_text.startswith("diff --git ", start) for start, _ in spans)
+        assert all(estimate_tokens(diff_text[start:end]) <= 3 * file_tokens + 2 for start, end in spans)
+        assert chunk_diff(diff_text=diff_text, target_tokens=3 * file_tokens) == spans
+
+    def test_chunks_break_where_the_directory_changes(self) -> None:
+        """Once a chunk is half full, it ends where the next file is in another directory."""
+        paths = ["docs/guide.md", "docs/intro.md", "pkg/api.py", "pkg/cli.py", "pkg/core.py"]
+        diff_text = _make_diff(paths)
+        file_tokens = estimate_tokens(_make_file_diff(path="docs/guide.md", nb_hunks=2, nb_lines_per_hunk=5))
+
+        spans = chunk_diff(diff_text=diff_text, target_tokens=4 * file_tokens)
+
+        chunk_paths = [re.findall(r"^diff --git a/(\S+)", diff_text[start:end], flags=re.MULTILINE) for start, end in spans]
+        assert chunk_paths == [["docs/guide.md", "docs/intro.md"], ["pkg/api.py", "pkg/cli.py", "pkg/core.py"]]
+
+    def test_large_files_are_cut_between_hunks(self) -> None:
+        """A file over the target is cut between its hunks, and a hunk over the target is kept whole."""
+        diff_text = _make_diff(["small.py"]) + _make_file_diff(path="large.py", nb_hunks=3, nb_lines_per_hunk=40)
+        hunk_starts = [hunk_match.start() for hunk_match in re.finditer(r"^@@ ", diff_text, flags=re.MULTILINE)]
+
+        spans = chunk_diff(diff_text=diff_text, target_tokens=500)
+
+        assert len(spans) == 4
+        assert [start for start, _ in spans[2:]] == hunk_starts[-2:]
+        assert chunk_diff(diff_text="not a diff\n") == [(0, 11)]
@@ -0,0 +1,142 @@
+"""
+Unit tests for the noise reduction of git diffs.
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List
+
+from cocode.diff.diff_noise import NOTE_PREFIX, reduce_diff_noise
+from cocode.diff.diff_stream import iter_text_lines, parse_diff_lines
+from cocode.diff.models import DiffCollapseKind
+from cocode.utils import run_git_diff_command
+
+
+def _git(repo_path: Path, args: List[str]) -> str:
+    result = subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args], cwd=repo_path, check=True, capture_output=True
+    )
+    return result.stdout.decode()
+
+
+def _make_function(name: str, indent: str = "") -> str:
+    return "".join(
+        f"{indent}{line}\n"
+        for line in [f"def {name}(values):", "    total = 0", "    for value in values:", "        total += value", "    return total"]
+    )
+
+
+def _make_repo(repo_path: Path) -> None:
+    """A repository with a commit, then, in the working tree, one change of each kind of noise and one real change."""
+    (repo_path / "pkg").mkdir()
+    (repo_path / "pkg" / "old_name.py").write_text("".join(f"NAME_{index} = {index}\n" for index in range(50)))
+    (repo_path / "pkg" / "source.py").write_text("import os\n\n" + _make_function("moved") + "\n" + _make_function("kept"))
+    (repo_path / "pkg" / "target.py").write_text("import sys\n")
+    (repo_path / "pkg" / "style.py").write_text("".join(f"def f{index}(a, b):  \n    return a + b\t\n" for index in range(20)))
+    (repo_path / "pkg" / "schema_pb2.py").write_text("DESCRIPTOR = 1\n")
+    (repo_path / "pkg" / "lexer.py").write_text("# Code generated by lexgen. DO NOT EDIT.\nTABLE = []\n")
+    (repo_path / "vendor").mkdir()
+    (repo_path / "vendor" / "bundle.js").write_text("var a = 1;\n")
+    (repo_path / ".gitattributes").write_text("vendor/** linguist-generated\n")
+    (repo_path / "app.py").write_text("print('hello')\n")
+    _git(repo_path, ["init", "-q"])
+    _git(repo_path, ["add", "."])
+    _git(repo_path, ["commit", "-q", "-m", "first"])
+    _git(repo_path, ["tag", "v1"])
+
+    _git(repo_path, ["mv", "pkg/old_name.py", "pkg/new_name.py"])
+    (repo_path / "pkg" / "source.py").write_text("import os\n\n" + _make_function("kept"))
+    (repo_path / "pkg" / "target.py").write_text("import sys\n\n\nclass Holder:\n" + _make_function("moved", indent="    "))
+    (repo_path / "pkg" / "style.py").write_text("".join(f"def f{index}(a, b):\n    return a + b\n" for index in range(20)))
+    (repo_path / "pkg" / "schema_pb2.py").write_text("".join(f"FIELD_{index} = {index}\n" for index in range(100)))
+    (repo_path / "pkg" / "lexer.py").write_text(
+        "# Code generated by lexgen. DO NOT EDIT.\n" + "".join(f"STATE_{index} = {index}\n" for index in range(100))
+    )
+    (repo_path / "vendor" / "bundle.js").write_text("".join(f"var a{index} = {index};\n" for index in range(100)))
+    (repo_path / "app.py").write_text("print('hello, world')\n")
+
+
+class TestDiffNoise:
+    """Test cases for collapsing the noisy parts of git diffs."""
+
+    def test_noise_is_collapsed_and_real_changes_are_kept(self, tmp_path: Path) -> None:
+        """Renames, moved blocks, whitespace-only and generated files become notes, other changes are kept verbatim."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        _make_repo(repo_path)
+
+        raw_diff_text = run_git_diff_command(repo_path=str(repo_path), version="v1")
+        diff_text = run_git_diff_command(repo_path=str(repo_path), version="v1", reduce_noise=True)
+
+        assert len(diff_text) < len(raw_diff_text) / 2
+        assert f"{NOTE_PREFIX}renamed pkg/old_name.py -> pkg/new_name.py, content unchanged\n" in diff_text
+        assert f"{NOTE_PREFIX}pkg/style.py: whitespace-only changes (+40 -40 lines), diff left out\n" in diff_text
+        assert f"{NOTE_PREFIX}5 lines moved to pkg/target.py:5\n" in diff_text
+        assert f"{NOTE_PREFIX}5 lines moved from pkg/source.py:3\n" in diff_text
+        for path in ["pkg/schema_pb2.py", "pkg/lexer.py", "vendor/bundle.js"]:
+            assert f"{NOTE_PREFIX}{path}: generated file modified" in diff_text
+        # The real changes, including the unmoved lines of a file with a moved block, are kept
+        assert "+print('hello, world')\n" in diff_text
+        assert "+class Holder:\n" in diff_text
+        assert "FIELD_1 = 1" not in diff_text
+
+    def test_report_counts_the_saved_tokens(self, tmp_path: Path) -> None:
+        """Each collapse is reported with its kind and the tokens it saves."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        _make_repo(repo_path)
+
+        raw_diff_text = run_git_diff_command(repo_path=str(repo_path), version="v1")
+        _, report = reduce_diff_noise(diff_files=list(parse_diff_lines(iter_text_lines(text=raw_diff_text))), repo_path=str(repo_path))
+
+        kinds = sorted(str(collapse.kind) for collapse in report.collapses)
+        assert kinds == sorted(
+            [DiffCollapseKind.RENAME, DiffCollapseKind.WHITESPACE, DiffCollapseKind.MOVE, DiffCollapseKind.MOVE] + [DiffCollapseKind.GENERATED] * 3
+        )
+        assert all(collapse.nb_saved_tokens > 0 for collapse in report.collapses)
+        assert report.nb_tokens_after < report.nb_tokens_before
+
+    def test_markers_outside_the_leading_comment_block_are_not_generated(self, tmp_path: Path) -> None:
+        """Hand-written files whose code, comments or docstrings mention 'do not edit' near their top keep their diff."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        (repo_path / "settings.py").write_text('"""Settings, do not edit by hand."""\n\nDEBUG = False\n')
+        (repo_path / "names.py").write_text("import os\n\n# Auto-generated ids must not be reused\nNAMES = []\n")
+        _git(repo_path, ["init", "-q"])
+        _git(repo_path, ["add", "."])
+        _git(repo_path, ["commit", "-q", "-m", "first"])
+        _git(repo_path, ["tag", "v1"])
+        (repo_path / "settings.py").write_text('"""Settings, do not edit by hand."""\n\nDEBUG = True\n')
+        (repo_path / "names.py").write_text("import os\n\n# Auto-generated ids must not be reused\nNAMES = ['a']\n")
+        _git(repo_path, ["commit", "-q", "-am", "second"])
+
+        for target_version in [None, "HEAD"]:
+            diff_text = run_git_diff_command(repo_path=str(repo_path), version="v1", target_version=target_version, reduce_noise=True)
+
+            assert NOTE_PREFIX not in diff_text
+            assert "+DEBUG = True\n" in diff_text
+            assert "+NAMES = ['a']\n" in diff_text
+
+    def test_changes_of_meaningful_whitespace_are_kept(self, tmp_path: Path) -> None:
+        """Dedented python lines, spaces changed within a line and joined lines keep their diff, reindented javascript does not."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        (repo_path / "a.py").write_text("def last(values):\n    for x in values:\n        print(x)\n        return x\n")
+        (repo_path / "b.py").write_text('GREETING = "hello world"\n')
+        (repo_path / "c.js").write_text("const values = [1,\n  2];\n")
+        (repo_path / "d.js").write_text("function f() {\nreturn 1;\n}\n")
+        _git(repo_path, ["init", "-q"])
+        _git(repo_path, ["add", "."])
+        _git(repo_path, ["commit", "-q", "-m", "first"])
+        (repo_path / "a.py").write_text("def last(values):\n    for x in values:\n        print(x)\n    return x\n")
+        (repo_path / "b.py").write_text('GREETING = "hello  world"\n')
+        (repo_path / "c.js").write_text("const values = [1, 2];\n")
+        (repo_path / "d.js").write_text("function f() {\n    return 1;\n}\n")
+
+        diff_text = run_git_diff_command(repo_path=str(repo_path), version="HEAD", reduce_noise=True)
+
+        assert "+    return x\n" in diff_text
+        assert '+GREETING = "hello  world"\n' in diff_text
+        assert "+const values = [1, 2];\n" in diff_text
+        assert f"{NOTE_PREFIX}d.js: whitespace-only changes (+1 -1 lines), diff left out\n" in diff_text
+        assert diff_text.count(NOTE_PREFIX) == 1
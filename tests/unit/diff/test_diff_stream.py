@@ -0,0 +1,127 @@
+"""
+Unit tests for the streaming git diff parser.
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List
+
+import pytest
+from typer.testing import CliRunner
+
+from cocode.cli.changelog.changelog_cli import changelog_app
+from cocode.diff.diff_stream import iter_git_diff, make_git_diff_command, parse_diff_lines, unquote_git_path
+from cocode.diff.models import DiffChange
+from cocode.exceptions import DiffTooLarge, NoDifferencesFound
+from cocode.utils import run_git_diff_command
+
+
+def _git(repo_path: Path, args: List[str]) -> str:
+    result = subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args], cwd=repo_path, check=True, capture_output=True
+    )
+    return result.stdout.decode()
+
+
+def _make_repo(repo_path: Path) -> None:
+    """A repository with a commit, then changes of every kind in the working tree, staged so that renames are detected."""
+    (repo_path / "pkg").mkdir()
+    (repo_path / "pkg" / "module.py").write_text("import os\n\n\ndef make():\n    return os.sep\n")
+    (repo_path / "pkg" / "old_name.py").write_text("".join(f"VALUE_{index} = {index}\n" for index in range(20)))
+    (repo_path / "gone.md").write_text("# Gone\n")
+    (repo_path / "run.sh").write_text("echo run\n")
+    (repo_path / "dashes.txt").write_text("-- a/comment\nkept\n")
+    (repo_path / "logo.bin").write_bytes(b"\x00\x01\x02")
+    _git(repo_path, ["init", "-q"])
+    _git(repo_path, ["add", "."])
+    _git(repo_path, ["commit", "-q", "-m", "initial"])
+
+    (repo_path / "pkg" / "module.py").write_text("import os\n\n\ndef make():\n    return os.sep + os.sep\n")
+    _git(repo_path, ["mv", "pkg/old_name.py", "pkg/new name.py"])
+    (repo_path / "gone.md").unlink()
+    (repo_path / "run.sh").chmod(0o755)
+    # Once prefixed with '-', the removed line looks like a file header
+    (repo_path / "dashes.txt").write_text("kept\n")
+    (repo_path / "logo.bin").write_bytes(b"\x00\x01\x03")
+    (repo_path / "added.py").write_text("x = 1")
+    _git(repo_path, ["add", "-A"])
+
+
+class TestDiffStream:
+    """Test cases for parsing git diffs into per-file records."""
+
+    def test_records_rebuild_the_diff_of_git(self, tmp_path: Path) -> None:
+        """The text of the records is exactly the output of git, and the helper returns it."""
+        _make_repo(tmp_path)
+        git_output = _git(tmp_path, make_git_diff_command(version="HEAD")[1:])
+
+        diff_files = list(iter_git_diff(repo_path=str(tmp_path), version="HEAD"))
+
+        assert "".join(diff_file.to_text() for diff_file in diff_files) == git_output
+        assert run_git_diff_command(repo_path=str(tmp_path), version="HEAD") == git_output
+
+    def test_records_describe_each_change(self, tmp_path: Path) -> None:
+        """Added, deleted, renamed, binary and mode changes are parsed, and hunk lines are told apart from headers."""
+        _make_repo(tmp_path)
+
+        diff_files = {diff_file.path: diff_file for diff_file in iter_git_diff(repo_path=str(tmp_path), version="HEAD")}
+
+        assert set(diff_files) == {"added.py", "dashes.txt", "gone.md", "logo.bin", "pkg/module.py", "pkg/new name.py", "run.sh"}
+        assert diff_files["added.py"].change == DiffChange.ADDED
+        assert diff_files["added.py"].old_path is None
+        assert diff_files["added.py"].new_mode == "100644"
+        assert diff_files["added.py"].hunks[0].lines == ["+x = 1\n", "\\ No newline at end of file\n"]
+        assert diff_files["gone.md"].change == DiffChange.DELETED
+        assert diff_files["gone.md"].hunks[0].removed_lines == ["# Gone"]
+        renamed = diff_files["pkg/new name.py"]
+        assert (renamed.change, renamed.old_path, renamed.similarity, renamed.hunks) == (DiffChange.RENAMED, "pkg/old_name.py", 100, [])
+        assert diff_files["logo.bin"].is_binary
+        assert diff_files["run.sh"].is_mode_changed
+        assert (diff_files["run.sh"].old_mode, diff_files["run.sh"].new_mode) == ("100644", "100755")
+        hunk = diff_files["dashes.txt"].hunks[0]
+        assert (hunk.old_start, hunk.old_count, hunk.new_start, hunk.new_count) == (1, 1, 0, 0)
+        assert hunk.removed_lines == ["-- a/comment"]
+        module_hunk = diff_files["pkg/module.py"].hunks[0]
+        assert (module_hunk.old_start, module_hunk.old_count, module_hunk.section) == (5, 1, "def make():")
+        assert module_hunk.added_lines == ["    return os.sep + os.sep"]
+
+    def test_byte_cap_stops_git(self, tmp_path: Path) -> None:
+        """A diff over the cap raises as soon as the cap is exceeded, and an empty diff raises NoDifferencesFound."""
+        _make_repo(tmp_path)
+        with pytest.raises(DiffTooLarge):
+            run_git_diff_command(repo_path=str(tmp_path), version="HEAD", max_bytes=100)
+        _git(tmp_path, ["commit", "-q", "-m", "changes"])
+        with pytest.raises(NoDifferencesFound):
+            run_git_diff_command(repo_path=str(tmp_path), version="HEAD")
+
+    def test_quoted_paths_are_decoded(self) -> None:
+        """Paths quoted by git for their special characters are decoded from their escaped UTF-8 bytes."""
+        assert unquote_git_path('"a/caf\\303\\251\\t.py"') == "a/café\t.py"
+        diff_lines = ['diff --git "a/caf\\303\\251.py" "b/caf\\303\\251.py"\n', "index 1..2 100644\n", "Binary files differ\n"]
+        [diff_file] = parse_diff_lines(diff_lines)
+        assert diff_file.path == "café.py"
+
+    def test_missing_final_newlines_stay_in_their_hunk(self, tmp_path: Path) -> None:
+        """A change between two files without a final newline rebuilds git's diff, its '\\' lines kept in the hunk."""
+        (tmp_path / "note.txt").write_text("a\nfoo")
+        _git(tmp_path, ["init", "-q"])
+        _git(tmp_path, ["add", "."])
+        _git(tmp_path, ["commit", "-q", "-m", "initial"])
+        (tmp_path / "note.txt").write_text("a\nbar")
+        git_output = _git(tmp_path, make_git_diff_command(version="HEAD")[1:])
+
+        [diff_file] = iter_git_diff(repo_path=str(tmp_path), version="HEAD")
+
+        assert diff_file.to_text() == git_output
+        assert [len(hunk.lines) for hunk in diff_file.hunks] == [4]
+        assert diff_file.hunks[0].added_lines == ["bar"]
+
+    def test_diff_commands_stop_on_a_diff_over_the_cap(self, tmp_path: Path) -> None:
+        """A diff command fails with a clear error, before running its pipeline, when the diff exceeds --max-diff-bytes."""
+        _make_repo(tmp_path)
+
+        result = CliRunner().invoke(changelog_app, ["HEAD", str(tmp_path), "--max-diff-bytes", "100", "-o", str(tmp_path / "out")])
+
+        assert result.exit_code == 1
+        assert isinstance(result.exception, SystemExit)
+        assert not (tmp_path / "out").exists()
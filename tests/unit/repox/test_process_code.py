@@ -0,0 +1,185 @@
+"""
+Unit tests for the interface extractors of JavaScript, TypeScript, Go and Rust.
+"""
+
+from cocode.repox.process_code import (
+    GO_MIME,
+    CodeProcessingRule,
+    go_interface,
+    javascript_interface,
+    make_code_text_processing_funcs,
+    rust_interface,
+    typescript_interface,
+)
+
+TYPESCRIPT_CODE = """import { Http } from "./http";
+
+const RETRIES = 3;
+
+/** Options of the client. */
+export interface Options {
+  baseUrl: string;
+}
+
+/**
+ * Fetches a resource.
+ */
+export async function fetchJson<T>(url: string): Promise<T> {
+  const pattern = /}/g;
+  const message = `{${url}}`;
+  return JSON.parse(message.replace(pattern, ""));
+}
+
+export const parse = (text: string): number => {
+  return Number(text);
+};
+
+export class Client {
+  /** The base URL. */
+  readonly baseUrl: string;
+  private secret = "}";
+
+  constructor(options: Options) {
+    this.baseUrl = options.baseUrl;
+  }
+
+  get(path: string): Promise<string> {
+    return fetch(this.baseUrl + path).then((response) => response.text());
+  }
+
+  #reset(): void {}
+}
+
+function helper() {
+  return RETRIES;
+}
+"""
+
+GO_CODE = """// Package shapes computes areas.
+package shapes
+
+import "math"
+
+// Circle is a circle.
+type Circle struct {
+	Radius float64
+}
+
+const (
+	// Pi is used for areas.
+	Pi    = math.Pi
+	scale = 2
+)
+
+// Area computes the area.
+func (c Circle) Area() float64 {
+	label := "}"
+	_ = label
+	return Pi * c.Radius * c.Radius
+}
+
+func helper() {}
+"""
+
+RUST_CODE = """//! Geometry.
+
+use std::fmt;
+
+/// A circle.
+#[derive(Debug)]
+pub struct Circle {
+    pub radius: f64,
+}
+
+impl Circle {
+    /// Creates a circle.
+    pub fn new(radius: f64) -> Self {
+        let brace = '}';
+        let text = r#"}"#;
+        Self { radius }
+    }
+
+    fn secret(&self) {}
+}
+
+impl fmt::Display for Circle {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        write!(f, "{}", self.radius)
+    }
+}
+
+fn private_helper() {}
+
+#[cfg(test)]
+mod tests {
+    #[test]
+    fn it_works() {}
+}
+"""
+
+
+class TestCodeInterface:
+    """Test cases for the heuristic interface extractors."""
+
+    def test_typescript_interface(self) -> None:
+        """Exported declarations keep their doc comments and signatures, bodies and private members are left out."""
+        assert typescript_interface(TYPESCRIPT_CODE) == (
+            "/** Options of the client. */\n"
+            "export interface Options {\n"
+            "  baseUrl: string;\n"
+            "}\n\n"
+            "/**\n"
+            " * Fetches a resource.\n"
+            " */\n"
+            "export async function fetchJson<T>(url: string): Promise<T>;\n\n"
+            "export const parse = (text: string): number => ...;\n\n"
+            "export class Client {\n"
+            "  /** The base URL. */\n"
+            "  readonly baseUrl: string;\n"
+            "  constructor(options: Options);\n"
+            "  get(path: string): Promise<string>;\n"
+            "}"
+        )
+
+    def test_javascript_without_exports_keeps_all_declarations(self) -> None:
+        """Scripts and CommonJS modules have no exports, so all their top-level declarations are kept."""
+        code = '"use strict";\nconst fs = require("fs");\n\nfunction load(path) {\n  return fs.readFileSync(path);\n}\n\nexports.load = load;\n'
+        assert javascript_interface(code) == "function load(path);\n\nexports.load = load;"
+
+    def test_go_interface(self) -> None:
+        """The package clause and the exported declarations are kept, with their doc comments, without bodies."""
+        assert go_interface(GO_CODE) == (
+            "// Package shapes computes areas.\n"
+            "package shapes\n\n"
+            "// Circle is a circle.\n"
+            "type Circle struct {\n"
+            "\tRadius float64\n"
+            "}\n\n"
+            "const (\n"
+            "\t// Pi is used for areas.\n"
+            "\tPi    = math.Pi\n"
+            ")\n\n"
+            "// Area computes the area.\n"
+            "func (c Circle) Area() float64"
+        )
+
+    def test_rust_interface(self) -> None:
+        """Public items and methods are kept, trait impls are reduced to their header, and tests are left out."""
+        assert rust_interface(RUST_CODE) == (
+            "//! Geometry.\n\n"
+            "/// A circle.\n"
+            "#[derive(Debug)]\n"
+            "pub struct Circle {\n"
+            "    pub radius: f64,\n"
+            "}\n\n"
+            "impl Circle {\n"
+            "    /// Creates a circle.\n"
+            "    pub fn new(radius: f64) -> Self;\n"
+            "}\n\n"
+            "impl fmt::Display for Circle { ... }"
+        )
+
+    def test_integral_rule_registers_nothing(self) -> None:
+        """The integral rule leaves the files as they are, so that they can be copied verbatim."""
+        assert make_code_text_processing_funcs(code_processing_rule=CodeProcessingRule.INTEGRAL) == {}
+        assert make_code_text_processing_funcs(code_processing_rule=CodeProcessingRule.INTERFACE)[GO_MIME] is go_interface
@@ -0,0 +1,76 @@
+"""
+Unit tests for batch repox over many repositories.
+"""
+
+from pathlib import Path
+
+from cocode.repox.models import EnumerationMode, OutputStyle
+from cocode.repox.process_python import PythonProcessingRule
+from cocode.repox.repox_batch import list_batch_repo_paths, repox_batch_command
+from cocode.repox.repox_cmd import repox_command
+from cocode.repox.repox_walker import compile_path_spec
+
+
+def _make_repo(repo_path: Path, nb_modules: int) -> None:
+    (repo_path / "pkg").mkdir(parents=True)
+    for index in range(nb_modules):
+        (repo_path / "pkg" / f"module_{index}.py").write_text(f"import os\n\n\ndef make_{index}():\n    return os.sep * {index}\n")
+
+
+class TestRepoxBatch:
+    """Test cases for processing several repositories in a single process."""
+
+    def test_each_repository_gets_the_output_of_a_single_run(self, tmp_path: Path) -> None:
+        """Each repository's output file holds the same bytes as a separate run, and an empty repository fails alone."""
+        root = tmp_path / "repos"
+        _make_repo(root / "alpha", nb_modules=3)
+        _make_repo(root / "beta", nb_modules=5)
+        (root / "empty").mkdir()
+        (root / ".hidden").mkdir()
+
+        results = repox_batch_command(
+            root_or_manifest=str(root),
+            output_dir=str(tmp_path / "out"),
+            output_filename="repo-to-text.txt",
+            exclude_patterns=None,
+            include_patterns=None,
+            path_pattern=None,
+            python_processing_rule=PythonProcessingRule.INTERFACE,
+            output_style=OutputStyle.REPO_MAP,
+            jobs=2,
+            use_cache=False,
+            enumeration_mode=EnumerationMode.FILESYSTEM,
+        )
+
+        assert [Path(result.repo_path).name for result in results] == ["alpha", "beta", "empty"]
+        assert [result.is_success for result in results] == [True, True, False]
+        assert not (tmp_path / "out" / "repo-to-text-empty.txt").exists()
+        for repo_name in ("alpha", "beta"):
+            repox_command(
+                repo_path=str(root / repo_name),
+                exclude_patterns=None,
+                include_patterns=None,
+                path_pattern=None,
+                python_processing_rule=PythonProcessingRule.INTERFACE,
+                output_style=OutputStyle.REPO_MAP,
+                output_filename=f"{repo_name}.txt",
+                output_dir=str(tmp_path / "single"),
+                to_stdout=False,
+                use_cache=False,
+                enumeration_mode=EnumerationMode.FILESYSTEM,
+            )
+            batch_output = (tmp_path / "out" / f"repo-to-text-{repo_name}.txt").read_bytes()
+            assert batch_output == (tmp_path / "single" / f"{repo_name}.txt").read_bytes()
+
+    def test_manifest_lists_repositories_relative_to_it(self, tmp_path: Path) -> None:
+        """Manifest paths are relative to the manifest, in its order, without blank and comment lines."""
+        manifest_path = tmp_path / "manifest.txt"
+        manifest_path.write_text("# internal repositories\nservices/beta\n\n/abs/alpha\n")
+        assert list_batch_repo_paths(root_or_manifest=str(manifest_path)) == [str(tmp_path / "services" / "beta"), "/abs/alpha"]
+
+    def test_compiled_patterns_are_shared(self) -> None:
+        """The specs of different repositories reuse the patterns they have in common."""
+        first_spec = compile_path_spec(["*.lock", ".venv", "build/"])
+        second_spec = compile_path_spec(["dist/", "*.lock", ""])
+        assert first_spec.patterns[0] is second_spec.patterns[1]
+        assert second_spec.match_file("poetry.lock")
@@ -0,0 +1,135 @@
+"""
+Unit tests for repox token budget planning.
+"""
+
+from pathlib import Path
+from typing import List
+
+from pytest_mock import MockerFixture
+
+from cocode.repox.models import OutputStyle
+from cocode.repox.process_python import (
+    PYTHON_MIME,
+    PythonProcessingRule,
+    make_python_text_processing_funcs,
+    make_python_token_budget,
+)
+from cocode.repox.repox_budget import FileRank, estimate_tokens, plan_token_budget, rank_file
+from cocode.repox.repox_processor import RepoxProcessor
+from cocode.repox.repox_walker import WalkedFile
+
+
+def _walked_file(relative_path: str, size: int) -> WalkedFile:
+    return WalkedFile(path=f"/repo/{relative_path}", relative_path=relative_path, size=size, is_content_ignored=False)
+
+
+class TestTokenBudget:
+    """Test cases for file ranking and budget planning."""
+
+    def test_rank_file(self) -> None:
+        """Entry points come first, tests and fixtures last."""
+        assert rank_file("pkg/__main__.py") == FileRank.ENTRY_POINT
+        assert rank_file("pkg/models.py") == FileRank.PUBLIC_MODULE
+        assert rank_file("README.md") == FileRank.DOC_OR_CONFIG
+        assert rank_file(".config/settings.cfg") == FileRank.DOC_OR_CONFIG
+        assert rank_file("pkg/_internal/helpers.py") == FileRank.PRIVATE_MODULE
+        assert rank_file("tests/fixtures/data.py") == FileRank.TEST
+        assert rank_file("pkg/models_test.py") == FileRank.TEST
+
+    def test_estimate_tokens(self) -> None:
+        """Words count one token per 4 characters and punctuation runs one per 2 characters."""
+        assert estimate_tokens("def f(): return x") == 7
+        assert estimate_tokens("") == 0
+
+    def test_lower_ranked_files_are_degraded_then_omitted(self) -> None:
+        """Higher ranked files keep their default processing, lower ranked ones are degraded, and what doesn't fit is omitted."""
+        walked_files = [
+            _walked_file("pkg/main.py", 3200),
+            _walked_file("pkg/models.py", 3200),
+            _walked_file("tests/test_models.py", 3200),
+            _walked_file("tests/data.json", 3200),
+        ]
+        mimes = {walked_file.relative_path: PYTHON_MIME for walked_file in walked_files}
+        mimes["tests/data.json"] = "application/json"
+        token_budget = make_python_token_budget(python_processing_rule=PythonProcessingRule.INTEGRAL, max_tokens=1400)
+
+        plan = plan_token_budget(walked_files=walked_files, mimes=mimes, token_budget=token_budget, reserved_tokens=0)
+
+        assert "pkg/main.py" not in plan.degraded_levels
+        degraded_level = plan.get_degraded_level("pkg/models.py")
+        assert degraded_level is not None and degraded_level.name == PythonProcessingRule.INTERFACE
+        degraded_level = plan.get_degraded_level("tests/test_models.py")
+        assert degraded_level is not None and degraded_level.name == PythonProcessingRule.IMPORTS
+        assert plan.omitted_paths == ["tests/data.json"]
+        assert plan.estimated_tokens <= 1400
+
+    def test_omitted_files_are_never_read(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """The plan is made from the walk only, omitted files are not loaded, and the header lists them."""
+        (tmp_path / "main.py").write_text("def run():\n    pass\n")
+        (tmp_path / "tests").mkdir()
+        (tmp_path / "tests" / "big.txt").write_text("word " * 2000)
+        load_spy = mocker.spy(RepoxProcessor, "_load_file")
+        processor = RepoxProcessor(
+            repo_path=str(tmp_path),
+            text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=PythonProcessingRule.INTEGRAL),
+            output_style=OutputStyle.REPO_MAP,
+            token_budget=make_python_token_budget(python_processing_rule=PythonProcessingRule.INTEGRAL, max_tokens=200),
+        )
+
+        tree_structure = processor.get_tree_structure()
+        output_content = processor.build_output_content(tree_structure=tree_structure, file_contents=processor.process_file_contents())
+
+        loaded_paths: List[str] = [call.kwargs["file_path"] for call in load_spy.call_args_list]
+        assert loaded_paths == [str(tmp_path / "main.py")]
+        assert "Omitted files:\n- tests/big.txt\n" in output_content
+        assert "def run():" in output_content
+
+    def test_higher_ranked_files_are_placed_before_lower_ranked_ones(self) -> None:
+        """A doc competing with many test modules is kept, and the test modules only share what is left."""
+        walked_files = [_walked_file(f"tests/test_{index}.py", 20_000) for index in range(40)]
+        walked_files.append(_walked_file("README.md", 3_000))
+        mimes = {walked_file.relative_path: PYTHON_MIME for walked_file in walked_files}
+        mimes["README.md"] = "text/markdown"
+        token_budget = make_python_token_budget(python_processing_rule=PythonProcessingRule.INTEGRAL, max_tokens=2000)
+
+        plan = plan_token_budget(walked_files=walked_files, mimes=mimes, token_budget=token_budget, reserved_tokens=0)
+
+        assert "README.md" not in plan.omitted_paths
+        assert "README.md" not in plan.degraded_levels
+        assert "tests/test_39.py" in plan.omitted_paths
+
+    def test_binary_files_are_charged_their_placeholder(self, tmp_path: Path) -> None:
+        """Large binaries cost the placeholder that stands for their content, so the source files that fit are kept."""
+        (tmp_path / "assets").mkdir()
+        for index in range(3):
+            (tmp_path / "assets" / f"image_{index}.dat").write_bytes(b"\x89PNG\r\n\x1a\n\x00" * 20_000)
+        (tmp_path / "pkg").mkdir()
+        for index in range(3):
+            (tmp_path / "pkg" / f"module_{index}.py").write_text(f"def make_{index}(value):\n    return value\n" * 10)
+        processor = RepoxProcessor(
+            repo_path=str(tmp_path),
+            text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=PythonProcessingRule.INTEGRAL),
+            output_style=OutputStyle.REPO_MAP,
+            token_budget=make_python_token_budget(python_processing_rule=PythonProcessingRule.INTEGRAL, max_tokens=1000),
+        )
+
+        plan = processor.get_budget_plan()
+
+        assert plan is not None
+        assert plan.omitted_paths == []
+        assert plan.degraded_levels == {}
+        assert plan.estimated_tokens <= 1000
+
+    def test_listing_omitted_files_over_the_budget_is_told(self) -> None:
+        """Once the budget is spent, the listing of the omitted files goes over it, and the plan's description says so."""
+        walked_files = [_walked_file(f"tests/test_{index}.py", 20_000) for index in range(40)]
+        token_budget = make_python_token_budget(python_processing_rule=PythonProcessingRule.IMPORTS, max_tokens=100)
+
+        mimes = {walked_file.relative_path: PYTHON_MIME for walked_file in walked_files}
+        plan = plan_token_budget(walked_files=walked_files, mimes=mimes, token_budget=token_budget, reserved_tokens=0)
+
+        assert "tests/test_39.py" in plan.omitted_paths
+        assert plan.estimated_tokens > 100
+        assert plan.describe().startswith(
+            f"Token budget: 100 tokens, {plan.estimated_tokens} estimated, over the budget by the listing of the omitted files\n"
+        )
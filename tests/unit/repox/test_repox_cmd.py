@@ -0,0 +1,67 @@
+"""
+Unit tests for the repox command helpers.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from cocode.exceptions import RepoxException
+from cocode.repox.models import EnumerationMode, OutputStyle
+from cocode.repox.process_python import (
+    PythonProcessingRule,
+    make_python_batch_processing_funcs,
+    make_python_text_processing_funcs,
+)
+from cocode.repox.repox_cmd import parse_repox_output, stream_repox, write_repox_outputs
+from cocode.repox.repox_processor import RepoxProcessor
+
+
+class TestWriteRepoxOutputs:
+    """Test cases for writing several outputs in a single pass."""
+
+    def test_outputs_match_separate_runs(self, tmp_path: Path) -> None:
+        """Each output file has the same bytes as a separate run with its rule and style."""
+        repo_path = tmp_path / "repo"
+        (repo_path / "pkg").mkdir(parents=True)
+        (repo_path / "pkg" / "models.py").write_text('class Model:\n    """A model."""\n\n    def run(self, x):\n        return x\n')
+        (repo_path / "pkg" / "broken.py").write_text("def broken(:\n")
+        (repo_path / "notes.md").write_text("# Notes\n")
+        outputs = [
+            parse_repox_output(output) for output in ["integral:repo_map", "interface:repo_map", "imports:import_list", "interface:flat", "tree"]
+        ]
+
+        output_file_paths = write_repox_outputs(
+            repox_processor=RepoxProcessor(repo_path=str(repo_path), enumeration_mode=EnumerationMode.FILESYSTEM),
+            outputs=outputs,
+            output_dir=tmp_path,
+            output_filename="out.txt",
+        )
+
+        assert [output_file_path.name for output_file_path in output_file_paths] == [
+            "out-integral-repo_map.txt",
+            "out-interface-repo_map.txt",
+            "out-imports-import_list.txt",
+            "out-interface-flat.txt",
+            "out-tree.txt",
+        ]
+        for (python_processing_rule, output_style), output_file_path in zip(outputs, output_file_paths):
+            processor = RepoxProcessor(
+                repo_path=str(repo_path),
+                text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=python_processing_rule),
+                text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=python_processing_rule),
+                output_style=output_style,
+                enumeration_mode=EnumerationMode.FILESYSTEM,
+            )
+            separate_output_path = tmp_path / "separate.txt"
+            with open(separate_output_path, "wb") as separate_output:
+                stream_repox(repox_processor=processor, output=separate_output, nb_padding_lines=0 if output_style == OutputStyle.TREE else 2)
+            assert output_file_path.read_bytes() == separate_output_path.read_bytes()
+
+    def test_parse_repox_output(self) -> None:
+        """Outputs are given as RULE:STYLE, the style defaulting to repo_map, or as tree."""
+        assert parse_repox_output("Interface:flat") == (PythonProcessingRule.INTERFACE, OutputStyle.FLAT)
+        assert parse_repox_output("imports") == (PythonProcessingRule.IMPORTS, OutputStyle.REPO_MAP)
+        assert parse_repox_output("tree")[1] == OutputStyle.TREE
+        with pytest.raises(RepoxException):
+            parse_repox_output("signatures:repo_map")
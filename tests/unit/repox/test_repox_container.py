@@ -0,0 +1,84 @@
+"""
+Unit tests for the compressed repox container.
+"""
+
+import io
+from pathlib import Path
+
+import pytest
+
+from cocode.exceptions import RepoxException
+from cocode.repox.models import EnumerationMode, OutputStyle
+from cocode.repox.process_python import python_imports_list
+from cocode.repox.repox_cmd import repox_get_command
+from cocode.repox.repox_container import ContainerCodec, RepoxContainerReader, RepoxContainerWriter
+from cocode.repox.repox_processor import RepoxProcessor
+
+
+class TestRepoxContainer:
+    """Test cases for writing and reading repox containers."""
+
+    def test_processed_contents_are_read_back_by_path(self, tmp_path: Path) -> None:
+        """Each file of the container holds the same processed content as the other output styles."""
+        repo_path = tmp_path / "repo"
+        (repo_path / "pkg").mkdir(parents=True)
+        (repo_path / "pkg" / "module.py").write_text("import os\n\n\ndef main():\n    return os.getcwd()\n")
+        (repo_path / "notes.txt").write_text("plain text\n")
+        processor = RepoxProcessor(
+            repo_path=str(repo_path),
+            text_processing_funcs={"text/x-python": python_imports_list},
+            output_style=OutputStyle.CONTAINER,
+            enumeration_mode=EnumerationMode.FILESYSTEM,
+        )
+        tree_structure = processor.get_tree_structure()
+        container_path = tmp_path / "repox.container"
+        with open(container_path, "wb") as container_file:
+            processor.write_output_content(tree_structure=tree_structure, output=container_file)
+
+        with RepoxContainerReader(container_path=container_path) as container_reader:
+            assert container_reader.list_paths() == ["notes.txt", "pkg/module.py"]
+            assert container_reader.get_tree_structure() == tree_structure
+            for relative_path, file_content in processor.process_file_contents().items():
+                assert container_reader.read_file(relative_path=relative_path) == file_content
+            with pytest.raises(RepoxException, match="is not in the repox container"):
+                container_reader.read_file(relative_path="missing.py")
+
+    def test_zstd_records(self, tmp_path: Path) -> None:
+        """Containers are compressed with zstd when the zstandard package is installed."""
+        pytest.importorskip("zstandard")
+        container_path = tmp_path / "repox.container"
+        with open(container_path, "wb") as container_file:
+            container_writer = RepoxContainerWriter(output=container_file, codec=ContainerCodec.ZSTD)
+            container_writer.write_tree(tree_structure="a.txt")
+            container_writer.write_file(relative_path="a.txt", file_content="alpha\n" * 100)
+            container_writer.close()
+
+        with RepoxContainerReader(container_path=container_path) as container_reader:
+            assert container_reader.codec == ContainerCodec.ZSTD
+            assert container_reader.read_file(relative_path="a.txt") == "alpha\n" * 100
+
+    def test_truncated_container_is_rejected(self, tmp_path: Path) -> None:
+        """A container cut short, as by an interrupted run, is detected from its missing footer."""
+        output = io.BytesIO()
+        container_writer = RepoxContainerWriter(output=output, codec=ContainerCodec.ZLIB)
+        container_writer.write_tree(tree_structure="a.txt")
+        container_writer.write_file(relative_path="a.txt", file_content="alpha\n")
+        container_path = tmp_path / "repox.container"
+        container_path.write_bytes(output.getvalue())
+
+        with pytest.raises(RepoxException, match="truncated"):
+            RepoxContainerReader(container_path=container_path)
+
+    def test_get_command_prints_one_file(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        """The get command prints the content of the file, or the tree structure without a path."""
+        container_path = tmp_path / "repox.container"
+        with open(container_path, "wb") as container_file:
+            container_writer = RepoxContainerWriter(output=container_file, codec=ContainerCodec.ZLIB)
+            container_writer.write_tree(tree_structure="a.txt\nb.txt")
+            container_writer.write_file(relative_path="a.txt", file_content="alpha")
+            container_writer.write_file(relative_path="b.txt", file_content="beta")
+            container_writer.close()
+
+        repox_get_command(container_path=str(container_path), relative_path="b.txt")
+        repox_get_command(container_path=str(container_path), relative_path=None)
+        assert capsys.readouterr().out == "beta\na.txt\nb.txt\n"
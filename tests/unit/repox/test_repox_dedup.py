@@ -0,0 +1,62 @@
+"""
+Unit tests for the collapse of duplicate files in repo maps.
+"""
+
+import io
+from pathlib import Path
+
+from cocode.repox.models import DedupMode, EnumerationMode
+from cocode.repox.repox_dedup import RepoxDeduplicator
+from cocode.repox.repox_processor import RepoxProcessor
+
+MIGRATION = "\n".join(f"op.add_column('table', sa.Column('column_{index}', sa.Integer(), nullable=True))" for index in range(20))
+
+
+class TestRepoxDeduplicator:
+    """Test cases for the detection of exact and near duplicates."""
+
+    def test_exact_duplicates_refer_to_first_occurrence(self) -> None:
+        """Identical contents are kept once, the other files refer to the first one."""
+        deduplicator = RepoxDeduplicator(dedup_mode=DedupMode.EXACT)
+        assert deduplicator.deduplicate(relative_path="a/lib.js", file_content=MIGRATION) == MIGRATION
+        assert deduplicator.deduplicate(relative_path="b/lib.js", file_content=MIGRATION) == "[identical to a/lib.js]"
+        similar_migration = MIGRATION.replace("column_7'", "column_seven'")
+        assert deduplicator.deduplicate(relative_path="c/lib.js", file_content=similar_migration) == similar_migration
+        assert deduplicator.nb_identical_files == 1
+        assert deduplicator.nb_similar_files == 0
+
+    def test_near_duplicates_are_shown_as_diffs(self) -> None:
+        """Similar contents are replaced by a diff from the first of them, dissimilar ones are kept in full."""
+        deduplicator = RepoxDeduplicator(dedup_mode=DedupMode.NEAR)
+        deduplicator.deduplicate(relative_path="migrations/0001.py", file_content=MIGRATION)
+        similar_migration = MIGRATION.replace("column_7'", "column_seven'")
+        assert deduplicator.deduplicate(relative_path="migrations/0002.py", file_content=similar_migration) == (
+            "[similar to migrations/0001.py, differences:]\n"
+            "@@ -7,3 +7,3 @@\n"
+            " op.add_column('table', sa.Column('column_6', sa.Integer(), nullable=True))\n"
+            "-op.add_column('table', sa.Column('column_7', sa.Integer(), nullable=True))\n"
+            "+op.add_column('table', sa.Column('column_seven', sa.Integer(), nullable=True))\n"
+            " op.add_column('table', sa.Column('column_8', sa.Integer(), nullable=True))"
+        )
+        other_content = "\n".join(f"def function_{index}():\n    return {index}" for index in range(10))
+        assert deduplicator.deduplicate(relative_path="lib.py", file_content=other_content) == other_content
+        assert deduplicator.nb_similar_files == 1
+        assert deduplicator.nb_saved_bytes > len(MIGRATION) / 2
+
+    def test_streamed_repo_map_matches_built_repo_map(self, tmp_path: Path) -> None:
+        """Duplicates are collapsed the same way when the repo map is built and when it is streamed."""
+        (tmp_path / "vendor").mkdir()
+        (tmp_path / "app.py").write_text(MIGRATION)
+        (tmp_path / "vendor" / "app.py").write_text(MIGRATION)
+        (tmp_path / "vendor" / "app_copy.py").write_text(MIGRATION.replace("column_3'", "column_three'"))
+        processor = RepoxProcessor(repo_path=str(tmp_path), enumeration_mode=EnumerationMode.FILESYSTEM, dedup_mode=DedupMode.NEAR)
+        tree_structure = processor.get_tree_structure()
+
+        built = processor.build_output_content(tree_structure=tree_structure, file_contents=processor.process_file_contents())
+        streamed = io.BytesIO()
+        processor.write_output_content(tree_structure=tree_structure, output=streamed)
+
+        assert streamed.getvalue() == built.encode()
+        assert built.count("column_0") == 1
+        assert "[identical to app.py]" in built
+        assert "[similar to app.py, differences:]" in built
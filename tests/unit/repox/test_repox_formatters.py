@@ -0,0 +1,58 @@
+"""
+Unit tests for the repox output formatters.
+"""
+
+from cocode.repox.repox_formatters import build_compact_tree, build_tree_structure, make_compact_file_content, strip_license_header
+
+
+class TestBuildTreeStructure:
+    """Test cases for the native tree renderer."""
+
+    def test_renders_tree_layout(self) -> None:
+        """Entries are sorted per directory and shown with their full relative path."""
+        tree_structure = build_tree_structure(relative_paths=["src/pkg/b.py", "README.md", "src/a.py", "src/pkg/a.py"])
+
+        assert tree_structure == "\n".join(
+            [
+                ".",
+                "├── README.md",
+                "└── src",
+                "    ├── src/a.py",
+                "    └── src/pkg",
+                "        ├── src/pkg/a.py",
+                "        └── src/pkg/b.py",
+            ]
+        )
+
+    def test_empty_tree(self) -> None:
+        """Without any file only the root line is rendered."""
+        assert build_tree_structure(relative_paths=[]) == "."
+
+
+class TestCompactFormatting:
+    """Test cases for the tree and file contents of the compact style."""
+
+    def test_renders_indented_names(self) -> None:
+        """Entries are sorted per directory as in the tree layout, with names only and directories suffixed with a slash."""
+        compact_tree = build_compact_tree(relative_paths=["src/pkg/b.py", "README.md", "src/a.py", "src/pkg/a.py"])
+
+        assert compact_tree == "\n".join(["README.md", "src/", "  a.py", "  pkg/", "    a.py", "    b.py"])
+
+    def test_normalizes_whitespace_and_strips_license_header(self) -> None:
+        """Trailing whitespace and extra blank lines go, and so does a license header, after the shebang line."""
+        file_content = (
+            "#!/usr/bin/env python\n# Copyright 2024 Example\n# SPDX-License-Identifier: MIT\n\nimport os  \n\n\n\ndef main():\t\n    pass\n\n"
+        )
+
+        assert make_compact_file_content(file_content=file_content) == (
+            "#!/usr/bin/env python\n# Copyright 2024 Example\n# SPDX-License-Identifier: MIT\n\nimport os\n\ndef main():\n    pass"
+        )
+        assert make_compact_file_content(file_content=file_content, strip_license_headers=True) == (
+            "#!/usr/bin/env python\nimport os\n\ndef main():\n    pass"
+        )
+
+    def test_keeps_comments_that_are_not_license_headers(self) -> None:
+        """A leading docstring merely mentioning licenses is kept, and so is a block comment followed by code on its line."""
+        assert strip_license_header('"""Check the license files."""\nimport os\n') == '"""Check the license files."""\nimport os\n'
+        assert strip_license_header("/* Copyright 2024 */ int a;\n") == "/* Copyright 2024 */ int a;\n"
+        assert strip_license_header("/*\n * Copyright 2024 Example\n */\nint a;\n") == "int a;\n"
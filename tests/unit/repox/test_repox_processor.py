@@ -0,0 +1,236 @@
+"""
+Unit tests for the repox processor.
+"""
+
+import ast
+import hashlib
+import io
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from pytest_mock import MockerFixture
+
+from cocode.repox.models import OutputStyle
+from cocode.repox.process_python import (
+    PythonProcessingRule,
+    make_python_batch_processing_funcs,
+    make_python_text_processing_funcs,
+    python_imports_list,
+)
+from cocode.repox.repox_budget import estimate_tokens
+from cocode.repox.repox_cache import RepoxCache
+from cocode.repox.repox_processor import RepoxProcessor
+
+
+def _make_python_repo(root: Path, nb_modules: int) -> None:
+    for index in range(nb_modules):
+        module_path = root / f"pkg_{index % 3}" / f"module_{index}.py"
+        module_path.parent.mkdir(parents=True, exist_ok=True)
+        module_path.write_text(f"class Model{index}:\n    pass\n\n\ndef make_{index}():\n    return Model{index}()\n")
+    (root / "notes.txt").write_text("plain text\n")
+
+
+class TestRepoxProcessor:
+    """Test cases for RepoxProcessor file content processing."""
+
+    def test_parallel_matches_sequential(self, tmp_path: Path) -> None:
+        """Parallel processing produces the same contents, in the same order, as sequential processing."""
+        _make_python_repo(tmp_path, nb_modules=12)
+        text_processing_funcs: Dict[str, Callable[[str], str]] = {"text/x-python": python_imports_list}
+
+        sequential = RepoxProcessor(repo_path=str(tmp_path), text_processing_funcs=text_processing_funcs).process_file_contents()
+        parallel = RepoxProcessor(repo_path=str(tmp_path), text_processing_funcs=text_processing_funcs, jobs=3).process_file_contents()
+
+        assert list(parallel.items()) == list(sequential.items())
+        assert sequential["pkg_0/module_0.py"] == "Model0, make_0"
+        assert sequential["notes.txt"] == "plain text\n"
+
+    def test_streamed_output_matches_built_output(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """Streaming in small windows, with verbatim copies and per-window batches, writes the same bytes as building the output."""
+        mocker.patch("cocode.repox.repox_processor.STREAMING_WINDOW_SIZE", 4)
+        _make_python_repo(tmp_path, nb_modules=10)
+        (tmp_path / "logo.bin").write_bytes(b"\x89PNG\r\n\x1a\n\x00\xff")
+        text_processing_funcs: Dict[str, Callable[[str], str]] = {"text/x-python": python_imports_list}
+        batch_sizes: List[int] = []
+
+        def upper_batch(texts: List[str]) -> List[str]:
+            batch_sizes.append(len(texts))
+            return [text.upper() for text in texts]
+
+        processors = [
+            RepoxProcessor(
+                repo_path=str(tmp_path),
+                text_processing_funcs=text_processing_funcs,
+                text_batch_processing_funcs={"text/x-python": upper_batch},
+                output_style=OutputStyle.REPO_MAP,
+            )
+            for _ in range(2)
+        ]
+        tree_structure = processors[0].get_tree_structure()
+        built = processors[0].build_output_content(tree_structure=tree_structure, file_contents=processors[0].process_file_contents())
+        streamed = io.BytesIO()
+        processors[1].write_output_content(tree_structure=tree_structure, output=streamed)
+
+        assert streamed.getvalue() == built.encode()
+        assert "Binary content: " in built
+        assert batch_sizes == [10, 2, 4, 4]
+
+    def test_variants_load_and_parse_each_file_once(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """Variants get the same contents as separate processors, with each file loaded and each python module parsed once."""
+        _make_python_repo(tmp_path, nb_modules=5)
+        processor = RepoxProcessor(repo_path=str(tmp_path))
+        rules = [PythonProcessingRule.IMPORTS, PythonProcessingRule.INTERFACE, PythonProcessingRule.INTEGRAL]
+        variants = [
+            processor.make_variant(
+                text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=rule),
+                text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=rule),
+                output_style=OutputStyle.REPO_MAP,
+            )
+            for rule in rules
+        ]
+        expected_contents = [
+            RepoxProcessor(
+                repo_path=str(tmp_path),
+                text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=rule),
+                text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=rule),
+            ).process_file_contents()
+            for rule in rules
+        ]
+        load_spy = mocker.spy(RepoxProcessor, "_load_file")
+        parse_spy = mocker.spy(ast, "parse")
+
+        variant_contents: List[Dict[str, str]] = [{} for _ in variants]
+        for walked_file, file_contents in processor.iter_variant_file_contents(variants=variants, window_size=2):
+            for contents, file_content in zip(variant_contents, file_contents):
+                assert file_content is not None
+                contents[walked_file.relative_path] = file_content
+
+        assert [list(contents.items()) for contents in variant_contents] == [list(contents.items()) for contents in expected_contents]
+        assert load_spy.call_count == 6
+        assert parse_spy.call_count == 5
+
+    def test_file_records_feed_the_formatters(self, tmp_path: Path) -> None:
+        """Eager and lazy file records hold the processed contents, and the formatters give the same output from them as from the dict."""
+        _make_python_repo(tmp_path, nb_modules=4)
+        text_processing_funcs: Dict[str, Callable[[str], str]] = {"text/x-python": python_imports_list}
+        for output_style in (OutputStyle.REPO_MAP, OutputStyle.COMPACT, OutputStyle.FLAT, OutputStyle.IMPORT_LIST):
+            processor = RepoxProcessor(repo_path=str(tmp_path), text_processing_funcs=text_processing_funcs, output_style=output_style)
+            tree_structure = processor.get_tree_structure()
+            file_contents = processor.process_file_contents()
+            built = processor.build_output_content(tree_structure=tree_structure, file_contents=file_contents)
+
+            eager_records = list(processor.iter_file_records(window_size=3))
+            assert [(file_record.relative_path, file_record.text) for file_record in eager_records] == list(file_contents.items())
+            assert "".join(processor.iter_output_content(tree_structure=tree_structure, file_records=eager_records)) == built
+            lazy_records = processor.iter_file_records(is_lazy=True)
+            assert "".join(processor.iter_output_content(tree_structure=tree_structure, file_records=lazy_records)) == built
+
+    def test_lazy_file_records_are_loaded_on_access(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """Lazy records can be filtered from their MIME type and size before any file is read."""
+        _make_python_repo(tmp_path, nb_modules=4)
+        load_spy = mocker.spy(RepoxProcessor, "_load_file")
+        processor = RepoxProcessor(repo_path=str(tmp_path), text_processing_funcs={"text/x-python": python_imports_list})
+
+        file_records = list(processor.iter_file_records(is_lazy=True))
+        assert load_spy.call_count == 0
+        text_records = [file_record for file_record in file_records if file_record.mime == "text/plain"]
+        assert [(file_record.relative_path, file_record.size, file_record.is_loaded) for file_record in text_records] == [("notes.txt", 11, False)]
+        assert text_records[0].text == "plain text\n"
+        assert text_records[0].content_hash == hashlib.blake2b(b"plain text\n", digest_size=16).hexdigest()
+        assert load_spy.call_count == 1
+
+    def test_compact_output_is_smaller_than_repo_map(self, tmp_path: Path) -> None:
+        """The compact style streams the same bytes as it builds, with the same files and fewer estimated tokens than the repo map."""
+        _make_python_repo(tmp_path, nb_modules=20)
+        repo_map_processor = RepoxProcessor(repo_path=str(tmp_path), output_style=OutputStyle.REPO_MAP)
+        repo_map = repo_map_processor.build_output_content(
+            tree_structure=repo_map_processor.get_tree_structure(), file_contents=repo_map_processor.process_file_contents()
+        )
+        compact_processor = RepoxProcessor(repo_path=str(tmp_path), output_style=OutputStyle.COMPACT)
+        tree_structure = compact_processor.get_tree_structure()
+        compact = compact_processor.build_output_content(tree_structure=tree_structure, file_contents=compact_processor.process_file_contents())
+        streamed = io.BytesIO()
+        RepoxProcessor(repo_path=str(tmp_path), output_style=OutputStyle.COMPACT).write_output_content(tree_structure=tree_structure, output=streamed)
+
+        assert streamed.getvalue() == compact.encode()
+        assert compact.startswith(f"Repository: {tmp_path.name}\nnotes.txt\npkg_0/\n  module_0.py\n")
+        assert "\n==> pkg_1/module_19.py <==\nclass Model19:\n    pass\n\ndef make_19():\n    return Model19()\n" in compact
+        assert str(tmp_path) not in compact
+        assert estimate_tokens(compact) < 0.9 * estimate_tokens(repo_map)
+
+    def test_total_bytes_budget_leaves_out_files(self, tmp_path: Path) -> None:
+        """Files that don't fit in what remains of the total budget are left out, smaller files after them are kept."""
+        (tmp_path / "a.txt").write_text("a" * 60)
+        (tmp_path / "b.txt").write_text("b" * 60)
+        (tmp_path / "c.txt").write_text("c" * 30)
+
+        file_contents = RepoxProcessor(repo_path=str(tmp_path), max_total_bytes=100).process_file_contents()
+
+        assert list(file_contents) == ["a.txt", "c.txt"]
+
+    def test_cache_serves_warm_runs(self, tmp_path: Path) -> None:
+        """A second run reads unchanged files from the cache and reprocesses changed ones."""
+        repo_path = tmp_path / "repo"
+        _make_python_repo(repo_path, nb_modules=3)
+        cache = RepoxCache(cache_dir=str(tmp_path / "cache"))
+        text_processing_funcs: Dict[str, Callable[[str], str]] = {"text/x-python": python_imports_list}
+
+        cold = RepoxProcessor(repo_path=str(repo_path), text_processing_funcs=text_processing_funcs, cache=cache).process_file_contents()
+        (repo_path / "pkg_1" / "module_1.py").write_text("def changed():\n    pass\n")
+        warm = RepoxProcessor(repo_path=str(repo_path), text_processing_funcs=text_processing_funcs, cache=cache)
+        warm_contents = warm.process_file_contents()
+
+        assert cold["pkg_1/module_1.py"] == "Model1, make_1"
+        assert warm_contents["pkg_1/module_1.py"] == "changed"
+        assert warm_contents["pkg_0/module_0.py"] == cold["pkg_0/module_0.py"]
+        assert cache.nb_hits == 0  # counters are reset at the end of each run
+
+    def test_parallel_and_sequential_runs_share_the_cache(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """Both executors go through the same pipeline: a parallel run is served the outputs cached by a sequential one."""
+        repo_path = tmp_path / "repo"
+        _make_python_repo(repo_path, nb_modules=3)
+        cache = RepoxCache(cache_dir=str(tmp_path / "cache"))
+        text_processing_funcs: Dict[str, Callable[[str], str]] = {"text/x-python": python_imports_list}
+
+        sequential = RepoxProcessor(repo_path=str(repo_path), text_processing_funcs=text_processing_funcs, cache=cache).process_file_contents()
+        get_spy = mocker.spy(cache, "get")
+        parallel = RepoxProcessor(repo_path=str(repo_path), text_processing_funcs=text_processing_funcs, cache=cache, jobs=2).process_file_contents()
+
+        assert list(parallel.items()) == list(sequential.items())
+        assert get_spy.call_count == 3
+        assert all(cached_text is not None for cached_text in get_spy.spy_return_list)
+
+    def test_cache_is_not_served_to_another_formatter(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """Outputs formatted without ruff are not served once ruff is installed, and the other way around."""
+        repo_path = tmp_path / "repo"
+        _make_python_repo(repo_path, nb_modules=3)
+        cache = RepoxCache(cache_dir=str(tmp_path / "cache"))
+
+        def process_interfaces() -> Dict[str, str]:
+            return RepoxProcessor(
+                repo_path=str(repo_path),
+                text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=PythonProcessingRule.INTERFACE),
+                text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=PythonProcessingRule.INTERFACE),
+                cache=cache,
+            ).process_file_contents()
+
+        which_patch = mocker.patch("cocode.utils.shutil.which", return_value=None)
+        normalized = process_interfaces()
+        mocker.stop(which_patch)
+        get_spy = mocker.spy(cache, "get")
+        formatted = process_interfaces()
+
+        assert get_spy.call_count == 3
+        assert all(cached_text is None for cached_text in get_spy.spy_return_list)
+        assert formatted["pkg_0/module_0.py"] != normalized["pkg_0/module_0.py"]
+        assert process_interfaces() == formatted
+        assert all(cached_text is not None for cached_text in get_spy.spy_return_list[3:])
+
+    def test_cache_eviction_is_size_bounded(self, tmp_path: Path) -> None:
+        """Least recently used entries are evicted once the cache exceeds its size bound."""
+        cache = RepoxCache(cache_dir=str(tmp_path / "cache"), max_bytes=10)
+        cache.put(key="aa" + "0" * 62, processed_text="12345678")
+        cache.put(key="bb" + "0" * 62, processed_text="12345678")
+
+        assert cache.evict() == 1
+        assert cache.get("aa" + "0" * 62) is None or cache.get("bb" + "0" * 62) is None
@@ -0,0 +1,74 @@
+"""
+Unit tests for the phase-level profiler of repox runs.
+"""
+
+import io
+import time
+from pathlib import Path
+
+from pipelex import log
+from pytest_mock import MockerFixture
+
+from cocode.repox.models import EnumerationMode, ProfilePhase
+from cocode.repox.process_python import PythonProcessingRule, make_python_batch_processing_funcs, make_python_text_processing_funcs
+from cocode.repox.repox_processor import RepoxProcessor
+from cocode.repox.repox_profile import RepoxProfiler
+
+
+def _make_processor(repo_path: Path, profiler: RepoxProfiler | None) -> RepoxProcessor:
+    return RepoxProcessor(
+        repo_path=str(repo_path),
+        text_processing_funcs=make_python_text_processing_funcs(python_processing_rule=PythonProcessingRule.INTERFACE),
+        text_batch_processing_funcs=make_python_batch_processing_funcs(python_processing_rule=PythonProcessingRule.INTERFACE),
+        enumeration_mode=EnumerationMode.FILESYSTEM,
+        profiler=profiler,
+    )
+
+
+class TestRepoxProfiler:
+    """Test cases for the measure of the phases of a run."""
+
+    def test_nested_phases_are_counted_once(self) -> None:
+        """The time of a phase measured within another one is left out of the outer phase."""
+        profiler = RepoxProfiler()
+        with profiler.measure(phase=ProfilePhase.WALK):
+            with profiler.measure(phase=ProfilePhase.IGNORE, relative_path="a.py"):
+                time.sleep(0.05)
+        assert profiler.phase_seconds[ProfilePhase.IGNORE] >= 0.05
+        assert profiler.phase_seconds[ProfilePhase.WALK] < 0.05
+        assert profiler.phase_counts[ProfilePhase.WALK] == profiler.phase_counts[ProfilePhase.IGNORE] == 1
+        assert profiler.get_slowest_files() == [("a.py", profiler.phase_seconds[ProfilePhase.IGNORE])]
+
+    def test_profiled_run_reports_every_phase(self, tmp_path: Path) -> None:
+        """A profiled run measures each phase and each file, and writes the same output as an unprofiled one."""
+        (tmp_path / "pkg").mkdir()
+        for index in range(3):
+            (tmp_path / "pkg" / f"module_{index}.py").write_text(f"def make_{index}():\n    return {index}\n")
+        (tmp_path / "notes.txt").write_text("plain text\n")
+        profiler = RepoxProfiler(nb_slowest_files=2)
+        processor = _make_processor(repo_path=tmp_path, profiler=profiler)
+        profiled = io.BytesIO()
+        processor.write_output_content(tree_structure=processor.get_tree_structure(), output=profiled)
+        unprofiled_processor = _make_processor(repo_path=tmp_path, profiler=None)
+        unprofiled = io.BytesIO()
+        unprofiled_processor.write_output_content(tree_structure=unprofiled_processor.get_tree_structure(), output=unprofiled)
+
+        assert profiled.getvalue() == unprofiled.getvalue()
+        assert profiler.phase_counts[ProfilePhase.WALK] == 4
+        # notes.txt is copied as is, without being loaded
+        assert profiler.phase_counts[ProfilePhase.READ] == profiler.phase_counts[ProfilePhase.CLASSIFY] == 3
+        assert profiler.phase_counts[ProfilePhase.IGNORE] > 4
+        assert profiler.phase_counts[ProfilePhase.TRANSFORM] > 0
+        assert profiler.phase_counts[ProfilePhase.WRITE] > 0
+        assert len(profiler.get_slowest_files()) == 2
+        report = profiler.describe()
+        assert all(phase in report for phase in ProfilePhase)
+        assert "Slowest 2 files:" in report
+
+    def test_hot_path_debug_logs_are_skipped_when_disabled(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """Per-file debug messages are neither built nor logged below the debug level."""
+        (tmp_path / "module.py").write_text("def main():\n    return 0\n")
+        debug_spy = mocker.spy(log, "debug")
+        mocker.patch("cocode.repox.repox_processor.is_log_enabled", return_value=False)
+        _make_processor(repo_path=tmp_path, profiler=None).process_file_contents()
+        assert not any("Text processing of" in str(call.args) for call in debug_spy.call_args_list)
@@ -0,0 +1,101 @@
+"""
+Unit tests for the size estimate and token attribution of repox outputs.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from cocode.exceptions import RepoxException
+from cocode.repox.models import EnumerationMode, OutputStyle, RepoxStats
+from cocode.repox.process_python import PythonProcessingRule
+from cocode.repox.repox_budget import estimate_tokens
+from cocode.repox.repox_cmd import make_repox_processor, process_repox
+from cocode.repox.repox_processor import RepoxProcessor
+from cocode.repox.repox_stats import BINARY_MIME, attribute_repox_tokens, describe_repox_stats, estimate_repox_size, repox_stats_command
+
+
+def _make_repo(repo_path: Path) -> None:
+    for index in range(6):
+        module_path = repo_path / "pkg" / f"sub_{index % 2}" / f"module_{index}.py"
+        module_path.parent.mkdir(parents=True, exist_ok=True)
+        module_path.write_text(f"import os\n\n\ndef make_{index}(value: int) -> str:\n    return os.sep.join([str(value)] * {index})\n")
+    (repo_path / "notes.md").write_text("# Example\n\nA repository to count tokens in.\n" * 20)
+    (repo_path / "logo.bin").write_bytes(b"\x89PNG\r\n\x1a\n\x00\xff" * 50)
+
+
+def _make_processor(repo_path: Path, output_style: OutputStyle) -> RepoxProcessor:
+    return make_repox_processor(
+        repo_path=str(repo_path),
+        exclude_patterns=None,
+        include_patterns=None,
+        path_pattern=None,
+        python_processing_rule=PythonProcessingRule.INTEGRAL,
+        output_style=output_style,
+        enumeration_mode=EnumerationMode.FILESYSTEM,
+    )
+
+
+class TestRepoxStats:
+    """Test cases for the statistics of repox outputs."""
+
+    def test_attribution_adds_up_to_the_output(self, tmp_path: Path) -> None:
+        """The tokens of the header and of each file add up to the tokens of the real output, and roll up to directories and types."""
+        _make_repo(tmp_path)
+        for output_style in (OutputStyle.REPO_MAP, OutputStyle.COMPACT, OutputStyle.FLAT):
+            attribution = attribute_repox_tokens(processor=_make_processor(repo_path=tmp_path, output_style=output_style))
+            output = process_repox(repox_processor=_make_processor(repo_path=tmp_path, output_style=output_style))
+
+            assert attribution.nb_tokens == estimate_tokens(output)
+            assert set(attribution.file_tokens) == {"notes.md", "logo.bin", *(f"pkg/sub_{index % 2}/module_{index}.py" for index in range(6))}
+            assert attribution.directory_tokens["pkg"] == attribution.directory_tokens["pkg/sub_0"] + attribution.directory_tokens["pkg/sub_1"]
+            assert attribution.mime_tokens["text/x-python"] == attribution.directory_tokens["pkg"]
+            assert (attribution.nb_header_tokens > 0) == (output_style != OutputStyle.FLAT)
+
+    def test_estimate_counts_the_files_of_the_real_run(self, tmp_path: Path) -> None:
+        """The estimate lists the same files and bytes as the run, and its tokens are close to the processed ones."""
+        _make_repo(tmp_path)
+        stats = repox_stats_command(
+            repo_path=str(tmp_path),
+            exclude_patterns=["notes.md"],
+            include_patterns=None,
+            path_pattern=None,
+            python_processing_rule=PythonProcessingRule.INTEGRAL,
+            output_style=OutputStyle.REPO_MAP,
+            is_processed=True,
+            use_cache=False,
+            enumeration_mode=EnumerationMode.FILESYSTEM,
+        )
+
+        assert stats.attribution is not None
+        assert stats.estimate.nb_files == stats.estimate.nb_content_files == len(stats.attribution.file_tokens) == 7
+        assert stats.estimate.nb_bytes == sum(path.stat().st_size for path in tmp_path.rglob("*") if path.is_file() and path.name != "notes.md")
+        # Three of the six python modules, the binary logo only being sniffed
+        assert stats.estimate.nb_sampled_files == 3
+        assert abs(stats.estimate.nb_estimated_tokens - stats.attribution.nb_tokens) < 0.1 * stats.attribution.nb_tokens
+        assert RepoxStats.model_validate_json(stats.model_dump_json()) == stats
+        report = describe_repox_stats(stats=stats, nb_top_entries=2)
+        assert "Top 2 files:" in report
+        assert "Top 2 directories:" in report
+        assert "Top 2 MIME types:" in report
+
+    def test_container_tokens_are_not_counted(self, tmp_path: Path) -> None:
+        """The container is binary: only its estimate can be made."""
+        _make_repo(tmp_path)
+        with pytest.raises(RepoxException, match="binary"):
+            attribute_repox_tokens(processor=_make_processor(repo_path=tmp_path, output_style=OutputStyle.CONTAINER))
+
+    def test_extensionless_binaries_only_cost_their_placeholder(self, tmp_path: Path) -> None:
+        """Binaries without an extension are counted apart from text files, at the cost of their placeholder, in the estimate and the attribution."""
+        (tmp_path / "README").write_text("A repository with large binary blobs.\n" * 20)
+        (tmp_path / "NOTES").write_text("Plain text notes.\n" * 20)
+        (tmp_path / "logo").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + bytes(range(256)) * 2000)
+        processor = _make_processor(repo_path=tmp_path, output_style=OutputStyle.REPO_MAP)
+
+        estimate = estimate_repox_size(processor=processor)
+        attribution = attribute_repox_tokens(processor=_make_processor(repo_path=tmp_path, output_style=OutputStyle.REPO_MAP))
+
+        assert estimate.nb_sampled_files == 2
+        assert abs(estimate.nb_estimated_tokens - attribution.nb_tokens) < 0.1 * attribution.nb_tokens
+        assert attribution.mime_tokens[BINARY_MIME] == attribution.file_tokens["logo"]
+        assert attribution.mime_tokens["text/plain"] == attribution.file_tokens["README"] + attribution.file_tokens["NOTES"]
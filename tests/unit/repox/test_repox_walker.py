@@ -0,0 +1,101 @@
+"""
+Unit tests for the repox scandir walker.
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List
+
+from cocode.repox.repox_walker import GitIndexWalker, RepoxMatcher, RepoxWalker, is_git_work_tree
+
+
+def _make_repo(root: Path, relative_paths: List[str]) -> None:
+    for relative_path in relative_paths:
+        file_path = root / relative_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(f"content of {relative_path}\n")
+
+
+class TestRepoxWalker:
+    """Test cases for directory pruning and file filtering."""
+
+    def test_prunes_ignored_directories(self, tmp_path: Path) -> None:
+        """Ignored directories are not descended into and are counted as pruned."""
+        _make_repo(tmp_path, ["main.py", "pkg/module.py", "node_modules/lib/index.js", ".venv/lib/site.py"])
+        matcher = RepoxMatcher(prune_patterns=["node_modules", ".venv"], content_ignore_patterns=[])
+        walker = RepoxWalker(repo_path=str(tmp_path), matcher=matcher)
+
+        relative_paths = [walked_file.relative_path for walked_file in walker.walk()]
+
+        assert relative_paths == ["main.py", "pkg/module.py"]
+        assert walker.stats.nb_dirs_pruned == 2
+        assert walker.stats.nb_files_kept == 2
+
+    def test_include_and_path_patterns(self, tmp_path: Path) -> None:
+        """Include globs apply to file names and the path pattern to their directory."""
+        _make_repo(tmp_path, ["README.md", "src/app.py", "src/app.md", "tests/test_app.py"])
+        matcher = RepoxMatcher(prune_patterns=[], content_ignore_patterns=[], include_patterns=["*.py"], path_pattern="^src")
+        walker = RepoxWalker(repo_path=str(tmp_path), matcher=matcher)
+
+        relative_paths = [walked_file.relative_path for walked_file in walker.walk()]
+
+        assert relative_paths == ["src/app.py"]
+        assert walker.stats.nb_files_pruned == 3
+
+    def test_content_ignored_files_are_flagged(self, tmp_path: Path) -> None:
+        """Content-ignored files are still yielded, flagged, with their size."""
+        _make_repo(tmp_path, ["README.md", "main.py"])
+        matcher = RepoxMatcher(prune_patterns=[], content_ignore_patterns=["README.md"])
+        walker = RepoxWalker(repo_path=str(tmp_path), matcher=matcher)
+
+        walked_files = {walked_file.relative_path: walked_file for walked_file in walker.walk()}
+
+        assert walked_files["README.md"].is_content_ignored
+        assert not walked_files["main.py"].is_content_ignored
+        assert walked_files["main.py"].size == len("content of main.py\n")
+
+
+class TestGitIndexWalker:
+    """Test cases for git index enumeration."""
+
+    def test_honors_nested_gitignore(self, tmp_path: Path) -> None:
+        """Tracked and untracked files are listed, files ignored by a nested .gitignore and deleted files are not."""
+        _make_repo(tmp_path, ["main.py", "pkg/module.py", "pkg/debug.log", "pkg/.gitignore", "gone.py", "vendor/lib.py"])
+        (tmp_path / "pkg" / ".gitignore").write_text("*.log\n")
+        subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+        subprocess.run(["git", "add", "main.py", "gone.py", "vendor/lib.py", "pkg/.gitignore"], cwd=tmp_path, check=True)
+        (tmp_path / "gone.py").unlink()
+        matcher = RepoxMatcher(prune_patterns=["vendor", ".gitignore"], content_ignore_patterns=[])
+
+        assert is_git_work_tree(str(tmp_path))
+        walker = GitIndexWalker(repo_path=str(tmp_path), matcher=matcher)
+        walked_files = list(walker.walk())
+
+        assert [walked_file.relative_path for walked_file in walked_files] == ["main.py", "pkg/module.py"]
+        assert walked_files[0].size == len("content of main.py\n")
+        assert walker.stats.nb_dirs_pruned == 1
+
+    def test_sizes_of_modified_files_come_from_the_working_tree(self, tmp_path: Path) -> None:
+        """Files changed since they were staged get their size on disk, not the one cached in the index."""
+        _make_repo(tmp_path, ["grown.py", "shrunk.py", "kept.py"])
+        subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+        subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+        (tmp_path / "grown.py").write_text("x = 1\n" * 1000)
+        (tmp_path / "shrunk.py").write_text("")
+
+        walker = GitIndexWalker(repo_path=str(tmp_path), matcher=RepoxMatcher(prune_patterns=[], content_ignore_patterns=[]))
+        file_sizes = {walked_file.relative_path: walked_file.size for walked_file in walker.walk()}
+
+        assert file_sizes == {"grown.py": len("x = 1\n") * 1000, "kept.py": len("content of kept.py\n"), "shrunk.py": 0}
+
+    def test_untracked_nested_repositories_are_skipped(self, tmp_path: Path) -> None:
+        """An untracked nested repository, which git lists as its directory, is neither walked nor yielded as a file."""
+        _make_repo(tmp_path, ["main.py", "nested/lib.py"])
+        subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+        subprocess.run(["git", "init", "-q"], cwd=tmp_path / "nested", check=True)
+        subprocess.run(["git", "add", "main.py"], cwd=tmp_path, check=True)
+
+        walker = GitIndexWalker(repo_path=str(tmp_path), matcher=RepoxMatcher(prune_patterns=[], content_ignore_patterns=[]))
+
+        assert [walked_file.relative_path for walked_file in walker.walk()] == ["main.py"]
+        assert [walked_file.relative_path for walked_file in walker.walk_paths(["nested", "main.py"])] == ["main.py"]
@@ -0,0 +1,172 @@
+"""
+Unit tests for the repox watch mode.
+"""
+
+import os
+import stat
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from cocode.repox.models import EnumerationMode, OutputStyle
+from cocode.repox.repox_cmd import get_output_exclude_patterns
+from cocode.repox.repox_processor import RepoxProcessor
+from cocode.repox.repox_walker import RepoxMatcher
+from cocode.repox.repox_watch import InotifyWatcher, RepoxWatchSession
+
+
+def _make_session(repo_path: Path, output_file_path: Path, enumeration_mode: EnumerationMode = EnumerationMode.FILESYSTEM) -> RepoxWatchSession:
+    processor = RepoxProcessor(
+        repo_path=str(repo_path),
+        output_style=OutputStyle.REPO_MAP,
+        enumeration_mode=enumeration_mode,
+    )
+    return RepoxWatchSession(processor=processor, output_file_path=output_file_path)
+
+
+class TestRepoxWatchSession:
+    """Test cases for the incremental regeneration of the output."""
+
+    def test_update_processes_only_changed_files(self, tmp_path: Path) -> None:
+        """Changed, new and deleted files are reflected in the output, unchanged files are not processed again."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        (repo_path / "a.txt").write_text("alpha\n")
+        (repo_path / "b.txt").write_text("beta\n")
+        (repo_path / "c.txt").write_text("gamma\n")
+        output_file_path = tmp_path / "repox.txt"
+        session = _make_session(repo_path=repo_path, output_file_path=output_file_path)
+        session.start()
+        assert "alpha" in output_file_path.read_text()
+
+        assert session.update(changed_paths=set()) == 0
+
+        (repo_path / "a.txt").write_text("alpha changed\n")
+        (repo_path / "d.txt").write_text("delta\n")
+        (repo_path / "c.txt").unlink()
+        # Changed a.txt, new d.txt, removed c.txt, and the tree
+        assert session.update(changed_paths={"a.txt", "c.txt", "d.txt"}) == 4
+
+        output_content = output_file_path.read_text()
+        assert "alpha changed" in output_content
+        assert "beta" in output_content
+        assert "delta" in output_content
+        assert "gamma" not in output_content
+        assert list(tmp_path.glob(".repox.txt.*")) == []
+
+    def test_update_without_changed_paths_compares_stats(self, tmp_path: Path) -> None:
+        """When the changes are unknown, as when polling, changed files are found from their size and modification time."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        (repo_path / "a.txt").write_text("alpha\n")
+        (repo_path / "b.txt").write_text("beta\n")
+        output_file_path = tmp_path / "repox.txt"
+        session = _make_session(repo_path=repo_path, output_file_path=output_file_path)
+        session.start()
+
+        assert session.update(changed_paths=None) == 0
+        (repo_path / "b.txt").write_text("beta, longer\n")
+        assert session.update(changed_paths=None) == 1
+        assert "beta, longer" in output_file_path.read_text()
+
+    @pytest.mark.parametrize("enumeration_mode", [EnumerationMode.FILESYSTEM, EnumerationMode.GIT])
+    def test_update_walks_only_changed_paths_until_a_gitignore_changes(
+        self, tmp_path: Path, mocker: MockerFixture, enumeration_mode: EnumerationMode
+    ) -> None:
+        """Changed files and new directories are walked alone, and a change of .gitignore walks the repository again with its new rules."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        (repo_path / "a.txt").write_text("alpha\n")
+        (repo_path / ".gitignore").write_text("*.log\n")
+        if enumeration_mode == EnumerationMode.GIT:
+            subprocess.run(["git", "init", "-q"], cwd=repo_path, check=True)
+        output_file_path = tmp_path / "repox.txt"
+        session = _make_session(repo_path=repo_path, output_file_path=output_file_path, enumeration_mode=enumeration_mode)
+        session.start()
+        refresh_spy = mocker.spy(session.processor, "refresh_walk")
+
+        (repo_path / "pkg").mkdir()
+        (repo_path / "pkg" / "b.txt").write_text("beta\n")
+        (repo_path / "pkg" / "debug.log").write_text("ignored\n")
+        (repo_path / "a.txt").write_text("alpha changed\n")
+        # Changed a.txt, new pkg/b.txt, and the tree
+        assert session.update(changed_paths={"a.txt", "pkg"}) == 3
+        assert refresh_spy.call_count == 0
+        output_content = output_file_path.read_text()
+        assert "alpha changed" in output_content
+        assert "beta" in output_content
+        assert "ignored" not in output_content
+
+        (repo_path / ".gitignore").write_text("*.log\npkg/\n")
+        session.update(changed_paths={".gitignore"})
+        assert refresh_spy.call_count == 1
+        assert "beta" not in output_file_path.read_text()
+
+    def test_output_file_keeps_its_mode(self, tmp_path: Path) -> None:
+        """The output file replaced atomically keeps the mode it had, and a new one gets the mode the umask gives."""
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        (repo_path / "a.txt").write_text("alpha\n")
+        output_file_path = tmp_path / "repox.txt"
+        session = _make_session(repo_path=repo_path, output_file_path=output_file_path)
+        umask = os.umask(0o022)
+        try:
+            session.start()
+            assert stat.S_IMODE(output_file_path.stat().st_mode) == 0o644
+            output_file_path.chmod(0o640)
+            session.write_output()
+            assert stat.S_IMODE(output_file_path.stat().st_mode) == 0o640
+        finally:
+            os.umask(umask)
+
+    def test_output_exclude_patterns(self) -> None:
+        """The output file is excluded only when it is written inside the repository."""
+        assert get_output_exclude_patterns(repo_path="/repo", output_dir="/repo/results", output_filename="out.txt") == [
+            "/results/out.txt",
+            "/results/.out.txt.*",
+        ]
+        assert get_output_exclude_patterns(repo_path="/repo", output_dir="/repo", output_filename="out.txt") == ["/out.txt", "/.out.txt.*"]
+        assert get_output_exclude_patterns(repo_path="/repo", output_dir="/elsewhere", output_filename="out.txt") == []
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+class TestInotifyWatcher:
+    """Test cases for the inotify watcher."""
+
+    def test_reports_changes_in_new_directories(self, tmp_path: Path) -> None:
+        """Writes are reported with their relative path, including in directories created after the watcher."""
+        (tmp_path / "a.txt").write_text("alpha\n")
+        (tmp_path / "node_modules").mkdir()
+        watcher = InotifyWatcher(repo_path=str(tmp_path), matcher=RepoxMatcher(prune_patterns=["node_modules/"], content_ignore_patterns=[]))
+        try:
+            (tmp_path / "a.txt").write_text("alpha changed\n")
+            (tmp_path / "node_modules" / "lib.js").write_text("ignored\n")
+            assert watcher.wait_for_changes(timeout=5) == {"a.txt"}
+
+            (tmp_path / "pkg").mkdir()
+            assert watcher.wait_for_changes(timeout=5) == {"pkg"}
+            (tmp_path / "pkg" / "b.txt").write_text("beta\n")
+            assert watcher.wait_for_changes(timeout=5) == {"pkg/b.txt"}
+
+            start_time = time.monotonic()
+            assert watcher.wait_for_changes(timeout=0.1) == set()
+            assert time.monotonic() - start_time < 2
+        finally:
+            watcher.close()
+
+    def test_ignore_rules_are_updated(self, tmp_path: Path) -> None:
+        """Directories newly ignored are no longer watched, and directories no longer ignored are."""
+        (tmp_path / "build").mkdir()
+        (tmp_path / "pkg").mkdir()
+        watcher = InotifyWatcher(repo_path=str(tmp_path), matcher=RepoxMatcher(prune_patterns=["build/"], content_ignore_patterns=[]))
+        try:
+            watcher.update_ignore_rules(matcher=RepoxMatcher(prune_patterns=["pkg/"], content_ignore_patterns=[]), ignored_dirs=None)
+            (tmp_path / "pkg" / "a.txt").write_text("alpha\n")
+            (tmp_path / "build" / "b.txt").write_text("beta\n")
+            assert watcher.wait_for_changes(timeout=5) == {"build/b.txt"}
+        finally:
+            watcher.close()
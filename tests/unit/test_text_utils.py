@@ -0,0 +1,38 @@
+"""
+Unit tests for the text splitting utilities of the pipelines.
+"""
+
+from cocode.pipelines.text_utils import find_first_line_starts, make_text_chunks, split_text_spans
+
+
+class TestSplitTextSpans:
+    """Test cases for splitting text on the first line starting with each identifier."""
+
+    def test_only_the_first_line_start_of_each_identifier_counts(self) -> None:
+        """Identifiers count when they start a line, possibly indented, and only on their first such line."""
+        text = "intro\ndiff --git a/x\n  diff --git a/y\nmore diff --git a/z\ndiff --git a/x again\n"
+
+        assert find_first_line_starts(text=text, identifiers=["diff --git a/x", "diff --git a/y", "diff --git a/z", "missing"]) == [6, 21]
+
+    def test_identifiers_prefixing_each_other_are_all_found(self) -> None:
+        """A line starting with a longer identifier is also the first line of the shorter ones it starts with."""
+        text = "head\nfoobar 1\nfoo 2\nfoobaz 3\n"
+
+        assert find_first_line_starts(text=text, identifiers=["foo", "foobar", "foobaz", "fo"]) == [5, 20]
+        assert find_first_line_starts(text=text, identifiers=["foo"]) == [5]
+
+    def test_spans_cover_the_text_and_chunks_copy_them(self) -> None:
+        """Spans follow each other without empty ones, and chunks are numbered in order."""
+        text = "alpha\nbeta\ngamma\n"
+
+        spans = split_text_spans(text=text, identifiers=["alpha", "gamma", "beta"])
+
+        assert spans == [(0, 6), (6, 11), (11, 17)]
+        assert split_text_spans(text=text, identifiers=[]) == [(0, 17)]
+        assert split_text_spans(text="", identifiers=["alpha"]) == [(0, 0)]
+        chunks = make_text_chunks(text=text, spans=spans).items
+        assert [(chunk.chunk_index, chunk.chunk_text, chunk.start_position) for chunk in chunks] == [
+            (0, "alpha\n", 0),
+            (1, "beta\n", 6),
+            (2, "gamma\n", 11),
+        ]
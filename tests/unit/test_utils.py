@@ -0,0 +1,81 @@
+"""
+Unit tests for the shared utilities.
+"""
+
+import io
+from pathlib import Path
+
+from pytest_mock import MockerFixture
+
+from cocode.utils import check_type_and_load_if_text, copy_text_file_bytes, format_many_with_ruff, normalize_python_layout
+
+
+class TestFormatManyWithRuff:
+    """Test cases for batch python formatting."""
+
+    def test_formats_batch_and_keeps_invalid_code(self) -> None:
+        """Valid codes are formatted in one run and codes that don't parse are returned as is."""
+        formatted = format_many_with_ruff(["def f( a,b ):\n    return a+b", "def broken(:\n"])
+
+        assert formatted == ["def f(a, b):\n    return a + b\n", "def broken(:\n"]
+
+    def test_falls_back_without_ruff(self, mocker: MockerFixture) -> None:
+        """Without ruff, the built-in normalizer is applied."""
+        mocker.patch("cocode.utils.shutil.which", return_value=None)
+
+        assert format_many_with_ruff(["x = 1   \n\n\n\n\ny = 2\n\n"]) == ["x = 1\n\n\ny = 2\n"]
+
+    def test_normalize_python_layout_strips_leading_blank_lines(self) -> None:
+        """Leading and trailing blank lines are dropped."""
+        assert normalize_python_layout("\n\nclass A:\n    ...  \n\n") == "class A:\n    ...\n"
+
+
+class TestCheckTypeAndLoadIfText:
+    """Test cases for text sniffing and size caps."""
+
+    def test_nul_prefix_is_binary(self, tmp_path: Path) -> None:
+        """A file whose prefix holds a NUL byte is binary, even if it is valid UTF-8."""
+        file_path = tmp_path / "image.txt"
+        file_path.write_bytes(b"\x89PNG\r\n\x1a\n\0" + b"a" * 100_000)
+
+        assert not isinstance(check_type_and_load_if_text(file_path=str(file_path)), tuple)
+
+    def test_large_text_is_truncated_to_head_and_tail(self, tmp_path: Path) -> None:
+        """A text file above max_file_bytes keeps whole lines from its head and tail around a truncation marker."""
+        file_path = tmp_path / "data.csv"
+        lines = [f"row {index}\r\n" for index in range(1000)]
+        file_path.write_text("".join(lines), newline="")
+
+        file_check = check_type_and_load_if_text(file_path=str(file_path), max_file_bytes=40)
+
+        assert isinstance(file_check, tuple)
+        nb_total_bytes = file_path.stat().st_size
+        assert file_check[1] == (
+            f"row 0\nrow 1\n[... truncated by cocode: {nb_total_bytes - 14 - 18} of {nb_total_bytes} bytes omitted ...]\nrow 998\nrow 999\n"
+        )
+
+
+class TestCopyTextFileBytes:
+    """Test cases for verbatim text file copies."""
+
+    def test_matches_text_loading_across_chunks(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """Copied bytes equal the loaded text, including a CRLF split across two chunks."""
+        mocker.patch("cocode.utils.COPY_CHUNK_SIZE", 4)
+        file_path = tmp_path / "notes.txt"
+        file_path.write_bytes("abc\r\nd\ré\r\n".encode())
+        output = io.BytesIO()
+
+        assert copy_text_file_bytes(file_path=str(file_path), output=output, header=b"> ")
+        file_check = check_type_and_load_if_text(file_path=str(file_path))
+        assert isinstance(file_check, tuple)
+        assert output.getvalue() == b"> " + file_check[1].encode()
+
+    def test_writes_nothing_for_binary_files(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        """A file that is not UTF-8 past the first chunk is detected before anything is written."""
+        mocker.patch("cocode.utils.COPY_CHUNK_SIZE", 4)
+        file_path = tmp_path / "image.bin"
+        file_path.write_bytes(b"plain start\xff\xfe")
+        output = io.BytesIO()
+
+        assert not copy_text_file_bytes(file_path=str(file_path), output=output, header=b"> ")
+        assert output.getvalue() == b""